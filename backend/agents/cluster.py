@@ -0,0 +1,66 @@
+"""Nearby-duplicate clustering for intake.
+
+A new report of the same class within CLUSTER_RADIUS_M of an open ticket is
+attached to that ticket (status MERGED, parent_id set) instead of being filed
+again. Candidates come from an in-memory grid of hot open tickets; the grid is
+topped up from the DB every HOT_INDEX_REFRESH_S seconds (so tickets created by
+other API workers show up) and every candidate is re-checked against the DB
+before attaching, so stale entries (since filed/resolved/merged) are dropped.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from agents.spatial import GridIndex
+from db.models import OPEN_STATUSES
+from db.repository import TicketRepo
+
+CLUSTER_RADIUS_M = float(os.getenv("CLUSTER_RADIUS_M", "30"))
+HOT_INDEX_REFRESH_S = float(os.getenv("HOT_INDEX_REFRESH_S", "5"))
+
+
+class HotTicketIndex:
+    def __init__(self, cell_m: float = 100.0, refresh_s: float = HOT_INDEX_REFRESH_S):
+        self.grid = GridIndex(cell_m)
+        self.refresh_s = refresh_s
+        self._watermark: Optional[datetime] = None
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, tid: str, lat: float, lng: float, iclass: str) -> None:
+        with self._lock:
+            self.grid.add(tid, lat, lng, iclass)
+
+    def discard(self, tid: str) -> None:
+        with self._lock:
+            self.grid.remove(tid)
+
+    def sync(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self._synced_at < self.refresh_s:
+            return
+        rows = TicketRepo.open_points(since=self._watermark)
+        with self._lock:
+            for r in rows:
+                self.grid.add(r["id"], r["lat"], r["lng"], r["iclass"])
+                if r["created_at"] and (self._watermark is None or r["created_at"] > self._watermark):
+                    self._watermark = r["created_at"]
+            self._synced_at = time.monotonic()
+
+    def find_parent(self, lat: float, lng: float, iclass: str, radius_m: float = CLUSTER_RADIUS_M) -> Optional[Dict[str, Any]]:
+        """Nearest open ticket of `iclass` within radius_m, confirmed in the DB."""
+        self.sync()
+        with self._lock:
+            candidates = self.grid.query(lat, lng, radius_m, predicate=lambda c: c == iclass)
+        for _, tid, _ in candidates:
+            t = TicketRepo.get(tid)
+            if t and t.get("status") in OPEN_STATUSES and t.get("iclass") == iclass and not t.get("parent_id"):
+                return t
+            self.discard(tid)
+        return None
+
+
+hot_index = HotTicketIndex()
@@ -0,0 +1,85 @@
+"""Resized copies of uploaded photos for listings, previews and emails.
+
+For an original stored under `<sha256>.jpg` this writes, next to it (MinIO
+or local media, via storage.store_file):
+
+    <sha256>.thumb.webp    <sha256>.thumb.jpg      long edge MEDIA_THUMB_PX (480)
+    <sha256>.preview.webp  <sha256>.preview.jpg    long edge MEDIA_PREVIEW_PX (1280)
+
+Tickets carry thumb_url / preview_url (the WebP copies); the JPEG siblings
+at the same path are for clients without WebP (mail readers).
+
+Decoding a 12 MP JPEG is most of the cost, so the original is opened with
+Image.draft, which lets libjpeg decode straight at 1/2, 1/4 or 1/8 scale, and
+shrunk with thumbnail(reducing_gap=...), which uses Image.reduce (box
+averaging) for the bulk of the reduction and resamples only the last step.
+Each size is derived from the previous, larger one. The EXIF orientation is
+applied to the pixels and no metadata (EXIF, GPS, XMP) is written out.
+"""
+from __future__ import annotations
+
+import io
+import os
+from typing import Dict, Tuple
+
+from PIL import Image, ImageOps
+
+from agents.storage import local_copy, store_bytes
+
+# (name, long edge in px), largest first
+SIZES: Tuple[Tuple[str, int], ...] = (
+    ("preview", int(os.getenv("MEDIA_PREVIEW_PX", "1280"))),
+    ("thumb", int(os.getenv("MEDIA_THUMB_PX", "480"))),
+)
+WEBP_QUALITY = int(os.getenv("MEDIA_WEBP_QUALITY", "78"))
+JPEG_QUALITY = int(os.getenv("MEDIA_JPEG_QUALITY", "82"))
+# thumbnail(): reduce() down to within this factor of the target, resample the rest
+REDUCING_GAP = 2.0
+
+FORMATS = (("webp", "WEBP", "image/webp"), ("jpg", "JPEG", "image/jpeg"))
+
+
+def derivative_key(key: str, name: str, ext: str) -> str:
+    return f"{os.path.splitext(key)[0]}.{name}.{ext}"
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "WEBP":
+        img.save(buf, format="WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def render(source) -> Dict[Tuple[str, str], bytes]:
+    """Encode every size and format of the image at `source` (path or file).
+    Returns: {(name, ext): bytes}"""
+    out: Dict[Tuple[str, str], bytes] = {}
+    with Image.open(source) as img:
+        largest = max(px for _, px in SIZES)
+        # JPEG only (a no-op for other formats). The box is square because the
+        # orientation isn't applied yet.
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        for name, px in SIZES:
+            img.thumbnail((px, px), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+            for ext, fmt, _ in FORMATS:
+                out[(name, ext)] = _encode(img, fmt)
+    return out
+
+
+def generate(key: str) -> Dict[str, str]:
+    """Render and store the derivatives of the stored original `key`.
+    Returns: {"thumb_url": ..., "preview_url": ...} (the WebP copies)"""
+    with local_copy(key) as path:
+        rendered = render(path)
+    content_types = {ext: ctype for ext, _, ctype in FORMATS}
+    urls = {}
+    for (name, ext), data in rendered.items():
+        url = store_bytes(data, derivative_key(key, name, ext), content_types[ext])
+        if ext == "webp":
+            urls[f"{name}_url"] = url
+    return urls
@@ -0,0 +1,123 @@
+"""Two-step intake: the photo goes straight to object storage.
+
+1. POST /api/intake/init hands out an upload slot: a staging key under
+   incoming/ and a MinIO POST policy limited to the declared image content
+   type and MAX_UPLOAD_BYTES, valid for UPLOAD_TTL_S. Without MinIO the slot
+   is a PUT to this API (PUT /api/intake/upload/<upload_id>), so local mode
+   keeps working with the same client flow.
+2. POST /api/intake/complete with the upload_id streams the staged object
+   once through ingest (hash, EXIF header, size limit, validation) and
+   creates the ticket like /api/intake. The stored original is a
+   server-side copy of the staged object, not a re-upload.
+
+The upload_id is a signed token carrying the staging key, content type and
+expiry, so no state is kept between the two calls. Set UPLOAD_SIGNING_KEY to
+the same value on every API process; unset, each process signs with its own
+random key and a complete() must reach the process that ran init().
+
+Staged objects are left in place, so a retried complete() finds the same
+bytes and intake dedupe returns the same ticket. On MinIO they expire with
+the incoming/ lifecycle rule (infra/docker-compose.yml); local ones are
+pruned by init() once they are a day old.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+import uuid
+from typing import Any, Dict
+
+from agents.ingest import MAX_UPLOAD_BYTES, SpooledUpload, spool_upload
+from agents.storage import MEDIA_DIR, open_object, presign_post
+
+UPLOAD_TTL_S = int(os.getenv("UPLOAD_TTL_S", "900"))
+STAGING_PREFIX = "incoming/"
+LOCAL_STAGING_MAX_AGE_S = 24 * 3600
+_SIGNING_KEY = (os.getenv("UPLOAD_SIGNING_KEY") or secrets.token_hex(32)).encode()
+
+
+class InvalidUploadToken(Exception):
+    pass
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def sign(claims: Dict[str, Any]) -> str:
+    body = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    mac = hmac.new(_SIGNING_KEY, body.encode(), hashlib.sha256).digest()
+    return f"{body}.{_b64(mac)}"
+
+
+def verify(token: str) -> Dict[str, Any]:
+    """Returns: the claims of a valid, unexpired upload_id"""
+    try:
+        body, mac = token.split(".")
+        expected = hmac.new(_SIGNING_KEY, body.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(_unb64(mac), expected):
+            raise InvalidUploadToken("bad signature")
+        claims = json.loads(_unb64(body))
+    except InvalidUploadToken:
+        raise
+    except Exception:
+        raise InvalidUploadToken("malformed upload_id")
+    if claims.get("exp", 0) < time.time():
+        raise InvalidUploadToken("upload_id expired")
+    return claims
+
+
+def new_upload(filename: str, content_type: str, max_bytes: int = MAX_UPLOAD_BYTES) -> Dict[str, Any]:
+    """Upload slot for one photo. Returns: the /api/intake/init response"""
+    ext = (os.path.splitext(filename or "")[1] or ".jpg").lower()
+    key = f"{STAGING_PREFIX}{uuid.uuid4().hex}{ext}"
+    expires = int(time.time()) + UPLOAD_TTL_S
+    token = sign({"k": key, "ct": content_type, "fn": filename, "max": max_bytes, "exp": expires})
+    slot = {"upload_id": token, "key": key, "max_bytes": max_bytes, "expires_at": expires}
+    post = presign_post(key, content_type, max_bytes, UPLOAD_TTL_S)
+    if post is not None:
+        slot.update({"method": "POST", "url": post["url"], "fields": post["fields"]})
+    else:
+        prune_local()
+        slot.update({"method": "PUT", "url": f"/api/intake/upload/{token}", "headers": {"Content-Type": content_type}})
+    return slot
+
+
+def local_path(claims: Dict[str, Any]) -> str:
+    return os.path.join(MEDIA_DIR, claims["k"])
+
+
+def prune_local(max_age_s: float = LOCAL_STAGING_MAX_AGE_S) -> int:
+    directory = os.path.join(MEDIA_DIR, STAGING_PREFIX)
+    removed = 0
+    cutoff = time.time() - max_age_s
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def spool(claims: Dict[str, Any]) -> SpooledUpload:
+    """Read the staged object once into a spool (raises FileNotFoundError if
+    it was never uploaded, UploadTooLarge past the signed limit)."""
+    with open_object(claims["k"]) as body:
+        spooled = spool_upload(body, claims.get("fn"), claims.get("ct"), claims.get("max", MAX_UPLOAD_BYTES))
+    spooled.source_key = claims["k"]
+    return spooled
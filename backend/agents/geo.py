@@ -1,42 +1,48 @@
-import os, requests, exifread, time
+import os, time
+from agents import metrics, outbound
+from agents.geo_cache import get_cache
 
 MAPBOX_TOKEN = os.getenv("MAPBOX_TOKEN")
 
+GEOCODE_SECONDS = metrics.histogram(
+    "civicguard_geocoder_seconds", "Reverse geocode call latency per provider", ["provider"]
+)
+GEOCODE_ERRORS = metrics.counter(
+    "civicguard_geocoder_errors_total", "Reverse geocode failures per provider", ["provider", "reason"]
+)
+
 def _reverse_geocode_mapbox(lat: float | None, lng: float | None) -> str | None:
-    """Reverse geocode with Mapbox. Includes simple retry/backoff and diagnostics.
+    """Reverse geocode with Mapbox. Retries transient failures with jittered
+    backoff; returns None straight away while the Mapbox breaker is open.
     Returns place_name or None.
     """
     if not (MAPBOX_TOKEN and lat is not None and lng is not None):
         return None
     url = f"https://api.mapbox.com/geocoding/v5/mapbox.places/{lng},{lat}.json"
     params = {"access_token": MAPBOX_TOKEN, "limit": 1}
-    for attempt in range(3):
+    try:
+        r = outbound.request("mapbox", "GET", url, params=params, timeout=10, retries=2)
+    except outbound.CircuitOpenError:
+        GEOCODE_ERRORS.labels("mapbox", "circuit_open").inc()
+        return None
+    except Exception as e:
+        print(f"[Mapbox] request error: {e}")
+        GEOCODE_ERRORS.labels("mapbox", "request").inc()
+        return None
+
+    if r.status_code == 200:
         try:
-            r = requests.get(url, params=params, timeout=10)
+            data = r.json()
+            feats = data.get("features") or []
+            return feats[0].get("place_name") if feats else None
         except Exception as e:
-            print(f"[Mapbox] request error on attempt {attempt+1}: {e}")
-            # quick backoff for transient client-side errors
-            time.sleep(0.8 * (attempt + 1))
-            continue
-
-        if r.status_code == 200:
-            try:
-                data = r.json()
-                feats = data.get("features") or []
-                return feats[0].get("place_name") if feats else None
-            except Exception as e:
-                print(f"[Mapbox] json parse error: {e}; body={r.text[:180]}")
-                return None
+            print(f"[Mapbox] json parse error: {e}; body={r.text[:180]}")
+            GEOCODE_ERRORS.labels("mapbox", "parse").inc()
+            return None
 
-        # helpful diagnostics
-        print(f"[Mapbox] status={r.status_code} attempt={attempt+1} body={r.text[:180]}")
-        if r.status_code in (429, 503):  # rate limit / service unavailable
-            time.sleep(1.5 * (attempt + 1))
-            continue
-        if r.status_code in (401, 403):  # auth/restriction -> don't retry
-            break
-        # other errors: one quick retry
-        time.sleep(0.8)
+    # helpful diagnostics (401/403 = auth/restriction, not retried)
+    print(f"[Mapbox] status={r.status_code} body={r.text[:180]}")
+    GEOCODE_ERRORS.labels("mapbox", f"http_{r.status_code}").inc()
     return None
 
 def _reverse_geocode_nominatim(lat: float | None, lng: float | None) -> str | None:
@@ -46,7 +52,9 @@ def _reverse_geocode_nominatim(lat: float | None, lng: float | None) -> str | No
     try:
         headers = {"User-Agent": os.getenv("NOMINATIM_UA", "CivicGuard/1.0 (contact@example.com)")}
         url = "https://nominatim.openstreetmap.org/reverse"
-        r = requests.get(
+        r = outbound.request(
+            "nominatim",
+            "GET",
             url,
             params={"format": "jsonv2", "lat": lat, "lon": lng, "zoom": 16},
             headers=headers,
@@ -58,19 +66,39 @@ def _reverse_geocode_nominatim(lat: float | None, lng: float | None) -> str | No
                 return data.get("display_name") or None
             except Exception as e:
                 print(f"[Nominatim] json parse error: {e}; body={r.text[:180]}")
+                GEOCODE_ERRORS.labels("nominatim", "parse").inc()
                 return None
         print(f"[Nominatim] status={r.status_code} body={r.text[:180]}")
+        GEOCODE_ERRORS.labels("nominatim", f"http_{r.status_code}").inc()
+    except outbound.CircuitOpenError:
+        GEOCODE_ERRORS.labels("nominatim", "circuit_open").inc()
+        return None
     except Exception as e:
         print("[Nominatim] error:", e)
+        GEOCODE_ERRORS.labels("nominatim", "request").inc()
     return None
 
-def reverse_geocode(lat: float | None, lng: float | None) -> str:
-    if lat is None or lng is None:
-        return "Unknown"
-    place = _reverse_geocode_mapbox(lat, lng)
+def _timed(provider: str, fn, lat: float, lng: float) -> str | None:
+    t0 = time.perf_counter()
+    try:
+        return fn(lat, lng)
+    finally:
+        GEOCODE_SECONDS.labels(provider).observe(time.perf_counter() - t0)
+
+
+def _reverse_geocode_providers(lat: float, lng: float) -> str | None:
+    place = _timed("mapbox", _reverse_geocode_mapbox, lat, lng)
     if place:
         return place
-    place = _reverse_geocode_nominatim(lat, lng)
+    return _timed("nominatim", _reverse_geocode_nominatim, lat, lng)
+
+
+def reverse_geocode(lat: float | None, lng: float | None, retry_negative: bool = False) -> str:
+    """retry_negative: ask the providers again even if this cell's last
+    lookup failed and that miss is still cached."""
+    if lat is None or lng is None:
+        return "Unknown"
+    place = get_cache().get_or_compute(lat, lng, _reverse_geocode_providers, retry_negative=retry_negative)
     return place or "Unknown"
 
 
@@ -84,19 +112,14 @@ def _dms_to_deg(dms, ref):
     return deg
 
 
-def exif_gps_from_file(local_path: str):
-    try:
-        with open(local_path, "rb") as f:
-            tags = exifread.process_file(f, details=False)
-        lat = tags.get("GPS GPSLatitude")
-        lat_ref = tags.get("GPS GPSLatitudeRef")
-        lng = tags.get("GPS GPSLongitude")
-        lng_ref = tags.get("GPS GPSLongitudeRef")
-        if lat and lng and lat_ref and lng_ref:
-            return (
-                _dms_to_deg(lat.values, lat_ref.values),
-                _dms_to_deg(lng.values, lng_ref.values),
-            )
-    except Exception:
-        pass
+def _gps_from_tags(tags):
+    lat = tags.get("GPS GPSLatitude")
+    lat_ref = tags.get("GPS GPSLatitudeRef")
+    lng = tags.get("GPS GPSLongitude")
+    lng_ref = tags.get("GPS GPSLongitudeRef")
+    if lat and lng and lat_ref and lng_ref:
+        return (
+            _dms_to_deg(lat.values, lat_ref.values),
+            _dms_to_deg(lng.values, lng_ref.values),
+        )
     return None
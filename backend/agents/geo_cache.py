@@ -0,0 +1,250 @@
+"""Reverse-geocode cache keyed by quantized coordinates.
+
+Reports cluster around the same street segments, so coordinates are snapped to
+a grid (GEOCODE_CACHE_GRID_M metres, default ~10 m) and looked up in:
+
+1. an in-process LRU with TTL, then
+2. a persistent store shared by all workers on the host (SQLite, default) or
+   across hosts (Redis, the same instance RQ uses).
+
+Provider misses ("Unknown") are cached too, with a short TTL, so an outage at
+Mapbox/Nominatim doesn't turn every intake into another doomed provider call.
+Concurrent misses for the same cell are collapsed into a single provider call.
+"""
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+GRID_M = float(os.getenv("GEOCODE_CACHE_GRID_M", "10"))
+TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+NEGATIVE_TTL = int(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL", "300"))
+MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+STORE = os.getenv("GEOCODE_CACHE_STORE", "sqlite").lower()  # sqlite | redis | none
+SQLITE_PATH = os.getenv(
+    "GEOCODE_CACHE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "geocode_cache.db")),
+)
+
+_METERS_PER_DEG = 111_320.0
+# Empty string marks a cached negative result in the persistent stores
+_NEGATIVE = ""
+
+
+def quantize(lat: float, lng: float, grid_m: float = GRID_M) -> str:
+    """Snap a coordinate to a ~grid_m metre cell and return its key."""
+    step = grid_m / _METERS_PER_DEG
+    return f"{grid_m:g}:{math.floor(lat / step)}:{math.floor(lng / step)}"
+
+
+class _SQLiteStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS geocode_cache ("
+            " key TEXT PRIMARY KEY, address TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        row = self._conn().execute(
+            "SELECT address, expires_at FROM geocode_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if not row or row[1] < time.time():
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO geocode_cache (key, address, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+        )
+
+
+class _RedisStore:
+    PREFIX = "geocode:"
+
+    def __init__(self):
+        from workers.queue import redis
+
+        self.redis = redis
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        pipe = self.redis.pipeline()
+        pipe.get(self.PREFIX + key)
+        pipe.ttl(self.PREFIX + key)
+        value, ttl = pipe.execute()
+        if value is None:
+            return None
+        return value.decode("utf-8"), time.time() + max(0, ttl or 0)
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        self.redis.setex(self.PREFIX + key, ttl, value)
+
+
+def _make_store(kind: str):
+    if kind == "sqlite":
+        return _SQLiteStore(SQLITE_PATH)
+    if kind == "redis":
+        return _RedisStore()
+    return None
+
+
+class GeocodeCache:
+    def __init__(
+        self,
+        store=None,
+        grid_m: float = GRID_M,
+        ttl: int = TTL,
+        negative_ttl: int = NEGATIVE_TTL,
+        max_entries: int = MAX_ENTRIES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.store = store
+        self.grid_m = grid_m
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lru: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Provider call in progress per cell; callers for the same cell wait
+        # on it, other cells don't
+        self._inflight: Dict[str, "Future[Optional[str]]"] = {}
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "store_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "store_errors": 0,
+        }
+
+    def _lru_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            if entry[1] < self.clock():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return entry[0]
+
+    def _lru_put(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._lru[key] = (value, expires_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        value = self._lru_get(key)
+        if value is not None:
+            self.counters["hits"] += 1
+        elif self.store is not None:
+            try:
+                found = self.store.get(key)
+            except Exception:
+                self.counters["store_errors"] += 1
+                found = None
+            if found is not None:
+                value = found[0]
+                self.counters["store_hits"] += 1
+                self._lru_put(key, value, found[1])
+        if value == _NEGATIVE:
+            self.counters["negative_hits"] += 1
+        return value
+
+    def put(self, lat: float, lng: float, address: Optional[str]) -> None:
+        key = quantize(lat, lng, self.grid_m)
+        value = address or _NEGATIVE
+        ttl = self.ttl if value else self.negative_ttl
+        self._lru_put(key, value, self.clock() + ttl)
+        if self.store is not None:
+            try:
+                self.store.set(key, value, ttl)
+            except Exception:
+                self.counters["store_errors"] += 1
+
+    def get_or_compute(
+        self,
+        lat: float,
+        lng: float,
+        compute: Callable[[float, float], Optional[str]],
+        retry_negative: bool = False,
+    ) -> Optional[str]:
+        """Return the cached address for (lat, lng), calling `compute` on a miss.
+        A cached negative result is returned as None, or with retry_negative
+        treated as a miss (the geocode job retrying an earlier failure).
+        """
+        key = quantize(lat, lng, self.grid_m)
+
+        def miss(value: Optional[str]) -> bool:
+            return value is None or (retry_negative and value == _NEGATIVE)
+
+        value = self._lookup(key)
+        if not miss(value):
+            return value or None
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+        if not leader:
+            return flight.result()
+        try:
+            # Another thread may have filled the cell since our lookup
+            value = self._lookup(key)
+            if miss(value):
+                self.counters["misses"] += 1
+                value = compute(lat, lng)
+                self.put(lat, lng, value)
+            flight.set_result(value or None)
+            return value or None
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = len(self._lru)
+        return {**self.counters, "size": size}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+
+_cache: Optional[GeocodeCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> GeocodeCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    store = _make_store(STORE)
+                except Exception as e:
+                    print(f"[GeocodeCache] persistent store '{STORE}' unavailable: {e}")
+                    store = None
+                _cache = GeocodeCache(store=store)
+    return _cache
@@ -0,0 +1,143 @@
+"""Single-pass upload ingest.
+
+The upload body is read exactly once, in fixed-size chunks. Each chunk is fed
+to an incremental SHA-256 and written to a spool file inside the media dir; the
+first HEADER_BYTES are also kept in memory because that's where the image
+header and the EXIF (APP1) segment live. The size limit is enforced as the
+bytes arrive, so an oversized upload is rejected without being buffered.
+
+Peak memory per upload is therefore ~CHUNK_SIZE + HEADER_BYTES regardless of
+the file size. The spool is later handed to storage.store_file, which renames
+it into place (local) or streams it to MinIO, so nothing is re-read.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import exifread
+from PIL import Image
+
+from agents.geo import _gps_from_tags
+from agents.storage import MEDIA_DIR, content_key, promote, store_file
+
+CHUNK_SIZE = 64 * 1024
+HEADER_BYTES = 256 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))  # 10MB
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidImage(Exception):
+    pass
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    sha256: str
+    size: int
+    header: bytes = field(repr=False)
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    # Set when the bytes were uploaded to storage directly (presigned intake):
+    # store() then copies that object instead of uploading the spool again
+    source_key: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        """True when the whole file fits in the retained header."""
+        return self.size <= len(self.header)
+
+    def validate_image(self) -> None:
+        """Check the bytes are an image Pillow understands.
+
+        Small files are fully verified from memory; larger ones are identified
+        from the header (format + dimensions) and only fall back to the spool
+        on disk if the header alone isn't enough.
+        """
+        try:
+            img = Image.open(io.BytesIO(self.header))
+            if self.complete:
+                img.verify()
+            return
+        except Exception:
+            if self.complete:
+                raise InvalidImage()
+        try:
+            with Image.open(self.path) as img:
+                img.verify()
+        except Exception:
+            raise InvalidImage()
+
+    def gps(self) -> Optional[Tuple[float, float]]:
+        """EXIF GPS from the retained header bytes (best-effort)."""
+        try:
+            return _gps_from_tags(exifread.process_file(io.BytesIO(self.header), details=False))
+        except Exception:
+            return None
+
+    def store(self, key: Optional[str] = None) -> Tuple[str, str]:
+        """Move the spool to storage. Returns: (key, public_url)"""
+        key = key or content_key(self.sha256, self.filename)
+        if self.source_key:
+            url = promote(self.source_key, key)
+            self.discard()
+            return key, url
+        return key, store_file(self.path, key, self.content_type)
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def spool_upload(
+    fileobj,
+    filename: Optional[str] = None,
+    content_type: Optional[str] = None,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+) -> SpooledUpload:
+    """Consume `fileobj` once: hash, keep the header, spool to disk, enforce size."""
+    try:
+        fileobj.seek(0)
+    except Exception:
+        pass
+    digest = hashlib.sha256()
+    header = bytearray()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=MEDIA_DIR, prefix=".ingest-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                if len(header) < HEADER_BYTES:
+                    header += chunk[: HEADER_BYTES - len(header)]
+                out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return SpooledUpload(
+        path=path,
+        sha256=digest.hexdigest(),
+        size=size,
+        header=bytes(header),
+        filename=filename,
+        content_type=content_type,
+    )
@@ -0,0 +1,147 @@
+"""Reused SMTP sessions for authority filing.
+
+One connection per (host, port, user) is opened, upgraded with STARTTLS and
+logged in once, then reused for every message until the server drops it or
+it sits idle longer than SMTP_IDLE_S. A send that fails because the
+connection went away reconnects once and retries; a refused recipient does
+not tear the connection down.
+
+smtplib sends commands one at a time (no ESMTP PIPELINING), so the win over
+the old per-ticket connect/STARTTLS/login is the handshake, not the commands.
+
+Config: SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS (falls back to
+SENDGRID_KEY), SMTP_STARTTLS, SMTP_FROM, SMTP_TIMEOUT, SMTP_IDLE_S.
+"""
+from __future__ import annotations
+
+import os
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.sendgrid.net")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "apikey")
+SMTP_PASS = os.getenv("SMTP_PASS") or os.getenv("SENDGRID_KEY", "YOUR_SENDGRID_KEY")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_FROM = os.getenv("SMTP_FROM", "noreply@civicguard.local")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "15"))
+SMTP_IDLE_S = float(os.getenv("SMTP_IDLE_S", "60"))
+
+# Errors that mean the connection itself is unusable
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def message(to_addr: str, subject: str, body: str, from_addr: str = SMTP_FROM) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = from_addr
+    msg["To"] = to_addr
+    msg["Subject"] = subject
+    msg.set_content(body)
+    return msg
+
+
+class SMTPSession:
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: Optional[str] = SMTP_USER,
+        password: Optional[str] = SMTP_PASS,
+        starttls: bool = SMTP_STARTTLS,
+        timeout: float = SMTP_TIMEOUT,
+        idle_s: float = SMTP_IDLE_S,
+    ):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_s = idle_s
+        self.connects = 0
+        self.sent = 0
+        self._conn: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._conn is not None and time.monotonic() - self._last_used > self.idle_s:
+            self._close()  # most servers drop idle clients; don't find out mid-send
+        if self._conn is None:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.ehlo()
+                if self.starttls:
+                    conn.starttls()
+                    conn.ehlo()
+                if self.user:
+                    conn.login(self.user, self.password or "")
+            except Exception:
+                conn.close()
+                raise
+            self._conn = conn
+            self.connects += 1
+        return self._conn
+
+    def _close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.quit()
+            except Exception:
+                conn.close()
+
+    def _send(self, msg: EmailMessage) -> None:
+        for attempt in (0, 1):
+            try:
+                self._connection().send_message(msg)
+                self._last_used = time.monotonic()
+                self.sent += 1
+                return
+            except _CONNECTION_ERRORS:
+                self._close()
+                if attempt:
+                    raise
+
+    def send(self, msg: EmailMessage) -> None:
+        with self._lock:
+            self._send(msg)
+
+    def send_many(self, msgs: Sequence[EmailMessage]) -> List[Optional[Exception]]:
+        """Send over one connection. Returns: per-message error (None if sent)"""
+        errors: List[Optional[Exception]] = []
+        with self._lock:
+            for msg in msgs:
+                try:
+                    self._send(msg)
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(e)
+        return errors
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+_sessions: Dict[Tuple[str, int, Optional[str]], SMTPSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def session(host: str = SMTP_HOST, port: int = SMTP_PORT, user: Optional[str] = SMTP_USER, **kwargs) -> SMTPSession:
+    """The shared session for this server/account, created on first use."""
+    key = (host, port, user)
+    with _sessions_lock:
+        s = _sessions.get(key)
+        if s is None:
+            s = _sessions[key] = SMTPSession(host, port, user, **kwargs)
+        return s
+
+
+def close_all() -> None:
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for s in sessions:
+        s.close()
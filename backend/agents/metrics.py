@@ -0,0 +1,347 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Counters and histograms are plain Python objects: an observation is a bisect
+over the bucket bounds plus two additions under a per-series lock (about a
+microsecond; see bench/metrics_overhead.py). Gauges are computed at scrape
+time by collector callbacks (queue depth, pool usage), so nothing is polled
+in the background.
+
+Several processes (rq workers, uvicorn/gunicorn workers) each hold their own
+series. With METRICS_DIR set, every process writes a JSON snapshot of its
+counters and histograms to <dir>/<pid>.json every METRICS_FLUSH_S seconds
+and render() sums all snapshots in the directory, so one /metrics shows the
+whole fleet.
+"""
+from __future__ import annotations
+
+import atexit
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_S = float(os.getenv("METRICS_FLUSH_S", "5"))
+
+# Seconds; covers a cache hit (sub-ms) up to a slow SMTP relay
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _Timer:
+    __slots__ = ("_child", "_t0")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._t0)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._by_args: Dict[tuple, object] = {}  # labels() args as given -> child, skips str()
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        child = self._by_args.get(values)
+        if child is None:
+            key = tuple(str(v) for v in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._by_args[values] = self._children.setdefault(key, self._new_child())
+        return child
+
+    def snapshot(self) -> Dict[str, object]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {json.dumps(k): c.value for k, c in list(self._children.items())}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.bounds = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def snapshot(self) -> Dict[str, object]:
+        out = {}
+        for k, c in list(self._children.items()):
+            with c._lock:
+                out[json.dumps(k)] = list(c.counts) + [c.sum]
+        return out
+
+
+# Gauge collector: returns {label values: value}, called at render time
+Collector = Callable[[], Dict[LabelValues, float]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._gauges: Dict[str, Tuple[str, Tuple[str, ...], Collector]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Re-importing a module (tests, reload) gets the existing series back
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, doc: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, doc, labelnames))
+
+    def histogram(self, name: str, doc: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, doc, labelnames, buckets))
+
+    def gauge(self, name: str, doc: str, labelnames: Sequence[str], collect: Collector) -> None:
+        with self._lock:
+            self._gauges[name] = (doc, tuple(labelnames), collect)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {
+            m.name: {"kind": m.kind, "doc": m.doc, "labelnames": list(m.labelnames),
+                     "bounds": list(getattr(m, "bounds", ())), "samples": m.snapshot()}
+            for m in list(self._metrics.values())
+        }
+
+    def render(self, snapshots: Optional[Iterable[Dict[str, Dict[str, object]]]] = None) -> str:
+        """Text exposition of this process (or of `snapshots`, summed) plus the gauges."""
+        merged = merge(snapshots if snapshots is not None else [self.snapshot()])
+        lines: List[str] = []
+        for name in sorted(merged):
+            m = merged[name]
+            names = m["labelnames"]
+            lines.append(f"# HELP {name} {m['doc']}")
+            lines.append(f"# TYPE {name} {m['kind']}")
+            for key in sorted(m["samples"]):
+                values, sample = json.loads(key), m["samples"][key]
+                if m["kind"] == "counter":
+                    lines.append(f"{name}{_labels(names, values)} {_fmt(sample)}")
+                    continue
+                cumulative = 0
+                for bound, n in zip(list(m["bounds"]) + [math.inf], sample[:-1]):
+                    cumulative += n
+                    le = 'le="%s"' % _fmt(bound)
+                    lines.append(f"{name}_bucket{_labels(names, values, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, values)} {_fmt(sample[-1])}")
+                lines.append(f"{name}_count{_labels(names, values)} {cumulative}")
+        for name, (doc, names, collect) in sorted(self._gauges.items()):
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"[Metrics] gauge {name} failed:", e)
+                continue
+            lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, v in sorted(values.items()):
+                lines.append(f"{name}{_labels(names, key)} {_fmt(v)}")
+        return "\n".join(lines) + "\n"
+
+
+def merge(snapshots: Iterable[Dict[str, Dict[str, object]]]) -> Dict[str, Dict[str, object]]:
+    out: Dict[str, Dict[str, object]] = {}
+    for snap in snapshots:
+        for name, m in snap.items():
+            into = out.setdefault(name, {**m, "samples": {}})
+            if list(into["bounds"]) != list(m["bounds"]):
+                continue  # bucket layout changed between deploys; keep the first
+            for key, sample in m["samples"].items():
+                prev = into["samples"].get(key)
+                if prev is None:
+                    into["samples"][key] = list(sample) if isinstance(sample, list) else sample
+                elif isinstance(sample, list):
+                    into["samples"][key] = [a + b for a, b in zip(prev, sample)]
+                else:
+                    into["samples"][key] = prev + sample
+    return out
+
+
+registry = Registry()
+counter = registry.counter
+histogram = registry.histogram
+gauge = registry.gauge
+
+
+# Multi-process mode
+_flusher: Optional[threading.Thread] = None
+_flusher_pid = 0
+_flusher_lock = threading.Lock()
+
+
+def _snapshot_path(directory: str, pid: Optional[int] = None) -> str:
+    return os.path.join(directory, f"{pid or os.getpid()}.json")
+
+
+def flush(directory: Optional[str] = None) -> None:
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    path = _snapshot_path(directory)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)  # readers never see a half-written file
+
+
+def start_flusher(directory: Optional[str] = None, interval_s: float = METRICS_FLUSH_S) -> bool:
+    """Write this process's snapshot to `directory` periodically and at exit."""
+    global _flusher, _flusher_pid
+    directory = directory or METRICS_DIR
+    if not directory:
+        return False
+    os.makedirs(directory, exist_ok=True)
+    with _flusher_lock:
+        if _flusher_pid == os.getpid() and _flusher is not None and _flusher.is_alive():
+            return True  # (a forked child inherits the variable, not the thread)
+
+        def _run():
+            while True:
+                time.sleep(interval_s)
+                try:
+                    flush(directory)
+                except Exception as e:
+                    print("[Metrics] flush failed:", e)
+
+        _flusher = threading.Thread(target=_run, name="metrics-flush", daemon=True)
+        _flusher_pid = os.getpid()
+        _flusher.start()
+    atexit.register(flush, directory)
+    return True
+
+
+def load_snapshots(directory: str) -> List[Dict[str, Dict[str, object]]]:
+    snaps = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(path) as f:
+                snaps.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snaps
+
+
+def render(directory: Optional[str] = None) -> str:
+    """/metrics body: the whole directory in multi-process mode, else this process."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return registry.render()
+    flush(directory)  # include this process's latest numbers
+    return registry.render(load_snapshots(directory))
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def serve(port: int, directory: Optional[str] = None, host: str = "0.0.0.0"):
+    """Blocking /metrics HTTP server for processes without the API (rq workers)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render(directory).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # no access log per scrape
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    print(f"[Metrics] serving http://{host}:{port}/metrics")
+    server.serve_forever()
@@ -0,0 +1,265 @@
+"""Shared outbound HTTP client for geocoders and authority APIs.
+
+- keep-alive connection pooling (one requests.Session / httpx.AsyncClient
+  per process instead of a fresh TCP+TLS handshake per call)
+- a per-host concurrency cap so one slow provider can't absorb every worker
+- jittered exponential backoff between retries
+- a circuit breaker per provider: after repeated failures calls fail fast
+  with CircuitOpenError until the provider has had time to recover, so
+  callers can go straight to their fallback.
+
+Tunables: OUTBOUND_POOL_SIZE, OUTBOUND_MAX_PER_HOST, OUTBOUND_BACKOFF_BASE,
+OUTBOUND_BACKOFF_CAP, OUTBOUND_BREAKER_FAILURES, OUTBOUND_BREAKER_RESET.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+import os
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agents import tracing
+
+POOL_SIZE = int(os.getenv("OUTBOUND_POOL_SIZE", "32"))
+MAX_PER_HOST = int(os.getenv("OUTBOUND_MAX_PER_HOST", "16"))
+BACKOFF_BASE = float(os.getenv("OUTBOUND_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("OUTBOUND_BACKOFF_CAP", "4"))
+BREAKER_FAILURES = int(os.getenv("OUTBOUND_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("OUTBOUND_BREAKER_RESET", "30"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Classic closed -> open -> half-open breaker.
+
+    `failure_threshold` consecutive failures open the circuit; after
+    `reset_timeout` seconds a single trial call is let through (half-open) and
+    its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self._trial_in_flight = False
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+_registry_lock = threading.Lock()
+
+
+def breaker(name: str) -> CircuitBreaker:
+    b = _breakers.get(name)
+    if b is None:
+        with _registry_lock:
+            b = _breakers.setdefault(name, CircuitBreaker(name))
+    return b
+
+
+def breakers() -> Dict[str, Dict[str, object]]:
+    return {name: b.snapshot() for name, b in list(_breakers.items())}
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def _host_limit(host: str) -> threading.BoundedSemaphore:
+    sem = _host_limits.get(host)
+    if sem is None:
+        with _registry_lock:
+            sem = _host_limits.setdefault(host, threading.BoundedSemaphore(MAX_PER_HOST))
+    return sem
+
+
+_session: Optional[requests.Session] = None
+
+
+def session() -> requests.Session:
+    """Process-wide pooled session (urllib3 pools are thread-safe)."""
+    global _session
+    if _session is None:
+        with _registry_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=MAX_PER_HOST)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+
+def request(
+    provider: str,
+    method: str,
+    url: str,
+    *,
+    retries: int = 0,
+    retry_statuses: Iterable[int] = RETRY_STATUSES,
+    backoff_base: float = BACKOFF_BASE,
+    **kwargs,
+) -> requests.Response:
+    """Send a request through the pooled session, guarded by `provider`'s breaker.
+
+    Retries transport errors and `retry_statuses` up to `retries` times with
+    jittered backoff, stopping early if the breaker opens. Returns the last
+    response (callers inspect status codes as before) or raises the last
+    transport error / CircuitOpenError.
+    """
+    with tracing.span(f"outbound {provider}", **{"http.method": method, "http.host": _host(url)}) as sp:
+        resp = _request(provider, method, url, retries, retry_statuses, backoff_base, sp, kwargs)
+        if sp is not None:
+            sp.set("http.status_code", resp.status_code)
+        return resp
+
+
+def _request(provider, method, url, retries, retry_statuses, backoff_base, sp, kwargs) -> requests.Response:
+    cb = breaker(provider)
+    retry_statuses = frozenset(retry_statuses)
+    last_exc: Optional[Exception] = None
+    resp: Optional[requests.Response] = None
+    for attempt in range(retries + 1):
+        if not cb.allow():
+            if resp is not None:
+                return resp
+            raise CircuitOpenError(provider)
+        if sp is not None:
+            sp.set("attempts", attempt + 1)
+        try:
+            with _host_limit(_host(url)):
+                resp = session().request(method, url, **kwargs)
+            last_exc = None
+        except requests.RequestException as e:
+            cb.record_failure()
+            last_exc, resp = e, None
+            print(f"[{provider}] request error on attempt {attempt+1}: {e}")
+        else:
+            if resp.status_code not in retry_statuses:
+                cb.record_success()
+                return resp
+            cb.record_failure()
+            print(f"[{provider}] status={resp.status_code} attempt={attempt+1}")
+        if attempt < retries:
+            time.sleep(backoff_delay(attempt, backoff_base))
+    if last_exc is not None:
+        raise last_exc
+    return resp  # type: ignore[return-value]
+
+
+class AsyncOutbound:
+    """asyncio counterpart of `request` built on a pooled httpx.AsyncClient.
+    Shares the same per-provider breakers as the sync path.
+    """
+
+    def __init__(self, max_connections: int = POOL_SIZE, max_per_host: int = MAX_PER_HOST):
+        import httpx
+
+        self._httpx = httpx
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self.max_per_host = max_per_host
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _limit(self, host: str) -> asyncio.Semaphore:
+        sem = self._limits.get(host)
+        if sem is None:
+            sem = self._limits.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        return sem
+
+    async def request(
+        self,
+        provider: str,
+        method: str,
+        url: str,
+        *,
+        retries: int = 0,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        backoff_base: float = BACKOFF_BASE,
+        **kwargs,
+    ):
+        cb = breaker(provider)
+        retry_statuses = frozenset(retry_statuses)
+        last_exc: Optional[Exception] = None
+        resp = None
+        for attempt in range(retries + 1):
+            if not cb.allow():
+                if resp is not None:
+                    return resp
+                raise CircuitOpenError(provider)
+            try:
+                async with self._limit(_host(url)):
+                    resp = await self.client.request(method, url, **kwargs)
+                last_exc = None
+            except self._httpx.HTTPError as e:
+                cb.record_failure()
+                last_exc, resp = e, None
+                print(f"[{provider}] request error on attempt {attempt+1}: {e}")
+            else:
+                if resp.status_code not in retry_statuses:
+                    cb.record_success()
+                    return resp
+                cb.record_failure()
+                print(f"[{provider}] status={resp.status_code} attempt={attempt+1}")
+            if attempt < retries:
+                await asyncio.sleep(backoff_delay(attempt, backoff_base))
+        if last_exc is not None:
+            raise last_exc
+        return resp
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,67 @@
+"""On-demand sampling profiler (GET /debug/profile).
+
+Every `interval_s` the sampler reads all thread stacks with
+sys._current_frames() and counts each one as a folded stack
+("thread;outer (file:line);...;inner (file:line) N"), the input format of
+flamegraph.pl and speedscope. Nothing is installed in the interpreter, so
+it costs nothing until someone asks for a profile; while sampling, each tick
+holds the GIL for roughly the time it takes to walk the stacks.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Deeper frames are dropped from the root end
+MAX_DEPTH = 128
+
+# One profile at a time: two samplers would double the overhead and each
+# would show the other in its stacks
+_busy = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _fold(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def sample(seconds: float, interval_s: float = 0.005, clock=time.monotonic) -> str:
+    """Sample every thread but this one for `seconds`. Returns: folded stacks,
+    most frequent first, after a `# samples=N ...` header line."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        ticks = 0
+        deadline = clock() + seconds
+        while clock() < deadline:
+            names: Dict[int, Optional[str]] = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stacks[f"{names.get(ident) or ident};{_fold(frame)}"] += 1
+            ticks += 1
+            time.sleep(interval_s)
+    finally:
+        _busy.release()
+    lines = [f"# samples={ticks} interval_ms={interval_s * 1000:g} seconds={seconds:g}"]
+    lines.extend(f"{stack} {n}" for stack, n in stacks.most_common())
+    return "\n".join(lines) + "\n"
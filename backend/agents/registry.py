@@ -0,0 +1,88 @@
+"""Lazy model registry.
+
+Models are registered with a loader and only materialised on first use, on an
+explicit warmup() (e.g. the API lifespan hook with MODEL_WARMUP=1) or on
+preload() before worker processes fork. preload() also gc.freeze()s the heap so
+forked workers keep sharing the weights' pages copy-on-write instead of
+dirtying them when the cyclic GC touches object headers.
+"""
+from __future__ import annotations
+
+import gc
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+_MISSING = object()
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        # Peak RSS; KB on Linux, bytes on macOS. Good enough as a fallback.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        self._loaders[name] = loader
+
+    def get(self, name: str) -> Optional[Any]:
+        """Return the model, loading it on first call. A loader that raises is
+        recorded as unavailable (None) rather than retried on every request.
+        """
+        model = self._models.get(name, _MISSING)
+        if model is not _MISSING:
+            return model
+        with self._lock:
+            model = self._models.get(name, _MISSING)
+            if model is not _MISSING:
+                return model
+            rss0, t0 = _rss_bytes(), time.perf_counter()
+            error = None
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                model, error = None, repr(e)
+            self._stats[name] = {
+                "loaded": model is not None,
+                "load_seconds": round(time.perf_counter() - t0, 3),
+                "rss_delta_mb": round((_rss_bytes() - rss0) / (1024 * 1024), 1),
+                "pid": os.getpid(),
+                "error": error,
+            }
+            self._models[name] = model
+            return model
+
+    def warmup(self, *names: str) -> Dict[str, Dict[str, Any]]:
+        for name in names or tuple(self._loaders):
+            self.get(name)
+        return self.stats()
+
+    def preload(self, *names: str) -> Dict[str, Dict[str, Any]]:
+        """Load before fork and freeze the heap for copy-on-write sharing."""
+        stats = self.warmup(*names)
+        gc.collect()
+        gc.freeze()
+        return stats
+
+    def is_loaded(self, name: str) -> bool:
+        return self._models.get(name) is not None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        out = {name: {"loaded": False} for name in self._loaders}
+        out.update({k: dict(v) for k, v in self._stats.items()})
+        return out
+
+
+registry = ModelRegistry()
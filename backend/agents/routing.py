@@ -1,23 +1,190 @@
+"""Authority routing.
+
+routing.csv (class, ward, authority_name, endpoint_type, endpoint_value) is
+compiled into a dict keyed by normalized (class, ward); a ward of "*" matches
+any ward. The file's mtime is checked at most every ROUTING_CHECK_S seconds
+and a changed file is rebuilt and swapped in whole, so edits apply without a
+restart and a lookup never sees a half-loaded table.
+
+With WARDS_GEOJSON pointing at a FeatureCollection of ward boundaries
+(Polygon/MultiPolygon, name in the WARD_NAME_PROPERTY property), the ward
+is resolved from the ticket's coordinates: polygons are bucketed by bounding
+box on a grid of WARD_GRID_DEG degrees, so a point is only tested against the
+few polygons whose bbox overlaps its cell. Without it, or for tickets without
+a location, DEFAULT_WARD is used.
+"""
+from __future__ import annotations
+
 import csv
-from functools import lru_cache
+import json
+import math
 import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTING_CSV = os.getenv("ROUTING_CSV", os.path.join(BASE_DIR, "routing.csv"))
+WARDS_GEOJSON = os.getenv("WARDS_GEOJSON", "")
+WARD_NAME_PROPERTY = os.getenv("WARD_NAME_PROPERTY", "name")
+WARD_GRID_DEG = float(os.getenv("WARD_GRID_DEG", "0.01"))
+DEFAULT_WARD = os.getenv("DEFAULT_WARD", "Ward-1")
+ROUTING_CHECK_S = float(os.getenv("ROUTING_CHECK_S", "2"))
+
+FALLBACK_ROUTE = {
+    'authority_name': 'Municipal Helpdesk',
+    'endpoint_type': 'email',
+    'endpoint_value': 'helpdesk@example.com'
+}
+
+Ring = List[Tuple[float, float]]  # (lng, lat) as in GeoJSON
+BBox = Tuple[float, float, float, float]  # min_lng, min_lat, max_lng, max_lat
+
+
+def _norm_class(iclass: Optional[str]) -> str:
+    return (iclass or '').strip().lower()
+
 
-@lru_cache
-def _routes():
-    # resolve path relative to backend dir
-    base = os.path.dirname(os.path.dirname(__file__))
-    path = os.path.join(base, 'routing.csv')
+def _norm_ward(ward: Optional[str]) -> str:
+    return (ward or '').strip().lower()
+
+
+def compile_routes(path: str) -> Dict[Tuple[str, str], Dict[str, str]]:
     with open(path, newline='', encoding='utf-8') as f:
-        return list(csv.DictReader(f))
-
-def lookup(iclass: str, ward: str = 'Ward-1'):
-    ic = (iclass or '').strip().lower()
-    wd = (ward or '').strip()
-    for r in _routes():
-        if (r.get('class','').strip().lower() == ic) and (r.get('ward','').strip() == wd):
-            return r
-    return {
-        'authority_name': 'Municipal Helpdesk',
-        'endpoint_type': 'email',
-        'endpoint_value': 'helpdesk@example.com'
-    }
+        rows = list(csv.DictReader(f))
+    table = {}
+    for r in rows:
+        key = (_norm_class(r.get('class')), _norm_ward(r.get('ward')))
+        table.setdefault(key, {k: (v or '').strip() for k, v in r.items() if k})  # first row wins, as before
+    return table
+
+
+def _point_in_ring(x: float, y: float, ring: Ring) -> bool:
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class WardIndex:
+    """Point-in-polygon over ward boundaries with a bbox grid in front."""
+
+    def __init__(self, wards: Sequence[Tuple[str, List[Ring]]], cell_deg: float = WARD_GRID_DEG):
+        self.cell_deg = cell_deg
+        self.polygons: List[Tuple[str, List[Ring], BBox]] = []
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+        for name, rings in wards:
+            xs = [p[0] for p in rings[0]]
+            ys = [p[1] for p in rings[0]]
+            bbox = (min(xs), min(ys), max(xs), max(ys))
+            idx = len(self.polygons)
+            self.polygons.append((name, rings, bbox))
+            for cx in range(self._cell(bbox[0]), self._cell(bbox[2]) + 1):
+                for cy in range(self._cell(bbox[1]), self._cell(bbox[3]) + 1):
+                    self.grid.setdefault((cx, cy), []).append(idx)
+
+    def _cell(self, deg: float) -> int:
+        return math.floor(deg / self.cell_deg)
+
+    def ward_at(self, lat: float, lng: float) -> Optional[str]:
+        for idx in self.grid.get((self._cell(lng), self._cell(lat)), ()):
+            name, rings, (x0, y0, x1, y1) = self.polygons[idx]
+            if not (x0 <= lng <= x1 and y0 <= lat <= y1):
+                continue
+            # Outer ring in, holes out
+            if _point_in_ring(lng, lat, rings[0]) and not any(_point_in_ring(lng, lat, h) for h in rings[1:]):
+                return name
+        return None
+
+    @classmethod
+    def from_geojson(cls, path: str, name_property: str = WARD_NAME_PROPERTY, cell_deg: float = WARD_GRID_DEG) -> "WardIndex":
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        wards = []
+        for i, feat in enumerate(data.get("features", [])):
+            props = feat.get("properties") or {}
+            name = props.get(name_property) or props.get("ward") or f"Ward-{i + 1}"
+            geom = feat.get("geometry") or {}
+            if geom.get("type") == "Polygon":
+                polys = [geom["coordinates"]]
+            elif geom.get("type") == "MultiPolygon":
+                polys = geom["coordinates"]
+            else:
+                continue
+            for poly in polys:
+                wards.append((str(name), [[(float(p[0]), float(p[1])) for p in ring] for ring in poly]))
+        return cls(wards, cell_deg)
+
+
+class _Watched:
+    """A file compiled by `load`, rebuilt when its mtime changes."""
+
+    def __init__(self, path: str, load, check_s: float):
+        self.path = path
+        self.load = load
+        self.check_s = check_s
+        self.value = None
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self.value is not None and now - self._checked < self.check_s:
+            return self.value
+        with self._lock:
+            if self.value is not None and now - self._checked < self.check_s:
+                return self.value
+            self._checked = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return self.value  # keep serving the last good table
+            if mtime != self._mtime:
+                try:
+                    self.value = self.load(self.path)  # swap in whole
+                    self._mtime = mtime
+                except Exception as e:
+                    print(f"[Routing] failed to load {self.path}:", e)
+            return self.value
+
+
+class Router:
+    def __init__(self, csv_path: str = ROUTING_CSV, wards_path: str = WARDS_GEOJSON,
+                 default_ward: str = DEFAULT_WARD, check_s: float = ROUTING_CHECK_S):
+        self.default_ward = default_ward
+        self._routes = _Watched(csv_path, compile_routes, check_s)
+        self._wards = _Watched(wards_path, WardIndex.from_geojson, check_s) if wards_path else None
+
+    def lookup(self, iclass: str, ward: Optional[str] = None) -> Dict[str, str]:
+        table = self._routes.get() or {}
+        ic = _norm_class(iclass)
+        return table.get((ic, _norm_ward(ward or self.default_ward))) or table.get((ic, "*")) or FALLBACK_ROUTE
+
+    def ward_for(self, lat: Optional[float], lng: Optional[float]) -> str:
+        if self._wards is not None and lat is not None and lng is not None:
+            index = self._wards.get()
+            ward = index.ward_at(lat, lng) if index is not None else None
+            if ward:
+                return ward
+        return self.default_ward
+
+    def resolve(self, iclass: str, lat: Optional[float] = None, lng: Optional[float] = None) -> Dict[str, str]:
+        return self.lookup(iclass, self.ward_for(lat, lng))
+
+
+router = Router()
+
+
+def lookup(iclass: str, ward: str = DEFAULT_WARD):
+    return router.lookup(iclass, ward)
+
+
+def resolve(iclass: str, lat: Optional[float] = None, lng: Optional[float] = None):
+    """Route for a ticket, with the ward taken from its coordinates."""
+    return router.resolve(iclass, lat, lng)
@@ -0,0 +1,145 @@
+"""Spatial helpers shared by intake, the repository and the workers."""
+from __future__ import annotations
+
+import math
+
+EARTH_RADIUS_M = 6_371_008.8
+_M_PER_DEG = 111_320.0
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lng: float, radius_m: float):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing the circle."""
+    dlat = radius_m / _M_PER_DEG
+    # Longitude degrees shrink poleward, so size the box at the poleward edge
+    edge = min(90.0, abs(lat) + dlat)
+    dlng = radius_m / (_M_PER_DEG * max(0.01, math.cos(math.radians(edge))))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+# --- Geohash -----------------------------------------------------------------
+# Stored on tickets as `cell` (precision 9, ~5 m). Prefixes are contiguous
+# ranges in a B-tree index, so "cells near X" is a handful of range scans.
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+CELL_PRECISION = 9
+
+
+def geohash(lat: float, lng: float, precision: int = CELL_PRECISION) -> str:
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch, lng_lo = (ch << 1) | 1, mid
+            else:
+                ch, lng_hi = ch << 1, mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch, lat_lo = (ch << 1) | 1, mid
+            else:
+                ch, lat_hi = ch << 1, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(out)
+
+
+def cell_size_deg(precision: int):
+    """(lat_degrees, lng_degrees) spanned by a geohash cell of `precision`."""
+    total = 5 * precision
+    lng_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def covering_cells(lat: float, lng: float, radius_m: float):
+    """Geohash prefixes whose union covers the circle (lat, lng, radius_m).
+
+    Picks the finest precision whose cells are at least `radius_m` on each
+    side, then returns the centre cell and its 8 neighbours.
+    """
+    cos_lat = max(0.01, math.cos(math.radians(lat)))
+    precision = 1
+    for p in range(CELL_PRECISION, 0, -1):
+        dlat, dlng = cell_size_deg(p)
+        if dlat * _M_PER_DEG >= radius_m and dlng * _M_PER_DEG * cos_lat >= radius_m:
+            precision = p
+            break
+    dlat, dlng = cell_size_deg(precision)
+    cells = set()
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            y = min(90.0, max(-90.0, lat + dy * dlat))
+            x = ((lng + dx * dlng + 180.0) % 360.0) - 180.0
+            cells.add(geohash(y, x, precision))
+    return sorted(cells)
+
+
+# --- In-memory grid ----------------------------------------------------------
+
+
+class GridIndex:
+    """Uniform lat/lng grid of points for hot radius queries.
+
+    Not thread-safe on its own; HotTicketIndex wraps it with a lock.
+    """
+
+    def __init__(self, cell_m: float = 100.0):
+        self.step = cell_m / _M_PER_DEG
+        self._cells = {}
+        self._where = {}
+
+    def __len__(self):
+        return len(self._where)
+
+    def _cell(self, lat: float, lng: float):
+        return (math.floor(lat / self.step), math.floor(lng / self.step))
+
+    def add(self, key, lat: float, lng: float, data=None) -> None:
+        self.remove(key)
+        c = self._cell(lat, lng)
+        self._cells.setdefault(c, {})[key] = (lat, lng, data)
+        self._where[key] = c
+
+    def remove(self, key) -> None:
+        c = self._where.pop(key, None)
+        if c is not None:
+            bucket = self._cells.get(c)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._cells[c]
+
+    def query(self, lat: float, lng: float, radius_m: float, predicate=None):
+        """[(distance_m, key, data)] within radius_m, nearest first."""
+        cy, cx = self._cell(lat, lng)
+        ky = math.ceil(radius_m / (self.step * _M_PER_DEG))
+        edge = min(90.0, abs(lat) + radius_m / _M_PER_DEG)
+        kx = math.ceil(radius_m / (self.step * _M_PER_DEG * max(0.01, math.cos(math.radians(edge)))))
+        out = []
+        for y in range(cy - ky, cy + ky + 1):
+            for x in range(cx - kx, cx + kx + 1):
+                bucket = self._cells.get((y, x))
+                if not bucket:
+                    continue
+                for key, (plat, plng, data) in bucket.items():
+                    if predicate is not None and not predicate(data):
+                        continue
+                    d = haversine_m(lat, lng, plat, plng)
+                    if d <= radius_m:
+                        out.append((d, key, data))
+        out.sort(key=lambda t: t[0])
+        return out
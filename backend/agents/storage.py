@@ -1,17 +1,23 @@
 import os
-import uuid
 import shutil
 import io
-from typing import Tuple
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, Optional
 
 import boto3
 from botocore.client import Config as BotoConfig
+from botocore.exceptions import ClientError
 
-# MEDIA_DIR relative to backend/app.py's mount (/media)
-MEDIA_DIR = os.path.join(os.path.dirname(__file__), "..", "media")
+# Local media, served by app/media.py under /media (default backend/media)
+MEDIA_DIR = os.getenv("MEDIA_DIR") or os.path.join(os.path.dirname(__file__), "..", "media")
 MEDIA_DIR = os.path.abspath(MEDIA_DIR)
 os.makedirs(MEDIA_DIR, exist_ok=True)
 
+# MEDIA_PROXY=1: hand out {BACKEND_PUBLIC_URL}/media/<key> for MinIO objects
+# too, served (with caching headers and a hot-object cache) by app/media.py
+MEDIA_PROXY = os.getenv("MEDIA_PROXY", "0") == "1"
+
 
 def _minio_client():
     endpoint = os.getenv("MINIO_ENDPOINT")  # e.g., http://localhost:9000
@@ -29,40 +35,169 @@ def _minio_client():
     )
 
 
-def save_upload(upload_file) -> Tuple[str, str]:
+def _object_url(public_base: str, bucket: str, key: str) -> str:
+    if MEDIA_PROXY:
+        backend_base = os.getenv("BACKEND_PUBLIC_URL") or "http://localhost:8000"
+        return f"{backend_base.rstrip('/')}/media/{key}"
+    return f"{public_base.rstrip('/')}/{bucket}/{key}"
+
+
+def content_key(sha256: str, filename: str | None = None) -> str:
+    """Content-addressed key: the same bytes always map to the same object."""
+    ext = (os.path.splitext(filename or "")[1] or ".jpg").lower()
+    return f"{sha256}{ext}"
+
+
+def _s3_exists(s3, bucket: str, key: str) -> bool:
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except Exception:
+        return False
+
+
+def store_file(path: str, key: str, content_type: str | None = None) -> str:
     """
-    Save UploadFile.
-    - If MINIO_* env is configured, upload to MinIO bucket and return public URL.
-    - Otherwise, save locally under /media and return local URL.
-    Returns: (key, public_url)
+    Persist an already-spooled file under `key` without reading it into memory.
+    MinIO gets a (multipart, streamed) upload_file and the spool is removed;
+    locally the spool is renamed into place, so no bytes are copied.
+    Keys are content-addressed, so an object that already exists is not
+    uploaded again.
+    Returns: public_url
     """
-    ext = os.path.splitext(getattr(upload_file, "filename", "") or "")[1] or ".jpg"
-    key = f"{uuid.uuid4()}{ext}"
-
-    # Try MinIO first
     s3 = _minio_client()
     bucket = os.getenv("MINIO_BUCKET", "uploads")
     public_base = os.getenv("MINIO_PUBLIC_URL", os.getenv("MINIO_ENDPOINT", "http://localhost:9000"))
     if s3:
         try:
-            # Ensure stream at beginning
+            if not _s3_exists(s3, bucket, key):
+                extra = {"ContentType": content_type or "application/octet-stream"}
+                s3.upload_file(path, bucket, key, ExtraArgs=extra)
             try:
-                upload_file.file.seek(0)
-            except Exception:
+                os.remove(path)
+            except OSError:
                 pass
-            extra = {"ContentType": getattr(upload_file, "content_type", "application/octet-stream")}
-            s3.upload_fileobj(upload_file.file, bucket, key, ExtraArgs=extra)
-            # Assume bucket is anonymously readable per infra/minio-init
-            url = f"{public_base.rstrip('/')}/{bucket}/{key}"
-            return key, url
+            return _object_url(public_base, bucket, key)
         except Exception:
             # MinIO/S3 failed: continue with local fallback
             pass
 
-    # Fallback to local FS
+    dest = os.path.join(MEDIA_DIR, key)
+    if os.path.exists(dest):
+        os.remove(path)
+    else:
+        os.replace(path, dest)
+    backend_base = os.getenv("BACKEND_PUBLIC_URL") or "http://localhost:8000"
+    return f"{backend_base.rstrip('/')}/media/{key}"
+
+
+@contextmanager
+def local_copy(key: str) -> Iterator[str]:
+    """Path of the stored object `key` on local disk: the media file itself,
+    or a temporary download from MinIO (removed on exit)."""
     path = os.path.join(MEDIA_DIR, key)
-    with open(path, "wb") as f:
-        shutil.copyfileobj(upload_file.file, f)
-    # Use configured backend public URL if provided so production links are correct
+    if os.path.exists(path):
+        yield path
+        return
+    s3 = _minio_client()
+    if not s3:
+        raise FileNotFoundError(key)
+    fd, tmp = tempfile.mkstemp(dir=MEDIA_DIR, prefix=".fetch-", suffix=os.path.splitext(key)[1])
+    os.close(fd)
+    try:
+        s3.download_file(os.getenv("MINIO_BUCKET", "uploads"), key, tmp)
+        yield tmp
+    finally:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def store_bytes(data: bytes, key: str, content_type: str | None = None) -> str:
+    """store_file for an in-memory object. Returns: public_url"""
+    fd, tmp = tempfile.mkstemp(dir=MEDIA_DIR, prefix=".store-", suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    try:
+        return store_file(tmp, key, content_type)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def presign_post(key: str, content_type: str, max_bytes: int, expires_s: int) -> Optional[Dict]:
+    """Browser-style POST policy for uploading `key` straight to MinIO, limited
+    to `content_type` and at most `max_bytes`. None without MinIO.
+    Returns: {"url": ..., "fields": {...}} (send fields + the file as multipart)
+    """
+    s3 = _minio_client()
+    if not s3:
+        return None
+    bucket = os.getenv("MINIO_BUCKET", "uploads")
+    public_base = os.getenv("MINIO_PUBLIC_URL", os.getenv("MINIO_ENDPOINT", "http://localhost:9000"))
+    post = s3.generate_presigned_post(
+        bucket, key,
+        Fields={"Content-Type": content_type},
+        Conditions=[{"Content-Type": content_type}, ["content-length-range", 1, max_bytes]],
+        ExpiresIn=expires_s,
+    )
+    # The policy signature doesn't cover the host, so clients can be pointed
+    # at the public address even when MINIO_ENDPOINT is an internal one
+    return {"url": f"{public_base.rstrip('/')}/{bucket}", "fields": post["fields"]}
+
+
+@contextmanager
+def open_object(key: str) -> Iterator[BinaryIO]:
+    """Stream a stored object (MinIO, else local media). Raises FileNotFoundError."""
+    s3 = _minio_client()
+    if s3:
+        try:
+            body = s3.get_object(Bucket=os.getenv("MINIO_BUCKET", "uploads"), Key=key)["Body"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise FileNotFoundError(key)
+            raise
+        try:
+            yield body
+        finally:
+            body.close()
+        return
+    with open(os.path.join(MEDIA_DIR, key), "rb") as f:
+        yield f
+
+
+def promote(src_key: str, key: str) -> str:
+    """Make the stored object `src_key` available under `key` without moving
+    its bytes through this process (server-side copy on MinIO, a hard link
+    locally). `src_key` is left in place. Returns: public_url"""
+    s3 = _minio_client()
+    if s3:
+        bucket = os.getenv("MINIO_BUCKET", "uploads")
+        public_base = os.getenv("MINIO_PUBLIC_URL", os.getenv("MINIO_ENDPOINT", "http://localhost:9000"))
+        if not _s3_exists(s3, bucket, key):
+            s3.copy_object(Bucket=bucket, Key=key, CopySource={"Bucket": bucket, "Key": src_key})
+        return _object_url(public_base, bucket, key)
+    dest = os.path.join(MEDIA_DIR, key)
+    if not os.path.exists(dest):
+        try:
+            os.link(os.path.join(MEDIA_DIR, src_key), dest)
+        except OSError:
+            shutil.copyfile(os.path.join(MEDIA_DIR, src_key), dest)
     backend_base = os.getenv("BACKEND_PUBLIC_URL") or "http://localhost:8000"
-    return key, f"{backend_base.rstrip('/')}/media/{key}"
+    return f"{backend_base.rstrip('/')}/media/{key}"
+
+
+def download(key: str, path: str) -> int:
+    """Copy the MinIO object `key` to `path`. Raises FileNotFoundError.
+    Returns: bytes written"""
+    s3 = _minio_client()
+    if not s3:
+        raise FileNotFoundError(key)
+    try:
+        s3.download_file(os.getenv("MINIO_BUCKET", "uploads"), key, path)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            raise FileNotFoundError(key)
+        raise
+    return os.path.getsize(path)
@@ -0,0 +1,354 @@
+"""Opt-in request tracing (TRACING=1).
+
+Spans are kept in a contextvar, so nesting follows the code path across
+awaits, asyncio tasks and app.pipeline.run_stage (which runs each stage in a
+copy of the caller's context). The trace id travels as a W3C `traceparent`:
+read from and returned on HTTP requests, stored in outbox payloads and rq
+job meta, so a filing job that runs minutes later joins the intake's trace.
+
+A trace is buffered in the process until its local root (the request, or the
+job) ends and is exported only if that root took at least TRACE_MIN_MS, so
+a low threshold shows "where did this slow intake spend its time" without
+shipping every fast request. TRACE_SAMPLE_RATE thins new traces up front.
+
+TRACE_EXPORT is a file path (JSON lines, one span per line; default
+traces.jsonl) or an http(s) URL of an OTLP/HTTP collector, which gets the
+OTLP JSON encoding at <url> (e.g. http://localhost:4318/v1/traces).
+"""
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+TRACING = os.getenv("TRACING", "0") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+TRACE_MIN_MS = float(os.getenv("TRACE_MIN_MS", "0"))
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "traces.jsonl")
+TRACE_SERVICE = os.getenv("TRACE_SERVICE", "civicguard")
+# SQL text attached to db spans is cut at this length
+TRACE_SQL_CHARS = int(os.getenv("TRACE_SQL_CHARS", "300"))
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "_root")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], root: "Optional[_Root]"):
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, Any] = {}
+        self.status = "ok"
+        self._root = root
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes, "status": self.status, "service": TRACE_SERVICE,
+        }
+
+
+class _Root:
+    """Spans of one trace in this process, held until the local root ends."""
+
+    __slots__ = ("spans", "done", "lock")
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.done = False
+        self.lock = threading.Lock()
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("trace_span", default=None)
+
+
+def parse_traceparent(value: Optional[str]):
+    """Returns: (trace_id, parent span id, sampled) or None"""
+    try:
+        version, trace_id, span_id, flags = (value or "").strip().split("-")
+        if len(trace_id) != 32 or len(span_id) != 16 or int(trace_id, 16) == 0:
+            return None
+        return trace_id, span_id, bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+def traceparent() -> Optional[str]:
+    """Header value for the current span, to hand to another process."""
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+class _SpanContext:
+    __slots__ = ("name", "attrs", "parent", "root", "span", "_local_root", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], parent: Optional[str], root: bool):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.root = root
+        self.span = None
+        self._local_root = False
+        self._token = None
+
+    def __enter__(self) -> Optional[Span]:
+        if not TRACING:
+            return None
+        outer = _current.get()
+        if outer is not None and not self.root:
+            span = Span(self.name, outer.trace_id, outer.span_id, outer._root)
+        elif self.root:
+            remote = parse_traceparent(self.parent)
+            if remote is not None:
+                if not remote[2]:
+                    return None  # caller decided not to sample this trace
+                trace_id, parent_id = remote[0], remote[1]
+            elif random.random() < TRACE_SAMPLE_RATE:
+                trace_id, parent_id = "%032x" % random.getrandbits(128), None
+            else:
+                return None
+            span = Span(self.name, trace_id, parent_id, _Root())
+            self._local_root = True
+        else:
+            return None  # no trace in progress: nested helpers stay free
+        span.attributes.update(self.attrs)
+        self.span = span
+        self._token = _current.set(span)
+        return span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        if span is None:
+            return False
+        span.end_ns = time.time_ns()
+        if exc is not None:
+            span.status = "error"
+            span.attributes.setdefault("error", f"{exc_type.__name__}: {exc}"[:300])
+        _current.reset(self._token)
+        _finish(span, self._local_root)
+        return False
+
+
+def span(name: str, **attrs) -> _SpanContext:
+    """Child of the current span; a no-op outside a trace or with TRACING off."""
+    return _SpanContext(name, attrs, None, False)
+
+
+def start_trace(name: str, parent: Optional[str] = None, **attrs) -> _SpanContext:
+    """Local root span (a request, a job), continuing `parent` (a traceparent) if given."""
+    return _SpanContext(name, attrs, parent, True)
+
+
+def _finish(span: Span, is_root: bool) -> None:
+    root = span._root
+    if root is None:
+        _exporter().submit([span])
+        return
+    with root.lock:
+        if root.done:  # outlived its root (background work): ship on its own
+            late = True
+        else:
+            late = False
+            root.spans.append(span)
+            if is_root:
+                root.done = True
+                spans, root.spans = root.spans, []
+    if late:
+        _exporter().submit([span])
+    elif is_root and (span.end_ns - span.start_ns) / 1e6 >= TRACE_MIN_MS:
+        _exporter().submit(spans)
+
+
+# Export
+class _Exporter:
+    def __init__(self, target: str, batch: int = 512, interval_s: float = 1.0):
+        self.target = target
+        self.batch = batch
+        self.interval_s = interval_s
+        self._q: "queue.Queue[Span]" = queue.Queue(maxsize=50000)
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, spans: List[Span]) -> None:
+        for s in spans:
+            try:
+                self._q.put_nowait(s)
+            except queue.Full:
+                return  # drop rather than block a request
+
+    def _drain(self) -> List[Span]:
+        out = []
+        while len(out) < self.batch:
+            try:
+                out.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    def flush(self) -> None:
+        while True:
+            spans = self._drain()
+            if not spans:
+                return
+            try:
+                self._write(spans)
+            except Exception as e:
+                print(f"[Tracing] export of {len(spans)} spans failed:", e)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_s)
+            self.flush()
+
+    def _write(self, spans: List[Span]) -> None:
+        if self.target.startswith(("http://", "https://")):
+            import requests
+
+            requests.post(self.target, json=otlp_json(spans), timeout=5).raise_for_status()
+            return
+        with open(self.target, "a", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s.as_dict(), default=str) + "\n")
+
+
+_exporter_instance: Optional[_Exporter] = None
+_exporter_lock = threading.Lock()
+
+
+def _exporter() -> _Exporter:
+    global _exporter_instance
+    if _exporter_instance is None:
+        with _exporter_lock:
+            if _exporter_instance is None:
+                _exporter_instance = _Exporter(TRACE_EXPORT)
+    return _exporter_instance
+
+
+def flush() -> None:
+    if _exporter_instance is not None:
+        _exporter_instance.flush()
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def otlp_json(spans: List[Span]) -> Dict[str, Any]:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for `spans`."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE}}]},
+        "scopeSpans": [{
+            "scope": {"name": "civicguard.tracing"},
+            "spans": [{
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                "status": {"code": 2 if s.status == "error" else 1},
+            } for s in spans],
+        }],
+    }]}
+
+
+# SQLAlchemy
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    ctx = span("db.query", **{"db.system": conn.dialect.name, "db.statement": statement[:TRACE_SQL_CHARS]})
+    ctx.__enter__()
+    conn.info.setdefault("trace_spans", []).append(ctx)
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("trace_spans")
+    if stack:
+        stack.pop().__exit__(None, None, None)
+
+
+def _on_error(exception_context):
+    conn = exception_context.connection
+    stack = conn.info.get("trace_spans") if conn is not None else None
+    if stack:
+        err = exception_context.original_exception
+        stack.pop().__exit__(type(err), err, None)
+
+
+def instrument_engine(engine) -> None:
+    """A `db.query` span per statement on `engine` (sync Engine or
+    AsyncEngine.sync_engine). Safe to call more than once."""
+    from sqlalchemy import event
+
+    if event.contains(engine, "before_cursor_execute", _before_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _on_error)
+
+
+# ASGI
+class TracingMiddleware:
+    """Root span per HTTP request, continuing an incoming `traceparent`;
+    the response carries `traceparent` and `X-Trace-Id` headers. Plain ASGI
+    (no BaseHTTPMiddleware task hop), and a pass-through with TRACING off."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not TRACING or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        parent = None
+        for k, v in scope.get("headers") or ():
+            if k == b"traceparent":
+                parent = v.decode("latin-1")
+                break
+        method, path = scope.get("method", "GET"), scope.get("path", "")
+        with start_trace(f"{method} {path}", parent=parent, **{"http.method": method, "http.target": path}) as root:
+            if root is None:
+                return await self.app(scope, receive, send)
+
+            async def send_traced(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    root.set("http.status_code", status)
+                    if status >= 500:
+                        root.status = "error"
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers") or []) + [
+                        (b"traceparent", root.traceparent.encode()),
+                        (b"x-trace-id", root.trace_id.encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_traced)
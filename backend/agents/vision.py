@@ -1,5 +1,7 @@
 import os
 
+from agents.registry import registry
+
 LABELS = ["pothole","garbage","streetlight","water_leak","illegal_parking","stray_animals"]
 
 
@@ -11,19 +13,25 @@ def _rule_based(filename_or_url: str):
     return "unknown", "medium", 0.6
 
 
-_YOLO = None
-_YOLO_ENABLED = False
+VISION_ENABLED = os.getenv("VISION_ENABLED", "1").lower() not in ("0", "false", "no")
+
 
-try:
-    # Enable YOLO if ultralytics is available
+def _load_yolo():
+    if not VISION_ENABLED:
+        return None
+    # Imported here so `import agents.vision` stays cheap; ultralytics/torch
+    # alone take seconds to import.
     from ultralytics import YOLO  # type: ignore
 
-    _model_path = os.getenv("YOLO_MODEL", "yolov8n.pt")
-    _YOLO = YOLO(_model_path)
-    _YOLO_ENABLED = True
-except Exception:
-    _YOLO = None
-    _YOLO_ENABLED = False
+    return YOLO(os.getenv("YOLO_MODEL", "yolov8n.pt"))
+
+
+registry.register("yolo", _load_yolo)
+
+
+def model():
+    """The YOLO model, loaded on first use; None if disabled or unavailable."""
+    return registry.get("yolo")
 
 
 COCO_TO_ISSUE = {
@@ -44,32 +52,57 @@ def _map_to_issue(cls_name: str):
     return COCO_TO_ISSUE.get(name, "unknown")
 
 
-def classify(local_file_or_url: str):
-    """
-    Classify an image path or local media URL.
-    Uses YOLO if available; otherwise falls back to rule-based.
-    Returns: (issue_label, severity, confidence)
-    """
-    if not _YOLO_ENABLED:
-        return _rule_based(local_file_or_url)
-
+def _to_path(local_file_or_url: str):
     # Convert local media URL to path if needed
     path = local_file_or_url
     if isinstance(path, str) and path.startswith("http://localhost:8000/media/"):
         path = "media/" + path.rsplit("/", 1)[-1]
+    return path
 
-    try:
-        res = _YOLO.predict(path, conf=0.25, verbose=False)
-        if not res or not getattr(res[0], "boxes", None) or len(res[0].boxes.cls) == 0:
-            return _rule_based(local_file_or_url)
-
-        cls_idx = int(res[0].boxes.cls[0].item())
-        cls_name = res[0].names.get(cls_idx, "")
-        conf = float(res[0].boxes.conf[0].item())
 
-        issue = _map_to_issue(cls_name)
-        severity = "high" if conf >= 0.6 else "medium"
-        return issue, severity, conf
+def _result_to_issue(res, fallback: str):
+    """Pick the most confident box that maps to a known issue (falling back to
+    the most confident box overall) instead of blindly taking boxes.cls[0].
+    """
+    boxes = getattr(res, "boxes", None)
+    if boxes is None or len(boxes.cls) == 0:
+        return _rule_based(fallback)
+    best = None
+    for cls_t, conf_t in zip(boxes.cls.tolist(), boxes.conf.tolist()):
+        issue = _map_to_issue(res.names.get(int(cls_t), ""))
+        rank = (issue != "unknown", float(conf_t))
+        if best is None or rank > best[0]:
+            best = (rank, issue, float(conf_t))
+    _, issue, conf = best
+    severity = "high" if conf >= 0.6 else "medium"
+    return issue, severity, conf
+
+
+def classify_batch(items, names=None):
+    """
+    Classify several image paths/URLs with a single batched YOLO predict.
+    `names` are the uploads' original filenames, for the rule-based fallback:
+    stored keys are content hashes and say nothing about the issue.
+    Returns a list of (issue_label, severity, confidence) in input order.
+    """
+    fallbacks = [n or i for n, i in zip(names or items, items)]
+    yolo = model() if items else None
+    if yolo is None:
+        return [_rule_based(f) for f in fallbacks]
+    try:
+        results = yolo.predict([_to_path(i) for i in items], conf=0.25, verbose=False)
+        return [_result_to_issue(r, f) for r, f in zip(results, fallbacks)]
     except Exception:
         # On any YOLO error, fallback
-        return _rule_based(local_file_or_url)
+        return [_rule_based(f) for f in fallbacks]
+
+
+def classify(local_file_or_url: str, name: str | None = None):
+    """
+    Classify an image path or local media URL.
+    Uses YOLO if available; otherwise falls back to rule-based (on `name`,
+    the original filename, when given).
+    Returns: (issue_label, severity, confidence)
+    """
+    return classify_batch([local_file_or_url], [name])[0]
+
@@ -0,0 +1,311 @@
+"""Server-sent ticket updates instead of polling.
+
+  GET /api/tickets/{tid}/events   one ticket: its current state, then changes
+  GET /api/events                 a feed of changes, optionally filtered by
+                                  status, iclass and lat/lng/radius (metres)
+
+Both are text/event-stream, `event: ticket` with the JSON from
+db/ticket_events.py (the per-ticket stream starts with the full ticket).
+EventSource reconnects on its own; clients re-read the ticket after a
+reconnect since nothing is replayed.
+
+One Broker per API process gets events from this process's writes directly
+and from everyone else's (RQ workers, other API processes) over Redis
+pub/sub, and fans them out: per-ticket subscribers are looked up by id, feed
+subscribers are matched one by one. An idle subscriber is a small object
+with a bounded deque and an asyncio.Event, plus its response coroutine; a
+comment line every EVENTS_HEARTBEAT_S keeps proxies from closing it and
+notices clients that went away.
+
+Backpressure: a client that doesn't read blocks its own response, nothing
+else, and its deque fills up to EVENTS_QUEUE_SIZE events. Past that a ticket
+stream folds new changes into the last queued event (the newest state wins),
+and a feed subscriber is dropped from the broker, sent `event: overflow` and
+closed, so a slow consumer costs bounded memory; the client reconnects and
+resyncs.
+EVENTS_MAX_SUBSCRIBERS caps connections per process (503 past it).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from agents.spatial import haversine_m
+from db import ticket_events
+from db.async_repository import AsyncTicketRepo
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+EVENTS_HEARTBEAT_S = float(os.getenv("EVENTS_HEARTBEAT_S", "15"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "10000"))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
+
+router = APIRouter()
+
+_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # nginx: don't buffer the stream
+
+
+class Subscriber:
+    __slots__ = ("tid", "status", "iclass", "area", "pending", "wake", "overflowed", "max_pending")
+
+    def __init__(
+        self,
+        tid: Optional[str] = None,
+        status: Optional[str] = None,
+        iclass: Optional[str] = None,
+        area: Optional[Tuple[float, float, float]] = None,
+        max_pending: int = EVENTS_QUEUE_SIZE,
+    ):
+        self.tid = tid
+        self.status = status
+        self.iclass = iclass
+        self.area = area  # (lat, lng, radius_m)
+        self.max_pending = max_pending
+        self.pending: "deque[Dict[str, Any]]" = deque()
+        self.wake = asyncio.Event()
+        self.overflowed = False
+
+    def matches(self, ev: Dict[str, Any]) -> bool:
+        if self.status and ev.get("status") != self.status:
+            return False
+        if self.iclass and ev.get("iclass") != self.iclass:
+            return False
+        if self.area is not None:
+            lat, lng, radius = self.area
+            if ev.get("lat") is None or ev.get("lng") is None:
+                return False
+            return haversine_m(lat, lng, ev["lat"], ev["lng"]) <= radius
+        return True
+
+    def push(self, ev: Dict[str, Any]) -> bool:
+        """Returns: False once the subscriber has fallen too far behind"""
+        if self.overflowed:
+            return False
+        if len(self.pending) >= self.max_pending and self.tid is not None:
+            # One ticket: its newest state supersedes what's queued
+            last = self.pending[-1]
+            changed = sorted(set(last.get("changed", ())) | set(ev.get("changed", ())))
+            self.pending[-1] = {**last, **ev, "changed": changed}
+            self.wake.set()
+            return True
+        if len(self.pending) >= self.max_pending:
+            self.overflowed = True
+            self.pending.clear()
+            self.wake.set()
+            return False
+        self.pending.append(ev)
+        self.wake.set()
+        return True
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Broker:
+    def __init__(self, redis=None, channel: str = ticket_events.CHANNEL, max_subscribers: int = EVENTS_MAX_SUBSCRIBERS):
+        self.redis = redis
+        self.channel = channel
+        self.max_subscribers = max_subscribers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tickets: Dict[str, Set[Subscriber]] = {}
+        self._feeds: Set[Subscriber] = set()
+        self._size = 0
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.counters: Dict[str, int] = {"events": 0, "delivered": 0, "overflows": 0, "rejected": 0}
+
+    # Event loop side
+    def start(self) -> None:
+        """Bind to the running loop; idempotent."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        ticket_events.remove_listener(self.deliver)  # rebinding to a new loop
+        ticket_events.add_listener(self.deliver)
+        if self.redis is not None and self._listener is None:
+            self._stop.clear()
+            self._listener = threading.Thread(target=self._listen, name="ticket-events", daemon=True)
+            self._listener.start()
+
+    def stop(self) -> None:
+        ticket_events.remove_listener(self.deliver)
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=2.0)
+            self._listener = None
+        self._loop = None
+
+    def full(self) -> bool:
+        return self._size >= self.max_subscribers
+
+    def subscribe(self, sub: Subscriber) -> None:
+        if self.full():
+            self.counters["rejected"] += 1
+            raise TooManySubscribers()
+        if sub.tid is not None:
+            self._tickets.setdefault(sub.tid, set()).add(sub)
+        else:
+            self._feeds.add(sub)
+        self._size += 1
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        if sub.tid is not None:
+            subs = self._tickets.get(sub.tid)
+            if subs is None or sub not in subs:
+                return
+            subs.discard(sub)
+            if not subs:
+                del self._tickets[sub.tid]
+        elif sub in self._feeds:
+            self._feeds.discard(sub)
+        else:
+            return
+        self._size -= 1
+
+    def dispatch(self, events: List[Dict[str, Any]]) -> None:
+        self.counters["events"] += len(events)
+        lagging = set()
+        for ev in events:
+            targets = list(self._tickets.get(ev.get("id"), ()))
+            targets.extend(s for s in self._feeds if s.matches(ev))
+            for sub in targets:
+                if sub.push(ev):
+                    self.counters["delivered"] += 1
+                elif sub not in lagging:
+                    lagging.add(sub)
+                    self.counters["overflows"] += 1
+        for sub in lagging:
+            self.unsubscribe(sub)
+
+    # Any thread
+    def deliver(self, events: List[Dict[str, Any]]) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self.dispatch, events)
+        except RuntimeError:
+            pass  # loop closed: the app is shutting down
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while not self._stop.is_set():
+                    msg = pubsub.get_message(timeout=1.0)
+                    if not msg or msg.get("type") != "message":
+                        continue
+                    decoded = ticket_events.decode(msg["data"])
+                    # Our own writes were delivered directly
+                    if decoded is not None and decoded.get("origin") != ticket_events.origin():
+                        self.deliver(decoded["events"])
+            except Exception as e:
+                print("[Events] redis listener error:", e)
+                self._stop.wait(5.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "subscribers": self._size, "tickets": len(self._tickets), "feeds": len(self._feeds)}
+
+
+def _make_broker() -> Broker:
+    redis = None
+    if ticket_events.TICKET_EVENTS:
+        try:
+            from db.ticket_cache import redis_client
+
+            redis = redis_client()
+        except Exception as e:
+            print(f"[Events] redis unavailable, this process's events only: {e}")
+    return Broker(redis=redis)
+
+
+broker = _make_broker()
+
+
+def _frame(data: bytes, event: str = "ticket") -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+async def stream(sub: Subscriber, load: Optional[Callable[[], Awaitable[Any]]] = None) -> AsyncIterator[bytes]:
+    """SSE frames for `sub` until the client goes away or overflows. `load`
+    reads the ticket's (body, etag) to send first."""
+    # Subscribed here, not in the handler: a response that never starts
+    # never leaves a subscriber behind
+    try:
+        broker.subscribe(sub)
+    except TooManySubscribers:
+        yield _frame(b"{}", "overflow")
+        return
+    try:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n".encode()
+        if load is not None:
+            # Read after subscribing: a write in between is sent, not lost
+            found = await load()
+            if found:
+                yield _frame(found[0])
+        loop = asyncio.get_running_loop()
+        while True:
+            if not sub.pending and not sub.overflowed:
+                # A timer rather than wait_for(): no extra Task per idle stream
+                timer = loop.call_later(EVENTS_HEARTBEAT_S, sub.wake.set)
+                await sub.wake.wait()
+                timer.cancel()
+                if not sub.pending and not sub.overflowed:
+                    sub.wake.clear()
+                    yield b": keepalive\n\n"
+                    continue
+            sub.wake.clear()
+            if sub.overflowed:
+                yield _frame(b"{}", "overflow")
+                return
+            while sub.pending:
+                yield _frame(json.dumps(sub.pending.popleft(), separators=(",", ":")).encode())
+    finally:
+        broker.unsubscribe(sub)
+
+
+def _open(sub: Subscriber, load=None) -> StreamingResponse:
+    broker.start()
+    if broker.full():
+        broker.counters["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Too many event subscribers", headers={"Retry-After": "5"})
+    return StreamingResponse(stream(sub, load), media_type="text/event-stream", headers=_HEADERS)
+
+
+@router.get("/api/tickets/{tid}/events")
+async def ticket_events_stream(tid: str):
+    if not await AsyncTicketRepo.get_encoded(tid):
+        raise HTTPException(status_code=404, detail="not_found")
+    return _open(Subscriber(tid=tid), load=lambda: AsyncTicketRepo.get_encoded(tid))
+
+
+@router.get("/api/events")
+async def events_feed(
+    status: Optional[str] = None,
+    iclass: Optional[str] = None,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    radius: float = 1000.0,
+):
+    area = None
+    if lat is not None or lng is not None:
+        if lat is None or lng is None:
+            raise HTTPException(status_code=400, detail="lat and lng go together")
+        area = (lat, lng, max(1.0, min(radius, 50000.0)))
+    return _open(Subscriber(status=status, iclass=iclass, area=area))
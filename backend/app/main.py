@@ -1,32 +1,116 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import UploadFile, File, HTTPException, Form
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
+from fastapi import UploadFile, File, HTTPException, Form, Header
 from typing import Optional
-from PIL import Image
-import exifread
-import io
-import hashlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import asyncio
+import hmac
 import os
 import logging
 import uuid
-import shutil
 from dotenv import load_dotenv
 load_dotenv()
 from db.repository import TicketRepo
-from db.models import Ticket, Base  # kept for SQL mode aspects like ensure
-from db.session import engine  # still used for SQL ensure
-from sqlalchemy import inspect, text
-from agents.storage import save_upload
-from agents.vision import classify
-from agents.geo import reverse_geocode, exif_gps_from_file
+from db.async_repository import AsyncTicketRepo
+from db.async_session import async_engine
+from db import export as ticket_export, stats as ticket_stats
+from db.ticket_cache import get_cache as get_ticket_cache
+from db.schema import check_at_startup as check_schema
+from db.session import engine
+from agents.vision import classify, _rule_based
+from agents.registry import registry as model_registry
+from agents.geo import reverse_geocode
+from agents.ingest import MAX_UPLOAD_BYTES, InvalidImage, SpooledUpload, UploadTooLarge, spool_upload
+from agents.geo_cache import get_cache as get_geocode_cache
 from agents.geo import _reverse_geocode_mapbox, _reverse_geocode_nominatim  # test-only provider introspection
-from workers.queue import file_queue
+from workers.queue import redis, register_metrics as register_queue_metrics
+from workers.outbox import OutboxRelay
+from agents import direct_upload, metrics, profiler, storage, tracing
+from agents.cluster import CLUSTER_RADIUS_M, hot_index
+from app.events import broker as events_broker, router as events_router
+from app.media import not_modified, router as media_router
+from app.pipeline import run_stage, shutdown as shutdown_pools
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("civicguard")
 
-app = FastAPI(title="CivicGuard API")
+# Models load lazily on first classification. MODEL_WARMUP=1 loads them in the
+# lifespan hook; PRELOAD_MODELS=1 loads them at import time, which under
+# `gunicorn --preload` happens in the master so forked workers share the
+# weights copy-on-write.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "0") == "1"
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+if PRELOAD_MODELS:
+    logger.info("Preloaded models: %s", model_registry.preload())
+
+# inline: classify during the request; batch: provisional label now, final
+# label from the micro-batching worker (python -m workers.classifier)
+CLASSIFY_MODE = os.getenv("CLASSIFY_MODE", "inline").lower()
+
+# Follow-up work (filing, batched classification, geocode retries) is written
+# to the outbox with the ticket and relayed to Redis right after the commit;
+# python -m workers.outbox picks up anything that couldn't be relayed here.
+outbox_relay = OutboxRelay(redis)
+
+INTAKE_SECONDS = metrics.histogram("civicguard_intake_stage_seconds", "Intake latency per stage", ["stage"])
+register_queue_metrics(redis)
+metrics.gauge(
+    "civicguard_db_pool_checked_out", "Connections currently checked out of the pool", ["engine"],
+    lambda: {(name, ): e.pool.checkedout() for name, e in (("sync", engine), ("async", async_engine.sync_engine))
+             if hasattr(e.pool, "checkedout")},
+)
+
+
+async def _timed(stage: str, aw):
+    with INTAKE_SECONDS.labels(stage).time(), tracing.span(f"intake.{stage}"):
+        return await aw
+
+# TRACING=1: a span per request and intake stage, outbound geocoder/authority
+# call and SQL statement, exported per agents/tracing.py (TRACE_EXPORT)
+if tracing.TRACING:
+    tracing.instrument_engine(engine)
+    tracing.instrument_engine(async_engine.sync_engine)
+
+# Token for the /debug/profile endpoint (unset: endpoint disabled)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Idempotent intake: a repeated photo hash within DEDUPE_RADIUS_M metres and
+# DEDUPE_WINDOW_SECONDS returns the existing ticket (INTAKE_DEDUPE=0 disables)
+INTAKE_DEDUPE = os.getenv("INTAKE_DEDUPE", "1") == "1"
+DEDUPE_WINDOW_SECONDS = int(os.getenv("DEDUPE_WINDOW_SECONDS", str(24 * 3600)))
+DEDUPE_RADIUS_M = float(os.getenv("DEDUPE_RADIUS_M", "50"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Migrations run once per deploy (python -m db.schema upgrade); here it's
+    # one SELECT of the schema version (SCHEMA_CHECK=fail refuses to start)
+    await run_stage("db", check_schema)
+    try:
+        await run_stage("db", ticket_stats.ensure_initialized)
+    except Exception:
+        logger.info("stats counters not initialized", exc_info=True)
+    metrics.start_flusher()  # only with METRICS_DIR (several API processes)
+    ticket_cache = get_ticket_cache()
+    if ticket_cache is not None:
+        ticket_cache.start_listener()  # worker writes invalidate over Redis pub/sub
+    if MODEL_WARMUP and not PRELOAD_MODELS:
+        # Load weights before the first request instead of during it
+        stats = await run_stage("classify", model_registry.warmup)
+        logger.info("Models warmed up: %s", stats)
+    yield
+    if ticket_cache is not None:
+        ticket_cache.stop_listener()
+    events_broker.stop()
+    # Don't block shutdown on in-flight geocode retries
+    shutdown_pools(wait=False)
+    await async_engine.dispose()
+    tracing.flush()
+
+
+app = FastAPI(title="CivicGuard API", lifespan=lifespan)
 
 """CORS configuration
 In development we allow localhost origins. In production, define ALLOWED_ORIGINS
@@ -55,70 +139,42 @@ app.add_middleware(
 )
 logger.info("CORS origins configured: %s", origins)
 
-# Serve uploaded files (dev)
-MEDIA_DIR = os.path.join(os.path.dirname(__file__), "..", "media")
-MEDIA_DIR = os.path.abspath(MEDIA_DIR)
-os.makedirs(MEDIA_DIR, exist_ok=True)
-app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
+# Outermost, so the request span covers the other middleware too
+app.add_middleware(tracing.TracingMiddleware)
 
-
-# Ensure DB schema minimal updates (only relevant in SQL mode)
-def _ensure_media_url_column():
-    try:
-        insp = inspect(engine)
-        cols = [c['name'] for c in insp.get_columns('tickets')]
-        if 'media_url' not in cols:
-            with engine.connect() as conn:
-                try:
-                    conn.execute(text("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS media_url TEXT"))
-                    conn.commit()
-                except Exception:
-                    conn.execute(text("ALTER TABLE tickets ADD COLUMN media_url TEXT"))
-                    conn.commit()
-    except Exception:
-        pass
-
-try:
-    # Create tables if they don't exist
-    Base.metadata.create_all(bind=engine)
-except Exception:
-    pass
-_ensure_media_url_column()
+# Serve uploaded files (dev); the directory is agents/storage.py's MEDIA_DIR
+MEDIA_DIR = storage.MEDIA_DIR
+# Cache headers, ETags, ranges and the MinIO proxy: app/media.py
+app.include_router(media_router)
+# Ticket status pushed over SSE: app/events.py
+app.include_router(events_router)
 
 
 @app.get("/api/stats")
 async def stats():
-    # Implement using list/get in repo for compatibility across backends
-    # Count open
-    open_items = TicketRepo.list(limit=200).get("items", [])
-    open_count = sum(1 for t in open_items if t.get("status") in ("CREATED", "FILING"))
-
-    # Filed today
-    from datetime import datetime, timezone
-    today = datetime.now(timezone.utc).date()
-    filed_today = 0
-    durations = []
-    for t in open_items:
-        if t.get("status") == "FILED":
-            created_at = t.get("created_at")
-            updated_at = t.get("updated_at")
-            try:
-                # Firestore returns datetime; SQL returns datetime; if strings, try parse
-                if isinstance(created_at, str):
-                    created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
-                if isinstance(updated_at, str):
-                    updated_at = datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
-            except Exception:
-                created_at = updated_at = None
-            if created_at and created_at.date() == today:
-                filed_today += 1
-            if created_at and updated_at and updated_at >= created_at:
-                durations.append((updated_at - created_at).total_seconds())
-
-    avg_secs = int(sum(durations) / len(durations)) if durations else 0
+    # Counters are maintained incrementally by TicketRepo (db/stats.py), so
+    # this is a fixed-size read regardless of how many tickets exist.
+    c = await AsyncTicketRepo.stats()
+    open_count = int(c.get("status:CREATED", 0) + c.get("status:FILING", 0))
+    today = datetime.utcnow().date().isoformat()
+    filed_today = int(c.get(f"filed:{today}", 0))
+
+    count = c.get("ttf_count", 0)
+    avg_secs = int(c.get("ttf_sum", 0) / count) if count else 0
     m, s = divmod(avg_secs, 60)
     avg_str = f"{m}m {s:02d}s" if avg_secs else "0m 00s"
-    return {"open": open_count, "filed_today": filed_today, "avg_time_to_file": avg_str}
+
+    def breakdown(prefix):
+        return {k[len(prefix):]: int(v) for k, v in c.items() if k.startswith(prefix) and v}
+
+    return {
+        "open": open_count,
+        "filed_today": filed_today,
+        "avg_time_to_file": avg_str,
+        "by_status": breakdown("status:"),
+        "by_iclass": breakdown("iclass:"),
+        "by_authority": breakdown("authority:"),
+    }
 
 
 @app.get("/")
@@ -136,6 +192,14 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format: intake stages, geocoders, filings, DB pool, queues."""
+    # Queue gauges read Redis; keep that off the event loop
+    body = await run_stage("queue", metrics.render)
+    return Response(body, media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/test-geocode")
 async def test_geocode(lat: float, lng: float):
     """Quick endpoint to test reverse geocoding and surface errors in logs.
@@ -154,17 +218,65 @@ async def test_geocode(lat: float, lng: float):
     return {"ok": addr not in (None, "Unknown"), "provider": provider, "address": addr}
 
 
-def _dms_to_deg(dms, ref: Optional[str] = None) -> Optional[float]:
+@app.get("/debug/models")
+async def model_stats():
+    """Which models are loaded in this worker, load time and RSS growth."""
+    return model_registry.stats()
+
+
+@app.get("/debug/geocode-cache")
+async def geocode_cache_stats():
+    """Hit/miss counters for the reverse-geocode cache."""
+    return get_geocode_cache().stats()
+
+
+@app.get("/debug/ticket-cache")
+async def ticket_cache_stats():
+    """Hit/miss/invalidation counters for the GET /api/tickets/{tid} cache."""
+    cache = get_ticket_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@app.get("/debug/events")
+async def events_stats():
+    """Subscribers and delivery counters for the ticket event streams."""
+    return events_broker.stats()
+
+
+def _require_admin(x_admin_token: Optional[str]) -> None:
+    """404 unless ADMIN_TOKEN is configured, 403 unless it was sent."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.get("/debug/profile")
+async def debug_profile(seconds: float = 10, interval_ms: float = 5, x_admin_token: Optional[str] = Header(None)):
+    """Sample every thread's stack for `seconds` and return folded stacks
+    (flamegraph.pl / speedscope input). Needs ADMIN_TOKEN in X-Admin-Token.
+    """
+    _require_admin(x_admin_token)
+    if not 0 < seconds <= profiler.MAX_SECONDS or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {profiler.MAX_SECONDS}], interval_ms in [1, 1000]")
+    # Own thread, not a stage pool: a profile must not wait behind the work it measures
     try:
-        d = float(dms.values[0].num) / float(dms.values[0].den)
-        m = float(dms.values[1].num) / float(dms.values[1].den)
-        s = float(dms.values[2].num) / float(dms.values[2].den)
-        deg = d + (m / 60.0) + (s / 3600.0)
-        if ref in ("S", "W"):
-            deg = -deg
-        return deg
-    except Exception:
-        return None
+        body = await asyncio.to_thread(profiler.sample, seconds, interval_ms / 1000)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(body, media_type="text/plain; charset=utf-8")
+
+
+async def _spool(upload: UploadFile) -> SpooledUpload:
+    """Stream the upload once into a spool (hash + header + size limit)."""
+    too_large = HTTPException(status_code=413, detail=f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)}MB).")
+    # Reject on the declared size before touching the body at all
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise too_large
+    try:
+        return await run_stage("ingest", spool_upload, upload.file, upload.filename, upload.content_type, MAX_UPLOAD_BYTES)
+    except UploadTooLarge:
+        raise too_large
 
 
 @app.post("/upload")
@@ -172,43 +284,28 @@ async def upload_image(file: UploadFile = File(...)):
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=415, detail="Unsupported media type. Please upload an image.")
 
-    data = await file.read()
-    size = len(data)
-    max_size = 10 * 1024 * 1024  # 10MB
-    if size > max_size:
-        raise HTTPException(status_code=413, detail="File too large (max 10MB).")
-
-    # Validate image can be opened
+    spooled = await _spool(file)
     try:
-        Image.open(io.BytesIO(data)).verify()
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid image file.")
-
-    # Hash for idempotency
-    sha256 = hashlib.sha256(data).hexdigest()
+        # Validate image can be opened
+        try:
+            await _timed("validate", run_stage("ingest", spooled.validate_image))
+        except InvalidImage:
+            raise HTTPException(status_code=400, detail="Invalid image file.")
 
-    # EXIF GPS (best-effort)
-    gps = None
-    try:
-        tags = exifread.process_file(io.BytesIO(data), details=False)
-        lat = tags.get("GPS GPSLatitude")
-        lat_ref = tags.get("GPS GPSLatitudeRef")
-        lon = tags.get("GPS GPSLongitude")
-        lon_ref = tags.get("GPS GPSLongitudeRef")
-        lat_deg = _dms_to_deg(lat, getattr(lat_ref, "values", [None])[0] if lat_ref else None) if lat else None
-        lon_deg = _dms_to_deg(lon, getattr(lon_ref, "values", [None])[0] if lon_ref else None) if lon else None
-        if lat_deg is not None and lon_deg is not None:
-            gps = {"lat": lat_deg, "lon": lon_deg}
-    except Exception:
-        gps = None
+        # EXIF GPS (best-effort)
+        coords = await run_stage("exif", spooled.gps)
+        gps = {"lat": coords[0], "lon": coords[1]} if coords else None
 
-    return {
-        "filename": file.filename,
-        "content_type": file.content_type,
-        "size": size,
-        "sha256": sha256,
-        "gps": gps,
-    }
+        return {
+            "filename": file.filename,
+            "content_type": file.content_type,
+            "size": spooled.size,
+            # Hash for idempotency
+            "sha256": spooled.sha256,
+            "gps": gps,
+        }
+    finally:
+        spooled.discard()
 
 
 @app.post("/api/intake")
@@ -220,83 +317,334 @@ async def intake(
     contact: str | None = Form(None),
 ):
     try:
-        # Save file (MinIO or local) and build URL
-        try:
-            key, file_url = save_upload(image)
-        except Exception:
-            logger.exception("save_upload failed")
-            raise HTTPException(status_code=500, detail="Upload failed")
+        # Read the body exactly once: hash, EXIF header and size limit are all
+        # handled while spooling, and the spool is what gets stored.
+        spooled = await _timed("read", _spool(image))
+        return await _create_ticket(spooled, image.filename, note, lat, lng, contact)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("intake failed")
+        raise HTTPException(status_code=500, detail="Intake failed")
+
 
-        local_media_path = os.path.join(os.path.dirname(__file__), "..", "media", key)
+@app.post("/api/intake/init")
+async def intake_init(filename: str = Form("photo.jpg"), content_type: str = Form("image/jpeg"), size: int | None = Form(None)):
+    """Step 1 of direct-to-storage intake (agents/direct_upload.py): an upload
+    slot the client sends the photo to, then POST /api/intake/complete."""
+    if not content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Unsupported media type. Please upload an image.")
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)}MB).")
+    return await run_stage("storage", direct_upload.new_upload, filename, content_type, MAX_UPLOAD_BYTES)
+
+
+@app.put("/api/intake/upload/{upload_id}")
+async def intake_upload(upload_id: str, request: Request):
+    """Upload target of an init slot when there is no MinIO (local media)."""
+    try:
+        claims = direct_upload.verify(upload_id)
+    except direct_upload.InvalidUploadToken as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    if request.headers.get("content-type", "").split(";")[0].strip() != claims["ct"]:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be {claims['ct']}")
+    path = direct_upload.local_path(claims)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = 0
+    with open(path + ".part", "wb") as f:
+        try:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > claims["max"]:
+                    raise HTTPException(status_code=413, detail=f"File too large (max {claims['max'] // (1024 * 1024)}MB).")
+                await run_stage("storage", f.write, chunk)
+        except BaseException:
+            f.close()
+            os.remove(path + ".part")
+            raise
+    os.replace(path + ".part", path)
+    return Response(status_code=204)
+
+
+@app.post("/api/intake/complete")
+async def intake_complete(
+    upload_id: str = Form(...),
+    note: str | None = Form(None),
+    lat: float | None = Form(None),
+    lng: float | None = Form(None),
+    contact: str | None = Form(None),
+):
+    """Step 2: ingest the uploaded object and create the ticket (as /api/intake)."""
+    try:
+        claims = direct_upload.verify(upload_id)
+    except direct_upload.InvalidUploadToken as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    try:
+        try:
+            spooled = await _timed("read", run_stage("storage", direct_upload.spool, claims))
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Nothing uploaded for this upload_id.")
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail=f"File too large (max {claims['max'] // (1024 * 1024)}MB).")
+        # Unlike a multipart intake nothing has looked at these bytes yet
+        try:
+            await _timed("validate", run_stage("ingest", spooled.validate_image))
+        except InvalidImage:
+            spooled.discard()
+            raise HTTPException(status_code=400, detail="Invalid image file.")
+        return await _create_ticket(spooled, claims.get("fn"), note, lat, lng, contact)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("intake failed")
+        raise HTTPException(status_code=500, detail="Intake failed")
 
-        # Lightweight classification (filename-based)
-        iclass, severity, conf = classify(image.filename or "")
 
-        # Autofill coordinates from EXIF if not provided
+async def _create_ticket(
+    spooled: SpooledUpload,
+    filename: Optional[str],
+    note: Optional[str],
+    lat: Optional[float],
+    lng: Optional[float],
+    contact: Optional[str],
+):
+    """Everything after the photo is spooled: EXIF, dedupe, storage,
+    classification, geocoding and the ticket + outbox write."""
+    try:
+        # Autofill coordinates from EXIF if not provided (header bytes only)
         if lat is None or lng is None:
             try:
-                gps = exif_gps_from_file(local_media_path)
+                gps = await _timed("exif", run_stage("exif", spooled.gps))
                 if gps:
                     lat, lng = gps
             except Exception:
                 logger.info("EXIF GPS read failed", exc_info=True)
 
-        # Reverse geocode (best-effort)
+        # Same photo from (about) the same place within the window is a
+        # resubmission (flaky mobile retry): hand back the existing ticket
+        # instead of storing, classifying and filing it again.
+        if INTAKE_DEDUPE:
+            since = datetime.utcnow() - timedelta(seconds=DEDUPE_WINDOW_SECONDS)
+            existing = await _timed("dedupe", run_stage(
+                "db", TicketRepo.find_duplicate, spooled.sha256, lat, lng, since, DEDUPE_RADIUS_M
+            ))
+            if existing:
+                return {
+                    "id": existing["id"],
+                    "file_url": existing.get("media_url"),
+                    "class": existing.get("iclass"),
+                    "severity": existing.get("severity"),
+                    "confidence": round(existing.get("confidence") or 0.0, 3),
+                    "provisional": False,
+                    "lat": existing.get("lat"),
+                    "lng": existing.get("lng"),
+                    "address": existing.get("address"),
+                    "note": note,
+                    "contact": existing.get("contact"),
+                    "status": existing.get("status"),
+                    "duplicate": True,
+                }
+
+        async def _geocode():
+            # Reverse geocode (best-effort)
+            if lat is None or lng is None:
+                return "Unknown"
+            try:
+                return await run_stage("geocode", reverse_geocode, lat, lng)
+            except Exception:
+                logger.info("reverse_geocode failed", exc_info=True)
+                return "Unknown"
+
+        # Storage upload, classification and geocoding are independent,
+        # so run them concurrently on their own pools.
+        stored, classified, address = await asyncio.gather(
+            _timed("store", run_stage("storage", spooled.store)),
+            # In batch mode only a provisional filename-based label is computed
+            # here; the classifier worker replaces it after a batched predict.
+            _timed("classify", run_stage(
+                "classify", _rule_based if CLASSIFY_MODE == "batch" else classify, filename or ""
+            )),
+            _timed("geocode", _geocode()),
+            return_exceptions=True,
+        )
+    finally:
+        # No-op once stored (renamed/uploaded); cleans up otherwise
+        spooled.discard()
+    if isinstance(stored, BaseException):
+        logger.error("storing upload failed", exc_info=stored)
+        raise HTTPException(status_code=500, detail="Upload failed")
+    key, file_url = stored
+    if isinstance(classified, BaseException):
+        raise classified
+    iclass, severity, conf = classified
+    if isinstance(address, BaseException):
+        logger.info("geocode failed", exc_info=address)
+        address = "Unknown"
+
+    # A report of the same issue right next to an open ticket is attached
+    # to it rather than filed again. Skipped for provisional labels (batch
+    # mode) and "unknown", which don't say what the issue is.
+    parent = None
+    if (
+        CLUSTER_RADIUS_M > 0 and CLASSIFY_MODE != "batch" and iclass != "unknown"
+        and lat is not None and lng is not None
+    ):
         try:
-            address = reverse_geocode(lat, lng) if (lat is not None and lng is not None) else "Unknown"
+            parent = await run_stage("db", hot_index.find_parent, lat, lng, iclass, CLUSTER_RADIUS_M)
         except Exception:
-            logger.info("reverse_geocode failed", exc_info=True)
-            address = "Unknown"
-
-        tid = str(uuid.uuid4())
-        TicketRepo.create({
-            "id": tid,
-            "iclass": iclass,
-            "severity": severity,
-            "lat": lat,
-            "lng": lng,
-            "address": address,
-            "status": "CREATED",
-            "contact": contact,
-            "media_url": file_url,
-        })
-
+            logger.info("cluster lookup failed", exc_info=True)
+    status = "MERGED" if parent else "CREATED"
+
+    # Merged reports ride on the parent's filing; with a provisional label
+    # the classifier worker queues the filing once the final label is known.
+    provisional = CLASSIFY_MODE == "batch"
+    outbox = []
+    if provisional:
+        local_path = os.path.join(MEDIA_DIR, key)
+        outbox.append(("classify", {
+            # name: what the provisional label was read from, for when there's no model
+            "source": local_path if os.path.exists(local_path) else file_url, "name": filename,
+        }))
+    elif parent is None:
+        outbox.append(("file", {}))
+    if address == "Unknown" and lat is not None and lng is not None:
+        outbox.append(("geocode", {}))
+    outbox.append(("media", {"key": key}))
+    traceparent = tracing.traceparent()
+    if traceparent:
+        # Jobs published later (workers.outbox) still join this trace
+        for _, payload in outbox:
+            payload["traceparent"] = traceparent
+
+    tid = str(uuid.uuid4())
+    await _timed("db_write", AsyncTicketRepo.create({
+        "id": tid,
+        "iclass": iclass,
+        "severity": severity,
+        "lat": lat,
+        "lng": lng,
+        "address": address,
+        "status": status,
+        "contact": contact,
+        "media_url": file_url,
+        "confidence": conf,
+        "content_hash": spooled.sha256,
+        "parent_id": parent["id"] if parent else None,
+    }, outbox=outbox))
+
+    if parent is None and lat is not None and lng is not None:
+        hot_index.add(tid, lat, lng, iclass)
+
+    if outbox:
         try:
-            file_queue.enqueue("workers.jobs.file_to_authority", tid, file_url, iclass, address, contact)
+            await _timed("enqueue", run_stage("queue", outbox_relay.relay, [tid]))
         except Exception:
-            logger.info("Queue enqueue failed (non-fatal)", exc_info=True)
+            logger.info("Outbox relay failed; left for workers.outbox (non-fatal)", exc_info=True)
 
-        return {
-            "id": tid,
-            "file_url": file_url,
-            "class": iclass,
-            "severity": severity,
-            "confidence": round(conf, 3),
-            "lat": lat,
-            "lng": lng,
-            "address": address,
-            "note": note,
-            "contact": contact,
-            "status": "CREATED",
-        }
-    except HTTPException:
-        raise
-    except Exception:
-        logger.exception("intake failed")
-        raise HTTPException(status_code=500, detail="Intake failed")
+    return {
+        "id": tid,
+        "file_url": file_url,
+        "class": iclass,
+        "severity": severity,
+        "confidence": round(conf, 3),
+        "provisional": provisional,
+        "lat": lat,
+        "lng": lng,
+        "address": address,
+        "note": note,
+        "contact": contact,
+        "status": status,
+        "duplicate": False,
+        "parent_id": parent["id"] if parent else None,
+    }
+
+
+# Declared before /api/tickets/{tid} so "nearby" isn't taken for a ticket id
+@app.get("/api/tickets/nearby")
+async def nearby_tickets(
+    lat: float,
+    lng: float,
+    radius: float = 30.0,
+    status: Optional[str] = None,
+    iclass: Optional[str] = None,
+    open_only: bool = False,
+    limit: int = 100,
+):
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Invalid coordinates.")
+    radius = max(1.0, min(radius, 5000.0))
+    items = await run_stage(
+        "db", TicketRepo.nearby, lat, lng, radius, status=status, iclass=iclass, open_only=open_only, limit=limit
+    )
+    return {"count": len(items), "radius": radius, "items": items}
 
 
 @app.get("/api/tickets/{tid}")
-async def get_ticket(tid: str):
-    t = TicketRepo.get(tid)
-    if not t:
+async def get_ticket(tid: str, request: Request):
+    """Polled by the track page: served from db/ticket_cache.py with an ETag,
+    so an unchanged ticket is a 304 without a body."""
+    found = await AsyncTicketRepo.get_encoded(tid)
+    if not found:
         return {"error": "not_found"}
-    return t
+    body, etag = found
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/tickets")
-async def list_tickets(limit: int = 50, offset: int = 0, status: Optional[str] = None, iclass: Optional[str] = None):
-    return TicketRepo.list(limit=limit, offset=offset, status=status, iclass=iclass)
+async def list_tickets(
+    limit: int = 50,
+    offset: int = 0,
+    status: Optional[str] = None,
+    iclass: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: str = "exact",
+):
+    """Newest first. Pass the returned next_cursor as `cursor` for the next page;
+    `fields=id,status,lat,lng` trims the columns; `count=cached|none` avoids a
+    COUNT(*) per page."""
+    try:
+        return await AsyncTicketRepo.list(
+            limit=limit,
+            offset=offset,
+            status=status,
+            iclass=iclass,
+            cursor=cursor,
+            fields=fields.split(",") if fields else None,
+            count=count,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/export")
+def export_tickets(
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    iclass: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    gzip: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """Every matching ticket, oldest first, streamed from a server-side cursor
+    as NDJSON, CSV or Parquet (db/export.py). Needs ADMIN_TOKEN in X-Admin-Token.
+    """
+    _require_admin(x_admin_token)
+    try:
+        chunks = ticket_export.stream(
+            format, status, iclass, since, until, fields.split(",") if fields else None, gzip
+        )
+    except ticket_export.ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type = "application/gzip" if gzip and format != "parquet" else ticket_export.MEDIA_TYPES[format]
+    disposition = f'attachment; filename="{ticket_export.filename(format, gzip)}"'
+    # A sync iterator: Starlette pulls it on a worker thread, off the event loop
+    return StreamingResponse(chunks, media_type=media_type, headers={"Content-Disposition": disposition})
 
 
 @app.get("/debug/cors")
@@ -0,0 +1,312 @@
+"""GET /media/<key>: uploaded photos and their derivatives.
+
+Keys are content-addressed (<sha256>.jpg, <sha256>.thumb.webp, ...) and
+never rewritten, so those responses are `Cache-Control: public,
+max-age=31536000, immutable` with a strong ETag made from the key: a
+dashboard that loaded a thumbnail once doesn't ask again, and a forced
+reload gets a 304. Older uuid-named uploads get MEDIA_MAX_AGE and an
+mtime/size ETag. Range and If-Range requests are honoured (Starlette's
+FileResponse for files, a single range for cached bytes).
+
+Local files go out through FileResponse, which hands the path to the server
+(http.response.pathsend, sendfile under e.g. Granian) when it supports that,
+or set MEDIA_X_ACCEL=/_media/ to answer with X-Accel-Redirect and let nginx
+send the file with sendfile (location /_media/ { internal; alias <media>/; }).
+
+With MEDIA_PROXY=1 (agents/storage.py) ticket URLs point here for MinIO
+objects too; a miss downloads the object into an on-disk LRU
+(MEDIA_DISK_CACHE_DIR, MEDIA_DISK_CACHE_MB).
+
+Content-addressed objects up to MEDIA_CACHE_OBJECT_KB (thumbnails,
+previews), local or proxied, are also kept in a per-process memory LRU
+(MEDIA_CACHE_MB), so hot dashboard images are answered without a thread
+hop, a syscall or a MinIO round trip.
+
+Dotfiles (ingest spools) and incoming/ (unvalidated direct uploads) are not
+served.
+"""
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from agents import storage
+from app.pipeline import run_stage
+
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "86400"))
+MEDIA_X_ACCEL = os.getenv("MEDIA_X_ACCEL", "")
+MEDIA_CACHE_MB = float(os.getenv("MEDIA_CACHE_MB", "64"))
+MEDIA_CACHE_OBJECT_KB = float(os.getenv("MEDIA_CACHE_OBJECT_KB", "512"))
+MEDIA_DISK_CACHE_DIR = os.getenv("MEDIA_DISK_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "civicguard-media-cache")
+MEDIA_DISK_CACHE_MB = float(os.getenv("MEDIA_DISK_CACHE_MB", "1024"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+_CONTENT_KEY = re.compile(r"^[0-9a-f]{64}(\.[a-z]+)?\.[a-z0-9]+$")
+
+router = APIRouter()
+
+
+class MemoryLRU:
+    """(bytes, mtime) by key, least recently used evicted past `max_bytes`."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key: str, data: bytes, mtime: float) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._items[key] = (data, mtime)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class DiskLRU:
+    """Downloaded MinIO objects under `directory`, least recently used
+    deleted past `max_bytes`. Each process keeps its own recency order; a
+    file another process evicted is simply downloaded again."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._items[name] = size
+            self.size += size
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest() + os.path.splitext(key)[1]
+
+    def get(self, key: str) -> Optional[str]:
+        name = self._name(key)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name not in self._items:
+                return None
+            self._items.move_to_end(name)
+        if not os.path.exists(path):
+            with self._lock:
+                self.size -= self._items.pop(name, 0)
+            return None
+        return path
+
+    def fetch(self, key: str) -> str:
+        """Path of `key` in the cache, downloading it on a miss."""
+        path = self.get(key)
+        if path is not None:
+            return path
+        name = self._name(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".dl-")
+        os.close(fd)
+        try:
+            size = storage.download(key, tmp)
+            path = os.path.join(self.directory, name)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self.size += size - self._items.pop(name, 0)
+            self._items[name] = size
+            evict = []
+            while self.size > self.max_bytes and len(self._items) > 1:
+                old, old_size = self._items.popitem(last=False)
+                self.size -= old_size
+                evict.append(old)
+        for old in evict:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+        return path
+
+
+memory_cache = MemoryLRU(int(MEDIA_CACHE_MB * 1024 * 1024))
+_disk_cache: Optional[DiskLRU] = None
+_disk_lock = threading.Lock()
+
+
+def disk_cache() -> DiskLRU:
+    global _disk_cache
+    if _disk_cache is None:
+        with _disk_lock:
+            if _disk_cache is None:
+                _disk_cache = DiskLRU(MEDIA_DISK_CACHE_DIR, int(MEDIA_DISK_CACHE_MB * 1024 * 1024))
+    return _disk_cache
+
+
+def _local_path(key: str) -> Optional[str]:
+    """Path under MEDIA_DIR, or None for keys that must not be served."""
+    parts = key.split("/")
+    if not key or any(not p or p.startswith(".") for p in parts) or parts[0] == "incoming":
+        return None
+    path = os.path.realpath(os.path.join(storage.MEDIA_DIR, key))
+    if not path.startswith(os.path.realpath(storage.MEDIA_DIR) + os.sep):
+        return None
+    return path
+
+
+def cache_headers(key: str, size: int, mtime: float) -> Dict[str, str]:
+    name = os.path.basename(key)
+    if _CONTENT_KEY.match(name):
+        etag, cache_control = f'"{name}"', IMMUTABLE
+    else:
+        etag = '"%s"' % hashlib.md5(f"{key}:{size}:{mtime}".encode(), usedforsecurity=False).hexdigest()
+        cache_control = f"public, max-age={MEDIA_MAX_AGE}"
+    return {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2)
+    tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+    return etag in tags
+
+
+def _single_range(request: Request, size: int, etag: str) -> Optional[Tuple[int, int]]:
+    """(start, end inclusive) of a satisfiable single `Range`, None to send
+    everything. Raises HTTPException(416)."""
+    header = request.headers.get("range")
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def _bytes_response(request: Request, data: bytes, headers: Dict[str, str], media_type: str) -> Response:
+    status = 200
+    span = _single_range(request, len(data), headers["ETag"])
+    if span is not None:
+        start, end = span
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        data, status = data[start:end + 1], 206
+    headers["Content-Length"] = str(len(data))
+    body = b"" if request.method == "HEAD" else data
+    return Response(body, status_code=status, headers=headers, media_type=media_type)
+
+
+def _small(path: str, st: os.stat_result, key: str) -> Optional[bytes]:
+    if st.st_size > MEDIA_CACHE_OBJECT_KB * 1024:
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    memory_cache.put(key, data, st.st_mtime)
+    return data
+
+
+def _local(path: str, key: str) -> Tuple[Optional[bytes], str, os.stat_result]:
+    """Returns: (bytes if small and immutable, path, stat)"""
+    st = os.stat(path)
+    cacheable = not MEDIA_X_ACCEL and _CONTENT_KEY.match(os.path.basename(key))
+    return (_small(path, st, key) if cacheable else None), path, st
+
+
+def _proxied(key: str) -> Tuple[Optional[bytes], str, os.stat_result]:
+    """MinIO object through the disk cache. Returns: (bytes if small, path, stat)"""
+    try:
+        path = disk_cache().fetch(key)
+        st = os.stat(path)
+    except FileNotFoundError:
+        # Evicted by a concurrent fetch between the two calls
+        path = disk_cache().fetch(key)
+        st = os.stat(path)
+    return _small(path, st, key), path, st
+
+
+@router.api_route("/media/{key:path}", methods=["GET", "HEAD"])
+async def media(key: str, request: Request):
+    path = _local_path(key)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+    # Hot objects: no syscalls, no thread hop
+    cached = memory_cache.get(key)
+    if cached is not None:
+        data, mtime = cached
+        headers = cache_headers(key, len(data), mtime)
+        if not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return _bytes_response(request, data, headers, media_type)
+
+    local = True
+    try:
+        data, path, st = await run_stage("storage", _local, path, key)
+    except FileNotFoundError:
+        if not storage.MEDIA_PROXY:
+            raise HTTPException(status_code=404, detail="Not Found")
+        local = False
+        try:
+            data, path, st = await run_stage("storage", _proxied, key)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Not Found")
+    headers = cache_headers(key, st.st_size, st.st_mtime)
+    if not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if data is not None:
+        return _bytes_response(request, data, headers, media_type)
+    if local and MEDIA_X_ACCEL:
+        headers["X-Accel-Redirect"] = MEDIA_X_ACCEL.rstrip("/") + "/" + key
+        return Response(status_code=200, headers=headers, media_type=media_type)
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=st)
@@ -0,0 +1,69 @@
+"""Executor pools for the blocking stages of the intake pipeline.
+
+Every stage that touches the network, the disk, the model or the database is
+dispatched to its own thread pool so a slow stage (e.g. a Mapbox retry loop)
+never stalls the event loop or starves the other stages. Pool sizes can be
+tuned per deployment with INTAKE_POOL_<STAGE> (e.g. INTAKE_POOL_GEOCODE=32).
+
+Stages run in a copy of the caller's contextvars (as asyncio.to_thread
+does), so the request's trace span is the parent of spans opened inside them.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Default worker counts per stage. Geocoding and storage are I/O bound and
+# mostly wait on remote services, so they get wide pools; classification is
+# CPU bound and is capped at the core count.
+_DEFAULT_SIZES = {
+    "ingest": 16,
+    "storage": 16,
+    "exif": 4,
+    "classify": max(1, os.cpu_count() or 1),
+    "geocode": 16,
+    "db": 8,
+    "queue": 4,
+}
+
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def pool_size(stage: str) -> int:
+    raw = os.getenv(f"INTAKE_POOL_{stage.upper()}")
+    try:
+        return max(1, int(raw)) if raw else _DEFAULT_SIZES.get(stage, 4)
+    except ValueError:
+        return _DEFAULT_SIZES.get(stage, 4)
+
+
+def get_pool(stage: str) -> ThreadPoolExecutor:
+    pool = _pools.get(stage)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(stage)
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=pool_size(stage), thread_name_prefix=f"intake-{stage}")
+                _pools[stage] = pool
+    return pool
+
+
+async def run_stage(stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking callable on the pool dedicated to `stage`."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(get_pool(stage), functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+def shutdown(wait: bool = True) -> None:
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for p in pools:
+        p.shutdown(wait=wait)
@@ -0,0 +1,68 @@
+"""
+Classification throughput (images/sec) vs. batch size.
+
+By default uses a stub predictor whose cost models a CPU YOLO call: a fixed
+per-call overhead (pre/post-processing, graph dispatch) plus a per-image cost.
+Pass --model to time the real ultralytics model on a directory of images.
+
+  python -m bench.classify_throughput -n 256
+  python -m bench.classify_throughput --model yolov8n.pt --images ./media
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+
+def _stub_predictor(call_ms: float, image_ms: float):
+    def predict(sources):
+        time.sleep((call_ms + image_ms * len(sources)) / 1000.0)
+        return [("pothole", "medium", 0.5)] * len(sources)
+    return predict
+
+
+def _yolo_predictor(model_path: str):
+    os.environ["YOLO_MODEL"] = model_path
+    from agents import vision
+
+    if vision.model() is None:
+        sys.exit("ultralytics / model not available")
+    return vision.classify_batch
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=256, help="images per run")
+    ap.add_argument("--sizes", default="1,2,4,8,16,32")
+    ap.add_argument("--call-ms", type=float, default=40.0, help="stub: fixed cost per predict call")
+    ap.add_argument("--image-ms", type=float, default=8.0, help="stub: cost per image")
+    ap.add_argument("--model", help="real YOLO weights instead of the stub")
+    ap.add_argument("--images", default=os.path.join(ROOT, "media"))
+    args = ap.parse_args()
+
+    if args.model:
+        predict = _yolo_predictor(args.model)
+        files = sorted(glob.glob(os.path.join(args.images, "*.jp*g")))[: args.n]
+        if not files:
+            sys.exit(f"no images in {args.images}")
+    else:
+        predict = _stub_predictor(args.call_ms, args.image_ms)
+        files = [f"img_{i}.jpg" for i in range(args.n)]
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        t0 = time.perf_counter()
+        for i in range(0, len(files), size):
+            predict(files[i:i + size])
+        wall = time.perf_counter() - t0
+        print(f"batch={size:3d} images={len(files)} wall={wall:.2f}s throughput={len(files) / wall:.1f} img/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+CPU time per photo for thumbnail/preview generation, and bytes saved.
+
+"naive" decodes the full image, applies the EXIF orientation and resizes it
+with LANCZOS once per size. "draft" is agents.derivatives.render: JPEG
+draft-mode decode at reduced scale, reduce()-then-resample, each size from
+the previous one. Both encode the same WebP + JPEG outputs.
+
+  python -m bench.derivatives
+  python -m bench.derivatives --width 4032 --height 3024 -n 10
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from PIL import Image, ImageOps  # noqa: E402
+
+from agents import derivatives  # noqa: E402
+
+
+def _photo(width: int, height: int) -> bytes:
+    """Phone-like JPEG: gradients plus textured noise, EXIF orientation 6."""
+    base = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((width, height)),
+        Image.radial_gradient("L").resize((width, height)),
+        # coarse noise survives downscaling, like real texture does
+        Image.effect_noise((width // 8, height // 8), 60).resize((width, height)),
+    ])
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buf = io.BytesIO()
+    base.save(buf, format="JPEG", quality=92, exif=exif.tobytes())
+    return buf.getvalue()
+
+
+def _naive(data: bytes):
+    out = {}
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        for name, px in derivatives.SIZES:
+            scale = px / max(img.size)
+            small = img.resize((round(img.width * scale), round(img.height * scale)), Image.Resampling.LANCZOS)
+            for ext, fmt, _ in derivatives.FORMATS:
+                out[(name, ext)] = derivatives._encode(small, fmt)
+    return out
+
+
+def _draft(data: bytes):
+    return derivatives.render(io.BytesIO(data))
+
+
+def _cpu_ms(fn, data: bytes, n: int):
+    fn(data)  # warm up
+    t0 = time.process_time()
+    for _ in range(n):
+        out = fn(data)
+    return (time.process_time() - t0) / n * 1000, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--width", type=int, default=4032)
+    ap.add_argument("--height", type=int, default=3024)
+    ap.add_argument("-n", type=int, default=5)
+    args = ap.parse_args()
+
+    data = _photo(args.width, args.height)
+    print(f"original: {args.width}x{args.height}, {len(data) / 1024:.0f} KiB")
+    for label, fn in (("naive", _naive), ("draft", _draft)):
+        ms, out = _cpu_ms(fn, data, args.n)
+        print(f"{label:6} {ms:8.1f} ms CPU per photo")
+    for (name, ext), blob in sorted(out.items()):
+        print(f"  {name:8} {ext:5} {len(blob) / 1024:7.1f} KiB  ({len(data) / len(blob):5.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
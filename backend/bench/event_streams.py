@@ -0,0 +1,196 @@
+"""
+Idle SSE connections, fan-out latency and slow consumers against a real
+uvicorn server (a child process of this script).
+
+1. --idle clients each open GET /api/tickets/{tid}/events for their own
+   ticket and sit there: server RSS per connection.
+2. --events status changes for random watched tickets are published into
+   the server (ticket_events.publish, as a repo write does): time from
+   publish to the client reading the frame.
+3. --slow feed subscribers (GET /api/events) stop reading while --flood
+   events are published: server RSS stays bounded and they're dropped as
+   overflowed instead of buffering without limit.
+
+  python -m bench.event_streams
+  python -m bench.event_streams --idle 5000 --slow 200 --flood 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+
+def _serve(port: int) -> None:
+    """Child: uvicorn on `port`; JSON lines on stdin are published as events."""
+    import uvicorn
+
+    import app.main as main
+    from db import ticket_events
+
+    def feed():
+        for line in sys.stdin:
+            cmd = json.loads(line)
+            if cmd.get("rows"):
+                ticket_events.publish(cmd["rows"], ["status"])
+
+    threading.Thread(target=feed, daemon=True).start()
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+
+
+def _rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _seed(n):
+    from db.models import Base, Ticket
+    from db.session import engine
+
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    rows = [{"id": str(uuid.uuid4()), "iclass": "pothole", "status": "CREATED", "lat": 13.0, "lng": 80.0,
+             "created_at": now, "updated_at": now} for _ in range(n)]
+    with engine.begin() as conn:
+        conn.execute(Ticket.__table__.insert(), rows)
+    return rows
+
+
+async def _open(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 20)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    assert b" 200 " in head.split(b"\r\n", 1)[0], head
+    return reader, writer
+
+
+async def _get_json(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.0\r\nHost: bench\r\n\r\n".encode())
+    data = await reader.read()
+    writer.close()
+    return json.loads(data.split(b"\r\n\r\n", 1)[1])
+
+
+async def _chunk(reader) -> bytes:
+    # The stream is chunked; each SSE frame the server yields is one chunk
+    size = int((await reader.readline()).strip(), 16)
+    data = await reader.readexactly(size)
+    await reader.readexactly(2)
+    return data
+
+
+async def _watch(reader, sent, latencies):
+    """Record publish -> read latency for every ticket frame."""
+    while True:
+        frame = await _chunk(reader)
+        if frame.startswith(b"event: ticket"):
+            ev = json.loads(frame.split(b"data: ", 1)[1])
+            key = ev.get("authority_ticket_id")
+            if key in sent:
+                latencies.append(time.perf_counter() - sent[key])
+
+
+async def _run(args, port, child, rows):
+    def publish(batch):
+        child.stdin.write((json.dumps({"rows": batch}) + "\n").encode())
+        child.stdin.flush()
+
+    base = _rss_kib(child.pid)
+    conns = []
+    for i in range(0, args.idle, 500):
+        conns += await asyncio.gather(*(_open(port, f"/api/tickets/{r['id']}/events") for r in rows[i:i + 500]))
+    await asyncio.sleep(1.0)
+    idle = _rss_kib(child.pid)
+    stats = await _get_json(port, "/debug/events")
+    print(f"idle:     {stats['subscribers']} SSE connections, server RSS {base / 1024:.0f} -> {idle / 1024:.0f} MiB "
+          f"({(idle - base) / max(1, args.idle):.1f} KiB per connection)")
+
+    sent, latencies = {}, []
+    watchers = [asyncio.create_task(_watch(r, sent, latencies)) for r, _ in conns]
+    rnd = random.Random(3)
+    for i in range(args.events):
+        row = dict(rnd.choice(rows[:args.idle]), status="FILED", authority_ticket_id=f"e{i}")
+        sent[row["authority_ticket_id"]] = time.perf_counter()
+        publish([row])
+        await asyncio.sleep(1.0 / args.rate)
+    await asyncio.sleep(1.0)
+    lat = sorted(latencies)
+    if lat:
+        print(f"fan-out:  {len(lat)}/{args.events} events received, publish -> client p50={lat[len(lat) // 2] * 1000:.1f}ms "
+              f"p99={lat[int(len(lat) * 0.99) - 1] * 1000:.1f}ms")
+
+    slow = await asyncio.gather(*(_open(port, "/api/events?status=FILED") for _ in range(args.slow)))
+    before = _rss_kib(child.pid)
+    payload = "x" * 200
+    for i in range(0, args.flood, 100):
+        publish([dict(rows[0], status="FILED", authority_ticket_id=f"f{j}", address=payload) for j in range(i, i + 100)])
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(2.0)
+    after = _rss_kib(child.pid)
+    stats = await _get_json(port, "/debug/events")
+    print(f"slow:     {args.slow} non-reading feed clients, {args.flood} events: server RSS {before / 1024:.0f} -> "
+          f"{after / 1024:.0f} MiB, overflowed {stats['overflows']}, feeds left {stats['feeds']}")
+
+    for t in watchers:
+        t.cancel()
+    for _, w in conns + list(slow):
+        w.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--idle", type=int, default=2000)
+    ap.add_argument("--events", type=int, default=500)
+    ap.add_argument("--rate", type=float, default=200, help="events per second in step 2")
+    ap.add_argument("--slow", type=int, default=100)
+    ap.add_argument("--flood", type=int, default=10000)
+    ap.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.serve:
+        return _serve(args.serve)
+
+    tmp = tempfile.mkdtemp(prefix="civicguard-bench-")
+    os.environ["DB_URL"] = f"sqlite:///{os.path.join(tmp, 'events.db')}"
+    os.environ["TICKET_CACHE"] = "none"  # keep the read cache out of the RSS numbers
+    rows = _seed(args.idle)
+    for r in rows:
+        r["created_at"] = r["updated_at"] = r["created_at"].isoformat()
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    child = subprocess.Popen([sys.executable, "-m", "bench.event_streams", "--serve", str(port)],
+                             cwd=ROOT, stdin=subprocess.PIPE, env=os.environ.copy())
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.2)
+        asyncio.run(_run(args, port, child, rows))
+    finally:
+        child.terminate()
+        child.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Rows/sec and peak RSS of db/export.py against a large tickets table (SQLite).
+
+Each case runs in its own process writing to /dev/null, so peak RSS
+(ru_maxrss) is the export's alone:
+
+  naive          the tickets_dump.json way: all rows as dicts, one json.dump
+                 (first --naive-rows rows only; it grows with the table)
+  ndjson, csv    db/export.py, with and without --gzip
+  parquet        db/export.py (pyarrow, zstd)
+
+The seeded database is kept at --db and reused when it has enough rows.
+
+  python -m bench.export
+  python -m bench.export --rows 500000 --naive-rows 500000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+CASES = [("naive", False), ("ndjson", False), ("ndjson", True), ("csv", False), ("csv", True), ("parquet", False)]
+
+
+def _seed(path: str, n: int) -> None:
+    os.environ["DB_URL"] = f"sqlite:///{path}"
+    from db.models import Base
+    from db.session import engine
+
+    Base.metadata.create_all(bind=engine)
+    conn = sqlite3.connect(path)
+    have = conn.execute("SELECT count(*) FROM tickets").fetchone()[0]
+    if have >= n:
+        return
+    rnd = random.Random(11)
+    classes = ["pothole", "garbage", "streetlight", "water_leak", "graffiti", "fallen_tree"]
+    statuses = ["CREATED", "FILING", "FILED", "FAILED", "RESOLVED"]
+    start = datetime(2023, 1, 1)
+    cols = ("id", "iclass", "severity", "confidence", "lat", "lng", "address", "status", "authority",
+            "authority_ticket_id", "contact", "media_url", "thumb_url", "preview_url", "content_hash", "cell",
+            "created_at", "updated_at")
+    sql = f"INSERT INTO tickets ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+    print(f"seeding {n - have} rows into {path} ...", file=sys.stderr)
+    for lo in range(have, n, 50000):
+        batch = []
+        for i in range(lo, min(n, lo + 50000)):
+            h = uuid.uuid4().hex * 2
+            ts = (start + timedelta(seconds=i * 6)).isoformat(" ")
+            batch.append((
+                str(uuid.uuid4()), rnd.choice(classes), rnd.choice(("low", "medium", "high")), rnd.random(),
+                12.9 + rnd.random() / 10, 77.5 + rnd.random() / 10, f"{rnd.randint(1, 999)} MG Road, Bengaluru",
+                rnd.choice(statuses), "BBMP", f"BBMP-{i}", None, f"http://localhost:9000/uploads/{h}.jpg",
+                f"/media/{h}.thumb.webp", f"/media/{h}.preview.webp", h, "tdr1" + h[:5], ts, ts,
+            ))
+        conn.executemany(sql, batch)
+        conn.commit()
+    conn.close()
+
+
+def _case(fmt: str, gzip: bool, naive_rows: int) -> None:
+    """Child: run one export to /dev/null, print {"rows", "bytes", "seconds"}."""
+    t0 = time.perf_counter()
+    if fmt == "naive":
+        from db.models import Ticket
+        from db.session import get_session
+
+        with get_session() as s:
+            tickets = [t.as_dict() for t in s.query(Ticket).order_by(Ticket.created_at).limit(naive_rows)]
+        with open(os.devnull, "w") as out:
+            body = json.dumps(tickets, default=str)
+            out.write(body)
+        rows, size = len(tickets), len(body)
+    else:
+        from db import export
+
+        rows = size = 0
+        with open(os.devnull, "wb") as out:
+            for chunk in export.stream(fmt, gzip=gzip):
+                out.write(chunk)
+                size += len(chunk)
+        from db.session import engine
+
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql("SELECT count(*) FROM tickets").scalar()
+    print(json.dumps({"rows": rows, "bytes": size, "seconds": time.perf_counter() - t0}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=5_000_000)
+    ap.add_argument("--naive-rows", type=int, default=500_000)
+    ap.add_argument("--db", default=os.path.join("/tmp", "civicguard-export-bench.db"))
+    ap.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.case:
+        return _case(args.case[0], args.case[1] == "gz", args.naive_rows)
+
+    _seed(args.db, args.rows)
+    env = {**os.environ, "DB_URL": f"sqlite:///{args.db}"}
+    for fmt, gz in CASES:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "bench.export", "--case", fmt, "gz" if gz else "-",
+             "--naive-rows", str(args.naive_rows)],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE,
+        )
+        out = proc.stdout.read()
+        _, status, usage = os.wait4(proc.pid, 0)
+        if status != 0:
+            print(f"{fmt:8} failed ({status})")
+            continue
+        r = json.loads(out)
+        name = fmt + ("+gzip" if gz else "")
+        print(f"{name:12} {r['rows']:>9} rows  {r['rows'] / r['seconds']:>9,.0f} rows/s  "
+              f"peak RSS {usage.ru_maxrss / 1024:7.0f} MiB  output {r['bytes'] / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Drain a backlog of filing jobs and time the ticket-status writes.
+
+"old" reproduces the former job body: TicketRepo.get, update to FILING and
+update to FILED, each its own session and commit. "new" is the current
+workers.jobs.file_to_authority: a CAS CREATED->FILING transition and a FILED
+transition that is coalesced across jobs when --coalesce-ms > 0. Routing
+and the outbound filing call are stubbed so only the DB work is measured.
+
+  python -m bench.filing_drain -n 10000
+  python -m bench.filing_drain -n 10000 --rq      # through an RQ SimpleWorker on fakeredis
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="civicguard-bench-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'drain.db')}"
+
+from sqlalchemy import event  # noqa: E402
+
+import agents.routing  # noqa: E402
+import fakeredis  # noqa: E402
+from db.models import Base  # noqa: E402
+from db.repository import TicketRepo  # noqa: E402
+from db.session import engine  # noqa: E402
+from workers import jobs  # noqa: E402
+from workers.coalesce import StatusCoalescer  # noqa: E402
+
+ROUTE = {"authority_name": "Roads Dept", "endpoint_type": "api", "endpoint_value": "http://authority.invalid/file"}
+agents.routing.resolve = lambda iclass, lat=None, lng=None: ROUTE
+jobs._file_via_api = lambda url, payload: None
+jobs.redis = fakeredis.FakeStrictRedis()  # idempotency keys
+
+_statements = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(*_):
+    global _statements
+    _statements += 1
+
+
+def old_file_to_authority(ticket_id, file_url, iclass, address, contact):
+    t = TicketRepo.get(ticket_id)
+    if not t:
+        return
+    route = agents.routing.resolve(iclass)
+    TicketRepo.update(ticket_id, {"status": "FILING", "authority": route.get("authority_name")})
+    jobs._file_via_api(route["endpoint_value"], {})
+    TicketRepo.update(ticket_id, {"status": "FILED", "authority_ticket_id": f"CG-{ticket_id[:8]}"})
+    return {"ok": True}
+
+
+def _seed(n):
+    ids = [str(uuid.uuid4()) for _ in range(n)]
+    TicketRepo.create_many([{"id": i, "iclass": "pothole", "address": "Somewhere"} for i in ids])
+    return ids
+
+
+def _drain_direct(fn, ids):
+    for tid in ids:
+        fn(tid, "http://x/p.jpg", "pothole", "Somewhere", None)
+
+
+def _drain_rq(fn_path, ids):
+    import fakeredis
+    from rq import Queue, SimpleWorker
+
+    conn = fakeredis.FakeStrictRedis()
+    q = Queue("file_jobs", connection=conn)
+    for tid in ids:
+        q.enqueue(fn_path, tid, "http://x/p.jpg", "pothole", "Somewhere", None)
+    SimpleWorker([q], connection=conn).work(burst=True, logging_level="WARNING")
+
+
+def main():
+    global _statements
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=10000)
+    ap.add_argument("--coalesce-ms", type=float, default=50)
+    ap.add_argument("--rq", action="store_true")
+    args = ap.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    variants = [
+        ("old", old_file_to_authority, "bench.filing_drain.old_file_to_authority", 0),
+        ("new", jobs.file_to_authority, "workers.jobs.file_to_authority", 0),
+        (f"new+{args.coalesce_ms:g}ms", jobs.file_to_authority, "workers.jobs.file_to_authority", args.coalesce_ms),
+    ]
+    for name, fn, path, window in variants:
+        ids = _seed(args.n)
+        jobs.status_updates = StatusCoalescer(window_ms=window)
+        _statements = 0
+        t0 = time.perf_counter()
+        if args.rq:
+            _drain_rq(path, ids)
+        else:
+            _drain_direct(fn, ids)
+        jobs.status_updates.close()
+        dt = time.perf_counter() - t0
+        filed = TicketRepo.count(status="FILED")
+        print(f"{name:12} {args.n / dt:8.0f} jobs/s  {dt:6.2f}s  {_statements / args.n:5.2f} stmts/job  filed_total={filed}")
+
+
+if __name__ == "__main__":
+    main()
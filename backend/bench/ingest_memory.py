@@ -0,0 +1,89 @@
+"""
+Peak Python-heap memory per upload: old read-everything path vs single-pass spool.
+
+"old" reproduces the former /upload handler: read the whole body, then
+Image.verify, SHA-256 and exifread each over their own BytesIO copy.
+"spool" is agents.ingest: one chunked pass (hash + header + size check) to a
+spool file, validation and EXIF from the retained header.
+
+  python -m bench.ingest_memory --mb 8
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+import exifread  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from agents.ingest import spool_upload  # noqa: E402
+
+
+def _make_jpeg(mb: float) -> str:
+    side = 512
+    while True:
+        img = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=95)
+        if buf.tell() >= mb * 1024 * 1024:
+            break
+        side = int(side * 1.4)
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    with os.fdopen(fd, "wb") as f:
+        f.write(buf.getvalue())
+    return path
+
+
+def _old(fileobj):
+    data = fileobj.read()
+    Image.open(io.BytesIO(data)).verify()
+    hashlib.sha256(data).hexdigest()
+    exifread.process_file(io.BytesIO(data), details=False)
+
+
+def _new(fileobj):
+    sp = spool_upload(fileobj, "bench.jpg", "image/jpeg", max_bytes=1 << 40)
+    sp.validate_image()
+    sp.gps()
+    sp.discard()
+
+
+def _measure(fn, path):
+    with open(path, "rb") as f:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        fn(f)
+        dt = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak, dt
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=8.0, help="approximate upload size")
+    args = ap.parse_args()
+
+    path = _make_jpeg(args.mb)
+    try:
+        size = os.path.getsize(path)
+        print(f"upload size: {size / (1024 * 1024):.1f} MB")
+        for name, fn in (("old", _old), ("spool", _new)):
+            peak, dt = _measure(fn, path)
+            print(f"{name:6} peak={peak / (1024 * 1024):7.2f} MB  time={dt * 1000:.0f} ms")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Load benchmark for POST /api/intake.
+
+Fires N concurrent uploads at the ASGI app in-process (no network) with the
+geocoder replaced by a blocking sleep that mimics a slow Mapbox round trip,
+then reports p50/p99 latency and throughput.
+
+  python -m bench.intake_load                 # staged pools (current)
+  python -m bench.intake_load --inline        # old behaviour: every stage inline on the loop
+  python -m bench.intake_load -n 200 -c 50 --geocode-ms 300
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="civicguard-bench-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'bench.db')}"
+
+import httpx  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+def _jpeg() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), color=(90, 90, 90)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+async def _run(total: int, concurrency: int, geocode_ms: int, inline: bool):
+    import app.main as main
+    from db import schema
+
+    schema.upgrade()
+
+    def slow_geocode(lat, lng):
+        time.sleep(geocode_ms / 1000.0)
+        return "Bench Street"
+
+    import fakeredis
+    from workers.outbox import OutboxRelay
+
+    main.reverse_geocode = slow_geocode
+    main.outbox_relay = OutboxRelay(fakeredis.FakeStrictRedis())
+    if inline:
+        async def _inline(stage, fn, *args, **kwargs):
+            return fn(*args, **kwargs)
+        main.run_stage = _inline
+
+    body = _jpeg()
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post(
+                    "/api/intake",
+                    files={"image": (f"pothole_{i}.jpg", body, "image/jpeg")},
+                    data={"lat": "13.08", "lng": "80.27"},
+                )
+                latencies.append(time.perf_counter() - t0)
+                r.raise_for_status()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        wall = time.perf_counter() - t0
+
+    main.shutdown_pools()
+    return latencies, wall
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", "--requests", type=int, default=200)
+    ap.add_argument("-c", "--concurrency", type=int, default=50)
+    ap.add_argument("--geocode-ms", type=int, default=200)
+    ap.add_argument("--inline", action="store_true", help="run stages inline on the event loop (pre-pipeline behaviour)")
+    args = ap.parse_args()
+
+    lat, wall = asyncio.run(_run(args.requests, args.concurrency, args.geocode_ms, args.inline))
+    mode = "inline" if args.inline else "pooled"
+    print(f"mode={mode} requests={args.requests} concurrency={args.concurrency} geocode={args.geocode_ms}ms")
+    print(f"  p50={_percentile(lat, 50) * 1000:.1f}ms p99={_percentile(lat, 99) * 1000:.1f}ms "
+          f"mean={statistics.mean(lat) * 1000:.1f}ms")
+    print(f"  wall={wall:.2f}s throughput={args.requests / wall:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Deep-page latency for /api/tickets listing on a synthetic SQLite table.
+
+"offset" is the former query shape: full ORM rows, COUNT(*) and OFFSET/LIMIT.
+"keyset" walks to the same depth with next_cursor (timed on the final page
+only), with and without a field projection and the exact count.
+
+  python -m bench.list_pages -n 100000
+  python -m bench.list_pages -n 1000000 --depths 100,1000,10000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="civicguard-bench-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'list.db')}"
+
+from db import stats  # noqa: E402
+from db.models import Base, Ticket  # noqa: E402
+from db.repository import TicketRepo  # noqa: E402
+from db.session import engine, get_session  # noqa: E402
+
+CLASSES = ["pothole", "garbage", "streetlight", "water_leak", "illegal_parking", "stray_animals"]
+STATUSES = ["CREATED", "FILING", "FILED", "RESOLVED"]
+PAGE = 50
+
+
+def _seed(n):
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(3)
+    start = datetime(2023, 1, 1)
+    t0 = time.perf_counter()
+    batch = []
+    with engine.begin() as conn:
+        for i in range(n):
+            ts = start + timedelta(seconds=i * 30)
+            batch.append({
+                "id": str(uuid.uuid4()), "iclass": rnd.choice(CLASSES), "status": rnd.choice(STATUSES),
+                "lat": 13 + rnd.random(), "lng": 80 + rnd.random(), "address": "Somewhere, Chennai",
+                "media_url": "http://localhost:8000/media/x.jpg", "created_at": ts, "updated_at": ts,
+            })
+            if len(batch) == 20000:
+                conn.execute(Ticket.__table__.insert(), batch)
+                batch.clear()
+        if batch:
+            conn.execute(Ticket.__table__.insert(), batch)
+    stats.rebuild()  # counters behind count=cached
+    print(f"seeded {n} rows in {time.perf_counter() - t0:.1f}s")
+
+
+def _old_list(offset, status=None):
+    db = get_session()
+    try:
+        q = db.query(Ticket)
+        if status:
+            q = q.filter(Ticket.status == status)
+        total = q.count()
+        rows = q.order_by(Ticket.created_at.desc()).offset(offset).limit(PAGE).all()
+        return {"count": total, "items": [r.as_dict() for r in rows]}
+    finally:
+        db.close()
+
+
+def _cursor_at(page_no, status=None):
+    cursor = None
+    for _ in range(page_no):
+        cursor = TicketRepo.list(limit=PAGE, status=status, cursor=cursor, fields=["id"], count="none")["next_cursor"]
+    return cursor
+
+
+def _time(fn, reps):
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=100_000)
+    ap.add_argument("--depths", default="1,100,1000", help="page numbers to time")
+    ap.add_argument("--status", default=None, help="optional status filter")
+    ap.add_argument("--reps", type=int, default=5)
+    args = ap.parse_args()
+
+    _seed(args.n)
+    for depth in (int(d) for d in args.depths.split(",")):
+        if depth * PAGE >= args.n:
+            continue
+        cursor = _cursor_at(depth, args.status)
+        off = _time(lambda: _old_list(depth * PAGE, args.status), args.reps)
+        full = _time(lambda: TicketRepo.list(limit=PAGE, status=args.status, cursor=cursor), args.reps)
+        lean = _time(lambda: TicketRepo.list(limit=PAGE, status=args.status, cursor=cursor,
+                                             fields=["id", "status", "lat", "lng"], count="cached"), args.reps)
+        print(f"page {depth:>6}: offset+count {off:8.2f}ms  keyset+count {full:8.2f}ms  keyset+fields,cached {lean:6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Repeated dashboard image loads against /media, in-process ASGI.
+
+A "dashboard load" fetches --thumbs thumbnails (~--kb KiB each) --loads
+times with --concurrency requests in flight.
+
+  static         the former StaticFiles mount (no Cache-Control)
+  media          app/media.py on local files, memory LRU off
+  media-hot      same with the memory LRU
+  proxy-disk     app/media.py with MEDIA_PROXY=1, memory LRU off: repeat
+                 loads come from the disk cache
+  proxy-hot      same with the memory LRU
+
+For the proxy cases the first visit downloads every object (stubbed MinIO
+with --minio-ms of latency per object); its time is reported as "first".
+
+Each is run as full GETs and as revalidating GETs (If-None-Match, what a
+browser does for a cached response without a long max-age). Immutable
+responses from app/media.py skip the revalidation entirely on a repeat
+visit, so its requests per repeat load are 0.
+
+  python -m bench.media_serving
+  python -m bench.media_serving --thumbs 120 --loads 20 --minio-ms 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+# Importing the app package imports app.main, which opens the database
+_TMP = tempfile.mkdtemp(prefix="civicguard-bench-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'media.db')}"
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.staticfiles import StaticFiles  # noqa: E402
+
+from agents import storage  # noqa: E402
+from app import media  # noqa: E402
+from app.pipeline import shutdown as shutdown_pools  # noqa: E402
+
+
+def _seed(directory: str, n: int, kb: float):
+    keys = []
+    for i in range(n):
+        data = os.urandom(int(kb * 1024))
+        key = hashlib.sha256(data).hexdigest() + ".thumb.webp"
+        with open(os.path.join(directory, key), "wb") as f:
+            f.write(data)
+        keys.append(key)
+    return keys
+
+
+async def _loads(app, keys, loads, concurrency, revalidate):
+    sem = asyncio.Semaphore(concurrency)
+    etags = {}
+    nbytes = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(key, conditional):
+            nonlocal nbytes
+            async with sem:
+                headers = {"If-None-Match": etags[key]} if conditional else {}
+                r = await client.get(f"/media/{key}", headers=headers)
+                assert r.status_code in (200, 304), r.status_code
+                etags[key] = r.headers.get("etag")
+                nbytes += len(r.content)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(k, False) for k in keys))  # first visit
+        first = time.perf_counter() - t0
+        nbytes = 0
+        t0 = time.perf_counter()
+        for _ in range(loads):
+            await asyncio.gather(*(one(k, revalidate) for k in keys))
+        wall = time.perf_counter() - t0
+    return first, wall, nbytes
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--thumbs", type=int, default=60)
+    ap.add_argument("--kb", type=float, default=25)
+    ap.add_argument("--loads", type=int, default=30)
+    ap.add_argument("-c", "--concurrency", type=int, default=6, help="a browser's connections per host")
+    ap.add_argument("--minio-ms", type=float, default=3.0)
+    args = ap.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    media_dir = tempfile.mkdtemp(prefix="civicguard-media-bench-")
+    remote_dir = tempfile.mkdtemp(prefix="civicguard-minio-bench-")
+    keys = _seed(media_dir, args.thumbs, args.kb)
+    for k in keys:
+        shutil.copy(os.path.join(media_dir, k), os.path.join(remote_dir, k))
+
+    def download(key, path):
+        time.sleep(args.minio_ms / 1000)
+        shutil.copy(os.path.join(remote_dir, key), path)
+        return os.path.getsize(path)
+
+    storage.MEDIA_DIR = media_dir
+    storage.download = download
+    static_app = FastAPI()
+    static_app.mount("/media", StaticFiles(directory=media_dir), name="media")
+    media_app = FastAPI()
+    media_app.include_router(media.router)
+
+    def proxy(hot):
+        storage.MEDIA_DIR = tempfile.mkdtemp(prefix="civicguard-empty-")  # nothing local
+        storage.MEDIA_PROXY = True
+        cache_dir = tempfile.mkdtemp(prefix="civicguard-cache-bench-")
+        media.memory_cache = media.MemoryLRU(64 << 20 if hot else 0)
+        media._disk_cache = media.DiskLRU(cache_dir, 1 << 30)
+
+    def local(hot):
+        storage.MEDIA_DIR = media_dir
+        storage.MEDIA_PROXY = False
+        media.memory_cache = media.MemoryLRU(64 << 20 if hot else 0)
+
+    cases = [
+        ("static", static_app, lambda: None),
+        ("media", media_app, lambda: local(False)),
+        ("media-hot", media_app, lambda: local(True)),
+        ("proxy-disk", media_app, lambda: proxy(False)),
+        ("proxy-hot", media_app, lambda: proxy(True)),
+    ]
+    total = args.thumbs * args.loads
+    for name, app, setup in cases:
+        for revalidate in (False, True):
+            setup()
+            first, wall, nbytes = asyncio.run(_loads(app, keys, args.loads, args.concurrency, revalidate))
+            kind = "revalidate" if revalidate else "full GET"
+            print(f"{name:11} {kind:10} {total / wall:8.0f} req/s  {nbytes / wall / 1e6:8.1f} MB/s  "
+                  f"{wall / args.loads * 1000:7.1f} ms per load  (first {first * 1000:.0f} ms)")
+    print(f"requests per repeat load: static {args.thumbs} (revalidated), media 0 (immutable, browser cache)")
+    shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cost of one metrics observation (agents/metrics.py), single-threaded and
+with contending threads, against an empty loop of the same shape.
+
+  python -m bench.metrics_overhead
+  python -m bench.metrics_overhead -n 1000000 --threads 8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from agents import metrics  # noqa: E402
+
+
+def _per_op(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=500000)
+    ap.add_argument("--threads", type=int, default=4)
+    args = ap.parse_args()
+
+    reg = metrics.Registry()
+    hist = reg.histogram("bench_seconds", "bench", ["stage"])
+    ctr = reg.counter("bench_total", "bench", ["provider", "reason"])
+    child = hist.labels("geocode")
+
+    def timer():
+        with child.time():
+            pass
+
+    cases = [
+        ("baseline (empty call)", lambda: None),
+        ("histogram child.observe", lambda: child.observe(0.012)),
+        ("histogram .labels().observe", lambda: hist.labels("geocode").observe(0.012)),
+        ("counter .labels().inc", lambda: ctr.labels("mapbox", "request").inc()),
+        ("timer context manager", timer),
+    ]
+    base = None
+    for name, fn in cases:
+        per = _per_op(fn, args.n)
+        base = per if base is None else base
+        print(f"{name:30} {per * 1e9:8.0f} ns/op   (+{(per - base) * 1e9:.0f} ns over baseline)")
+
+    # Same series from several threads: lock contention under the GIL
+    def worker():
+        for _ in range(args.n // args.threads):
+            child.observe(0.012)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    per = (time.perf_counter() - t0) / (args.n // args.threads * args.threads)
+    print(f"{f'observe, {args.threads} threads':30} {per * 1e9:8.0f} ns/op")
+
+    t0 = time.perf_counter()
+    text = reg.render()
+    print(f"render: {(time.perf_counter() - t0) * 1e3:.2f} ms, {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Radius-query benchmark over synthetic tickets spread across a ~50 km city.
+
+Times the in-memory GridIndex and, with --db, TicketRepo.nearby on a SQLite
+table with the indexed geohash `cell` column (same query path as
+/api/tickets/nearby).
+
+  python -m bench.nearby -n 1000000
+  python -m bench.nearby -n 1000000 --db
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="civicguard-bench-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'nearby.db')}"
+
+from agents.spatial import GridIndex, geohash  # noqa: E402
+
+CITY = (13.0827, 80.2707)
+SPAN = 0.45  # degrees, ~50 km
+CLASSES = ["pothole", "garbage", "streetlight", "water_leak", "illegal_parking", "stray_animals"]
+
+
+def _points(n, seed=7):
+    rnd = random.Random(seed)
+    for _ in range(n):
+        yield (
+            CITY[0] + rnd.uniform(-SPAN / 2, SPAN / 2),
+            CITY[1] + rnd.uniform(-SPAN / 2, SPAN / 2),
+            rnd.choice(CLASSES),
+        )
+
+
+def _queries(k, seed=11):
+    rnd = random.Random(seed)
+    return [(CITY[0] + rnd.uniform(-SPAN / 3, SPAN / 3), CITY[1] + rnd.uniform(-SPAN / 3, SPAN / 3)) for _ in range(k)]
+
+
+def _report(label, times, hits):
+    times = sorted(times)
+    print(f"  {label:18} p50={times[len(times) // 2] * 1000:.3f}ms p99={times[int(len(times) * 0.99) - 1] * 1000:.3f}ms "
+          f"mean_hits={statistics.mean(hits):.1f}")
+
+
+def bench_grid(n, radii, k):
+    grid = GridIndex(cell_m=100)
+    t0 = time.perf_counter()
+    for i, (lat, lng, ic) in enumerate(_points(n)):
+        grid.add(i, lat, lng, ic)
+    print(f"grid: indexed {n} points in {time.perf_counter() - t0:.1f}s")
+    for r in radii:
+        times, hits = [], []
+        for lat, lng in _queries(k):
+            t0 = time.perf_counter()
+            res = grid.query(lat, lng, r)
+            times.append(time.perf_counter() - t0)
+            hits.append(len(res))
+        _report(f"radius={r:g}m", times, hits)
+
+
+def bench_db(n, radii, k):
+    from db.models import Base, Ticket
+    from db.repository import TicketRepo
+    from db.session import engine
+
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    t0 = time.perf_counter()
+    batch = []
+    with engine.begin() as conn:
+        for lat, lng, ic in _points(n):
+            batch.append({
+                "id": str(uuid.uuid4()), "iclass": ic, "lat": lat, "lng": lng,
+                "cell": geohash(lat, lng), "status": "CREATED", "created_at": now, "updated_at": now,
+            })
+            if len(batch) == 20000:
+                conn.execute(Ticket.__table__.insert(), batch)
+                batch.clear()
+        if batch:
+            conn.execute(Ticket.__table__.insert(), batch)
+    print(f"db: inserted {n} rows in {time.perf_counter() - t0:.1f}s")
+    for r in radii:
+        times, hits = [], []
+        for lat, lng in _queries(k):
+            t0 = time.perf_counter()
+            res = TicketRepo.nearby(lat, lng, r, limit=500)
+            times.append(time.perf_counter() - t0)
+            hits.append(len(res))
+        _report(f"radius={r:g}m", times, hits)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=1_000_000)
+    ap.add_argument("-k", type=int, default=500, help="queries per radius")
+    ap.add_argument("--radii", default="30,100,500")
+    ap.add_argument("--db", action="store_true", help="also benchmark the SQL geohash index")
+    args = ap.parse_args()
+    radii = [float(r) for r in args.radii.split(",")]
+    bench_grid(args.n, radii, args.k)
+    if args.db:
+        bench_db(args.n, radii, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Connection reuse / latency benchmark for agents.outbound against a local stub.
+
+Compares bare `requests.get` (new TCP connection per call, as geo.py and
+jobs.py used to do) with the pooled outbound client.
+
+  python -m bench.outbound -n 500
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+import requests  # noqa: E402
+
+from agents import outbound  # noqa: E402
+from bench.stub_server import StubServer  # noqa: E402
+
+
+def _measure(label, n, call):
+    lat = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        call()
+        lat.append(time.perf_counter() - t0)
+    lat.sort()
+    print(f"{label:8} mean={statistics.mean(lat) * 1e3:.3f}ms p50={lat[len(lat) // 2] * 1e3:.3f}ms "
+          f"p99={lat[int(len(lat) * 0.99) - 1] * 1e3:.3f}ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=500)
+    args = ap.parse_args()
+
+    with StubServer() as stub:
+        url = stub.url + "/reverse"
+        _measure("bare", args.n, lambda: requests.get(url, timeout=5))
+        bare_conns = stub.connections
+        _measure("pooled", args.n, lambda: outbound.request("bench", "GET", url, timeout=5))
+        pooled_conns = stub.connections - bare_conns
+    print(f"connections: bare={bare_conns} pooled={pooled_conns} (requests={args.n} each)")
+
+
+if __name__ == "__main__":
+    main()
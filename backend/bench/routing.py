@@ -0,0 +1,113 @@
+"""
+Routing lookups/sec with a synthetic city of 500 wards x 20 issue classes.
+
+Wards are jittered quadrilaterals on a 25x20 grid; routing.csv has one row
+per (class, ward). Compares the former linear csv scan with the compiled
+(class, ward) table, and full resolution from coordinates through the ward
+polygon index.
+
+  python -m bench.routing
+  python -m bench.routing --wards 500 --classes 20 -n 200000
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from agents.routing import Router  # noqa: E402
+
+ORIGIN = (12.9, 80.1)  # lat, lng
+CELL = 0.02  # degrees per ward
+
+
+def _city(tmp, n_wards, n_classes, seed=9):
+    rnd = random.Random(seed)
+    cols = 25
+    rows = -(-n_wards // cols)
+    # Shared jittered grid vertices so neighbouring wards tile without gaps
+    verts = {(i, j): (ORIGIN[1] + i * CELL + rnd.uniform(-0.3, 0.3) * CELL * (0 < i < cols),
+                      ORIGIN[0] + j * CELL + rnd.uniform(-0.3, 0.3) * CELL * (0 < j < rows))
+             for i in range(cols + 1) for j in range(rows + 1)}
+    features, names = [], []
+    for w in range(n_wards):
+        i, j = w % cols, w // cols
+        ring = [verts[(i, j)], verts[(i + 1, j)], verts[(i + 1, j + 1)], verts[(i, j + 1)], verts[(i, j)]]
+        names.append(f"Ward-{w + 1}")
+        features.append({"type": "Feature", "properties": {"name": names[-1]},
+                         "geometry": {"type": "Polygon", "coordinates": [[list(p) for p in ring]]}})
+    classes = [f"class_{c}" for c in range(n_classes)]
+    csv_path = os.path.join(tmp, "routing.csv")
+    with open(csv_path, "w", newline="") as f:
+        wr = csv.writer(f)
+        wr.writerow(["class", "ward", "authority_name", "endpoint_type", "endpoint_value"])
+        for ward in names:
+            for c in classes:
+                wr.writerow([c, ward, f"{c} dept {ward}", "email", f"{c}.{ward}@example.com".lower()])
+    wards_path = os.path.join(tmp, "wards.geojson")
+    with open(wards_path, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    bounds = (ORIGIN[0], ORIGIN[0] + rows * CELL, ORIGIN[1], ORIGIN[1] + cols * CELL)
+    return csv_path, wards_path, names, classes, bounds
+
+
+def _old_lookup(path):
+    # Former agents.routing: lru_cached csv rows, normalized on every call
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    def lookup(iclass, ward):
+        ic = (iclass or "").strip().lower()
+        wd = (ward or "").strip()
+        for r in rows:
+            if r.get("class", "").strip().lower() == ic and r.get("ward", "").strip() == wd:
+                return r
+        return None
+    return lookup
+
+
+def _rate(label, fn, args):
+    t0 = time.perf_counter()
+    for a in args:
+        fn(*a)
+    dt = time.perf_counter() - t0
+    print(f"  {label:28} {len(args) / dt:12,.0f} lookups/s")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--wards", type=int, default=500)
+    ap.add_argument("--classes", type=int, default=20)
+    ap.add_argument("-n", type=int, default=200_000)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="civicguard-bench-")
+    csv_path, wards_path, names, classes, (lat0, lat1, lng0, lng1) = _city(tmp, args.wards, args.classes)
+    rnd = random.Random(1)
+    by_ward = [(rnd.choice(classes), rnd.choice(names)) for _ in range(args.n)]
+    by_point = [(rnd.choice(classes), rnd.uniform(lat0, lat1), rnd.uniform(lng0, lng1)) for _ in range(args.n)]
+
+    router = Router(csv_path, wards_path)
+    router.resolve(classes[0], lat0, lng0)  # load both files
+    print(f"{args.wards} wards x {args.classes} classes = {args.wards * args.classes} routes")
+    _rate("old linear scan (class, ward)", _old_lookup(csv_path), by_ward[: max(1, args.n // 100)])
+    _rate("compiled (class, ward)", router.lookup, by_ward)
+    _rate("resolve from lat/lng", router.resolve, by_point)
+
+    index = router._wards.get()
+    sample = by_point[:10000]
+    hits = sum(index.ward_at(lat, lng) is not None for _, lat, lng in sample)
+    print(f"  points inside some ward: {hits / len(sample):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cold-start benchmark: time `import app.main` in fresh interpreters.
+
+Each configuration runs in its own subprocess so module caches don't leak
+between samples. Reports median wall time and RSS after import, and the SQL
+statements issued by the import plus the startup schema check (the
+database is migrated once, beforehand, as a deploy would).
+
+  python -m bench.startup_time -n 5
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+_PROBE = r"""
+import time, resource
+from sqlalchemy import event
+from db.session import engine
+n = [0]
+event.listen(engine, "before_cursor_execute", lambda *a: n.__setitem__(0, n[0] + 1))
+t0 = time.perf_counter()
+import app.main
+app.main.check_schema()
+dt = time.perf_counter() - t0
+print(dt, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, n[0])
+"""
+
+CONFIGS = {
+    "vision off": {"VISION_ENABLED": "0"},
+    "vision lazy": {"VISION_ENABLED": "1"},
+    "vision preload": {"VISION_ENABLED": "1", "PRELOAD_MODELS": "1"},
+}
+
+
+def _sample(env_overrides, db_url):
+    env = {**os.environ, **env_overrides, "DB_URL": db_url, "PYTHONPATH": ROOT}
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(out[-3]), int(out[-2]) / 1024.0, int(out[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=5)
+    args = ap.parse_args()
+
+    db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='civicguard-bench-'), 'boot.db')}"
+    subprocess.run([sys.executable, "-m", "db.schema", "upgrade"], cwd=ROOT, env={**os.environ, "DB_URL": db_url},
+                   check=True, capture_output=True)
+    for name, overrides in CONFIGS.items():
+        samples = [_sample(overrides, db_url) for _ in range(args.n)]
+        times = [s[0] for s in samples]
+        rss = [s[1] for s in samples]
+        print(f"{name:15} import median={statistics.median(times) * 1000:.0f}ms "
+              f"min={min(times) * 1000:.0f}ms maxrss={statistics.median(rss):.0f}MB sql={samples[0][2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Track-page polling of GET /api/tickets/{tid}, in-process ASGI.
+
+--pollers citizens each watch their own ticket and poll it --rounds times,
+all at once; between rounds a worker moves --churn of the tickets on
+(CREATED -> FILING -> FILED) through TicketRepo.transition, as
+workers/jobs.py and workers/dispatch.py do.
+
+  db       the former handler: a ticket read per poll, full body every time
+  etag     no cache, If-None-Match: unchanged tickets are 304s, still a read each
+  cache    db/ticket_cache.py + If-None-Match: reads only after a write
+
+Reported per mode: polls/s, latency, ticket SELECTs per poll and the share
+of polls answered 304.
+
+  python -m bench.ticket_polling
+  python -m bench.ticket_polling --pollers 10000 --rounds 5 --db-latency-ms 1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="civicguard-bench-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'polling.db')}"
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+MODES = ("db", "etag", "cache")
+NEXT = {"CREATED": "FILING", "FILING": "FILED"}
+
+
+def _seed(n):
+    from db.models import Base, Ticket
+    from db.session import engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    rows = [{"id": str(uuid.uuid4()), "iclass": "pothole", "status": "CREATED", "lat": 13.0, "lng": 80.0,
+             "created_at": now, "updated_at": now} for _ in range(n)]
+    with engine.begin() as conn:
+        conn.execute(Ticket.__table__.insert(), rows)
+    return [r["id"] for r in rows]
+
+
+def _advance(ids, status, churn, rnd):
+    from db.repository import TicketRepo
+
+    moving = [tid for tid in rnd.sample(ids, int(len(ids) * churn)) if status[tid] in NEXT]
+    by_status = {}
+    for tid in moving:
+        by_status.setdefault(status[tid], {})[tid] = {}
+    for expected, changes in by_status.items():
+        for tid in TicketRepo.transition(changes, expected, NEXT[expected]):
+            status[tid] = NEXT[expected]
+
+
+async def _run(main, ids, rounds, churn, conditional, selects):
+    rnd = random.Random(7)
+    status = {tid: "CREATED" for tid in ids}
+    etags = {}
+    latencies = []
+    not_modified = 0
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def poll(tid):
+            nonlocal not_modified
+            headers = {"If-None-Match": etags[tid]} if conditional and tid in etags else {}
+            t0 = time.perf_counter()
+            r = await client.get(f"/api/tickets/{tid}", headers=headers)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code == 304:
+                not_modified += 1
+                return
+            assert r.status_code == 200 and r.json()["status"] == status[tid], r.text
+            etags[tid] = r.headers.get("etag")
+
+        await asyncio.gather(*(poll(tid) for tid in ids))  # first visit
+        latencies.clear()
+        not_modified = 0
+        selects["n"] = 0
+        wall = 0.0
+        for _ in range(rounds):
+            await asyncio.to_thread(_advance, ids, status, churn, rnd)
+            t0 = time.perf_counter()
+            await asyncio.gather(*(poll(tid) for tid in ids))
+            wall += time.perf_counter() - t0
+    await main.async_engine.dispose()  # connections are bound to this loop
+    return latencies, wall, not_modified
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pollers", type=int, default=10000)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--churn", type=float, default=0.02, help="share of tickets a worker moves per round")
+    ap.add_argument("--mode", choices=MODES, action="append", help="default: all")
+    ap.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated DB round trip per read")
+    args = ap.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    import app.main as main
+    from db import ticket_cache
+    from db.async_repository import AsyncTicketRepo
+
+    selects = {"n": 0}
+
+    @event.listens_for(main.async_engine.sync_engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, *a):
+        if statement.lstrip().upper().startswith("SELECT") and "FROM tickets" in statement:
+            selects["n"] += 1
+
+    original_get = AsyncTicketRepo.get
+
+    async def get(tid):
+        await asyncio.sleep(args.db_latency_ms / 1000.0)
+        return await original_get(tid)
+
+    if args.db_latency_ms:
+        AsyncTicketRepo.get = staticmethod(get)
+
+    for mode in args.mode or MODES:
+        ids = _seed(args.pollers)
+        # In-process only: nothing to share or hear from in a single process
+        ticket_cache._cache = ticket_cache.TicketCache() if mode == "cache" else None
+        ticket_cache.MODE = "memory" if mode == "cache" else "none"
+        lat, wall, n304 = asyncio.run(_run(main, ids, args.rounds, args.churn, mode != "db", selects))
+        polls = len(lat)
+        lat.sort()
+        print(f"{mode:6} {polls / wall:8.0f} polls/s  p50={lat[polls // 2] * 1000:7.1f}ms "
+              f"p99={lat[int(polls * 0.99) - 1] * 1000:7.1f}ms  "
+              f"ticket SELECTs/poll={selects['n'] / polls:.3f}  304s={n304 / polls:.0%}")
+    main.shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
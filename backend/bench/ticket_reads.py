@@ -0,0 +1,136 @@
+"""
+Requests/sec for GET /api/tickets/{tid} under concurrency, in-process ASGI.
+
+  sync      the former handler: TicketRepo.get called on the event loop
+  threaded  TicketRepo.get on the "db" stage pool
+  async     AsyncTicketRepo.get (aiosqlite here, asyncpg on Postgres)
+
+  python -m bench.ticket_reads -n 5000 -c 64
+  python -m bench.ticket_reads -n 2000 -c 64 --db-latency-ms 2
+  DB_POOL_SIZE=20 python -m bench.ticket_reads --mode async
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="civicguard-bench-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'reads.db')}"
+
+import logging  # noqa: E402
+
+import httpx  # noqa: E402
+
+MODES = ("sync", "threaded", "async")
+
+
+def _seed(n):
+    from db.models import Base, Ticket
+    from db.session import engine
+
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    rows = [{"id": str(uuid.uuid4()), "iclass": "pothole", "status": "CREATED", "lat": 13.0, "lng": 80.0,
+             "created_at": now, "updated_at": now} for _ in range(n)]
+    with engine.begin() as conn:
+        conn.execute(Ticket.__table__.insert(), rows)
+    return [r["id"] for r in rows]
+
+
+def _patch(main, mode, latency_s):
+    """Point the handler at the repo for `mode`. latency_s models a network
+    round trip to the DB: a blocking sleep for the sync repo, an awaited one
+    for the async repo."""
+    from db.async_repository import AsyncTicketRepo
+    from db import ticket_cache
+    from db.repository import TicketRepo
+
+    def blocking_get(tid):
+        if latency_s:
+            time.sleep(latency_s)
+        return TicketRepo.get(tid)
+
+    class Repo(AsyncTicketRepo):
+        pass
+
+    if mode == "sync":
+        async def get(tid):
+            return blocking_get(tid)
+    elif mode == "threaded":
+        async def get(tid):
+            return await main.run_stage("db", blocking_get, tid)
+    else:
+        async def get(tid):
+            if latency_s:
+                await asyncio.sleep(latency_s)
+            return await AsyncTicketRepo.get(tid)
+    async def get_encoded(tid):
+        t = await get(tid)
+        return ticket_cache.encode(t) if t else None
+
+    Repo.get = staticmethod(get)
+    Repo.get_encoded = staticmethod(get_encoded)  # no cache: every request reads
+    main.AsyncTicketRepo = Repo
+
+
+async def _run(main, ids, total, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+    rnd = random.Random(5)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.get(f"/api/tickets/{rnd.choice(ids)}")
+                latencies.append(time.perf_counter() - t0)
+                assert r.status_code == 200 and "id" in r.json()
+
+        await asyncio.gather(*(one() for _ in range(min(total, 200))))  # warm pools
+        latencies.clear()
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        wall = time.perf_counter() - t0
+    await main.async_engine.dispose()  # connections are bound to this loop
+    return latencies, wall
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", "--requests", type=int, default=5000)
+    ap.add_argument("-c", "--concurrency", type=int, default=64)
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--mode", choices=MODES, action="append", help="default: all")
+    ap.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated DB round trip")
+    args = ap.parse_args()
+
+    ids = _seed(args.rows)
+    import app.main as main
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    original = main.AsyncTicketRepo
+    for mode in args.mode or MODES:
+        main.AsyncTicketRepo = original
+        _patch(main, mode, args.db_latency_ms / 1000.0)
+        lat, wall = asyncio.run(_run(main, ids, args.requests, args.concurrency))
+        lat.sort()
+        print(f"{mode:9} {args.requests / wall:8.0f} req/s  p50={lat[len(lat) // 2] * 1000:.2f}ms "
+              f"p99={lat[int(len(lat) * 0.99) - 1] * 1000:.2f}ms mean={statistics.mean(lat) * 1000:.2f}ms")
+    main.shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,2 @@
 from .session import engine, SessionLocal, get_session  # noqa: F401
-from .models import Base, Ticket  # noqa: F401
+from .models import Base, Ticket, TicketStat, OutboxMessage  # noqa: F401
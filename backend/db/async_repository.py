@@ -0,0 +1,156 @@
+"""Async twin of TicketRepo for the FastAPI handlers.
+
+Same create/get/list/update/count contract and the same statement builders,
+cursor format and stats deltas as repository.py, but awaited on the
+asyncpg/aiosqlite engine instead of blocking a thread per query. Workers and
+scripts keep using the sync TicketRepo.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import select
+
+from . import stats, ticket_cache, ticket_events
+from .async_session import get_async_session
+from .models import Ticket
+from .repository import (
+    Outbox,
+    TicketRepo,
+    apply_changes,
+    cached_count,
+    count_stmt,
+    counters_count,
+    list_stmt,
+    outbox_rows,
+    page_result,
+    remember_count,
+    with_cell,
+    with_filed_at,
+)
+
+
+async def _apply_stats(session, changes: Dict[str, float]) -> None:
+    if stats.STATS_BACKEND != "sql":
+        return
+    dialect = session.bind.dialect.name
+    for key, delta in sorted(changes.items()):  # stable lock order
+        stmt = stats.upsert_stmt(dialect, key, delta)
+        if stmt is None:
+            raise RuntimeError(f"no counter upsert for dialect {dialect}")
+        await session.execute(stmt)
+
+
+async def _after_commit(changes: Dict[str, float]) -> None:
+    if stats.STATS_BACKEND == "redis" and changes:
+        await asyncio.to_thread(stats.apply_after_commit, changes)
+
+
+def _after_write(after: Dict[str, Any], changes: Dict[str, Any]) -> None:
+    ticket_cache.invalidate([after["id"]])
+    ticket_events.publish([after], changes)
+
+
+class AsyncTicketRepo:
+    @staticmethod
+    async def create(data: Dict[str, Any], outbox: Optional[Outbox] = None) -> Dict[str, Any]:
+        async with get_async_session() as db:
+            t = Ticket(**with_filed_at(with_cell(data)))
+            db.add(t)
+            db.add_all(outbox_rows(t.id, outbox))
+            await db.flush()  # apply column defaults before counting
+            after = t.as_dict()
+            changes = stats.deltas(None, after)
+            await _apply_stats(db, changes)
+            await db.commit()
+        await _after_commit(changes)
+        return after
+
+    @staticmethod
+    async def get(tid: str) -> Optional[Dict[str, Any]]:
+        # Core row instead of an ORM entity: nothing to track for a read
+        async with get_async_session() as db:
+            row = (await db.execute(select(Ticket.__table__).where(Ticket.id == tid))).first()
+            return dict(row._mapping) if row else None
+
+    # Read one as the (JSON body, ETag) GET /api/tickets/{tid} sends, through
+    # db/ticket_cache.py. Returns: None for an unknown id
+    @staticmethod
+    async def get_encoded(tid: str) -> Optional[ticket_cache.Entry]:
+        cache = ticket_cache.get_cache()
+        if cache is None:
+            t = await AsyncTicketRepo.get(tid)
+            return ticket_cache.encode(t) if t else None
+        return await cache.get(tid, AsyncTicketRepo.get)
+
+    @staticmethod
+    async def list(
+        limit: int = 50,
+        offset: int = 0,
+        status: Optional[str] = None,
+        iclass: Optional[str] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        count: str = "exact",
+    ) -> Dict[str, Any]:
+        names, stmt, limit = list_stmt(limit, offset, status, iclass, cursor, fields, count)
+        async with get_async_session() as db:
+            items, next_cursor = page_result((await db.execute(stmt)).all(), names, limit)
+            total = await AsyncTicketRepo.count(status, iclass, mode=count, session=db)
+            return {"count": total, "items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    async def count(
+        status: Optional[str] = None,
+        iclass: Optional[str] = None,
+        mode: str = "exact",
+        session=None,
+    ) -> Optional[int]:
+        if mode == "none":
+            return None
+        if mode == "cached":
+            if not (status and iclass):
+                try:
+                    return counters_count(await AsyncTicketRepo.stats(session), status, iclass)
+                except Exception:
+                    pass
+            hit = cached_count(status, iclass)
+            if hit is not None:
+                return hit
+        if session is None:
+            async with get_async_session() as db:
+                n = (await db.execute(count_stmt(status, iclass))).scalar_one()
+        else:
+            n = (await session.execute(count_stmt(status, iclass))).scalar_one()
+        remember_count(status, iclass, n)
+        return n
+
+    # Counters behind /api/stats (db/stats.py read())
+    @staticmethod
+    async def stats(session=None) -> Dict[str, float]:
+        if stats.STATS_BACKEND != "sql":
+            return await asyncio.to_thread(stats.read)
+        if session is None:
+            async with get_async_session() as db:
+                rows = (await db.execute(stats.read_stmt())).all()
+        else:
+            rows = (await session.execute(stats.read_stmt())).all()
+        return {k: v for k, v in rows}
+
+    @staticmethod
+    async def update(tid: str, changes: Dict[str, Any], outbox: Optional[Outbox] = None) -> Optional[Dict[str, Any]]:
+        changes = {**changes, "updated_at": TicketRepo._now()}
+        async with get_async_session() as db:
+            t = await db.get(Ticket, tid)
+            if not t:
+                return None
+            before, after = apply_changes(t, changes)
+            db.add_all(outbox_rows(tid, outbox))
+            counter_changes = stats.deltas(before, after)
+            await _apply_stats(db, counter_changes)
+            await db.commit()
+        await _after_commit(counter_changes)
+        # Both may publish to Redis: off the event loop
+        await asyncio.to_thread(_after_write, after, changes)
+        return after
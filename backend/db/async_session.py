@@ -0,0 +1,54 @@
+"""Async engine/session for the API handlers (see async_repository.py).
+
+Derived from DB_URL unless ASYNC_DB_URL is set: Postgres goes through asyncpg,
+SQLite through aiosqlite. Pool settings are the same DB_POOL_* knobs as the
+sync engine in session.py.
+"""
+import os
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .session import DB_URL, POOL_WAIT, pool_options
+
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "postgres": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_url(url: str) -> str:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"no async driver configured for {backend}")
+    if u.drivername != f"{backend}+{driver}":
+        u = u.set(drivername=f"{'postgresql' if backend == 'postgres' else backend}+{driver}")
+    if driver == "asyncpg" and "sslmode" in u.query:
+        # libpq spelling -> asyncpg's
+        mode = u.query["sslmode"]
+        u = u.difference_update_query(["sslmode"])
+        if mode not in ("disable", "allow"):
+            u = u.update_query_dict({"ssl": mode})
+    return u.render_as_string(hide_password=False)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    _wait = POOL_WAIT.labels("async")
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self._wait.observe(time.perf_counter() - t0)
+
+
+ASYNC_DB_URL = os.getenv("ASYNC_DB_URL") or async_url(DB_URL)
+
+async_engine = create_async_engine(ASYNC_DB_URL, **pool_options(ASYNC_DB_URL, TimedAsyncQueuePool))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+def get_async_session():
+    return AsyncSessionLocal()
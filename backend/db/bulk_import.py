@@ -0,0 +1,460 @@
+"""Resumable bulk import of historical complaints (CSV or NDJSON).
+
+Replaces the one-off migration scripts. For every input record:
+
+- columns are mapped (ALIASES: latitude -> lat, category -> iclass, ...),
+  validated and normalized (coordinates, dates, severity, status); a bad
+  record goes to <input>.rejects.ndjson with the reason, the rest carry on;
+- the ticket id is deterministic (the record's own id, else the authority's
+  complaint number, else file name + record number), so a record imported
+  twice is one ticket;
+- a referenced photo (URL, or a path under --media-root) is fetched, checked
+  and stored content-addressed like an intake upload, by a pool of
+  IMPORT_UPLOAD_CONCURRENCY threads;
+- records are written IMPORT_BATCH_ROWS at a time with TicketRepo.import_many
+  (batched multi-row INSERT, COPY on Postgres), skipping ids already
+  there, and counted into the stats counters in the same commit.
+
+After each batch commits, the record count is checkpointed to
+<input>.import-state.json; a re-run picks up after the last committed batch
+(a batch that committed without its checkpoint is skipped by id). --restart
+starts over, --dry-run validates and reports without writing anything.
+
+Imported complaints are already with the authority, so they default to
+status FILED and are never filed again. With --enqueue, rows missing an
+address get a geocode job, rows without a class get classified from their
+photo, and photos get thumbnails; those go in as outbox rows with the
+ticket, for python -m workers.outbox to relay.
+
+  python -m db.bulk_import complaints.csv --media-root /data/photos --dry-run
+  python -m db.bulk_import complaints.ndjson.gz --enqueue
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from sqlalchemy import select  # noqa: E402
+
+from agents.ingest import spool_upload  # noqa: E402
+from db.models import Ticket  # noqa: E402
+from db.repository import TicketRepo  # noqa: E402
+from db.session import engine  # noqa: E402
+
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "1000"))
+IMPORT_UPLOAD_CONCURRENCY = int(os.getenv("IMPORT_UPLOAD_CONCURRENCY", "8"))
+IMPORT_FETCH_TIMEOUT_S = float(os.getenv("IMPORT_FETCH_TIMEOUT_S", "30"))
+IMPORT_DEFAULT_STATUS = os.getenv("IMPORT_DEFAULT_STATUS", "FILED")
+
+FORMATS = ("csv", "ndjson")
+STATUSES = ("CREATED", "FILING", "FILED", "FAILED", "RESOLVED", "MERGED")
+SEVERITIES = ("low", "medium", "high")
+
+# Source column -> ticket field, for the names municipal exports tend to use
+ALIASES = {
+    "latitude": "lat",
+    "longitude": "lng",
+    "lon": "lng",
+    "long": "lng",
+    "category": "iclass",
+    "type": "iclass",
+    "issue_type": "iclass",
+    "complaint_id": "authority_ticket_id",
+    "reference": "authority_ticket_id",
+    "department": "authority",
+    "location": "address",
+    "reported_at": "created_at",
+    "date": "created_at",
+    "closed_at": "updated_at",
+    "phone": "contact",
+    "email": "contact",
+    "photo_url": "photo",
+    "image": "photo",
+    "image_url": "photo",
+}
+TEXT_FIELDS = ("address", "authority", "authority_ticket_id", "contact")
+DATE_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y")
+
+# Ids for records that don't bring their own
+ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "civicguard:import")
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(path: str) -> str:
+    base = path[:-3] if path.endswith(".gz") else path
+    ext = os.path.splitext(base)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    raise ValueError(f"can't tell the format of {path}; pass --format")
+
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+
+def read_records(path: str, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Raw records, one per CSV row / NDJSON line (a line that isn't a JSON
+    object comes through as {"__error__": ...} so it's rejected, not fatal)."""
+    with _open(path) as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                yield {"__error__": f"invalid JSON: {e}"}
+                continue
+            yield rec if isinstance(rec, dict) else {"__error__": "not a JSON object"}
+
+
+def _text(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    v = str(v).strip()
+    return v or None
+
+
+def _float(name: str, v: Any) -> Optional[float]:
+    v = _text(v)
+    if v is None:
+        return None
+    try:
+        return float(v)
+    except ValueError:
+        raise RowError(f"{name} is not a number: {v!r}")
+
+
+def parse_time(name: str, v: Any) -> Optional[datetime]:
+    """ISO 8601, dd/mm/yyyy[ HH:MM[:SS]] or epoch seconds -> naive UTC."""
+    v = _text(v)
+    if v is None:
+        return None
+    try:
+        return datetime.fromtimestamp(float(v), tz=timezone.utc).replace(tzinfo=None)
+    except (ValueError, OverflowError, OSError):
+        pass
+    try:
+        dt = datetime.fromisoformat(v)
+    except ValueError:
+        for fmt in DATE_FORMATS:
+            try:
+                dt = datetime.strptime(v, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            raise RowError(f"{name} is not a date: {v!r}")
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def normalize(
+    raw: Dict[str, Any],
+    source: str,
+    record: int,
+    default_status: str = IMPORT_DEFAULT_STATUS,
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Validate one record. Returns: (ticket row, photo reference or None)"""
+    if "__error__" in raw:
+        raise RowError(raw["__error__"])
+    rec: Dict[str, Any] = {}
+    for k, v in raw.items():
+        if k is None:
+            raise RowError("more values than columns")
+        key = k.strip().lower().replace(" ", "_")
+        rec.setdefault(ALIASES.get(key, key), v)
+
+    row: Dict[str, Any] = {name: _text(rec.get(name)) for name in TEXT_FIELDS}
+    iclass = _text(rec.get("iclass"))
+    row["iclass"] = iclass.lower().replace(" ", "_").replace("-", "_") if iclass else "unknown"
+
+    lat, lng = _float("lat", rec.get("lat")), _float("lng", rec.get("lng"))
+    if (lat, lng) == (0.0, 0.0):
+        lat = lng = None  # "no location" in many exports
+    if (lat is None) != (lng is None):
+        raise RowError("lat and lng go together")
+    if lat is not None and not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise RowError(f"coordinates out of range: {lat},{lng}")
+    row["lat"], row["lng"] = lat, lng
+
+    severity = _text(rec.get("severity"))
+    if severity is not None and severity.lower() not in SEVERITIES:
+        raise RowError(f"unknown severity {severity!r}")
+    row["severity"] = severity.lower() if severity else None
+    confidence = _float("confidence", rec.get("confidence"))
+    if confidence is not None and not 0 <= confidence <= 1:
+        raise RowError(f"confidence out of range: {confidence}")
+    row["confidence"] = confidence
+
+    status = (_text(rec.get("status")) or default_status).upper()
+    if status not in STATUSES:
+        raise RowError(f"unknown status {status!r}")
+    row["status"] = status
+
+    created_at = parse_time("created_at", rec.get("created_at")) or datetime.utcnow()
+    updated_at = parse_time("updated_at", rec.get("updated_at")) or created_at
+    row["created_at"], row["updated_at"] = created_at, max(updated_at, created_at)
+
+    tid = _text(rec.get("id"))
+    if tid is not None and len(tid) > 64:
+        raise RowError("id longer than 64 characters")
+    if tid is None and row["authority_ticket_id"]:
+        tid = str(uuid.uuid5(ID_NAMESPACE, f"{row['authority'] or ''}:{row['authority_ticket_id']}"))
+    row["id"] = tid or str(uuid.uuid5(ID_NAMESPACE, f"{os.path.basename(source)}:{record}"))
+    return row, _text(rec.get("photo"))
+
+
+def fetch_photo(ref: str, media_root: str) -> Tuple[str, str, str]:
+    """Store the photo `ref` (http(s) URL or path under media_root) like an
+    intake upload. Returns: (key, public_url, sha256)"""
+    name = os.path.basename(ref.split("?", 1)[0])
+    if ref.startswith(("http://", "https://")):
+        import requests
+
+        with requests.get(ref, stream=True, timeout=IMPORT_FETCH_TIMEOUT_S) as resp:
+            resp.raise_for_status()
+            spooled = spool_upload(resp.raw, name, resp.headers.get("Content-Type"))
+    else:
+        path = os.path.normpath(os.path.join(media_root, ref))
+        if os.path.commonpath([path, os.path.abspath(media_root)]) != os.path.abspath(media_root):
+            raise RowError(f"photo path outside the media root: {ref}")
+        with open(path, "rb") as f:
+            spooled = spool_upload(f, name)
+    try:
+        spooled.validate_image()
+        key, url = spooled.store()
+    finally:
+        spooled.discard()  # no-op once stored
+    return key, url, spooled.sha256
+
+
+class Checkpoint:
+    """Records consumed and running totals, rewritten atomically per batch."""
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        st = os.stat(source)
+        self.fingerprint = {"source": os.path.abspath(source), "size": st.st_size, "mtime": int(st.st_mtime)}
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        if state.get("fingerprint") != self.fingerprint:
+            raise ValueError(f"{self.path} is for a different version of the input; pass --restart")
+        return state
+
+    def save(self, records: int, counters: Dict[str, int]) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "records": records, "counters": counters}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Importer:
+    def __init__(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        media_root: Optional[str] = None,
+        batch_rows: int = IMPORT_BATCH_ROWS,
+        concurrency: int = IMPORT_UPLOAD_CONCURRENCY,
+        enqueue: bool = False,
+        dry_run: bool = False,
+        default_status: str = IMPORT_DEFAULT_STATUS,
+        copy: bool = True,
+        checkpoint_path: Optional[str] = None,
+        rejects_path: Optional[str] = None,
+        progress_s: float = 5.0,
+    ):
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        self.media_root = media_root or os.path.dirname(os.path.abspath(path))
+        self.batch_rows = max(1, batch_rows)
+        self.concurrency = max(1, concurrency)
+        self.enqueue = enqueue
+        self.dry_run = dry_run
+        self.default_status = default_status.upper()
+        self.copy = copy
+        self.checkpoint = Checkpoint(checkpoint_path or path + ".import-state.json", path)
+        self.rejects_path = rejects_path or path + ".rejects.ndjson"
+        self.progress_s = progress_s
+        self.counters = {"records": 0, "inserted": 0, "existing": 0, "rejected": 0, "photos": 0, "enqueued": 0}
+        self.reject_samples: List[Dict[str, Any]] = []
+
+    def _photo(self, item):
+        record, row, ref = item
+        if ref is None:
+            return record, row, None
+        if self.dry_run:
+            if not ref.startswith(("http://", "https://")) and not os.path.isfile(os.path.join(self.media_root, ref)):
+                return record, row, f"photo not found: {ref}"
+            return record, row, None
+        try:
+            key, url, sha256 = fetch_photo(ref, self.media_root)
+        except Exception as e:  # unreadable, not an image, too big, fetch failed
+            return record, row, f"photo {ref}: {type(e).__name__} {e}".strip()
+        row.update(media_url=url, content_hash=sha256, _key=key)
+        return record, row, None
+
+    def _outbox(self, row: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        key = row.pop("_key", None)
+        if not self.enqueue:
+            return []
+        out = []
+        if row["iclass"] == "unknown" and row.get("media_url"):
+            out.append(("classify", {"source": row["media_url"]}))
+        if not row.get("address") and row.get("lat") is not None:
+            out.append(("geocode", {}))
+        if key:
+            out.append(("media", {"key": key}))
+        return out
+
+    def _batch(self, pool, start: int, raws: List[Dict[str, Any]], rejects) -> None:
+        items, rejected = [], []
+        for i, raw in enumerate(raws, start + 1):
+            try:
+                row, ref = normalize(raw, self.path, i, self.default_status)
+                items.append((i, row, ref))
+            except RowError as e:
+                rejected.append((i, str(e), raw))
+        # Already imported (a re-run, or an overlapping export): no photo to fetch
+        ids = [row["id"] for _, row, _ in items]
+        with engine.connect() as conn:
+            existing = set(conn.execute(select(Ticket.id).where(Ticket.id.in_(ids))).scalars()) if ids else set()
+        self.counters["existing"] += sum(1 for tid in ids if tid in existing)
+        rows = []
+        for record, row, error in pool.map(self._photo, [item for item in items if item[1]["id"] not in existing]):
+            if error:
+                rejected.append((record, error, dict(raws[record - start - 1])))
+            else:
+                rows.append(row)
+        self.counters["photos"] += sum(1 for r in rows if r.get("media_url"))
+
+        if self.dry_run:
+            self.counters["inserted"] += len({r["id"] for r in rows})
+        else:
+            outbox = {r["id"]: self._outbox(r) for r in rows}
+            inserted = TicketRepo.import_many(rows, outbox, copy=self.copy) if rows else []
+            self.counters["inserted"] += len(inserted)
+            self.counters["existing"] += len(rows) - len(inserted)
+            self.counters["enqueued"] += sum(len(outbox[tid]) for tid in inserted)
+
+        self.counters["rejected"] += len(rejected)
+        self.counters["records"] = start + len(raws)
+        for record, error, raw in rejected:
+            entry = {"record": record, "error": error, "row": raw}
+            if len(self.reject_samples) < 20:
+                self.reject_samples.append(entry)
+            if rejects is not None:
+                rejects.write(json.dumps(entry, default=str) + "\n")
+        if rejects is not None:
+            rejects.flush()
+            self.checkpoint.save(self.counters["records"], self.counters)
+
+    def run(self, restart: bool = False) -> Dict[str, Any]:
+        start = 0
+        if restart and not self.dry_run:
+            self.checkpoint.clear()
+        state = None if restart else self.checkpoint.load()
+        if state:
+            start = state["records"]
+            self.counters.update(state["counters"])
+            print(f"[Import] resuming {self.path} after record {start}")
+
+        t0 = time.perf_counter()
+        last = t0
+        done_now = 0
+        records = islice(read_records(self.path, self.fmt), start, None)
+        rejects = None if self.dry_run else open(self.rejects_path, "w" if start == 0 else "a")
+        try:
+            with ThreadPoolExecutor(self.concurrency, thread_name_prefix="import-photo") as pool:
+                while True:
+                    raws = list(islice(records, self.batch_rows))
+                    if not raws:
+                        break
+                    self._batch(pool, start, raws, rejects)
+                    start += len(raws)
+                    done_now += len(raws)
+                    now = time.perf_counter()
+                    if now - last >= self.progress_s:
+                        last = now
+                        print(f"[Import] {self._summary()}  {done_now / (now - t0):,.0f} records/s")
+        finally:
+            if rejects is not None:
+                rejects.close()
+        elapsed = time.perf_counter() - t0
+        return {**self.counters, "seconds": round(elapsed, 3),
+                "records_per_s": round(done_now / elapsed, 1) if elapsed > 0 else None, "dry_run": self.dry_run}
+
+    def _summary(self) -> str:
+        return "  ".join(f"{k} {v}" for k, v in self.counters.items())
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Resumable bulk import of complaints from CSV or NDJSON.")
+    ap.add_argument("input", help="CSV or NDJSON file (.gz ok)")
+    ap.add_argument("-f", "--format", choices=FORMATS)
+    ap.add_argument("--media-root", help="base directory of relative photo paths (default: the input's directory)")
+    ap.add_argument("--batch", type=int, default=IMPORT_BATCH_ROWS, help="records per commit")
+    ap.add_argument("--concurrency", type=int, default=IMPORT_UPLOAD_CONCURRENCY, help="photo uploads in flight")
+    ap.add_argument("--status", default=IMPORT_DEFAULT_STATUS, help="status of records without one")
+    ap.add_argument("--enqueue", action="store_true", help="queue geocoding/classification/thumbnails")
+    ap.add_argument("--no-copy", action="store_true", help="batched INSERTs instead of COPY on Postgres")
+    ap.add_argument("--dry-run", action="store_true", help="validate and report, write nothing")
+    ap.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    ap.add_argument("--checkpoint", help="default: <input>.import-state.json")
+    ap.add_argument("--rejects", help="default: <input>.rejects.ndjson")
+    args = ap.parse_args(argv)
+
+    try:
+        importer = Importer(
+            args.input, args.format, args.media_root, args.batch, args.concurrency, args.enqueue,
+            args.dry_run, args.status, not args.no_copy, args.checkpoint, args.rejects,
+        )
+        result = importer.run(restart=args.restart)
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+    if args.dry_run:
+        for entry in importer.reject_samples:
+            print(f"[Import] record {entry['record']}: {entry['error']}")
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""Full ticket dumps for analysts and the open-data portal.
+
+Streams the tickets table, oldest first, into NDJSON, CSV or Parquet with
+constant memory whatever the table size:
+
+- rows come off a server-side cursor (stream_results / yield_per: a named
+  cursor on Postgres) EXPORT_BATCH_ROWS at a time, never the whole result;
+- each batch is encoded and handed on before the next one is fetched;
+  Parquet buffers one row group (EXPORT_PARQUET_ROW_GROUP rows) at a time;
+- gzip=True compresses on the fly (NDJSON/CSV; Parquet compresses its
+  column chunks itself with EXPORT_PARQUET_COMPRESSION).
+
+Filters: status, iclass and a created_at range [since, until). `contact` is
+personal data, so it's only exported when asked for in `fields`.
+
+Used by GET /api/export and from the command line:
+
+  python -m db.export -f ndjson -o tickets.ndjson
+  python -m db.export -f csv --status FILED --since 2024-01-01 --gzip -o filed.csv.gz
+  python -m db.export -f parquet --fields id,iclass,lat,lng,created_at -o tickets.parquet
+
+Parquet needs pyarrow (optional, not in requirements.txt).
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, Float, Integer, select
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only the parquet format needs it
+    pa = pq = None
+
+from .models import Ticket
+from .repository import TICKET_FIELDS, _filtered, _projection
+from .session import engine
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+EXPORT_PARQUET_ROW_GROUP = int(os.getenv("EXPORT_PARQUET_ROW_GROUP", "100000"))
+EXPORT_PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+PRIVATE_FIELDS = ("contact",)
+DEFAULT_FIELDS = tuple(f for f in TICKET_FIELDS if f not in PRIVATE_FIELDS)
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_stmt(
+    names: Sequence[str],
+    status: Optional[str] = None,
+    iclass: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    cols = Ticket.__table__.c
+    # (created_at, id) ascending: the keyset indexes, so no sort on the server
+    stmt = _filtered(select(*[cols[n] for n in names]), status, iclass)
+    if since is not None:
+        stmt = stmt.where(cols.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(cols.created_at < until)
+    return stmt.order_by(cols.created_at.asc(), cols.id.asc())
+
+
+def batches(stmt, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[List[Tuple[Any, ...]]]:
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_rows).execute(stmt)
+        for part in result.partitions():
+            yield [tuple(r) for r in part]
+
+
+def _text(v: Any) -> Any:
+    return v.isoformat() if isinstance(v, (datetime, date)) else v
+
+
+def _ndjson(names: List[str], parts: Iterable[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_text).encode
+    for rows in parts:
+        yield "".join(dumps(dict(zip(names, r))) + "\n" for r in rows).encode()
+
+
+def _csv(names: List[str], parts: Iterable[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(names)
+    for rows in parts:
+        writer.writerows([[_text(v) for v in r] for r in rows])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file for ParquetWriter whose bytes are taken out as they come."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks = []
+        return out
+
+
+def _arrow_type(name: str):
+    kind = Ticket.__table__.c[name].type
+    if isinstance(kind, DateTime):
+        return pa.timestamp("us")
+    if isinstance(kind, Float):
+        return pa.float64()
+    if isinstance(kind, Integer):
+        return pa.int64()
+    return pa.string()
+
+
+def _parquet(names: List[str], parts: Iterable[List[Tuple[Any, ...]]]) -> Iterator[bytes]:
+    schema = pa.schema([(n, _arrow_type(n)) for n in names])
+    sink = _Sink()
+    pending: List[Tuple[Any, ...]] = []
+
+    def flush(writer):
+        columns = list(zip(*pending)) if pending else [[] for _ in names]
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema
+        ))
+        pending.clear()
+
+    writer = pq.ParquetWriter(sink, schema, compression=EXPORT_PARQUET_COMPRESSION)
+    try:
+        for rows in parts:
+            pending.extend(rows)
+            if len(pending) >= EXPORT_PARQUET_ROW_GROUP:
+                flush(writer)
+                yield sink.drain()
+        if pending:
+            flush(writer)
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzipped(chunks: Iterable[bytes], level: int = EXPORT_GZIP_LEVEL) -> Iterator[bytes]:
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def filename(fmt: str, gzip: bool = False) -> str:
+    return f"tickets.{fmt}" + (".gz" if gzip and fmt != "parquet" else "")
+
+
+def stream(
+    fmt: str = "ndjson",
+    status: Optional[str] = None,
+    iclass: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[Sequence[str]] = None,
+    gzip: bool = False,
+    batch_rows: int = EXPORT_BATCH_ROWS,
+) -> Iterator[bytes]:
+    """The export as byte chunks. Arguments are checked here, before the
+    first chunk (raises ExportError); the query runs as chunks are taken."""
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of {', '.join(FORMATS)}")
+    if fmt == "parquet" and pa is None:
+        raise ExportError("parquet export needs pyarrow installed")
+    try:
+        names = _projection(fields or DEFAULT_FIELDS)
+    except ValueError as e:
+        raise ExportError(str(e))
+    stmt = export_stmt(names, status, iclass, since, until)
+    encode = {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}[fmt]
+    chunks = encode(names, batches(stmt, batch_rows))
+    return _gzipped(chunks) if gzip and fmt != "parquet" else chunks
+
+
+def _when(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Stream the tickets table to NDJSON, CSV or Parquet.")
+    ap.add_argument("-f", "--format", choices=FORMATS, default="ndjson")
+    ap.add_argument("-o", "--output", default="-", help="file, or - for stdout")
+    ap.add_argument("--status")
+    ap.add_argument("--iclass")
+    ap.add_argument("--since", type=_when, help="created_at >= (ISO date/time)")
+    ap.add_argument("--until", type=_when, help="created_at < (ISO date/time)")
+    ap.add_argument("--fields", help="comma-separated columns (default: all but contact)")
+    ap.add_argument("--gzip", action="store_true")
+    args = ap.parse_args(argv)
+
+    try:
+        chunks = stream(args.format, args.status, args.iclass, args.since, args.until,
+                        args.fields.split(",") if args.fields else None, args.gzip)
+    except ExportError as e:
+        ap.error(str(e))
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
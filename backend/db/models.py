@@ -1,15 +1,19 @@
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, String, Float, DateTime
+from sqlalchemy import Column, String, Float, DateTime, Index, Integer, Text
 from datetime import datetime
 
 Base = declarative_base()
 
+# Statuses of tickets still being worked on; new nearby reports attach to these
+OPEN_STATUSES = ("CREATED", "FILING", "FILED")
+
 class Ticket(Base):
     __tablename__ = "tickets"
 
     id = Column(String, primary_key=True)        # UUID string
     iclass = Column(String, nullable=False)      # pothole, garbage, etc.
     severity = Column(String, nullable=True)     # e.g., low/medium/high
+    confidence = Column(Float, nullable=True)    # classifier confidence
     lat = Column(Float, nullable=True)
     lng = Column(Float, nullable=True)
     address = Column(String, nullable=True)
@@ -18,8 +22,51 @@ class Ticket(Base):
     authority_ticket_id = Column(String, nullable=True)
     contact = Column(String, nullable=True)
     media_url = Column(String, nullable=True)
+    thumb_url = Column(String, nullable=True)    # resized copies, see agents/derivatives.py
+    preview_url = Column(String, nullable=True)
+    content_hash = Column(String, nullable=True)  # sha256 of the photo
+    cell = Column(String, nullable=True)          # geohash of lat/lng
+    parent_id = Column(String, nullable=True, index=True)     # set when merged into a nearby report
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    filed_at = Column(DateTime, nullable=True)    # set by the write that makes it FILED
+
+    # Listing orders by (created_at, id) newest first, optionally filtered by
+    # status or iclass; these cover keyset pages for each case. The schema
+    # itself is owned by the migrations in backend/migrations (db/schema.py).
+    __table_args__ = (
+        Index("ix_tickets_created_at_id", "created_at", "id"),
+        Index("ix_tickets_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_tickets_iclass_created_at_id", "iclass", "created_at", "id"),
+        # Duplicate photo within a time window; radius lookups by geohash cell
+        Index("ix_tickets_content_hash_created_at", "content_hash", "created_at"),
+        Index("ix_tickets_cell_lat_lng", "cell", "lat", "lng"),
+    )
 
     def as_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+
+
+class TicketStat(Base):
+    """Incrementally maintained counters behind /api/stats (see db/stats.py)."""
+    __tablename__ = "ticket_stats"
+
+    key = Column(String, primary_key=True)       # e.g. status:CREATED, filed:2024-05-01
+    value = Column(Float, nullable=False, default=0)
+
+
+class OutboxMessage(Base):
+    """Follow-up work for a ticket (file / classify / geocode), written in the
+    same transaction as the ticket and published to Redis by workers/outbox.py."""
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticket_id = Column(String, nullable=False)
+    topic = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    dispatched_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_outbox_pending", "dispatched_at", "id"),)
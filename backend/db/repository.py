@@ -1,9 +1,193 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
+import base64
+import csv
+import io
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime
 
 from .session import get_session
-from .models import Ticket
+from sqlalchemy import and_, case, func, or_, select
+
+from . import stats, ticket_cache, ticket_events
+from .models import OPEN_STATUSES, OutboxMessage, Ticket
+from agents.spatial import bounding_box, covering_cells, geohash, haversine_m
+
+COUNT_MODES = ("exact", "cached", "none")
+COUNT_CACHE_TTL_S = float(os.getenv("COUNT_CACHE_TTL_S", "30"))
+_count_cache: Dict[Tuple[Optional[str], Optional[str]], Tuple[float, int]] = {}
+
+TICKET_FIELDS = tuple(c.name for c in Ticket.__table__.columns)
+# What a bulk write reads back to publish its ticket events (ticket_events.py)
+_EVENT_COLUMNS = tuple(Ticket.__table__.c[name] for name in ticket_events.EVENT_FIELDS)
+
+
+def encode_cursor(created_at: datetime, tid: str) -> str:
+    raw = json.dumps([created_at.isoformat() if created_at else None, tid]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, tid = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(tid)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def _projection(fields: Optional[Sequence[str]]) -> List[str]:
+    if not fields:
+        return list(TICKET_FIELDS)
+    names = [f.strip() for f in fields if f and f.strip()]
+    unknown = [n for n in names if n not in TICKET_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(names)) or list(TICKET_FIELDS)
+
+
+def _filtered(stmt, status: Optional[str], iclass: Optional[str]):
+    if status:
+        stmt = stmt.where(Ticket.status == status)
+    if iclass:
+        stmt = stmt.where(Ticket.iclass == iclass)
+    return stmt
+
+
+def list_stmt(
+    limit: int,
+    offset: int,
+    status: Optional[str],
+    iclass: Optional[str],
+    cursor: Optional[str],
+    fields: Optional[Sequence[str]],
+    count: str,
+):
+    """Validate list() arguments. Returns: (names, stmt selecting limit+1 rows, limit)"""
+    if count not in COUNT_MODES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+    limit = max(1, min(limit, 200))
+    names = _projection(fields)
+    # Requested columns first, then the cursor keys if they weren't asked for
+    cols = [Ticket.__table__.c[n] for n in dict.fromkeys([*names, "created_at", "id"])]
+    stmt = _filtered(select(*cols), status, iclass).order_by(Ticket.created_at.desc(), Ticket.id.desc())
+    if cursor:
+        created_at, tid = decode_cursor(cursor)
+        stmt = stmt.where(
+            Ticket.created_at <= created_at,
+            or_(Ticket.created_at < created_at, Ticket.id < tid),
+        )
+    elif offset > 0:
+        stmt = stmt.offset(offset)
+    return names, stmt.limit(limit + 1), limit
+
+
+def page_result(rows, names: List[str], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [dict(zip(names, r)) for r in rows]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if more and rows else None
+    return items, next_cursor
+
+
+def count_stmt(status: Optional[str], iclass: Optional[str]):
+    return _filtered(select(func.count()).select_from(Ticket), status, iclass)
+
+
+def counters_count(counters: Dict[str, float], status: Optional[str], iclass: Optional[str]) -> int:
+    """Total for at most one filter, from the stats counters."""
+    if status:
+        return int(counters.get(f"status:{status}", 0))
+    if iclass:
+        return int(counters.get(f"iclass:{iclass}", 0))
+    return int(sum(v for k, v in counters.items() if k.startswith("status:")))
+
+
+def cached_count(status: Optional[str], iclass: Optional[str]) -> Optional[int]:
+    hit = _count_cache.get((status, iclass))
+    if hit and time.monotonic() - hit[0] < COUNT_CACHE_TTL_S:
+        return hit[1]
+    return None
+
+
+def remember_count(status: Optional[str], iclass: Optional[str], n: int) -> None:
+    _count_cache[(status, iclass)] = (time.monotonic(), n)
+
+
+# Fields with stats counters (db/stats.py)
+_COUNTED = ("status", "iclass", "authority")
+
+
+def _add_deltas(totals: Dict[str, float], changes: Dict[str, float]) -> None:
+    for k, v in changes.items():
+        totals[k] = totals.get(k, 0) + v
+
+
+def _counted_before(db, ids: Sequence[str], changes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Old values of the counted fields `changes` touches (plus what the
+    stats need for a FILED transition), in one query."""
+    counted = [c for c in _COUNTED if c in changes]
+    if not counted:
+        return []
+    cols = dict.fromkeys([*counted, "status", "created_at"])
+    rows = db.execute(select(*[Ticket.__table__.c[c] for c in cols]).where(Ticket.id.in_(ids))).all()
+    return [dict(zip(cols, r)) for r in rows]
+
+
+def with_cell(data: Dict[str, Any]) -> Dict[str, Any]:
+    lat, lng = data.get("lat"), data.get("lng")
+    if lat is not None and lng is not None:
+        return {**data, "cell": geohash(lat, lng)}
+    if "lat" in data or "lng" in data:
+        return {**data, "cell": None}
+    return data
+
+
+# Follow-up work written with the ticket: [(topic, payload), ...]
+Outbox = Sequence[Tuple[str, Dict[str, Any]]]
+
+
+def outbox_rows(tid: str, outbox: Optional[Outbox]) -> List[OutboxMessage]:
+    return [OutboxMessage(ticket_id=tid, topic=topic, payload=json.dumps(payload or {})) for topic, payload in outbox or ()]
+
+
+def _copy_rows(db, values: List[Dict[str, Any]]) -> None:
+    """COPY `values` into tickets on the session's connection (psycopg2),
+    inside its transaction. CSV NULL is an unquoted empty field, so empty
+    strings must already be None."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for row in values:
+        writer.writerow(["" if row[n] is None else row[n].isoformat() if isinstance(row[n], datetime) else row[n]
+                         for n in TICKET_FIELDS])
+    buf.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY tickets ({', '.join(TICKET_FIELDS)}) FROM STDIN WITH (FORMAT csv)", buf)
+    finally:
+        cursor.close()
+
+
+def with_filed_at(data: Dict[str, Any]) -> Dict[str, Any]:
+    """A row inserted as FILED (imports, fixtures) was filed when it was last updated."""
+    if data.get("status") == stats.FILED and not data.get("filed_at"):
+        return {**data, "filed_at": data.get("updated_at") or data.get("created_at") or TicketRepo._now()}
+    return data
+
+
+def apply_changes(t: Ticket, changes: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Set `changes` on a loaded ticket (keeping `cell` and `filed_at` in
+    step). Returns: (before, after)"""
+    before = t.as_dict()
+    if changes.get("status") == stats.FILED and before["status"] != stats.FILED and "filed_at" not in changes:
+        changes = {**changes, "filed_at": changes.get("updated_at") or TicketRepo._now()}
+    for k, v in changes.items():
+        setattr(t, k, v)
+    if "lat" in changes or "lng" in changes:
+        t.cell = geohash(t.lat, t.lng) if t.lat is not None and t.lng is not None else None
+    return before, t.as_dict()
 
 
 class TicketRepo:
@@ -13,13 +197,19 @@ class TicketRepo:
 
     # Create
     @staticmethod
-    def create(data: Dict[str, Any]) -> Dict[str, Any]:
+    def create(data: Dict[str, Any], outbox: Optional[Outbox] = None) -> Dict[str, Any]:
         db = get_session()
         try:
-            t = Ticket(**data)
+            t = Ticket(**with_filed_at(with_cell(data)))
             db.add(t)
+            db.add_all(outbox_rows(t.id, outbox))  # same commit as the ticket
+            db.flush()  # apply column defaults (status, created_at) before counting
+            after = t.as_dict()
+            changes = stats.deltas(None, after)
+            stats.apply_in_session(db, changes)
             db.commit()
-            return t.as_dict()
+            stats.apply_after_commit(changes)
+            return after
         finally:
             db.close()
 
@@ -33,39 +223,408 @@ class TicketRepo:
         finally:
             db.close()
 
-    # List with filters/pagination (best-effort)
+    # Read many in one query. Returns: {id: ticket} for the ids that exist
     @staticmethod
-    def list(limit: int = 50, offset: int = 0, status: Optional[str] = None, iclass: Optional[str] = None) -> Dict[str, Any]:
+    def get_many(ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
         db = get_session()
         try:
-            q = db.query(Ticket)
+            rows = db.execute(select(Ticket.__table__).where(Ticket.id.in_(list(ids)))).all()
+            return {r.id: dict(r._mapping) for r in rows}
+        finally:
+            db.close()
+
+    # Same photo, same place, recently: the resubmission of an existing report
+    @staticmethod
+    def find_duplicate(
+        content_hash: str,
+        lat: Optional[float],
+        lng: Optional[float],
+        since: datetime,
+        radius_m: float = 50.0,
+    ) -> Optional[Dict[str, Any]]:
+        db = get_session()
+        try:
+            rows = (
+                db.query(Ticket)
+                  .filter(Ticket.content_hash == content_hash, Ticket.created_at >= since)
+                  .order_by(Ticket.created_at.desc())
+                  .limit(20)
+                  .all()
+            )
+            for r in rows:
+                if lat is None or lng is None or r.lat is None or r.lng is None:
+                    # Only "no location" matches "no location"
+                    same_place = lat is None and r.lat is None
+                else:
+                    same_place = haversine_m(lat, lng, r.lat, r.lng) <= radius_m
+                if same_place:
+                    return r.as_dict()
+            return None
+        finally:
+            db.close()
+
+    # Radius query: geohash prefix ranges on the indexed cell column, then an
+    # exact distance filter on the few candidates
+    @staticmethod
+    def nearby(
+        lat: float,
+        lng: float,
+        radius_m: float,
+        status: Optional[str] = None,
+        iclass: Optional[str] = None,
+        open_only: bool = False,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        db = get_session()
+        try:
+            ranges = [and_(Ticket.cell >= p, Ticket.cell < p + "~") for p in covering_cells(lat, lng, radius_m)]
+            min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_m)
+            # Only id/lat/lng for candidates; full rows just for the hits
+            q = db.query(Ticket.id, Ticket.lat, Ticket.lng).filter(
+                or_(*ranges), Ticket.lat.between(min_lat, max_lat), Ticket.lng.between(min_lng, max_lng)
+            )
             if status:
                 q = q.filter(Ticket.status == status)
+            elif open_only:
+                q = q.filter(Ticket.status.in_(OPEN_STATUSES))
             if iclass:
                 q = q.filter(Ticket.iclass == iclass)
-            total = q.count()
-            rows = (
-                q.order_by(Ticket.created_at.desc())
-                 .offset(max(0, offset))
-                 .limit(max(1, min(limit, 200)))
-                 .all()
+            hits = []
+            for tid, tlat, tlng in q.all():
+                d = haversine_m(lat, lng, tlat, tlng)
+                if d <= radius_m:
+                    hits.append((d, tid))
+            hits.sort()
+            hits = hits[: max(1, min(limit, 500))]
+            rows = {r.id: r for r in db.query(Ticket).filter(Ticket.id.in_([tid for _, tid in hits]))} if hits else {}
+            return [{**rows[tid].as_dict(), "distance_m": round(d, 1)} for d, tid in hits if tid in rows]
+        finally:
+            db.close()
+
+    # Open, located tickets created after `since` (feeds the in-memory index)
+    @staticmethod
+    def open_points(since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        db = get_session()
+        try:
+            q = db.query(Ticket.id, Ticket.lat, Ticket.lng, Ticket.iclass, Ticket.created_at).filter(
+                Ticket.status.in_(OPEN_STATUSES), Ticket.lat.isnot(None), Ticket.lng.isnot(None)
             )
-            return {"count": total, "items": [r.as_dict() for r in rows]}
+            if since is not None:
+                q = q.filter(Ticket.created_at > since)
+            return [dict(r._mapping) for r in q.all()]
         finally:
             db.close()
 
+    # Fill `cell` for rows written before the column existed
+    @staticmethod
+    def backfill_cells(batch: int = 1000) -> int:
+        db = get_session()
+        done = 0
+        try:
+            while True:
+                rows = (
+                    db.query(Ticket)
+                      .filter(Ticket.cell.is_(None), Ticket.lat.isnot(None), Ticket.lng.isnot(None))
+                      .limit(batch)
+                      .all()
+                )
+                if not rows:
+                    return done
+                for r in rows:
+                    r.cell = geohash(r.lat, r.lng)
+                db.commit()
+                done += len(rows)
+        finally:
+            db.close()
+
+    # List newest first. Pages are keyset-based: `cursor` is the opaque
+    # next_cursor of the previous page, so a deep page costs the same as the
+    # first one. `offset` is still honoured when no cursor is given.
+    # `fields` limits the selected columns; `count` is exact|cached|none.
+    @staticmethod
+    def list(
+        limit: int = 50,
+        offset: int = 0,
+        status: Optional[str] = None,
+        iclass: Optional[str] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        count: str = "exact",
+    ) -> Dict[str, Any]:
+        names, stmt, limit = list_stmt(limit, offset, status, iclass, cursor, fields, count)
+        db = get_session()
+        try:
+            items, next_cursor = page_result(db.execute(stmt).all(), names, limit)
+            total = TicketRepo.count(status, iclass, mode=count, session=db)
+            return {"count": total, "items": items, "next_cursor": next_cursor}
+        finally:
+            db.close()
+
+    # Number of tickets matching the list filters. "cached" answers from the
+    # stats counters when one filter (or none) is set, otherwise from a
+    # COUNT(*) memoised for COUNT_CACHE_TTL_S; "none" skips counting.
+    @staticmethod
+    def count(
+        status: Optional[str] = None,
+        iclass: Optional[str] = None,
+        mode: str = "exact",
+        session=None,
+    ) -> Optional[int]:
+        if mode == "none":
+            return None
+        if mode == "cached":
+            if not (status and iclass):
+                try:
+                    return counters_count(stats.read(), status, iclass)
+                except Exception:
+                    pass
+            hit = cached_count(status, iclass)
+            if hit is not None:
+                return hit
+        db = session or get_session()
+        try:
+            n = db.execute(count_stmt(status, iclass)).scalar_one()
+        finally:
+            if session is None:
+                db.close()
+        remember_count(status, iclass, n)
+        return n
+
     # Update fields
     @staticmethod
-    def update(tid: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def update(tid: str, changes: Dict[str, Any], outbox: Optional[Outbox] = None) -> Optional[Dict[str, Any]]:
         changes = {**changes, "updated_at": TicketRepo._now()}
         db = get_session()
         try:
             t = db.get(Ticket, tid)
             if not t:
                 return None
-            for k, v in changes.items():
-                setattr(t, k, v)
+            before, after = apply_changes(t, changes)
+            db.add_all(outbox_rows(tid, outbox))
+            counter_changes = stats.deltas(before, after)
+            stats.apply_in_session(db, counter_changes)
+            db.commit()
+            stats.apply_after_commit(counter_changes)
+            ticket_cache.invalidate([tid])
+            ticket_events.publish([after], changes)
+            return after
+        finally:
+            db.close()
+
+    # Bulk insert: one executemany, one set of counter upserts, one commit
+    @staticmethod
+    def create_many(rows: Sequence[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        now = TicketRepo._now()
+        defaults = {"status": "CREATED", "created_at": now, "updated_at": now}
+        values = []
+        totals: Dict[str, float] = {}
+        for data in rows:
+            row = {name: None for name in TICKET_FIELDS}
+            row.update(defaults)
+            row.update({k: v for k, v in with_cell(data).items() if v is not None or k not in defaults})
+            row = with_filed_at(row)
+            values.append(row)
+            _add_deltas(totals, stats.deltas(None, row))
+        db = get_session()
+        try:
+            db.execute(Ticket.__table__.insert(), values)
+            stats.apply_in_session(db, totals)
+            db.commit()
+            stats.apply_after_commit(totals)
+            return len(values)
+        finally:
+            db.close()
+
+    # Backfill: like create_many, but rows whose id is already there are left
+    # alone (so a re-run batch is a no-op) and outbox rows go in the same
+    # commit. Rows are complete (see db/bulk_import.py), so on Postgres they
+    # can go in through COPY.
+    @staticmethod
+    def import_many(
+        rows: Sequence[Dict[str, Any]],
+        outbox: Optional[Dict[str, Outbox]] = None,
+        copy: bool = False,
+    ) -> List[str]:
+        """Returns: ids actually inserted"""
+        ids = [r["id"] for r in rows]
+        db = get_session()
+        try:
+            existing = set(db.execute(select(Ticket.id).where(Ticket.id.in_(ids))).scalars())
+            values, seen = [], set(existing)
+            totals: Dict[str, float] = {}
+            for data in rows:
+                if data["id"] in seen:
+                    continue
+                seen.add(data["id"])
+                row = {name: None for name in TICKET_FIELDS}
+                row.update(with_filed_at(with_cell(data)))
+                values.append(row)
+                _add_deltas(totals, stats.deltas(None, row))
+            if not values:
+                return []
+            if copy and db.get_bind().dialect.name == "postgresql":
+                _copy_rows(db, values)
+            else:
+                # executemany: sent as batched multi-row VALUES ("insertmanyvalues")
+                # from one cached compile, unlike a literal insert().values([...])
+                db.execute(Ticket.__table__.insert(), values)
+            for row in values:
+                db.add_all(outbox_rows(row["id"], (outbox or {}).get(row["id"])))
+            stats.apply_in_session(db, totals)
+            db.commit()
+            stats.apply_after_commit(totals)
+            return [row["id"] for row in values]
+        finally:
+            db.close()
+
+    # Same changes for many tickets in one UPDATE ... WHERE id IN (...).
+    # Counted fields (status/iclass/authority) need their old values for the
+    # stats deltas; those are read in one batched SELECT, not per ticket.
+    @staticmethod
+    def update_many(ids: Sequence[str], changes: Dict[str, Any]) -> int:
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return 0
+        if "lat" in changes or "lng" in changes:
+            raise ValueError("update_many doesn't move tickets; use update()")
+        changes = {**changes, "updated_at": TicketRepo._now()}
+        db = get_session()
+        try:
+            before = _counted_before(db, ids, changes)
+            n = db.execute(
+                Ticket.__table__.update().where(Ticket.id.in_(ids)).values(**changes)
+            ).rowcount
+            totals: Dict[str, float] = {}
+            for old in before:
+                _add_deltas(totals, stats.deltas(old, {**old, **changes}))
+            stats.apply_in_session(db, totals)
+            updated = []
+            if ticket_events.TICKET_EVENTS:
+                updated = db.execute(select(*_EVENT_COLUMNS).where(Ticket.id.in_(ids))).all()
+            db.commit()
+            stats.apply_after_commit(totals)
+            ticket_cache.invalidate(ids)
+            ticket_events.publish([dict(r._mapping) for r in updated], changes)
+            return n
+        finally:
+            db.close()
+
+    # Compare-and-set status transition for many tickets in one statement:
+    # only rows still in `expected` move to `to_status`, without reading them
+    # first. `changes` maps id -> extra column values; values that differ per
+    # ticket are set through a CASE on id. Returns: ids that transitioned
+    @staticmethod
+    def transition(changes: Dict[str, Dict[str, Any]], expected: str, to_status: str) -> List[str]:
+        if not changes:
+            return []
+        ids = list(changes)
+        now = TicketRepo._now()
+        columns = sorted({k for c in changes.values() for k in c})
+        if "status" in columns or "lat" in columns or "lng" in columns:
+            raise ValueError("transition() sets status itself and doesn't move tickets")
+        stamps = {"updated_at": now, **({"filed_at": now} if to_status == stats.FILED else {})}
+        values: Dict[str, Any] = {"status": to_status, **stamps}
+        for col in columns:
+            given = {tid: c[col] for tid, c in changes.items() if col in c}
+            first = next(iter(given.values()))
+            if len(given) == len(changes) and all(v == first for v in given.values()):
+                values[col] = first
+            else:
+                # Tickets without the key keep their current value
+                values[col] = case(given, value=Ticket.id, else_=Ticket.__table__.c[col])
+        db = get_session()
+        try:
+            counted = [c for c in columns if c in _COUNTED]
+            before = {}
+            if counted:
+                rows = db.execute(
+                    select(Ticket.id, *[Ticket.__table__.c[c] for c in counted])
+                    .where(Ticket.id.in_(ids), Ticket.status == expected)
+                ).all()
+                before = {r[0]: dict(zip(counted, r[1:])) for r in rows}
+            stmt = (
+                Ticket.__table__.update()
+                .where(Ticket.id.in_(ids), Ticket.status == expected)
+                .values(**values)
+            )
+            # created_at for the stats deltas, the rest for the ticket events
+            returned = (Ticket.created_at, *_EVENT_COLUMNS)
+            if db.bind.dialect.update_returning:
+                done = db.execute(stmt.returning(*returned)).all()
+            else:
+                done = db.execute(
+                    select(*returned).where(Ticket.id.in_(ids), Ticket.status == expected)
+                    .with_for_update()
+                ).all()
+                db.execute(stmt.where(Ticket.id.in_([r.id for r in done])))
+            totals: Dict[str, float] = {}
+            events = []
+            for r in done:
+                old = {"status": expected, "created_at": r.created_at, **before.get(r.id, {})}
+                new = {**old, **changes[r.id], "status": to_status, **stamps}
+                _add_deltas(totals, stats.deltas(old, new))
+                events.append({**r._mapping, **new})
+            stats.apply_in_session(db, totals)
+            db.commit()
+            stats.apply_after_commit(totals)
+            moved = [r.id for r in done]
+            ticket_cache.invalidate(moved)
+            ticket_events.publish(events, ["status", *columns])
+            return moved
+        finally:
+            db.close()
+
+
+class OutboxRepo:
+    """Pending follow-up messages (see workers/outbox.py)."""
+
+    @staticmethod
+    def pending(
+        limit: int = 100,
+        ticket_ids: Optional[Sequence[str]] = None,
+        older_than: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        stmt = select(OutboxMessage.__table__).where(OutboxMessage.dispatched_at.is_(None))
+        if ticket_ids is not None:
+            stmt = stmt.where(OutboxMessage.ticket_id.in_(list(ticket_ids)))
+        if older_than is not None:
+            stmt = stmt.where(OutboxMessage.created_at < older_than)
+        db = get_session()
+        try:
+            rows = db.execute(stmt.order_by(OutboxMessage.id).limit(limit)).all()
+            return [dict(r._mapping) for r in rows]
+        finally:
+            db.close()
+
+    @staticmethod
+    def mark_dispatched(ids: Sequence[int]) -> int:
+        if not ids:
+            return 0
+        db = get_session()
+        try:
+            res = db.execute(
+                OutboxMessage.__table__.update()
+                .where(OutboxMessage.id.in_(list(ids)), OutboxMessage.dispatched_at.is_(None))
+                .values(dispatched_at=TicketRepo._now())
+            )
+            db.commit()
+            return res.rowcount
+        finally:
+            db.close()
+
+    @staticmethod
+    def mark_failed(mid: int, error: str) -> None:
+        db = get_session()
+        try:
+            db.execute(
+                OutboxMessage.__table__.update()
+                .where(OutboxMessage.id == mid)
+                .values(attempts=OutboxMessage.attempts + 1, last_error=error[:500])
+            )
             db.commit()
-            return t.as_dict()
         finally:
             db.close()
@@ -0,0 +1,99 @@
+"""Schema version of the SQL database.
+
+All schema changes are Alembic migrations (backend/migrations/versions) and
+run once per deploy, before the new API processes and workers start:
+
+  python -m db.schema upgrade      # same as: alembic upgrade head
+  python -m db.schema check        # exit 1 unless the database is at head
+
+Process startup only calls check_at_startup(): one SELECT of
+alembic_version, compared with SCHEMA_HEAD. Alembic itself isn't imported
+there. SCHEMA_CHECK says what happens when the versions differ: warn (log
+and carry on), fail (refuse to start) or off.
+
+A database created by the old boot-time create_all + ALTER TABLE is adopted
+by the baseline migration (0001), so `upgrade` is also the way over.
+"""
+from __future__ import annotations
+
+import os
+import sys
+from typing import Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from sqlalchemy import text  # noqa: E402
+
+from db.session import engine  # noqa: E402
+
+# The newest revision in migrations/versions; tests/test_schema.py keeps the two in step
+SCHEMA_HEAD = "0003"
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "warn").lower()
+
+ALEMBIC_INI = os.path.join(ROOT, "alembic.ini")
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def current(bind=None) -> Optional[str]:
+    """The database's revision, or None if it has never been migrated."""
+    try:
+        with (bind or engine).connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except Exception:
+        return None  # no alembic_version table (or no database yet)
+
+
+def check_at_startup(mode: str = SCHEMA_CHECK) -> Optional[str]:
+    if mode == "off":
+        return None
+    rev = current()
+    if rev == SCHEMA_HEAD:
+        return rev
+    msg = f"database schema is at {rev or 'no version'}, code expects {SCHEMA_HEAD}: run python -m db.schema upgrade"
+    if mode == "fail":
+        raise SchemaOutOfDate(msg)
+    print(f"[Schema] {msg}")
+    return rev
+
+
+def alembic_config(connection=None):
+    from alembic.config import Config
+
+    cfg = Config(ALEMBIC_INI)
+    cfg.attributes["configure_logging"] = False
+    if connection is not None:
+        cfg.attributes["connection"] = connection
+    return cfg
+
+
+def upgrade(revision: str = "head", connection=None) -> None:
+    from alembic import command
+
+    command.upgrade(alembic_config(connection), revision)
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Database schema migrations")
+    ap.add_argument("command", choices=["upgrade", "check", "current"])
+    ap.add_argument("revision", nargs="?", default="head")
+    args = ap.parse_args(argv)
+    if args.command == "upgrade":
+        upgrade(args.revision)
+        print(f"[Schema] at {current()}")
+        return 0
+    rev = current()
+    print(rev or "no version")
+    if args.command == "check":
+        return 0 if rev == SCHEMA_HEAD else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
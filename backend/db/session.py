@@ -1,8 +1,12 @@
 import os
+import time
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
+from agents import metrics
+
 # Ensure .env is loaded before reading DB_URL
 load_dotenv()
 
@@ -12,8 +16,44 @@ DB_URL = os.getenv(
     "sqlite:///d:/civicguard/backend/dev.db",
 )
 
-# Enable pre-ping to avoid stale connections; keep defaults for drivers
-engine = create_engine(DB_URL, future=True, pool_pre_ping=True)
+# Pool tuning, shared by the sync engine and the async one in async_session.py.
+# Pre-ping costs a round-trip per checkout; recycling connections before the
+# server/proxy idle timeout avoids most stale ones without it, so it's opt-in.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+
+
+POOL_WAIT = metrics.histogram(
+    "civicguard_db_pool_wait_seconds", "Time spent checking a connection out of the pool", ["engine"]
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited (SQLAlchemy has
+    no event for the start of a checkout, so this wraps the pool's get)."""
+
+    _wait = POOL_WAIT.labels("sync")
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self._wait.observe(time.perf_counter() - t0)
+
+
+def pool_options(url: str, poolclass=None) -> dict:
+    opts = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+        # In-memory SQLite uses a single-connection pool without size knobs
+        return opts
+    opts = {**opts, "pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    return {**opts, "poolclass": poolclass} if poolclass else opts
+
+
+engine = create_engine(DB_URL, future=True, **pool_options(DB_URL, TimedQueuePool))
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 
 def get_session():
@@ -0,0 +1,238 @@
+"""
+Incremental ticket statistics.
+
+Every TicketRepo.create/update turns the before/after ticket into counter
+deltas (status:*, iclass:*, authority:*, filed:<date>, ttf_sum, ttf_count) and
+applies them:
+- STATS_BACKEND=sql (default): upserted into `ticket_stats` in the same
+  transaction as the ticket write, so counters never drift from the rows;
+- STATS_BACKEND=redis: HINCRBYFLOAT on one hash after the commit.
+
+/api/stats then reads a handful of counters instead of scanning tickets.
+`rebuild()` recomputes everything with GROUP BY queries for repair:
+
+  python -m db.stats rebuild
+  python -m db.stats show
+"""
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, or_, select
+
+from .models import Ticket, TicketStat
+from .session import engine, get_session
+
+STATS_BACKEND = os.getenv("STATS_BACKEND", "sql").lower()
+REDIS_KEY = "ticket_stats"
+
+FILED = "FILED"
+
+
+def _day(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return None
+
+
+def deltas(before: Optional[Dict[str, Any]], after: Dict[str, Any]) -> Dict[str, float]:
+    """Counter changes implied by a ticket going from `before` (None on create) to `after`."""
+    out: Dict[str, float] = defaultdict(float)
+    for field in ("status", "iclass", "authority"):
+        old = (before or {}).get(field)
+        new = after.get(field)
+        if before is not None and old == new:
+            continue
+        if old:
+            out[f"{field}:{old}"] -= 1
+        if new:
+            out[f"{field}:{new}"] += 1
+
+    old_status = (before or {}).get("status")
+    if after.get("status") == FILED and old_status != FILED:
+        filed_at = after.get("filed_at")
+        day = _day(filed_at)
+        if day:
+            out[f"filed:{day}"] += 1
+        created_at = after.get("created_at")
+        if isinstance(created_at, datetime) and isinstance(filed_at, datetime) and filed_at >= created_at:
+            out["ttf_sum"] += (filed_at - created_at).total_seconds()
+            out["ttf_count"] += 1
+    return {k: v for k, v in out.items() if v}
+
+
+def upsert_stmt(dialect: str, key: Optional[str] = None, delta: Optional[float] = None):
+    """Single-statement `value += delta` upsert, or None if the dialect has none.
+    Without key/delta the values are bound per execution (executemany)."""
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    stmt = insert(TicketStat)
+    if key is not None:
+        stmt = stmt.values(key=key, value=delta)
+    return stmt.on_conflict_do_update(
+        index_elements=[TicketStat.key], set_={"value": TicketStat.value + stmt.excluded.value}
+    )
+
+
+def _upsert(session, key: str, delta: float) -> None:
+    dialect = session.bind.dialect.name if session.bind is not None else engine.dialect.name
+    stmt = upsert_stmt(dialect, key, delta)
+    if stmt is not None:
+        session.execute(stmt)
+        return
+    # Portable fallback
+    updated = session.query(TicketStat).filter(TicketStat.key == key).update(
+        {TicketStat.value: TicketStat.value + delta}, synchronize_session=False
+    )
+    if not updated:
+        session.add(TicketStat(key=key, value=delta))
+
+
+def _redis():
+    from workers.queue import redis
+
+    return redis
+
+
+def apply_in_session(session, changes: Dict[str, float]) -> None:
+    """SQL backend: stage the counter upserts in the caller's transaction."""
+    if STATS_BACKEND != "sql" or not changes:
+        return
+    ordered = sorted(changes.items())  # stable lock order
+    dialect = session.bind.dialect.name if session.bind is not None else engine.dialect.name
+    stmt = upsert_stmt(dialect)
+    if stmt is not None and len(ordered) > 1:
+        # Bulk writes touch many keys (a filed:<day> per day): one executemany
+        session.execute(stmt, [{"key": key, "value": delta} for key, delta in ordered])
+        return
+    for key, delta in ordered:
+        _upsert(session, key, delta)
+
+
+def apply_after_commit(changes: Dict[str, float]) -> None:
+    """Redis backend: best-effort increments once the ticket write committed."""
+    if STATS_BACKEND != "redis" or not changes:
+        return
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for key, delta in changes.items():
+            pipe.hincrbyfloat(REDIS_KEY, key, delta)
+        pipe.execute()
+    except Exception as e:
+        print("[Stats] redis increment failed:", e)
+
+
+def _today_key(today: Optional[date] = None) -> str:
+    return f"filed:{(today or datetime.utcnow().date()).isoformat()}"
+
+
+def read_stmt(today: Optional[date] = None):
+    """SQL backend query for read(); also run by the async repository."""
+    return select(TicketStat.key, TicketStat.value).where(
+        or_(~TicketStat.key.like("filed:%"), TicketStat.key == _today_key(today))
+    )
+
+
+def read(today: Optional[date] = None) -> Dict[str, float]:
+    """Current counters, skipping per-day filing counters other than today's."""
+    if STATS_BACKEND == "redis":
+        today_key = _today_key(today)
+        raw = _redis().hgetall(REDIS_KEY)
+        items = {k.decode(): float(v) for k, v in raw.items()}
+        return {k: v for k, v in items.items() if not k.startswith("filed:") or k == today_key}
+    db = get_session()
+    try:
+        return {k: v for k, v in db.execute(read_stmt(today)).all()}
+    finally:
+        db.close()
+
+
+def compute() -> Dict[str, float]:
+    """Recompute all counters from the tickets table."""
+    out: Dict[str, float] = defaultdict(float)
+    db = get_session()
+    try:
+        for field in ("status", "iclass", "authority"):
+            col = getattr(Ticket, field)
+            for value, n in db.execute(select(col, func.count()).where(col.isnot(None)).group_by(col)):
+                out[f"{field}:{value}"] = n
+        for day, n in db.execute(
+            select(func.date(Ticket.filed_at), func.count()).where(Ticket.status == FILED).group_by(func.date(Ticket.filed_at))
+        ):
+            if day:
+                out[f"filed:{_day(day) or day}"] = n
+        # Time-to-file needs timestamp arithmetic that differs per dialect;
+        # stream the two columns instead.
+        rows = db.execute(
+            select(Ticket.created_at, Ticket.filed_at).where(Ticket.status == FILED).execution_options(yield_per=5000)
+        )
+        for created_at, filed_at in rows:
+            if created_at and filed_at and filed_at >= created_at:
+                out["ttf_sum"] += (filed_at - created_at).total_seconds()
+                out["ttf_count"] += 1
+        return dict(out)
+    finally:
+        db.close()
+
+
+def rebuild() -> Dict[str, float]:
+    """Replace the stored counters with a fresh GROUP BY computation."""
+    counters = compute()
+    if STATS_BACKEND == "redis":
+        pipe = _redis().pipeline()
+        pipe.delete(REDIS_KEY)
+        if counters:
+            pipe.hset(REDIS_KEY, mapping=counters)
+        pipe.execute()
+        return counters
+    db = get_session()
+    try:
+        db.query(TicketStat).delete()
+        db.add_all(TicketStat(key=k, value=v) for k, v in counters.items())
+        db.commit()
+        return counters
+    finally:
+        db.close()
+
+
+def ensure_initialized() -> None:
+    """Seed counters on first boot against a DB that predates them."""
+    if STATS_BACKEND == "redis":
+        if not _redis().exists(REDIS_KEY):
+            rebuild()
+        return
+    db = get_session()
+    try:
+        seeded = db.execute(select(TicketStat.key).limit(1)).first() is not None
+        has_tickets = db.execute(select(Ticket.id).limit(1)).first() is not None
+    finally:
+        db.close()
+    if not seeded and has_tickets:
+        rebuild()
+
+
+def main(argv=None):
+    import argparse
+    import json
+
+    ap = argparse.ArgumentParser(description="Ticket statistics maintenance")
+    ap.add_argument("command", choices=["rebuild", "show"])
+    args = ap.parse_args(argv)
+    if args.command == "rebuild":
+        counters = rebuild()
+        print(f"rebuilt {len(counters)} counters")
+    else:
+        print(json.dumps(read(), indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
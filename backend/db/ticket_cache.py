@@ -0,0 +1,337 @@
+"""Read-through cache for GET /api/tickets/{tid}.
+
+Citizens poll their ticket while it goes CREATED -> FILING -> FILED, so the
+same few rows are read over and over between rare writes. Entries are the
+JSON body the endpoint sends plus an ETag over it, so a hit costs neither a
+session nor a re-serialisation, and an unchanged ticket answers 304.
+
+Tiers (TICKET_CACHE):
+- memory (default): an in-process LRU of TICKET_CACHE_SIZE tickets.
+- redis: the LRU in front of a Redis tier shared by every API process.
+- none: straight to the database.
+
+Every TicketRepo/AsyncTicketRepo write (update, update_many, transition)
+calls invalidate() after its commit: the ids are dropped locally, deleted
+from Redis and published on TICKET_CACHE_CHANNEL, which each API process
+listens to (start_listener(), from the app lifespan) to drop its own copies;
+that's how RQ worker writes reach the API. Redis entries are only written if
+the ticket's version key didn't move while the row was being read, so a slow
+reader can't put back what a writer just invalidated. TICKET_CACHE_TTL_S
+bounds how long a missed message (Redis down, listener reconnecting) can
+leave a stale entry.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+MODE = os.getenv("TICKET_CACHE", "memory").lower()  # memory | redis | none
+MAX_ENTRIES = int(os.getenv("TICKET_CACHE_SIZE", "10000"))
+TTL_S = float(os.getenv("TICKET_CACHE_TTL_S", "60"))
+CHANNEL = os.getenv("TICKET_CACHE_CHANNEL", "civicguard:tickets:invalidate")
+# After a failed publish, don't try Redis again on every write for this long
+PUBLISH_BACKOFF_S = 30.0
+
+# (JSON body, ETag)
+Entry = Tuple[bytes, str]
+
+
+def _default(v: Any) -> Any:
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+
+def encode(ticket: Dict[str, Any]) -> Entry:
+    """The body FastAPI's JSONResponse would send for `ticket`, and its ETag."""
+    body = json.dumps(ticket, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    return body, '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+
+def redis_client():
+    from redis import Redis
+    from workers.queue import REDIS_HOST, REDIS_PORT
+
+    # Not the queue's client: without its retries an unreachable Redis costs
+    # a write one refused connection, not seconds of backoff
+    return Redis(host=REDIS_HOST, port=REDIS_PORT, socket_connect_timeout=1, retry=None)
+
+
+class _RedisStore:
+    PREFIX = "ticket:"
+    VERSION = "ticketv:"
+
+    def __init__(self, redis, ttl_s: float):
+        self.redis = redis
+        self.ttl = max(1, int(ttl_s))
+
+    def get(self, tid: str) -> Tuple[Optional[Entry], Optional[bytes]]:
+        """Returns: (entry or None, current version for a later put())"""
+        raw, version = self.redis.mget(self.PREFIX + tid, self.VERSION + tid)
+        if raw is None:
+            return None, version
+        etag, _, body = raw.partition(b"\n")
+        return (body, etag.decode()), version
+
+    def put(self, tid: str, entry: Entry, version: Optional[bytes]) -> bool:
+        from redis.exceptions import WatchError
+
+        vkey = self.VERSION + tid
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(vkey)
+                if pipe.get(vkey) != version:
+                    return False
+                pipe.multi()
+                pipe.setex(self.PREFIX + tid, self.ttl, entry[1].encode() + b"\n" + entry[0])
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def invalidate(self, ids: Iterable[str], channel: str) -> None:
+        ids = list(ids)
+        pipe = self.redis.pipeline(transaction=False)
+        for tid in ids:
+            pipe.incr(self.VERSION + tid)
+            pipe.expire(self.VERSION + tid, self.ttl * 2)
+        pipe.delete(*[self.PREFIX + tid for tid in ids])
+        pipe.publish(channel, json.dumps(ids))
+        pipe.execute()
+
+
+class TicketCache:
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        ttl_s: float = TTL_S,
+        store: Optional[_RedisStore] = None,
+        redis=None,
+        channel: str = CHANNEL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.store = store
+        self.redis = redis  # pub/sub; the store's connection when there is one
+        self.channel = channel
+        self.clock = clock
+        self._lru: "OrderedDict[str, Tuple[bytes, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a fill that started before one is dropped
+        self._generation = 0
+        self._inflight: Dict[str, "asyncio.Future[Optional[Entry]]"] = {}
+        self._publish_after = 0.0
+        self._listener: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "store_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "stale_fills": 0,
+            "store_errors": 0,
+        }
+
+    # Local tier
+    def _local_get(self, tid: str) -> Optional[Entry]:
+        with self._lock:
+            item = self._lru.get(tid)
+            if item is None:
+                return None
+            if item[2] < self.clock():
+                del self._lru[tid]
+                return None
+            self._lru.move_to_end(tid)
+            return item[0], item[1]
+
+    def _local_put(self, tid: str, entry: Entry, generation: int) -> bool:
+        with self._lock:
+            if generation != self._generation:
+                self.counters["stale_fills"] += 1
+                return False
+            self._lru[tid] = (entry[0], entry[1], self.clock() + self.ttl_s)
+            self._lru.move_to_end(tid)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+            return True
+
+    def drop(self, ids: Iterable[str]) -> None:
+        """Forget `ids` in this process only (the pub/sub handler)."""
+        with self._lock:
+            self._generation += 1
+            for tid in ids:
+                self._lru.pop(tid, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._lru.clear()
+
+    # Read-through
+    def _store_get(self, tid: str) -> Tuple[Optional[Entry], Optional[bytes]]:
+        try:
+            return self.store.get(tid)
+        except Exception:
+            self.counters["store_errors"] += 1
+            return None, None
+
+    def _store_put(self, tid: str, entry: Entry, version: Optional[bytes]) -> None:
+        try:
+            if not self.store.put(tid, entry, version):
+                self.counters["stale_fills"] += 1
+        except Exception:
+            self.counters["store_errors"] += 1
+
+    async def get(self, tid: str, load: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Entry]:
+        """Cached (body, etag) for `tid`, reading it with `load` on a miss.
+        Concurrent misses for one ticket share a single `load`."""
+        entry = self._local_get(tid)
+        if entry is not None:
+            self.counters["hits"] += 1
+            return entry
+        pending = self._inflight.get(tid)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[tid] = fut
+        try:
+            entry = await self._fill(tid, load)
+            fut.set_result(entry)
+            return entry
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # retrieved: no "never retrieved" warning without waiters
+            raise
+        finally:
+            del self._inflight[tid]
+
+    async def _fill(self, tid: str, load) -> Optional[Entry]:
+        generation = self._generation
+        version = None
+        if self.store is not None:
+            entry, version = await asyncio.to_thread(self._store_get, tid)
+            if entry is not None:
+                self.counters["store_hits"] += 1
+                self._local_put(tid, entry, generation)
+                return entry
+        self.counters["misses"] += 1
+        ticket = await load(tid)
+        if ticket is None:
+            return None  # not cached: the id may be created any moment
+        entry = encode(ticket)
+        self._local_put(tid, entry, generation)
+        if self.store is not None:
+            await asyncio.to_thread(self._store_put, tid, entry, version)
+        return entry
+
+    # Writes
+    def invalidate(self, ids: Iterable[str]) -> None:
+        """After a committed write: drop `ids` here, in Redis and (published)
+        in every other API process."""
+        ids = [str(tid) for tid in ids]
+        if not ids:
+            return
+        self.counters["invalidations"] += len(ids)
+        self.drop(ids)
+        if self.redis is None or self.clock() < self._publish_after:
+            return
+        try:
+            if self.store is not None:
+                self.store.invalidate(ids, self.channel)
+            else:
+                self.redis.publish(self.channel, json.dumps(ids))
+        except Exception as e:
+            self.counters["store_errors"] += 1
+            self._publish_after = self.clock() + PUBLISH_BACKOFF_S
+            print("[TicketCache] invalidation publish failed:", e)
+
+    # Pub/sub
+    def _on_message(self, data: bytes) -> None:
+        try:
+            ids = json.loads(data)
+        except ValueError:
+            return
+        self.drop(ids)
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Whatever was published while we weren't listening is lost
+                self.clear()
+                while not self._stop.is_set():
+                    msg = pubsub.get_message(timeout=1.0)
+                    if msg and msg.get("type") == "message":
+                        self._on_message(msg["data"])
+            except Exception as e:
+                print("[TicketCache] invalidation listener error:", e)
+                self.clear()
+                self._stop.wait(5.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def start_listener(self) -> bool:
+        """Drop entries other processes invalidate. Returns: whether it started"""
+        if self.redis is None or self._listener is not None:
+            return False
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, name="ticket-cache-invalidations", daemon=True)
+        self._listener.start()
+        return True
+
+    def stop_listener(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=2.0)
+            self._listener = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = len(self._lru)
+        return {**self.counters, "size": size}
+
+
+_cache: Optional[TicketCache] = None
+_cache_lock = threading.Lock()
+
+
+def _make_cache(mode: str) -> Optional[TicketCache]:
+    if mode not in ("memory", "redis"):
+        return None
+    try:
+        redis = redis_client()
+    except Exception as e:
+        print(f"[TicketCache] redis unavailable, local invalidation only: {e}")
+        redis = None
+    store = _RedisStore(redis, TTL_S) if mode == "redis" and redis is not None else None
+    return TicketCache(store=store, redis=redis)
+
+
+def get_cache() -> Optional[TicketCache]:
+    """The process-wide cache, None with TICKET_CACHE=none."""
+    global _cache
+    if _cache is None and MODE != "none":
+        with _cache_lock:
+            if _cache is None:
+                _cache = _make_cache(MODE)
+    return _cache
+
+
+def invalidate(ids: Iterable[str]) -> None:
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate(ids)
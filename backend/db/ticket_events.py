@@ -0,0 +1,100 @@
+"""Ticket change events for the push endpoints (app/events.py).
+
+TicketRepo/AsyncTicketRepo writes call publish() after their commit with one
+event per changed ticket: the fields subscribers filter and display on
+(EVENT_FIELDS) plus `changed`, the columns the write set. Events go to
+
+- listeners in this process (the API's broker), directly, and
+- Redis pub/sub on TICKET_EVENTS_CHANNEL, for the other API processes; that
+  is how RQ worker writes (filing, classification) reach browsers.
+
+Messages carry the publishing process (origin()) so a broker skips what it
+already got directly. Delivery is best effort, like the counters in stats.py:
+a subscriber that misses events resyncs from GET /api/tickets/{tid}.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+TICKET_EVENTS = os.getenv("TICKET_EVENTS", "1") == "1"
+CHANNEL = os.getenv("TICKET_EVENTS_CHANNEL", "civicguard:tickets:events")
+EVENT_FIELDS = ("id", "status", "iclass", "severity", "authority", "authority_ticket_id", "lat", "lng", "updated_at")
+PUBLISH_BACKOFF_S = 30.0
+
+Listener = Callable[[List[Dict[str, Any]]], None]
+_listeners: List[Listener] = []
+_lock = threading.Lock()
+_client = None
+_publish_after = 0.0
+
+
+def origin() -> str:
+    # Per pid, not per import: forked API workers are separate subscribers
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def event(row: Dict[str, Any], changed: Iterable[str]) -> Dict[str, Any]:
+    ev = {}
+    for name in EVENT_FIELDS:
+        v = row.get(name)
+        ev[name] = v.isoformat() if isinstance(v, (datetime, date)) else v
+    ev["changed"] = sorted(c for c in changed if c != "updated_at")
+    return ev
+
+
+def add_listener(fn: Listener) -> None:
+    with _lock:
+        _listeners.append(fn)
+
+
+def remove_listener(fn: Listener) -> None:
+    with _lock:
+        if fn in _listeners:
+            _listeners.remove(fn)
+
+
+def _redis():
+    global _client
+    if _client is None:
+        from .ticket_cache import redis_client
+
+        _client = redis_client()
+    return _client
+
+
+def publish(rows: Sequence[Dict[str, Any]], changed: Iterable[str]) -> None:
+    """After a committed write of `rows` (each with at least EVENT_FIELDS)."""
+    global _publish_after
+    if not TICKET_EVENTS or not rows:
+        return
+    changed = list(changed)
+    events = [event(r, changed) for r in rows]
+    with _lock:
+        listeners = list(_listeners)
+    for fn in listeners:
+        try:
+            fn(events)
+        except Exception as e:
+            print("[TicketEvents] listener failed:", e)
+    if time.monotonic() < _publish_after:
+        return
+    try:
+        _redis().publish(CHANNEL, json.dumps({"origin": origin(), "events": events}))
+    except Exception as e:
+        _publish_after = time.monotonic() + PUBLISH_BACKOFF_S
+        print("[TicketEvents] publish failed:", e)
+
+
+def decode(data: bytes) -> Optional[Dict[str, Any]]:
+    """A pub/sub message, None if it's malformed."""
+    try:
+        msg = json.loads(data)
+        return msg if isinstance(msg, dict) and isinstance(msg.get("events"), list) else None
+    except ValueError:
+        return None
@@ -0,0 +1,68 @@
+"""Alembic environment: runs the migrations in versions/ against DB_URL.
+
+Postgres: the run holds an advisory lock, so two deploy steps started at
+once apply the migrations one after the other instead of racing on DDL.
+"""
+import os
+import sys
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import text
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from db.models import Base  # noqa: E402
+from db.session import DB_URL, engine  # noqa: E402
+
+config = context.config
+# From the alembic CLI only; db/schema.py leaves the app's logging alone
+if config.config_file_name is not None and config.attributes.get("configure_logging", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+MIGRATION_LOCK_ID = 7283401  # pg_advisory_lock key, any constant
+
+
+def run_migrations_offline() -> None:
+    """`alembic upgrade head --sql`: the DDL as a script, for review."""
+    context.configure(url=DB_URL, target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",  # ALTER via table copy
+    )
+    postgres = connection.dialect.name == "postgresql"
+    if postgres:
+        connection.execute(text("SELECT pg_advisory_lock(:k)"), {"k": MIGRATION_LOCK_ID})
+        connection.commit()  # session-level lock; the migrations get their own transaction
+    try:
+        with context.begin_transaction():
+            context.run_migrations()
+    finally:
+        if postgres:
+            connection.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MIGRATION_LOCK_ID})
+            connection.commit()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,147 @@
+"""Baseline: the schema app/main.py used to create and patch at boot
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+An empty database gets the three tables. A database created by the old
+boot-time create_all + ALTER TABLE (any vintage) is brought up to the same
+point: missing columns and indexes are added and `cell` is filled for
+located rows, as _ensure_columns did. Either way it ends up stamped 0001.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Added to tickets over time by the boot-time ALTERs
+ADDED_COLUMNS = {
+    "media_url": sa.String,
+    "thumb_url": sa.String,
+    "preview_url": sa.String,
+    "confidence": sa.Float,
+    "content_hash": sa.String,
+    "cell": sa.String,
+    "parent_id": sa.String,
+}
+TICKET_INDEXES = {
+    "ix_tickets_content_hash": ["content_hash"],
+    "ix_tickets_cell": ["cell"],
+    "ix_tickets_parent_id": ["parent_id"],
+    "ix_tickets_created_at_id": ["created_at", "id"],
+    "ix_tickets_status_created_at_id": ["status", "created_at", "id"],
+    "ix_tickets_iclass_created_at_id": ["iclass", "created_at", "id"],
+}
+
+
+def _create_tickets() -> None:
+    op.create_table(
+        "tickets",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("iclass", sa.String(), nullable=False),
+        sa.Column("severity", sa.String()),
+        sa.Column("confidence", sa.Float()),
+        sa.Column("lat", sa.Float()),
+        sa.Column("lng", sa.Float()),
+        sa.Column("address", sa.String()),
+        sa.Column("status", sa.String()),
+        sa.Column("authority", sa.String()),
+        sa.Column("authority_ticket_id", sa.String()),
+        sa.Column("contact", sa.String()),
+        sa.Column("media_url", sa.String()),
+        sa.Column("thumb_url", sa.String()),
+        sa.Column("preview_url", sa.String()),
+        sa.Column("content_hash", sa.String()),
+        sa.Column("cell", sa.String()),
+        sa.Column("parent_id", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+
+def _create_ticket_stats() -> None:
+    op.create_table(
+        "ticket_stats",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("value", sa.Float(), nullable=False),
+    )
+
+
+def _create_outbox() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("ticket_id", sa.String(), nullable=False),
+        sa.Column("topic", sa.String(), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("dispatched_at", sa.DateTime()),
+    )
+    op.create_index("ix_outbox_pending", "outbox", ["dispatched_at", "id"])
+
+
+def _backfill_cells(bind) -> None:
+    from agents.spatial import geohash
+
+    tickets = sa.table("tickets", sa.column("id"), sa.column("lat"), sa.column("lng"), sa.column("cell"))
+    while True:
+        rows = bind.execute(
+            sa.select(tickets.c.id, tickets.c.lat, tickets.c.lng)
+            .where(tickets.c.cell.is_(None), tickets.c.lat.isnot(None), tickets.c.lng.isnot(None))
+            .limit(1000)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            tickets.update().where(tickets.c.id == sa.bindparam("tid")).values(cell=sa.bindparam("c")),
+            [{"tid": r.id, "c": geohash(r.lat, r.lng)} for r in rows],
+        )
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        # --sql: no database to inspect, so the script for an empty one
+        _create_tickets()
+        for name, cols in TICKET_INDEXES.items():
+            op.create_index(name, "tickets", cols)
+        _create_ticket_stats()
+        _create_outbox()
+        return
+
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    tables = set(insp.get_table_names())
+    if "tickets" not in tables:
+        _create_tickets()
+        indexes = set()
+    else:
+        have = {c["name"] for c in insp.get_columns("tickets")}
+        added = [name for name in ADDED_COLUMNS if name not in have]
+        for name in added:
+            op.add_column("tickets", sa.Column(name, ADDED_COLUMNS[name]()))
+        if "cell" in added:
+            _backfill_cells(bind)
+        indexes = {ix["name"] for ix in insp.get_indexes("tickets")}
+    for name, cols in TICKET_INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, "tickets", cols)
+    if "ticket_stats" not in tables:
+        _create_ticket_stats()
+    if "outbox" not in tables:
+        _create_outbox()
+    elif "ix_outbox_pending" not in {ix["name"] for ix in insp.get_indexes("outbox")}:
+        op.create_index("ix_outbox_pending", "outbox", ["dispatched_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_table("outbox")
+    op.drop_table("ticket_stats")
+    op.drop_table("tickets")
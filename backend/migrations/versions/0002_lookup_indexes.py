@@ -0,0 +1,49 @@
+"""Composite indexes for the duplicate-photo and radius lookups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+- find_duplicate filters content_hash and a created_at window, newest
+  first: (content_hash, created_at) answers it in index order, with no sort.
+- nearby scans geohash cell ranges and then filters a lat/lng box:
+  (cell, lat, lng) checks the box in the index, before reading rows.
+
+Each one replaces the single-column index that is its prefix. On Postgres
+they are built CONCURRENTLY, so writes carry on during the deploy.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REPLACED = [
+    # (new, columns, old, old columns)
+    ("ix_tickets_content_hash_created_at", ["content_hash", "created_at"], "ix_tickets_content_hash", ["content_hash"]),
+    ("ix_tickets_cell_lat_lng", ["cell", "lat", "lng"], "ix_tickets_cell", ["cell"]),
+]
+
+
+def _swap(create: str, columns, drop: str) -> None:
+    if op.get_context().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(create, "tickets", columns, postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(drop, table_name="tickets", postgresql_concurrently=True, if_exists=True)
+        return
+    op.create_index(create, "tickets", columns, if_not_exists=True)
+    op.drop_index(drop, table_name="tickets", if_exists=True)
+
+
+def upgrade() -> None:
+    for new, columns, old, _ in REPLACED:
+        _swap(new, columns, old)
+
+
+def downgrade() -> None:
+    for new, _, old, old_columns in REPLACED:
+        _swap(old, old_columns, new)
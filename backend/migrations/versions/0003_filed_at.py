@@ -0,0 +1,32 @@
+"""tickets.filed_at: when the ticket went FILED
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+The filed-per-day counters and time-to-file used updated_at of FILED
+tickets, which later writes (thumbnails, a late geocode, cluster updates)
+move on. filed_at is set once, by the write that files the ticket.
+
+Tickets already FILED get their updated_at, the best guess there is.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("tickets", sa.Column("filed_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE tickets SET filed_at = updated_at WHERE status = 'FILED'")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("tickets") as batch:
+        batch.drop_column("filed_at")
@@ -7,3 +7,11 @@ async def recv(req: Request):
     data = await req.json()
     print("[MockAuthority] received:", data)
     return {"ok": True, "ticket": "AUTH123"}
+
+
+@app.post("/mock-authority/batch")
+async def recv_batch(req: Request):
+    data = await req.json()
+    filings = data.get("filings") or []
+    print(f"[MockAuthority] received batch of {len(filings)}")
+    return {"ok": True, "tickets": [f"AUTH{i + 1:03d}" for i in range(len(filings))]}
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+# Point the app at throwaway SQLite files before anything imports db.session
+_TMP = tempfile.mkdtemp(prefix="civicguard-tests-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["GEOCODE_CACHE_PATH"] = os.path.join(_TMP, "geocode_cache.db")
+# ... and keep uploads, derivatives and the media proxy cache out of backend/media
+os.environ["MEDIA_DIR"] = os.path.join(_TMP, "media")
+os.environ["MEDIA_DISK_CACHE_DIR"] = os.path.join(_TMP, "media-cache")
+os.environ.pop("MAPBOX_TOKEN", None)
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# The test database gets the real schema, built by the migrations
+from db import schema  # noqa: E402
+
+schema.upgrade()
@@ -1,3 +1,4 @@
+import fakeredis
 from fastapi.testclient import TestClient
 from app.main import app
 from PIL import Image
@@ -30,3 +31,73 @@ def test_upload_accepts_image_and_returns_metadata():
     assert payload["content_type"].startswith("image/")
     assert payload["size"] == len(data)
     assert isinstance(payload["sha256"], str) and len(payload["sha256"]) == 64
+
+
+def _jpeg_bytes():
+    img = Image.new("RGB", (8, 8), color=(0, 255, 0))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_intake_creates_ticket_and_enqueues(monkeypatch):
+    import app.main as main
+    from workers.outbox import OutboxRelay
+
+    relay = OutboxRelay(fakeredis.FakeStrictRedis(), filing_mode="job")
+    monkeypatch.setattr(main, "reverse_geocode", lambda lat, lng: "12 Test Street")
+    monkeypatch.setattr(main, "outbox_relay", relay)
+
+    r = client.post(
+        "/api/intake",
+        files={"image": ("pothole.jpg", _jpeg_bytes(), "image/jpeg")},
+        data={"lat": "13.08", "lng": "80.27", "contact": "a@example.com"},
+    )
+    assert r.status_code == 200
+    payload = r.json()
+    assert payload["class"] == "pothole"
+    assert payload["address"] == "12 Test Street"
+    job = relay.queues["file"].jobs[0]
+    assert job.id == f"file-{payload['id']}" and job.args[0] == payload["id"]
+
+    t = client.get(f"/api/tickets/{payload['id']}").json()
+    assert t["status"] == "CREATED"
+    assert t["address"] == "12 Test Street"
+
+
+def test_upload_rejects_oversized_file(monkeypatch):
+    import app.main as main
+
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 100)
+    r = client.post("/upload", files={"file": ("big.jpg", _jpeg_bytes() + b"\0" * 200, "image/jpeg")})
+    assert r.status_code == 413
+
+
+def test_intake_resubmission_returns_existing_ticket(monkeypatch):
+    import app.main as main
+    from workers.outbox import OutboxRelay
+
+    relay = OutboxRelay(fakeredis.FakeStrictRedis(), filing_mode="job")
+    monkeypatch.setattr(main, "reverse_geocode", lambda lat, lng: "Dup Street")
+    monkeypatch.setattr(main, "outbox_relay", relay)
+
+    img = Image.new("RGB", (8, 8), color=(1, 2, 3))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+
+    def post(lat):
+        return client.post(
+            "/api/intake",
+            files={"image": ("garbage.jpg", buf.getvalue(), "image/jpeg")},
+            data={"lat": str(lat), "lng": "77.5"},
+        ).json()
+
+    first = post(12.9)
+    again = post(12.90001)   # ~1 m away
+    elsewhere = post(13.9)   # same photo, different place
+    assert first["duplicate"] is False
+    assert again["duplicate"] is True and again["id"] == first["id"]
+    assert elsewhere["duplicate"] is False and elsewhere["id"] != first["id"]
+    assert len(relay.queues["file"].job_ids) == 2
+    # Content-addressed storage: one object for all three submissions
+    assert first["file_url"] == elsewhere["file_url"]
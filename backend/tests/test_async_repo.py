@@ -0,0 +1,39 @@
+import asyncio
+import uuid
+
+from db import stats
+from db.async_repository import AsyncTicketRepo
+from db.async_session import async_url
+from db.repository import TicketRepo
+
+
+def test_async_url_drivers():
+    assert async_url("sqlite:////tmp/x.db") == "sqlite+aiosqlite:////tmp/x.db"
+    assert async_url("postgresql+psycopg2://u:p@h/db?sslmode=require") == "postgresql+asyncpg://u:p@h/db?ssl=require"
+    assert async_url("postgres://u:p@h/db?sslmode=disable") == "postgresql+asyncpg://u:p@h/db"
+
+
+def test_async_repo_matches_sync_repo():
+    iclass = f"async-{uuid.uuid4().hex[:8]}"
+
+    async def scenario():
+        before = await AsyncTicketRepo.stats()
+        t = await AsyncTicketRepo.create({"id": str(uuid.uuid4()), "iclass": iclass, "lat": -30.0, "lng": -50.0})
+        assert t["status"] == "CREATED" and t["cell"]
+        await AsyncTicketRepo.create({"id": str(uuid.uuid4()), "iclass": iclass})
+        updated = await AsyncTicketRepo.update(t["id"], {"status": "FILED"})
+        assert updated["status"] == "FILED"
+        assert await AsyncTicketRepo.update("missing", {"status": "FILED"}) is None
+        after = await AsyncTicketRepo.stats()
+        page = await AsyncTicketRepo.list(limit=1, iclass=iclass)
+        rest = await AsyncTicketRepo.list(limit=1, iclass=iclass, cursor=page["next_cursor"], count="cached")
+        return t, before, after, page, rest
+
+    t, before, after, page, rest = asyncio.run(scenario())
+    assert TicketRepo.get(t["id"])["status"] == "FILED"
+    assert after[f"iclass:{iclass}"] == 2
+    assert after.get("status:FILED", 0) == before.get("status:FILED", 0) + 1
+    assert after == stats.read()
+    assert page["count"] == 2 and rest["count"] == 2 and rest["next_cursor"] is None
+    sync_ids = [x["id"] for x in TicketRepo.list(limit=10, iclass=iclass)["items"]]
+    assert [x["id"] for x in page["items"] + rest["items"]] == sync_ids
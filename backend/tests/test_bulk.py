@@ -0,0 +1,106 @@
+import time
+import uuid
+
+import fakeredis
+import pytest
+
+from db import stats
+from db.models import TicketStat
+from db.repository import TicketRepo
+from db.session import get_session
+from workers.coalesce import StatusCoalescer
+
+
+def _ids(n):
+    return [str(uuid.uuid4()) for _ in range(n)]
+
+
+def _counters_consistent():
+    db = get_session()
+    try:
+        stored = {r.key: r.value for r in db.query(TicketStat).all() if r.value}
+    finally:
+        db.close()
+    assert {k: v for k, v in stats.compute().items() if v} == pytest.approx(stored)
+
+
+def test_create_many_and_update_many():
+    ids = _ids(5)
+    assert TicketRepo.create_many([{"id": i, "iclass": "garbage", "lat": 11.0, "lng": 21.0} for i in ids]) == 5
+    t = TicketRepo.get(ids[0])
+    assert t["status"] == "CREATED" and t["cell"] and t["created_at"]
+    assert TicketRepo.update_many(ids[:3], {"severity": "high", "iclass": "pothole"}) == 3
+    assert [TicketRepo.get(i)["iclass"] for i in ids] == ["pothole"] * 3 + ["garbage"] * 2
+    _counters_consistent()
+
+
+def test_transition_is_compare_and_set():
+    ids = _ids(4)
+    TicketRepo.create_many([{"id": i, "iclass": "streetlight"} for i in ids])
+    TicketRepo.update(ids[3], {"status": "FILED"})
+    started = TicketRepo.transition({i: {"authority": "Electricity Board"} for i in ids}, "CREATED", "FILING")
+    assert sorted(started) == sorted(ids[:3])
+    done = TicketRepo.transition({i: {"authority_ticket_id": f"CG-{i[:8]}"} for i in ids[:3]}, "FILING", "FILED")
+    assert sorted(done) == sorted(ids[:3])
+    for i in ids[:3]:
+        t = TicketRepo.get(i)
+        assert (t["status"], t["authority"], t["authority_ticket_id"]) == ("FILED", "Electricity Board", f"CG-{i[:8]}")
+    assert TicketRepo.transition({ids[0]: {}}, "FILING", "FILED") == []
+    _counters_consistent()
+
+
+def test_coalescer_batches_within_window():
+    calls = []
+    c = StatusCoalescer(window_ms=30, apply=lambda batch, exp, to: calls.append((dict(batch), exp, to)) or list(batch))
+    for i in range(5):
+        c.submit(f"t{i}", "FILING", "FILED", {"authority_ticket_id": f"A{i}"})
+    time.sleep(0.2)
+    assert len(calls) == 1 and len(calls[0][0]) == 5 and calls[0][1:] == ("FILING", "FILED")
+    c.submit("late", "FILING", "FILED")
+    c.close()
+    assert calls[-1][0] == {"late": {}}
+
+
+def test_coalescer_retries_a_failed_write():
+    calls, failing = [], [2]
+
+    def apply(batch, exp, to):
+        calls.append(dict(batch))
+        if failing[0]:
+            failing[0] -= 1
+            raise ConnectionError("database went away")
+        return list(batch)
+
+    c = StatusCoalescer(window_ms=10, apply=apply)
+    c.submit("a", "FILING", "FILED", {"authority_ticket_id": "A"})
+    time.sleep(0.05)
+    c.submit("b", "FILING", "FILED")
+    deadline = time.monotonic() + 5
+    while len(calls) < 3 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    c.close()
+    assert calls[0] == {"a": {"authority_ticket_id": "A"}}
+    assert calls[-1] == {"a": {"authority_ticket_id": "A"}, "b": {}} and len(calls) == 3
+
+    # Unbuffered, the caller (an rq job) sees the failure and is retried
+    failing[0] = 1
+    with pytest.raises(ConnectionError):
+        StatusCoalescer(window_ms=0, apply=apply).submit("c", "FILING", "FILED")
+
+
+def test_file_to_authority_uses_transitions(monkeypatch):
+    import agents.routing
+    from workers import jobs
+
+    monkeypatch.setattr(agents.routing, "resolve", lambda iclass, lat, lng: {
+        "authority_name": "Roads Dept", "endpoint_type": "api", "endpoint_value": "http://authority.invalid/file",
+    })
+    monkeypatch.setattr(jobs, "_file_via_api", lambda url, payload: None)
+    monkeypatch.setattr(jobs, "redis", fakeredis.FakeStrictRedis())
+    tid = str(uuid.uuid4())
+    TicketRepo.create({"id": tid, "iclass": "pothole"})
+    assert jobs.file_to_authority(tid, "http://x/p.jpg", "pothole", "Somewhere", None)["ok"]
+    t = TicketRepo.get(tid)
+    assert (t["status"], t["authority"]) == ("FILED", "Roads Dept")
+    # Already filed: a duplicate job is a no-op
+    assert jobs.file_to_authority(tid, "http://x/p.jpg", "pothole", "Somewhere", None) is None
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import uuid
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+
+from db import bulk_import, stats
+from db.bulk_import import Importer
+from db.models import OutboxMessage
+from db.repository import TicketRepo
+from db.session import get_session
+
+
+def _csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_csv_import_validates_uploads_photos_and_reruns_as_a_no_op(tmp_path):
+    tag = uuid.uuid4().hex[:8]
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 24), "red").save(buf, "JPEG")
+    (tmp_path / "p1.jpg").write_bytes(buf.getvalue())
+    (tmp_path / "junk.jpg").write_bytes(b"not an image")
+    src = tmp_path / "complaints.csv"
+    _csv(src, [
+        {"Complaint ID": f"{tag}-1", "Category": "Water Leak", "Latitude": "12.97", "Longitude": "77.59",
+         "Location": "", "Reported At": "05/03/2023 10:15", "status": "", "Photo": "p1.jpg"},
+        {"Complaint ID": f"{tag}-2", "Category": "", "Latitude": "0", "Longitude": "0",
+         "Location": "MG Road", "Reported At": "2023-03-06T08:00:00+05:30", "status": "resolved", "Photo": ""},
+        {"Complaint ID": f"{tag}-3", "Category": "pothole", "Latitude": "95", "Longitude": "77.59",
+         "Location": "", "Reported At": "", "status": "", "Photo": ""},
+        {"Complaint ID": f"{tag}-4", "Category": "pothole", "Latitude": "", "Longitude": "",
+         "Location": "", "Reported At": "", "status": "", "Photo": "junk.jpg"},
+    ])
+
+    dry = Importer(str(src), dry_run=True).run()
+    assert (dry["inserted"], dry["rejected"], dry["photos"]) == (3, 1, 0)
+    assert not (tmp_path / "complaints.csv.import-state.json").exists()
+
+    before = stats.read()
+    result = Importer(str(src), enqueue=True, batch_rows=2).run()
+    assert (result["records"], result["inserted"], result["rejected"], result["photos"]) == (4, 2, 2, 1)
+    rejects = [json.loads(line) for line in open(str(src) + ".rejects.ndjson")]
+    assert [r["record"] for r in rejects] == [3, 4] and "out of range" in rejects[0]["error"]
+
+    ids = [bulk_import.normalize({"complaint_id": f"{tag}-{i}"}, str(src), i)[0]["id"] for i in (1, 2)]
+    leak, other = TicketRepo.get(ids[0]), TicketRepo.get(ids[1])
+    assert leak["iclass"] == "water_leak" and leak["status"] == "FILED" and leak["cell"]
+    assert leak["created_at"].isoformat() == "2023-03-05T10:15:00" and leak["media_url"].endswith(".jpg")
+    assert other["iclass"] == "unknown" and other["lat"] is None and other["status"] == "RESOLVED"
+    assert other["created_at"].isoformat() == "2023-03-06T02:30:00"  # converted to UTC
+    assert stats.read().get("status:FILED", 0) - before.get("status:FILED", 0) == 1
+
+    with get_session() as s:
+        topics = sorted(s.execute(select(OutboxMessage.topic).where(OutboxMessage.ticket_id.in_(ids))).scalars())
+    assert topics == ["geocode", "media"]  # no photo on the unknown-class one, so nothing to classify
+
+    again = Importer(str(src), batch_rows=10).run(restart=True)
+    assert (again["inserted"], again["existing"]) == (0, 2)
+
+
+def test_interrupted_import_resumes_after_the_last_committed_batch(tmp_path, monkeypatch):
+    tag = uuid.uuid4().hex[:8]
+    src = tmp_path / "complaints.ndjson"
+    src.write_text("".join(
+        json.dumps({"id": f"{tag}-{i}", "iclass": "garbage", "created_at": f"2023-01-{i + 1:02d}"}) + "\n"
+        for i in range(7)
+    ) + "{broken\n")
+    real = TicketRepo.import_many
+    calls = []
+
+    def flaky(rows, outbox=None, copy=False):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return real(rows, outbox, copy)
+
+    monkeypatch.setattr(TicketRepo, "import_many", staticmethod(flaky))
+    with pytest.raises(RuntimeError):
+        Importer(str(src), batch_rows=3).run()
+    state = json.load(open(str(src) + ".import-state.json"))
+    assert state["records"] == 3 and state["counters"]["inserted"] == 3
+
+    result = Importer(str(src), batch_rows=3).run()
+    assert (result["records"], result["inserted"], result["rejected"]) == (8, 7, 1)
+    assert calls[2:] == [3, 1]  # picked up at record 4
+    assert all(TicketRepo.get(f"{tag}-{i}") for i in range(7))
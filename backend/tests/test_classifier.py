@@ -0,0 +1,123 @@
+import io
+import json
+import time
+import uuid
+
+import fakeredis
+from PIL import Image
+
+from db.repository import TicketRepo
+from workers.classifier import PENDING_KEY, ClassifierService, enqueue_classification
+from workers.worklist import WorkList
+
+
+def _jpeg_bytes():
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _ticket():
+    tid = str(uuid.uuid4())
+    TicketRepo.create({"id": tid, "iclass": "unknown", "severity": "medium", "status": "CREATED"})
+    return tid
+
+
+def test_next_batch_caps_size_and_wait():
+    r = fakeredis.FakeRedis()
+    for i in range(5):
+        enqueue_classification(r, f"t{i}", f"/media/{i}.jpg")
+    svc = ClassifierService(r, max_batch=3, max_wait_ms=10, predict=None, on_classified=None)
+    assert [b["id"] for b in svc.next_batch()] == ["t0", "t1", "t2"]
+    assert [b["id"] for b in svc.next_batch()] == ["t3", "t4"]
+    assert svc.next_batch(block_timeout=0.01) == []
+
+
+def test_process_runs_one_predict_per_batch_and_updates_tickets():
+    r = fakeredis.FakeRedis()
+    ids = [_ticket() for _ in range(4)]
+    for tid in ids:
+        enqueue_classification(r, tid, f"/media/{tid}.jpg")
+
+    calls, filed = [], []
+
+    def predict(sources, names):
+        calls.append(len(sources))
+        return [("pothole", "high", 0.91)] * len(sources)
+
+    svc = ClassifierService(r, max_batch=8, max_wait_ms=0, predict=predict, on_classified=filed.append)
+    assert svc.process(svc.next_batch()) == 4
+    assert calls == [4]
+    assert [t["id"] for t in filed] == ids
+    t = TicketRepo.get(ids[0])
+    assert (t["iclass"], t["severity"], t["confidence"]) == ("pothole", "high", 0.91)
+
+
+def test_without_a_model_the_label_comes_from_the_upload_name(monkeypatch):
+    from agents import vision
+
+    monkeypatch.setattr(vision, "model", lambda: None)
+    r = fakeredis.FakeRedis()
+    tid = _ticket()
+    TicketRepo.update(tid, {"iclass": "pothole"})  # provisional, from the filename
+    enqueue_classification(r, tid, "/media/0b1c2d3e4f.jpg", "big pothole.jpg")
+    svc = ClassifierService(r, max_batch=8, max_wait_ms=0, on_classified=None)
+    assert svc.process(svc.next_batch()) == 1
+    assert TicketRepo.get(tid)["iclass"] == "pothole"
+    assert vision.classify_batch(["/media/0b1c2d3e4f.jpg"]) == [("unknown", "medium", 0.6)]
+
+
+def test_intake_batch_mode_returns_provisional_label(monkeypatch):
+    from fastapi.testclient import TestClient
+    import app.main as main
+
+    from workers.outbox import OutboxRelay
+
+    r = fakeredis.FakeRedis()
+    relay = OutboxRelay(r, filing_mode="job")
+    monkeypatch.setattr(main, "CLASSIFY_MODE", "batch")
+    monkeypatch.setattr(main, "outbox_relay", relay)
+    monkeypatch.setattr(main, "reverse_geocode", lambda lat, lng: "Somewhere")
+
+    resp = TestClient(main.app).post(
+        "/api/intake",
+        files={"image": ("garbage.jpg", _jpeg_bytes(), "image/jpeg")},
+        data={"lat": "1", "lng": "2"},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["provisional"] is True and body["class"] == "garbage"
+    pending = [json.loads(x) for x in r.lrange(PENDING_KEY, 0, -1)]
+    assert (pending[0]["id"], pending[0]["name"]) == (body["id"], "garbage.jpg")
+    assert relay.queues["file"].count == 0  # filing waits for the final label
+
+
+def test_items_survive_a_failed_batch_and_a_dead_worker():
+    r = fakeredis.FakeRedis()
+    for i in range(3):
+        enqueue_classification(r, f"t{i}", f"/media/{i}.jpg")
+    crashed = ClassifierService(r, max_batch=2, max_wait_ms=0, predict=None, on_classified=None, worker="a")
+    assert [b["id"] for b in crashed.next_batch()] == ["t0", "t1"]
+    assert crashed.work.requeue() == 2  # what run_forever does when process() raises
+    assert [json.loads(x)["id"] for x in r.lrange(PENDING_KEY, 0, -1)] == ["t0", "t1", "t2"]
+
+    assert len(crashed.next_batch()) == 2  # ... and then the process dies
+    other = ClassifierService(r, max_batch=8, max_wait_ms=0, predict=None, on_classified=None, worker="b")
+    assert other.work.recover() == 0  # "a" still holds its lease
+    crashed.work.close()
+    r.delete(crashed.work.alive_key)  # lease lapsed
+    assert [b["id"] for b in other.next_batch()] == ["t0", "t1", "t2"]
+    other.work.ack()
+    assert r.keys(PENDING_KEY + ":processing:*") == []
+
+
+def test_heartbeat_outlives_a_batch_longer_than_the_lease():
+    r = fakeredis.FakeRedis()
+    enqueue_classification(r, "slow", "/media/slow.jpg")
+    busy = WorkList(r, PENDING_KEY, worker="busy", lease_s=1)
+    assert len(busy.take(8, 0)) == 1
+    time.sleep(1.5)  # still processing, past one lease
+    assert WorkList(r, PENDING_KEY, worker="other", lease_s=1).recover() == 0
+    busy.close()
+    time.sleep(1.1)
+    assert WorkList(r, PENDING_KEY, worker="other", lease_s=1).recover() == 1
@@ -0,0 +1,51 @@
+import io
+import os
+import uuid
+
+from PIL import Image
+
+from agents import derivatives
+from agents.storage import MEDIA_DIR
+from db.repository import TicketRepo
+
+
+def _photo(size=(2000, 1000), orientation=6) -> bytes:
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    exif = Image.Exif()
+    exif[0x0112] = orientation  # rotate 90 CW for display
+    exif[0x010F] = "PhoneMaker"
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95, exif=exif.tobytes())
+    return buf.getvalue()
+
+
+def test_render_orients_resizes_and_strips_metadata(monkeypatch):
+    monkeypatch.setattr(derivatives, "SIZES", (("preview", 800), ("thumb", 200)))
+    out = derivatives.render(io.BytesIO(_photo()))
+    assert set(out) == {("preview", "webp"), ("preview", "jpg"), ("thumb", "webp"), ("thumb", "jpg")}
+    for (name, ext), data in out.items():
+        img = Image.open(io.BytesIO(data))
+        assert img.format == ("WEBP" if ext == "webp" else "JPEG")
+        # Portrait after applying the orientation, long edge at the target
+        assert img.size == ((400, 800) if name == "preview" else (100, 200))
+        assert not img.getexif() and "exif" not in img.info
+
+
+def test_derive_media_job_stores_copies_and_sets_urls():
+    from workers.jobs import derive_media
+
+    key = f"{uuid.uuid4().hex}.jpg"
+    original = _photo()
+    with open(os.path.join(MEDIA_DIR, key), "wb") as f:
+        f.write(original)
+    tid = str(uuid.uuid4())
+    TicketRepo.create({"id": tid, "iclass": "pothole", "media_url": f"http://localhost:8000/media/{key}"})
+
+    derive_media(tid, key)
+    t = TicketRepo.get(tid)
+    stem = key[:-4]
+    assert t["thumb_url"].endswith(f"/media/{stem}.thumb.webp")
+    assert t["preview_url"].endswith(f"/media/{stem}.preview.webp")
+    for name in ("thumb.webp", "thumb.jpg", "preview.webp", "preview.jpg"):
+        path = os.path.join(MEDIA_DIR, f"{stem}.{name}")
+        assert 0 < os.path.getsize(path) < len(original)
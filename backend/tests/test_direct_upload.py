@@ -0,0 +1,93 @@
+import io
+import os
+
+import boto3
+import fakeredis
+import requests
+from fastapi.testclient import TestClient
+from moto import mock_aws
+from PIL import Image
+
+import app.main as main
+from agents import direct_upload, storage
+from workers.outbox import OutboxRelay
+
+
+def _jpeg(color) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (16, 16), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _client(monkeypatch):
+    monkeypatch.setattr(main, "reverse_geocode", lambda lat, lng: "Direct Road")
+    monkeypatch.setattr(main, "outbox_relay", OutboxRelay(fakeredis.FakeStrictRedis(), filing_mode="job"))
+    return TestClient(main.app)
+
+
+def test_local_mode_init_put_complete(monkeypatch):
+    client = _client(monkeypatch)
+    photo = _jpeg((10, 200, 30))
+    slot = client.post("/api/intake/init", data={"filename": "hole.jpg", "content_type": "image/jpeg"}).json()
+    assert slot["method"] == "PUT" and slot["key"].startswith("incoming/")
+
+    assert client.post("/api/intake/complete", data={"upload_id": slot["upload_id"]}).status_code == 404
+    assert client.put(slot["url"], content=photo, headers={"Content-Type": "image/png"}).status_code == 415
+    assert client.put(slot["url"], content=photo, headers=slot["headers"]).status_code == 204
+
+    form = {"upload_id": slot["upload_id"], "lat": "-33.0", "lng": "151.0", "contact": "a@b.c"}
+    resp = client.post("/api/intake/complete", data=form)
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["address"] == "Direct Road" and body["contact"] == "a@b.c" and not body["duplicate"]
+    key = body["file_url"].rsplit("/media/", 1)[1]
+    with open(os.path.join(storage.MEDIA_DIR, key), "rb") as f:
+        assert f.read() == photo
+
+    # A retried complete finds the same bytes: intake dedupe returns the ticket
+    again = client.post("/api/intake/complete", data=form).json()
+    assert again["duplicate"] and again["id"] == body["id"]
+
+
+def test_complete_rejects_bad_tokens_and_oversized_objects(monkeypatch):
+    client = _client(monkeypatch)
+    assert client.post("/api/intake/complete", data={"upload_id": "x.y"}).status_code == 403
+    assert client.post("/api/intake/init", data={"content_type": "text/plain"}).status_code == 415
+
+    slot = client.post("/api/intake/init", data={"filename": "big.jpg"}).json()
+    forged = slot["upload_id"][:-2] + ("AA" if not slot["upload_id"].endswith("AA") else "BB")
+    assert client.put(f"/api/intake/upload/{forged}", content=b"x", headers=slot["headers"]).status_code == 403
+
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 100)
+    small = client.post("/api/intake/init", data={"filename": "big.jpg"}).json()
+    assert small["max_bytes"] == 100
+    assert client.put(small["url"], content=b"\xff" * 500, headers=small["headers"]).status_code == 413
+    # An object that got past the storage-side limit is still refused on complete
+    path = direct_upload.local_path(direct_upload.verify(small["upload_id"]))
+    with open(path, "wb") as f:
+        f.write(b"\xff" * 500)
+    assert client.post("/api/intake/complete", data={"upload_id": small["upload_id"]}).status_code == 413
+
+
+def test_minio_mode_uploads_directly_and_copies_server_side(monkeypatch):
+    monkeypatch.setenv("MINIO_PUBLIC_URL", "https://s3.amazonaws.com")
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="uploads")
+        monkeypatch.setattr(storage, "_minio_client", lambda: s3)
+        client = _client(monkeypatch)
+
+        slot = client.post("/api/intake/init", data={"filename": "lamp.jpg", "content_type": "image/jpeg"}).json()
+        assert slot["method"] == "POST" and slot["url"] == "https://s3.amazonaws.com/uploads"
+        assert slot["fields"]["key"] == slot["key"] and slot["fields"]["Content-Type"] == "image/jpeg"
+
+        photo = _jpeg((250, 250, 0))
+        up = requests.post(slot["url"], data=slot["fields"], files={"file": ("lamp.jpg", photo, "image/jpeg")})
+        assert up.status_code in (200, 201, 204)
+
+        resp = client.post("/api/intake/complete", data={"upload_id": slot["upload_id"], "lat": "40.0", "lng": "-3.0"})
+        assert resp.status_code == 200, resp.text
+        url = resp.json()["file_url"]
+        assert url.startswith("https://s3.amazonaws.com/uploads/") and "incoming/" not in url
+        key = url.rsplit("/uploads/", 1)[1]
+        assert s3.get_object(Bucket="uploads", Key=key)["Body"].read() == photo
@@ -0,0 +1,223 @@
+import socket
+import uuid
+
+import fakeredis
+import pytest
+from aiosmtpd.controller import Controller
+from fastapi.testclient import TestClient
+
+import mock_authority
+from agents import mailer
+from db.repository import TicketRepo
+from workers.dispatch import DIGEST_SENDING_KEY, FilingDispatcher, enqueue_filing
+from workers.queue import make_queues
+
+ROUTES = {
+    "garbage": {"authority_name": "Sanitation Dept", "endpoint_type": "email", "endpoint_value": "sanitation@example.com"},
+    "pothole": {"authority_name": "Highways Dept", "endpoint_type": "email", "endpoint_value": "highways@example.com"},
+    "streetlight": {"authority_name": "Electrical Dept", "endpoint_type": "api", "endpoint_value": "http://authority/mock-authority"},
+}
+
+
+class _Inbox:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode()))
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp():
+    inbox = _Inbox()
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    controller = Controller(inbox, hostname="127.0.0.1", port=port)
+    controller.start()
+    session = mailer.SMTPSession("127.0.0.1", port, user=None, starttls=False)
+    yield inbox, session
+    session.close()
+    controller.stop()
+
+
+def _tickets(iclass, n):
+    ids = [str(uuid.uuid4()) for _ in range(n)]
+    TicketRepo.create_many([{"id": i, "iclass": iclass, "address": "MG Road", "media_url": f"http://m/{i}.jpg"} for i in ids])
+    return ids
+
+
+def _dispatcher(session, posts=None, **kw):
+    client = TestClient(mock_authority.app)
+
+    def post(url, payload):
+        posts.append(url)
+        return client.post(url.replace("http://authority", ""), json=payload)
+
+    return FilingDispatcher(
+        fakeredis.FakeStrictRedis(), max_wait_ms=0, smtp=session, post=post,
+        route=lambda t: ROUTES[t["iclass"]], **kw,
+    )
+
+
+def test_emails_reuse_one_connection_and_reconnect(smtp):
+    inbox, session = smtp
+    ids = _tickets("pothole", 5)
+    d = _dispatcher(session, [])
+    for i in ids:
+        enqueue_filing(d.redis, i)
+    assert d.process(d.next_batch(block_timeout=0.1)) == 5
+    assert len(inbox.messages) == 5 and len(inbox.sessions) == 1 and session.connects == 1
+    assert all(TicketRepo.get(i)["status"] == "FILED" for i in ids)
+
+    session._conn.sock.shutdown(socket.SHUT_RDWR)  # connection dropped
+    more = _tickets("pothole", 2)
+    assert d.process(more) == 2
+    assert len(inbox.messages) == 7 and session.connects == 2
+
+
+def test_api_groups_use_batch_endpoint(smtp):
+    _, session = smtp
+    posts = []
+    ids = _tickets("streetlight", 4)
+    d = _dispatcher(session, posts)
+    assert d.process(ids) == 4
+    assert posts == ["http://authority/mock-authority/batch"]
+    assert TicketRepo.get(ids[0])["authority"] == "Electrical Dept"
+
+
+def test_digest_mode_sends_one_email_per_interval(smtp):
+    inbox, session = smtp
+    now = [1000.0]
+    d = _dispatcher(session, [], digest_authorities={"Sanitation Dept"}, digest_interval_s=3600, clock=lambda: now[0])
+    ids = _tickets("garbage", 3)
+    assert d.process(ids) == 0
+    assert d.send_due_digests() == 0
+    assert {TicketRepo.get(i)["status"] for i in ids} == {"FILING"}
+    now[0] += 3600
+    assert d.send_due_digests() == 3
+    assert len(inbox.messages) == 1 and "3 issues reported" in inbox.messages[0][1]
+    assert {TicketRepo.get(i)["status"] for i in ids} == {"FILED"}
+
+
+class _Resp:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_failed_filings_are_not_marked_filed_and_go_to_the_retrying_job(smtp):
+    _, session = smtp
+    ids = _tickets("streetlight", 3)
+    bad = ids[1]
+
+    def post(url, payload):
+        if url.endswith("/batch"):
+            return _Resp(404)
+        return _Resp(503 if bad in payload["photo"] else 201)
+
+    d = _dispatcher(session, [])
+    d.post = post
+    assert d.process(ids) == 2
+    assert [TicketRepo.get(i)["status"] for i in ids] == ["FILED", "FILING", "FILED"]
+    assert make_queues(d.redis)["file"].job_ids == [f"file-{bad}"]
+
+
+def test_digest_that_fails_to_send_is_kept_for_the_next_interval(smtp):
+    inbox, session = smtp
+
+    class Down:
+        def send(self, msg):
+            raise ConnectionRefusedError("relay down")
+
+    d = _dispatcher(Down(), [], digest_authorities={"Sanitation Dept"})
+    ids = _tickets("garbage", 2)
+    d.process(ids)
+    assert d.send_due_digests(force=True) == 0
+    assert d.redis.llen(DIGEST_SENDING_KEY.format("Sanitation Dept|sanitation@example.com")) == 2
+    assert {TicketRepo.get(i)["status"] for i in ids} == {"FILING"}
+
+    d.smtp = session
+    assert d.send_due_digests(force=True) == 2
+    assert len(inbox.messages) == 1 and "2 issues reported" in inbox.messages[0][1]
+    assert {TicketRepo.get(i)["status"] for i in ids} == {"FILED"}
+
+
+def test_batch_that_raises_is_requeued_not_lost(smtp, monkeypatch):
+    _, session = smtp
+    ids = _tickets("pothole", 2)
+    d = _dispatcher(session, [])
+    for i in ids:
+        enqueue_filing(d.redis, i)
+
+    def broken(changes, expected, to_status):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as m:
+        m.setattr(TicketRepo, "transition", staticmethod(broken))
+        with pytest.raises(RuntimeError):
+            d.process(d.next_batch(block_timeout=0.1))
+    d.work.requeue()
+    assert d.process(d.next_batch(block_timeout=0.1)) == 2
+    d.work.ack()
+    assert {TicketRepo.get(i)["status"] for i in ids} == {"FILED"}
+    assert d.redis.llen(d.work.processing_key) == 0
+
+
+def test_requeued_batch_does_not_send_again(smtp, monkeypatch):
+    inbox, session = smtp
+    ids = _tickets("pothole", 3)
+    d = _dispatcher(session, [])
+    d.redis.set(f"idem:file:{ids[2]}", "sending")  # its rq job is delivering it
+    real = TicketRepo.transition
+
+    def lost_write(changes, expected, to_status):
+        if to_status == "FILED":
+            raise RuntimeError("database is locked")
+        return real(changes, expected, to_status)
+
+    with monkeypatch.context() as m:
+        m.setattr(TicketRepo, "transition", staticmethod(lost_write))
+        with pytest.raises(RuntimeError):
+            d.process(ids)
+    assert len(inbox.messages) == 2  # sent, but still FILING
+    assert d.process(ids) == 2
+    assert len(inbox.messages) == 2
+    assert [TicketRepo.get(i)["status"] for i in ids] == ["FILED", "FILED", "FILING"]
+    assert make_queues(d.redis)["file"].job_ids == [f"file-{ids[2]}"]
+
+
+def test_digest_per_address_and_not_resent_after_a_lost_write(smtp, monkeypatch):
+    inbox, session = smtp
+    wards = {"north": "north@example.com", "south": "south@example.com"}
+
+    def route(t):
+        return {**ROUTES["garbage"], "endpoint_value": wards[t["address"]]}
+
+    d = _dispatcher(session, [], digest_authorities={"*"})
+    d.route = route
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    TicketRepo.create_many([{"id": i, "iclass": "garbage", "address": a} for i, a in zip(ids, ["north", "south", "north"])])
+    d.process(ids)
+
+    real = TicketRepo.transition
+
+    def lost_write(changes, expected, to_status):
+        if to_status == "FILED":
+            raise RuntimeError("database is locked")
+        return real(changes, expected, to_status)
+
+    with monkeypatch.context() as m:
+        m.setattr(TicketRepo, "transition", staticmethod(lost_write))
+        with pytest.raises(RuntimeError):
+            d.send_due_digests(force=True)  # first digest mailed, its FILED write lost
+    assert len(inbox.messages) == 1 and {TicketRepo.get(i)["status"] for i in ids} == {"FILING"}
+
+    assert d.send_due_digests(force=True) == 3
+    assert len(inbox.messages) == 2  # the digest already mailed isn't mailed again
+    assert sorted(to for rcpt, _ in inbox.messages for to in rcpt) == ["north@example.com", "south@example.com"]
+    north = next(body for rcpt, body in inbox.messages if rcpt == ["north@example.com"])
+    assert "2 issues reported" in north
+    assert {TicketRepo.get(i)["status"] for i in ids} == {"FILED"}
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import time
+import uuid
+
+import fakeredis
+
+from app import events
+from db import ticket_events
+from db.repository import TicketRepo
+
+
+async def _frames(body, n):
+    out = []
+    while len(out) < n:
+        chunk = await asyncio.wait_for(body.__anext__(), 5)
+        if not chunk.startswith(b":"):
+            out.append(chunk.decode())
+    return out
+
+
+def _data(frame):
+    return json.loads(frame.split("data: ", 1)[1])
+
+
+def test_ticket_stream_and_filtered_feed_follow_repo_writes(monkeypatch):
+    monkeypatch.setattr(events, "broker", events.Broker())
+    tid, other = str(uuid.uuid4()), str(uuid.uuid4())
+    TicketRepo.create({"id": tid, "iclass": "pothole", "lat": 12.97, "lng": 77.59})
+    TicketRepo.create({"id": other, "iclass": "garbage", "lat": 12.97, "lng": 77.59})
+
+    async def run():
+        one = (await events.ticket_events_stream(tid)).body_iterator
+        feed = (await events.events_feed(iclass="pothole", lat=12.971, lng=77.591, radius=500)).body_iterator
+        retry, first = await _frames(one, 2)
+        assert retry.startswith("retry:") and _data(first)["status"] == "CREATED"
+        await _frames(feed, 1)
+
+        # As a filing worker would, from another thread
+        await asyncio.to_thread(TicketRepo.transition, {tid: {"authority": "BBMP"}, other: {}}, "CREATED", "FILING")
+        (update,) = await _frames(one, 1)
+        ev = _data(update)
+        assert update.startswith("event: ticket") and ev["id"] == tid and ev["status"] == "FILING"
+        assert ev["authority"] == "BBMP" and ev["changed"] == ["authority", "status"]
+        (fed,) = await _frames(feed, 1)
+        assert _data(fed)["id"] == tid  # the garbage ticket is filtered out
+        assert events.broker.stats()["subscribers"] == 2
+        await one.aclose()
+        await feed.aclose()
+        assert events.broker.stats()["subscribers"] == 0
+
+    asyncio.run(run())
+    events.broker.stop()
+
+
+def test_slow_subscriber_overflows_and_is_dropped(monkeypatch):
+    monkeypatch.setattr(events, "broker", events.Broker(max_subscribers=1))
+
+    async def run():
+        sub = events.Subscriber(max_pending=2)
+        body = events.stream(sub)
+        await _frames(body, 1)
+        events.broker.dispatch([{"id": str(i), "status": "FILED"} for i in range(3)])
+        assert sub.overflowed and events.broker.stats()["overflows"] == 1
+        assert events.broker.stats()["subscribers"] == 0
+        (frame,) = await _frames(body, 1)
+        assert frame.startswith("event: overflow")
+
+        # A ticket stream folds a burst into its newest state instead
+        one = events.Subscriber(tid="t", max_pending=2)
+        for status, changed in (("FILING", ["status"]), ("FILING", ["authority"]), ("FILED", ["status"])):
+            assert one.push({"id": "t", "status": status, "changed": changed})
+        assert [e["status"] for e in one.pending] == ["FILING", "FILED"] and not one.overflowed
+        assert one.pending[-1]["changed"] == ["authority", "status"]
+
+        keep = events.stream(events.Subscriber())
+        await _frames(keep, 1)
+        assert events.broker.full()
+        await keep.aclose()
+
+    asyncio.run(run())
+
+
+def test_events_from_other_processes_arrive_over_redis(monkeypatch):
+    r = fakeredis.FakeStrictRedis()
+    broker = events.Broker(redis=r)
+    monkeypatch.setattr(events, "broker", broker)
+
+    async def run():
+        broker.start()
+        sub = events.Subscriber(status="FILED")
+        body = events.stream(sub)
+        await _frames(body, 1)
+        deadline = time.time() + 5
+        while not r.pubsub_numsub(broker.channel)[0][1] and time.time() < deadline:
+            await asyncio.sleep(0.02)
+        mine = {"origin": ticket_events.origin(), "events": [{"id": "a", "status": "FILED"}]}
+        theirs = {"origin": "worker-host:1", "events": [{"id": "b", "status": "FILED"}]}
+        r.publish(broker.channel, json.dumps(mine))  # already delivered directly
+        r.publish(broker.channel, json.dumps(theirs))
+        (frame,) = await _frames(body, 1)
+        assert _data(frame)["id"] == "b" and not sub.pending
+        await body.aclose()
+
+    try:
+        asyncio.run(run())
+    finally:
+        broker.stop()
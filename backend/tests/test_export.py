@@ -0,0 +1,59 @@
+import csv
+import gzip
+import io
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from db import export
+from db.repository import TicketRepo
+
+
+def _seed():
+    tag = uuid.uuid4().hex[:8]
+    rows = [
+        {"id": f"{tag}-{i}", "iclass": f"export-{tag}", "status": "FILED" if i % 2 else "CREATED",
+         "lat": 12.0 + i, "lng": 77.0, "contact": "a@b.c", "created_at": datetime(2024, 1, 1 + i)}
+        for i in range(6)
+    ]
+    TicketRepo.create_many(rows)
+    return tag, rows
+
+
+def test_export_endpoint_streams_filtered_ndjson_and_needs_the_admin_token(monkeypatch):
+    tag, rows = _seed()
+    client = TestClient(main.app)
+    params = {"iclass": f"export-{tag}", "status": "FILED", "since": "2024-01-02", "until": "2024-01-06"}
+    assert client.get("/api/export", params=params).status_code == 404
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/api/export", params=params, headers={"X-Admin-Token": "nope"}).status_code == 403
+
+    resp = client.get("/api/export", params=params, headers={"X-Admin-Token": "s3cret"})
+    assert resp.status_code == 200 and resp.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="tickets.ndjson"' in resp.headers["content-disposition"]
+    got = [json.loads(line) for line in resp.text.splitlines()]
+    assert [t["id"] for t in got] == [f"{tag}-1", f"{tag}-3"]  # oldest first, [since, until)
+    assert got[0]["created_at"] == "2024-01-02T00:00:00" and "contact" not in got[0]
+
+    bad = client.get("/api/export", params={"format": "xml"}, headers={"X-Admin-Token": "s3cret"})
+    assert bad.status_code == 400
+    assert client.get("/api/export", params={"fields": "id,nope"}, headers={"X-Admin-Token": "s3cret"}).status_code == 400
+
+
+def test_gzipped_csv_and_parquet_round_trip():
+    tag, rows = _seed()
+    body = b"".join(export.stream("csv", iclass=f"export-{tag}", fields=["id", "lat", "contact"], gzip=True, batch_rows=2))
+    table = list(csv.reader(io.StringIO(gzip.decompress(body).decode())))
+    assert table[0] == ["id", "lat", "contact"] and len(table) == 7
+    assert table[1] == [f"{tag}-0", "12.0", "a@b.c"]
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    data = b"".join(export.stream("parquet", iclass=f"export-{tag}", batch_rows=4))
+    t = pq.read_table(io.BytesIO(data))
+    assert t.num_rows == 6 and "contact" not in t.column_names
+    assert t.column("id").to_pylist() == [r["id"] for r in rows]
+    assert t.column("created_at").to_pylist()[5] == datetime(2024, 1, 6)
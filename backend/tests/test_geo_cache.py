@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from agents import geo
+from agents.geo_cache import GeocodeCache, _SQLiteStore, quantize
+
+
+def test_quantize_groups_nearby_points():
+    # ~1 m apart -> same 10 m cell; ~100 m apart -> different cell
+    assert quantize(13.082700, 80.270700, 10) == quantize(13.082705, 80.270705, 10)
+    assert quantize(13.0827, 80.2707, 10) != quantize(13.0837, 80.2707, 10)
+
+
+def test_lru_ttl_and_negative_caching():
+    now = [1000.0]
+    cache = GeocodeCache(ttl=60, negative_ttl=5, clock=lambda: now[0])
+    calls = []
+
+    def compute(lat, lng):
+        calls.append((lat, lng))
+        return None  # provider outage
+
+    assert cache.get_or_compute(1.0, 2.0, compute) is None
+    assert cache.get_or_compute(1.0, 2.0, compute) is None
+    assert len(calls) == 1
+    assert cache.stats()["negative_hits"] == 1
+
+    now[0] += 6  # negative entry expired
+    assert cache.get_or_compute(1.0, 2.0, lambda lat, lng: "Main St") == "Main St"
+    assert cache.get_or_compute(1.0, 2.0, compute) == "Main St"
+    assert cache.stats()["hits"] >= 1
+
+
+def test_sqlite_store_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    GeocodeCache(store=_SQLiteStore(path)).put(13.08, 80.27, "Chennai Central")
+
+    fresh = GeocodeCache(store=_SQLiteStore(path))
+    assert fresh.get_or_compute(13.08, 80.27, lambda lat, lng: "WRONG") == "Chennai Central"
+    assert fresh.stats()["store_hits"] == 1
+
+
+def test_reverse_geocode_uses_cache(monkeypatch):
+    calls = []
+
+    def mapbox(lat, lng):
+        calls.append("mapbox")
+        return "Cached Road"
+
+    monkeypatch.setattr(geo, "_reverse_geocode_mapbox", mapbox)
+    monkeypatch.setattr(geo, "get_cache", lambda c=GeocodeCache(): c)
+    assert geo.reverse_geocode(12.97, 77.59) == "Cached Road"
+    assert geo.reverse_geocode(12.97, 77.59) == "Cached Road"
+    assert calls == ["mapbox"]
+
+
+def test_geocode_job_retries_past_a_cached_miss(monkeypatch):
+    from workers import jobs
+
+    answers = [None, None, "Late Road"]
+    monkeypatch.setattr(geo, "_reverse_geocode_mapbox", lambda lat, lng: answers.pop(0))
+    monkeypatch.setattr(geo, "_reverse_geocode_nominatim", lambda lat, lng: None)
+    monkeypatch.setattr(geo, "get_cache", lambda c=GeocodeCache(negative_ttl=300): c)
+    updates = []
+    monkeypatch.setattr(jobs.TicketRepo, "update", lambda tid, changes: updates.append((tid, changes)))
+
+    assert geo.reverse_geocode(12.97, 77.59) == "Unknown"  # intake; the miss is cached
+    with pytest.raises(RuntimeError):
+        jobs.geocode_ticket("t1", 12.97, 77.59)
+    assert jobs.geocode_ticket("t1", 12.97, 77.59)["address"] == "Late Road"
+    assert updates == [("t1", {"address": "Late Road"})] and answers == []
+    assert geo.reverse_geocode(12.97, 77.59) == "Late Road"
+
+
+def test_slow_lookup_only_holds_up_its_own_cell():
+    cache = GeocodeCache()
+    release, started, calls = threading.Event(), threading.Event(), []
+
+    def slow(lat, lng):
+        calls.append((lat, lng))
+        started.set()
+        release.wait(5)
+        return "Slow Road"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(1.0, 2.0, slow))) for _ in range(3)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    # Every other cell is answered while the provider call for (1, 2) hangs
+    for i in range(100):
+        assert cache.get_or_compute(10.0 + i, 20.0, lambda lat, lng: "Fast Road") == "Fast Road"
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert results == ["Slow Road"] * 3 and calls == [(1.0, 2.0)]
@@ -0,0 +1,70 @@
+import glob
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from agents.ingest import HEADER_BYTES, InvalidImage, UploadTooLarge, spool_upload
+from agents.storage import MEDIA_DIR
+
+
+def _jpeg_with_gps(size=(16, 16)):
+    img = Image.new("RGB", size, color=(10, 20, 30))
+    exif = Image.Exif()
+    # GPS IFD: 13°04'57.72"N 80°16'14.52"E
+    exif[0x8825] = {
+        1: "N", 2: (13.0, 4.0, 57.72),
+        3: "E", 4: (80.0, 16.0, 14.52),
+    }
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", exif=exif.tobytes())
+    return buf.getvalue()
+
+
+def _spools():
+    return glob.glob(os.path.join(MEDIA_DIR, ".ingest-*"))
+
+
+def test_spool_hashes_once_and_reads_gps_from_header():
+    data = _jpeg_with_gps()
+    sp = spool_upload(io.BytesIO(data), "x.jpg", "image/jpeg")
+    try:
+        assert sp.size == len(data)
+        assert sp.sha256 == hashlib.sha256(data).hexdigest()
+        sp.validate_image()
+        lat, lng = sp.gps()
+        assert lat == pytest.approx(13.0827, abs=1e-4)
+        assert lng == pytest.approx(80.2707, abs=1e-4)
+    finally:
+        sp.discard()
+
+
+def test_large_file_keeps_only_header_in_memory():
+    # Incompressible noise so the JPEG is well past the header size
+    img = Image.frombytes("RGB", (700, 700), os.urandom(700 * 700 * 3))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95)
+    sp = spool_upload(io.BytesIO(buf.getvalue()))
+    try:
+        assert sp.size > HEADER_BYTES and len(sp.header) == HEADER_BYTES
+        sp.validate_image()
+    finally:
+        sp.discard()
+
+
+def test_oversized_upload_rejected_and_spool_removed():
+    before = set(_spools())
+    with pytest.raises(UploadTooLarge):
+        spool_upload(io.BytesIO(b"x" * 300_000), max_bytes=100_000)
+    assert set(_spools()) == before
+
+
+def test_non_image_is_invalid():
+    sp = spool_upload(io.BytesIO(b"definitely not an image"))
+    try:
+        with pytest.raises(InvalidImage):
+            sp.validate_image()
+    finally:
+        sp.discard()
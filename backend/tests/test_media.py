@@ -0,0 +1,91 @@
+import hashlib
+import os
+
+import boto3
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+import app.main as main
+from agents import storage
+from app import media
+
+
+def _stored(data: bytes, suffix: str = ".thumb.webp") -> str:
+    key = hashlib.sha256(data).hexdigest() + suffix
+    with open(os.path.join(storage.MEDIA_DIR, key), "wb") as f:
+        f.write(data)
+    return key
+
+
+def test_local_media_caching_headers_conditional_and_ranges():
+    client = TestClient(main.app)
+    data = bytes(range(256)) * 8
+    key = _stored(data)
+
+    resp = client.get(f"/media/{key}")
+    assert resp.status_code == 200 and resp.content == data
+    assert resp.headers["cache-control"] == media.IMMUTABLE
+    assert resp.headers["etag"] == f'"{key}"' and resp.headers["content-type"] == "image/webp"
+
+    assert client.get(f"/media/{key}", headers={"If-None-Match": f'W/"{key}"'}).status_code == 304
+    part = client.get(f"/media/{key}", headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206 and part.content == data[10:20]
+    assert part.headers["content-range"] == f"bytes 10-19/{len(data)}"
+    stale = client.get(f"/media/{key}", headers={"Range": "bytes=10-19", "If-Range": '"other"'})
+    assert stale.status_code == 200 and stale.content == data
+    assert client.get(f"/media/{key}", headers={"Range": "bytes=99999-"}).status_code == 416
+    head = client.head(f"/media/{key}")
+    assert head.status_code == 200 and head.headers["content-length"] == str(len(data))
+
+    legacy = "0b1c2d3e-legacy.jpg"
+    with open(os.path.join(storage.MEDIA_DIR, legacy), "wb") as f:
+        f.write(b"old upload")
+    resp = client.get(f"/media/{legacy}")
+    assert resp.status_code == 200 and resp.headers["cache-control"] == f"public, max-age={media.MEDIA_MAX_AGE}"
+
+    for hidden in (".ingest-x.part", "incoming/abc.jpg", "sub/.store-1.part"):
+        assert client.get(f"/media/{hidden}").status_code == 404
+    assert media._local_path("../requirements.txt") is None and media._local_path("a/../../x") is None
+
+
+def test_proxied_minio_objects_are_cached_on_disk_and_in_memory(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "MEDIA_PROXY", True)
+    monkeypatch.setattr(media, "memory_cache", media.MemoryLRU(1 << 20))
+    monkeypatch.setattr(media, "_disk_cache", media.DiskLRU(str(tmp_path), 1 << 20))
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="uploads")
+        monkeypatch.setattr(storage, "_minio_client", lambda: s3)
+        data = os.urandom(3000)
+        key = hashlib.sha256(data).hexdigest() + ".thumb.jpg"
+        s3.put_object(Bucket="uploads", Key=key, Body=data)
+        client = TestClient(main.app)
+
+        first = client.get(f"/media/{key}")
+        assert first.status_code == 200 and first.content == data
+        assert first.headers["cache-control"] == media.IMMUTABLE
+        s3.delete_object(Bucket="uploads", Key=key)  # later hits never reach MinIO
+
+        again = client.get(f"/media/{key}", headers={"Range": "bytes=-100"})
+        assert again.status_code == 206 and again.content == data[-100:]
+        assert client.get(f"/media/{key}", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+        assert media.memory_cache.hits == 2
+        assert client.get(f"/media/{'0' * 64}.jpg").status_code == 404
+
+
+def test_disk_cache_evicts_least_recently_used(monkeypatch, tmp_path):
+    sizes = {"a.jpg": 400, "b.jpg": 400, "c.jpg": 400}
+
+    def download(key, path):
+        with open(path, "wb") as f:
+            f.write(b"x" * sizes[key])
+        return sizes[key]
+
+    monkeypatch.setattr(storage, "download", download)
+    cache = media.DiskLRU(str(tmp_path), 1000)
+    a = cache.fetch("a.jpg")
+    cache.fetch("b.jpg")
+    assert cache.fetch("a.jpg") == a  # hit; b is now the oldest
+    cache.fetch("c.jpg")
+    assert cache.get("b.jpg") is None and cache.get("a.jpg") == a
+    assert cache.size == 800 and len(os.listdir(tmp_path)) == 2
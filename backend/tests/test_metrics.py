@@ -0,0 +1,87 @@
+import io
+import json
+import os
+
+import fakeredis
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from agents import metrics
+
+
+def _sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_and_counter_exposition():
+    reg = metrics.Registry()
+    h = reg.histogram("t_seconds", "test", ["stage"], buckets=(0.1, 1.0))
+    h.labels("a").observe(0.05)
+    h.labels("a").observe(0.5)
+    h.labels("a").observe(5)
+    reg.counter("t_total", "test", ["p"]).labels('say "hi"').inc(2)
+    reg.gauge("t_depth", "test", ["q"], lambda: {("file",): 3})
+    text = reg.render()
+    assert _sample(text, 't_seconds_bucket{stage="a",le="0.1"}') == 1
+    assert _sample(text, 't_seconds_bucket{stage="a",le="1"}') == 2
+    assert _sample(text, 't_seconds_bucket{stage="a",le="+Inf"}') == 3
+    assert _sample(text, 't_seconds_count{stage="a"}') == 3
+    assert _sample(text, 't_seconds_sum{stage="a"}') == 5.55
+    assert _sample(text, 't_total{p="say \\"hi\\""}') == 2
+    assert _sample(text, 't_depth{q="file"}') == 3
+    assert "# TYPE t_seconds histogram" in text
+
+
+def test_snapshots_from_several_processes_are_summed(tmp_path):
+    reg = metrics.Registry()
+    reg.counter("jobs_total", "test", ["queue"]).labels("file").inc(3)
+    reg.histogram("job_seconds", "test", buckets=(1.0,)).observe(0.5)
+    other = reg.snapshot()
+    other["jobs_total"]["samples"] = {json.dumps(["file"]): 4.0}
+    (tmp_path / "123.json").write_text(json.dumps(other))
+    text = reg.render([reg.snapshot()] + metrics.load_snapshots(str(tmp_path)))
+    assert _sample(text, 'jobs_total{queue="file"}') == 7
+    assert _sample(text, "job_seconds_count") == 2
+
+
+def test_metrics_endpoint_covers_intake(monkeypatch):
+    import app.main as main
+    from workers.outbox import OutboxRelay
+    from workers.queue import register_metrics
+
+    r = fakeredis.FakeStrictRedis()
+    monkeypatch.setattr(main, "reverse_geocode", lambda lat, lng: "Metric Road")
+    monkeypatch.setattr(main, "outbox_relay", OutboxRelay(r, filing_mode="job"))
+    register_metrics(r, max_age_s=0)
+    client = TestClient(main.app)
+
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), color=(9, 9, 9)).save(buf, format="JPEG")
+    resp = client.post("/api/intake", files={"image": ("pothole.jpg", buf.getvalue(), "image/jpeg")},
+                       data={"lat": "-50.0", "lng": "10.0"})
+    assert resp.status_code == 200
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    for stage in ("read", "store", "classify", "geocode", "db_write", "enqueue"):
+        assert _sample(text, f'civicguard_intake_stage_seconds_count{{stage="{stage}"}}') >= 1
+    assert _sample(text, 'civicguard_queue_depth{queue="file"}') >= 1
+    assert _sample(text, 'civicguard_db_pool_wait_seconds_count{engine="async"}') >= 1
+
+
+def test_worker_records_job_wait_and_run_time():
+    from rq import Queue
+    from workers.run import JOB_SECONDS, JOB_WAIT, MeteredWorker
+
+    r = fakeredis.FakeStrictRedis()
+    q = Queue("metered_jobs", connection=r)
+    q.enqueue(os.getcwd)
+    q.enqueue("workers.no_such_module.fn")
+    MeteredWorker([q], connection=r).work(burst=True)
+    assert sum(JOB_WAIT.labels("metered_jobs").counts) == 2
+    assert sum(JOB_SECONDS.labels("metered_jobs", "ok").counts) == 1
+    assert sum(JOB_SECONDS.labels("metered_jobs", "error").counts) == 1
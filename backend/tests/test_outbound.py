@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from agents import geo, outbound
+from bench.stub_server import StubServer
+
+
+def test_pooled_session_reuses_connection():
+    with StubServer() as stub:
+        for _ in range(10):
+            r = outbound.request("stub-reuse", "GET", stub.url + "/x", timeout=5)
+            assert r.status_code == 200
+        assert stub.requests == 10
+        assert stub.connections == 1
+
+
+def test_breaker_opens_and_short_circuits():
+    with StubServer(status=503) as stub:
+        outbound._breakers.pop("stub-down", None)
+        cb = outbound.breaker("stub-down")
+        cb.failure_threshold = 3
+        r = outbound.request("stub-down", "GET", stub.url, retries=5, backoff_base=0, timeout=5)
+        assert r.status_code == 503
+        # Stopped retrying once the breaker opened
+        assert stub.requests == 3
+        with pytest.raises(outbound.CircuitOpenError):
+            outbound.request("stub-down", "GET", stub.url, timeout=5)
+        assert stub.requests == 3
+
+
+def test_breaker_half_open_recovers():
+    now = [0.0]
+    cb = outbound.CircuitBreaker("t", failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    cb.record_failure()
+    assert not cb.allow()
+    now[0] = 11
+    assert cb.allow()          # single trial call
+    assert not cb.allow()      # others still blocked
+    cb.record_success()
+    assert cb.allow() and cb.state == cb.CLOSED
+
+
+def test_mapbox_breaker_falls_back_to_nominatim(monkeypatch):
+    monkeypatch.setattr(geo, "MAPBOX_TOKEN", "tok")
+    outbound._breakers.pop("mapbox", None)
+    cb = outbound.breaker("mapbox")
+    cb.record_failure()
+    cb.state, cb.opened_at = cb.OPEN, float("inf")
+    monkeypatch.setattr(geo, "_reverse_geocode_nominatim", lambda lat, lng: "OSM Street")
+    try:
+        assert geo._reverse_geocode_providers(1.0, 2.0) == "OSM Street"
+    finally:
+        outbound._breakers.pop("mapbox", None)
+
+
+def test_async_client_reuses_connection():
+    async def run(url):
+        client = outbound.AsyncOutbound()
+        try:
+            for _ in range(5):
+                r = await client.request("stub-async", "POST", url, json={"a": 1})
+                assert r.status_code == 200
+        finally:
+            await client.aclose()
+
+    with StubServer() as stub:
+        asyncio.run(run(stub.url))
+        assert stub.requests == 5
+        assert stub.connections == 1
@@ -0,0 +1,106 @@
+import uuid
+
+import fakeredis
+import pytest
+from rq import SimpleWorker
+from rq.registry import FailedJobRegistry
+
+from db.repository import OutboxRepo, TicketRepo
+from workers import dlq, jobs
+from workers import queue as q
+from workers.outbox import OutboxRelay
+
+ROUTE = {"authority_name": "Roads Dept", "endpoint_type": "api", "endpoint_value": "http://authority.invalid/file"}
+
+
+def _ticket(outbox=None):
+    tid = str(uuid.uuid4())
+    TicketRepo.create({"id": tid, "iclass": "pothole", "address": "Main Rd", "lat": 5.0, "lng": 6.0}, outbox=outbox)
+    return tid
+
+
+def _pending(tid):
+    return OutboxRepo.pending(ticket_ids=[tid])
+
+
+def test_outbox_row_survives_redis_outage():
+    server = fakeredis.FakeServer()
+    r = fakeredis.FakeStrictRedis(server=server)
+    relay = OutboxRelay(r, filing_mode="job")
+    tid = _ticket(outbox=[("file", {}), ("geocode", {})])
+
+    server.connected = False
+    assert relay.relay([tid]) == 0
+    rows = _pending(tid)
+    assert len(rows) == 2 and rows[0]["attempts"] == 1 and rows[0]["last_error"]
+
+    server.connected = True
+    assert relay.relay([tid]) == 2
+    assert _pending(tid) == []
+    assert relay.queues["file"].job_ids == [f"file-{tid}"]
+    assert relay.queues["geocode"].job_ids == [f"geocode-{tid}"]
+    # Publishing again while the job is queued doesn't add a second one
+    relay.publish("file", {}, TicketRepo.get(tid))
+    assert relay.queues["file"].count == 1
+
+
+def _setup_filing(monkeypatch, r, send):
+    import agents.routing
+
+    monkeypatch.setattr(agents.routing, "resolve", lambda iclass, lat, lng: ROUTE)
+    monkeypatch.setattr(jobs, "_file_via_api", send)
+    monkeypatch.setattr(jobs, "redis", r)
+    monkeypatch.setattr(q, "JOB_MAX_RETRIES", 2)
+    monkeypatch.setattr(q, "JOB_RETRY_INTERVALS", [])  # retry immediately
+
+
+def test_failed_filing_retries_then_dead_letters_and_replays(monkeypatch):
+    r = fakeredis.FakeStrictRedis()
+    calls = []
+
+    def send(url, payload):
+        calls.append(url)
+        if broken:
+            raise ConnectionError("authority down")
+
+    broken = True
+    _setup_filing(monkeypatch, r, send)
+    tid = _ticket(outbox=[("file", {})])
+    relay = OutboxRelay(r, filing_mode="job")
+    relay.relay([tid])
+    queue = relay.queues["file"]
+
+    SimpleWorker([queue], connection=r).work(burst=True)
+    assert len(calls) == 3  # first try + 2 retries
+    assert FailedJobRegistry(queue=queue).get_job_ids() == [f"file-{tid}"]
+    assert TicketRepo.get(tid)["status"] == "FAILED"
+    assert [j["id"] for j in dlq.failed_jobs(r, ["file"])] == [f"file-{tid}"]
+
+    broken = False
+    assert dlq.replay(r, ["file"]) == 1
+    SimpleWorker([queue], connection=r).work(burst=True)
+    assert FailedJobRegistry(queue=queue).count == 0
+    t = TicketRepo.get(tid)
+    assert (t["status"], t["authority"], t["authority_ticket_id"]) == ("FILED", "Roads Dept", f"CG-{tid[:8]}")
+
+
+def test_retried_filing_is_not_sent_twice(monkeypatch):
+    r = fakeredis.FakeStrictRedis()
+    sent = []
+    _setup_filing(monkeypatch, r, lambda url, payload: sent.append(payload))
+    tid = _ticket()
+
+    class _LostWrite:
+        def submit(self, *args):
+            raise ConnectionError("database went away")
+
+    # Sent, but the FILED write fails: the retry must not file again
+    coalescer = jobs.status_updates
+    monkeypatch.setattr(jobs, "status_updates", _LostWrite())
+    with pytest.raises(ConnectionError):
+        jobs.file_to_authority(tid, None, "pothole", "Main Rd", None)
+    assert TicketRepo.get(tid)["status"] == "FILING"
+    monkeypatch.setattr(jobs, "status_updates", coalescer)
+    assert jobs.file_to_authority(tid, None, "pothole", "Main Rd", None)["ok"]
+    assert len(sent) == 1
+    assert TicketRepo.get(tid)["status"] == "FILED"
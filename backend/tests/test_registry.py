@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+from agents.registry import ModelRegistry
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_models_load_lazily_once():
+    calls = []
+    reg = ModelRegistry()
+    reg.register("m", lambda: calls.append(1) or "weights")
+    assert not reg.is_loaded("m") and calls == []
+    assert reg.get("m") == "weights"
+    assert reg.get("m") == "weights"
+    assert calls == [1]
+    stats = reg.stats()["m"]
+    assert stats["loaded"] and stats["load_seconds"] >= 0
+
+
+def test_failed_loader_is_not_retried():
+    calls = []
+
+    def boom():
+        calls.append(1)
+        raise ImportError("no ultralytics")
+
+    reg = ModelRegistry()
+    reg.register("yolo", boom)
+    assert reg.get("yolo") is None
+    assert reg.get("yolo") is None
+    assert calls == [1]
+    assert "ultralytics" in reg.stats()["yolo"]["error"]
+
+
+def test_importing_app_does_not_load_vision_model():
+    # Fresh interpreter: other tests may already have classified something
+    probe = "import app.main; from agents.registry import registry; print(registry.stats()['yolo'])"
+    out = subprocess.run(
+        [sys.executable, "-c", probe], cwd=BACKEND, env={**os.environ, "PYTHONPATH": BACKEND},
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert "{'loaded': False}" in out
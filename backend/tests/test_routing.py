@@ -0,0 +1,57 @@
+import json
+import os
+
+from agents.routing import FALLBACK_ROUTE, Router, lookup
+
+
+def _square(x0, y0, size):
+    return [[x0, y0], [x0 + size, y0], [x0 + size, y0 + size], [x0, y0 + size], [x0, y0]]
+
+
+def _write(tmp_path, rows, features):
+    csv_path = tmp_path / "routing.csv"
+    csv_path.write_text("class,ward,authority_name,endpoint_type,endpoint_value\n" + "\n".join(rows) + "\n")
+    wards_path = tmp_path / "wards.geojson"
+    wards_path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    return str(csv_path), str(wards_path)
+
+
+def _feature(name, *rings):
+    return {"type": "Feature", "properties": {"name": name}, "geometry": {"type": "Polygon", "coordinates": list(rings)}}
+
+
+def test_default_table_matches_csv():
+    assert lookup(" Pothole ", "Ward-1")["authority_name"] == "Highways Dept"
+    assert lookup("unknown", "Ward-1") == FALLBACK_ROUTE
+
+
+def test_ward_from_coordinates_with_holes(tmp_path):
+    csv_path, wards_path = _write(tmp_path, [
+        "pothole,North,North Roads,email,north@example.com",
+        "pothole,South,South Roads,email,south@example.com",
+        "garbage,*,Sanitation Dept,email,sanitation@example.com",
+    ], [
+        # North ward has a hole that belongs to South
+        _feature("North", _square(80.0, 13.1, 0.1), _square(80.04, 13.14, 0.02)),
+        _feature("South", _square(80.0, 13.0, 0.1)),
+        _feature("South", _square(80.04, 13.14, 0.02)),
+    ])
+    r = Router(csv_path, wards_path, default_ward="North", check_s=0)
+    assert r.ward_for(13.12, 80.01) == "North"
+    assert r.ward_for(13.05, 80.05) == "South"
+    assert r.ward_for(13.15, 80.05) == "South"  # inside the hole
+    assert r.ward_for(12.0, 80.0) == "North"  # outside every ward -> default
+    assert r.resolve("pothole", 13.05, 80.05)["authority_name"] == "South Roads"
+    assert r.resolve("garbage", 13.12, 80.01)["authority_name"] == "Sanitation Dept"
+    assert r.resolve("pothole")["authority_name"] == "North Roads"
+
+
+def test_reloads_when_csv_changes(tmp_path):
+    csv_path, wards_path = _write(tmp_path, ["pothole,Ward-1,Old Dept,email,old@example.com"], [])
+    r = Router(csv_path, wards_path, check_s=0)
+    assert r.lookup("pothole", "Ward-1")["authority_name"] == "Old Dept"
+    with open(csv_path, "a") as f:
+        f.write("streetlight,Ward-1,Electrical Dept,api,http://localhost:8081/mock-authority\n")
+    st = os.stat(csv_path)
+    os.utime(csv_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert r.lookup("streetlight", "Ward-1")["authority_name"] == "Electrical Dept"
@@ -0,0 +1,46 @@
+import sqlalchemy as sa
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from db import schema
+from db.models import Base
+
+
+def _engine(tmp_path, name):
+    return sa.create_engine(f"sqlite:///{tmp_path / name}")
+
+
+def test_migrations_build_the_models_schema_and_the_head_constant_is_current(tmp_path):
+    assert ScriptDirectory.from_config(schema.alembic_config()).get_current_head() == schema.SCHEMA_HEAD
+    assert schema.check_at_startup("fail") == schema.SCHEMA_HEAD  # conftest migrated the test database
+
+    eng = _engine(tmp_path, "fresh.db")
+    assert schema.current(eng) is None
+    with eng.connect() as conn:
+        schema.upgrade(connection=conn)
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+    assert schema.current(eng) == schema.SCHEMA_HEAD
+    with eng.connect() as conn:
+        command.downgrade(schema.alembic_config(conn), "base")
+    assert sa.inspect(eng).get_table_names() == ["alembic_version"]
+
+
+def test_baseline_adopts_a_database_patched_at_boot_by_the_old_code(tmp_path):
+    eng = _engine(tmp_path, "legacy.db")
+    with eng.begin() as conn:
+        # What create_all made before media_url & co. were added by ALTER TABLE
+        conn.execute(sa.text(
+            "CREATE TABLE tickets (id VARCHAR NOT NULL, iclass VARCHAR NOT NULL, severity VARCHAR, lat FLOAT, "
+            "lng FLOAT, address VARCHAR, status VARCHAR, authority VARCHAR, authority_ticket_id VARCHAR, "
+            "contact VARCHAR, created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id))"
+        ))
+        conn.execute(sa.text("INSERT INTO tickets (id, iclass, lat, lng, status) VALUES ('t1', 'pothole', 12.97, 77.59, 'FILED')"))
+
+    with eng.connect() as conn:
+        schema.upgrade(connection=conn)
+        assert compare_metadata(MigrationContext.configure(conn), Base.metadata) == []
+        cell = conn.execute(sa.text("SELECT cell FROM tickets WHERE id = 't1'")).scalar()
+    assert cell and cell.startswith("tdr1")
+    assert schema.current(eng) == schema.SCHEMA_HEAD
@@ -0,0 +1,81 @@
+import io
+import random
+import uuid
+
+import fakeredis
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from agents.spatial import GridIndex, covering_cells, geohash, haversine_m
+from db.repository import TicketRepo
+
+
+def test_geohash_reference_value():
+    assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_covering_cells_contain_every_point_in_radius():
+    rnd = random.Random(1)
+    lat, lng, radius = 13.0827, 80.2707, 250.0
+    cells = covering_cells(lat, lng, radius)
+    for _ in range(500):
+        plat = lat + rnd.uniform(-0.003, 0.003)
+        plng = lng + rnd.uniform(-0.003, 0.003)
+        if haversine_m(lat, lng, plat, plng) <= radius:
+            assert any(geohash(plat, plng).startswith(c) for c in cells)
+
+
+def test_grid_index_matches_brute_force():
+    rnd = random.Random(2)
+    grid = GridIndex(cell_m=50)
+    pts = {i: (12.9 + rnd.uniform(0, 0.02), 77.5 + rnd.uniform(0, 0.02)) for i in range(2000)}
+    for i, (lat, lng) in pts.items():
+        grid.add(i, lat, lng, "pothole")
+    grid.remove(0)
+    q = (12.91, 77.51, 120.0)
+    expected = sorted(i for i, (lat, lng) in pts.items() if i != 0 and haversine_m(q[0], q[1], lat, lng) <= q[2])
+    assert sorted(k for _, k, _ in grid.query(*q)) == expected
+
+
+def test_repo_nearby_uses_cells():
+    near = TicketRepo.create({"id": str(uuid.uuid4()), "iclass": "garbage", "lat": 10.0, "lng": 20.0, "status": "CREATED"})
+    TicketRepo.create({"id": str(uuid.uuid4()), "iclass": "garbage", "lat": 10.01, "lng": 20.0, "status": "CREATED"})
+    assert near["cell"] == geohash(10.0, 20.0)
+    items = TicketRepo.nearby(10.0001, 20.0001, 30)
+    assert [t["id"] for t in items] == [near["id"]]
+    assert items[0]["distance_m"] < 30
+
+
+def _jpeg(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_intake_merges_nearby_report_of_same_class(monkeypatch):
+    import app.main as main
+    from workers.outbox import OutboxRelay
+
+    relay = OutboxRelay(fakeredis.FakeStrictRedis(), filing_mode="job")
+    monkeypatch.setattr(main, "reverse_geocode", lambda lat, lng: "Cluster Road")
+    monkeypatch.setattr(main, "outbox_relay", relay)
+    client = TestClient(main.app)
+
+    def post(name, color, lat):
+        return client.post(
+            "/api/intake",
+            files={"image": (name, _jpeg(color), "image/jpeg")},
+            data={"lat": str(lat), "lng": "30.0"},
+        ).json()
+
+    first = post("pothole1.jpg", (200, 0, 0), -20.0)
+    second = post("pothole2.jpg", (0, 0, 200), -20.0001)       # ~11 m away
+    other = post("streetlight.jpg", (0, 200, 0), -20.0001)     # different class
+    assert first["status"] == "CREATED"
+    assert second["status"] == "MERGED" and second["parent_id"] == first["id"]
+    assert other["status"] == "CREATED"
+    assert [j.args[0] for j in relay.queues["file"].jobs] == [first["id"], other["id"]]
+
+    r = client.get("/api/tickets/nearby", params={"lat": -20.0, "lng": 30.0, "radius": 30})
+    assert r.status_code == 200
+    assert {t["id"] for t in r.json()["items"]} == {first["id"], second["id"], other["id"]}
@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from db import stats
+from db.models import TicketStat
+from db.repository import TicketRepo
+from db.session import get_session
+
+
+def _stored():
+    db = get_session()
+    try:
+        return {r.key: r.value for r in db.query(TicketStat).all() if r.value}
+    finally:
+        db.close()
+
+
+def test_deltas_for_status_transition():
+    created = datetime(2024, 5, 1, 10, 0, 0)
+    before = {"status": "FILING", "iclass": "pothole", "authority": "Highways Dept", "created_at": created}
+    after = {**before, "status": "FILED", "filed_at": created + timedelta(seconds=90)}
+    assert stats.deltas(before, after) == {
+        "status:FILING": -1,
+        "status:FILED": 1,
+        "filed:2024-05-01": 1,
+        "ttf_sum": 90.0,
+        "ttf_count": 1,
+    }
+
+
+def test_counters_follow_writes_and_match_rebuild(monkeypatch):
+    tid = str(uuid.uuid4())
+    TicketRepo.create({"id": tid, "iclass": "water_leak", "status": "CREATED"})
+    before = stats.read()
+    TicketRepo.update(tid, {"status": "FILING", "authority": "Water Board"})
+    TicketRepo.update(tid, {"status": "FILED"})
+    after = stats.read()
+    assert after.get("status:FILED", 0) == before.get("status:FILED", 0) + 1
+    assert after.get("status:CREATED", 0) == before.get("status:CREATED", 0) - 1
+    assert after["authority:Water Board"] >= 1
+    assert after["ttf_count"] == before.get("ttf_count", 0) + 1
+    # A later write (thumbnails, a late geocode) doesn't move the filing day
+    filed_at = TicketRepo.get(tid)["filed_at"]
+    monkeypatch.setattr(TicketRepo, "_now", staticmethod(lambda: filed_at + timedelta(days=3)))
+    TicketRepo.update(tid, {"thumb_url": "/media/x.thumb.webp"})
+    assert TicketRepo.get(tid)["filed_at"] == filed_at
+
+    incremental = _stored()
+    assert {k: v for k, v in stats.compute().items() if v} == pytest.approx(incremental)
+    stats.rebuild()
+    assert _stored() == pytest.approx(incremental)
+
+
+def test_stats_endpoint_reads_counters():
+    import app.main as main
+
+    tid = str(uuid.uuid4())
+    TicketRepo.create({"id": tid, "iclass": "garbage", "status": "CREATED"})
+    TicketRepo.update(tid, {"status": "FILED"})
+    body = TestClient(main.app).get("/api/stats").json()
+    c = stats.read()
+    assert body["open"] == int(c.get("status:CREATED", 0) + c.get("status:FILING", 0))
+    assert body["filed_today"] >= 1
+    assert body["by_iclass"]["garbage"] >= 1
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+import uuid
+
+import fakeredis
+from fastapi.testclient import TestClient
+
+import app.main as main
+from db import ticket_cache
+from db.repository import TicketRepo
+
+
+def test_endpoint_serves_cached_body_with_etag_and_sees_worker_updates(monkeypatch):
+    cache = ticket_cache.TicketCache()
+    monkeypatch.setattr(ticket_cache, "_cache", cache)
+    client = TestClient(main.app)
+    tid = str(uuid.uuid4())
+    TicketRepo.create({"id": tid, "iclass": "pothole", "lat": 12.0, "lng": 77.0})
+
+    first = client.get(f"/api/tickets/{tid}")
+    assert first.status_code == 200 and first.json()["status"] == "CREATED"
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+    again = client.get(f"/api/tickets/{tid}", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # A worker-side write drops the entry: the next poll sees the new status
+    TicketRepo.transition({tid: {"authority": "BBMP"}}, "CREATED", "FILING")
+    moved = client.get(f"/api/tickets/{tid}", headers={"If-None-Match": etag})
+    assert moved.status_code == 200 and moved.json()["status"] == "FILING"
+    assert moved.headers["etag"] != etag and moved.json()["authority"] == "BBMP"
+    assert client.get(f"/api/tickets/{uuid.uuid4()}").json() == {"error": "not_found"}
+
+
+def test_redis_tier_shares_entries_and_pubsub_invalidates_other_processes():
+    server = fakeredis.FakeServer()
+    api_redis = fakeredis.FakeStrictRedis(server=server)
+    worker_redis = fakeredis.FakeStrictRedis(server=server)
+    api = ticket_cache.TicketCache(store=ticket_cache._RedisStore(api_redis, 60), redis=api_redis)
+    other_api = ticket_cache.TicketCache(store=ticket_cache._RedisStore(api_redis, 60), redis=api_redis)
+    worker = ticket_cache.TicketCache(store=ticket_cache._RedisStore(worker_redis, 60), redis=worker_redis)
+    rows = {"t1": {"id": "t1", "status": "FILING"}}
+    loads = []
+
+    async def load(tid):
+        loads.append(tid)
+        return dict(rows[tid])
+
+    async def poll(cache, n=1):
+        return await asyncio.gather(*(cache.get("t1", load) for _ in range(n)))
+
+    assert api.start_listener()
+    try:
+        deadline = time.time() + 5
+        while not api_redis.pubsub_numsub(api.channel)[0][1] and time.time() < deadline:
+            time.sleep(0.02)
+        entries = asyncio.run(poll(api, 20))
+        assert len(set(entries)) == 1 and loads == ["t1"]  # concurrent misses share one load
+        asyncio.run(poll(other_api))
+        assert loads == ["t1"] and other_api.stats()["store_hits"] == 1
+
+        rows["t1"]["status"] = "FILED"
+        worker.invalidate(["t1"])
+        deadline = time.time() + 5
+        while api.stats()["size"] and time.time() < deadline:
+            time.sleep(0.02)
+        assert api.stats()["size"] == 0
+        (body, _), = asyncio.run(poll(api))
+        assert json.loads(body)["status"] == "FILED" and loads == ["t1", "t1"]
+    finally:
+        api.stop_listener()
+
+    # A read that started before an invalidation doesn't write its row back
+    store = ticket_cache._RedisStore(api_redis, 60)
+    _, version = store.get("t2")
+    worker.invalidate(["t2"])
+    assert not store.put("t2", ticket_cache.encode({"id": "t2"}), version)
+    assert store.get("t2")[0] is None
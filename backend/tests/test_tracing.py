@@ -0,0 +1,100 @@
+import io
+import json
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from rq import Queue
+
+from agents import profiler, tracing
+from db.session import engine
+
+
+def _traced(monkeypatch, tmp_path):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "TRACING", True)
+    monkeypatch.setattr(tracing, "_exporter_instance", tracing._Exporter(str(path)))
+    tracing.instrument_engine(engine)
+
+    def spans():
+        tracing.flush()
+        return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+    return spans
+
+
+def test_spans_nest_and_cover_sql(monkeypatch, tmp_path):
+    spans = _traced(monkeypatch, tmp_path)
+    with tracing.start_trace("outer") as root:
+        with tracing.span("inner", step=1):
+            with engine.connect() as conn:
+                conn.exec_driver_sql("SELECT 1")
+    assert tracing.span("outside").__enter__() is None
+
+    by_name = {s["name"]: s for s in spans()}
+    assert by_name["outer"]["parent_id"] is None
+    assert by_name["inner"]["parent_id"] == root.span_id and by_name["inner"]["attributes"] == {"step": 1}
+    db = by_name["db.query"]
+    assert db["parent_id"] == by_name["inner"]["span_id"] and db["attributes"]["db.statement"] == "SELECT 1"
+    assert {s["trace_id"] for s in by_name.values()} == {root.trace_id}
+
+
+def test_intake_trace_continues_into_filing_job(monkeypatch, tmp_path):
+    import app.main as main
+    from workers.outbox import OutboxRelay
+    from workers.run import MeteredWorker
+
+    spans = _traced(monkeypatch, tmp_path)
+    r = fakeredis.FakeStrictRedis()
+    monkeypatch.setattr(main, "reverse_geocode", lambda lat, lng: "Trace Street")
+    monkeypatch.setattr(main, "outbox_relay", OutboxRelay(r, filing_mode="job"))
+    client = TestClient(main.app)
+
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), color=(1, 2, 3)).save(buf, format="JPEG")
+    caller = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    resp = client.post("/api/intake", files={"image": ("p.jpg", buf.getvalue(), "image/jpeg")},
+                       data={"lat": "-40.0", "lng": "20.0"}, headers={"traceparent": caller})
+    assert resp.status_code == 200
+    trace_id = "0af7651916cd43dd8448eb211c80319c"
+    assert resp.headers["x-trace-id"] == trace_id
+
+    file_queue = main.outbox_relay.queues["file"]
+    job = file_queue.jobs[0]
+    assert tracing.parse_traceparent(job.meta["traceparent"])[0] == trace_id
+
+    # Run something cheap under the same meta instead of a real filing
+    q = Queue("traced_jobs", connection=r)
+    q.enqueue("os.getcwd", meta=job.meta)
+    MeteredWorker([q], connection=r).work(burst=True)
+
+    names = [s["name"] for s in spans() if s["trace_id"] == trace_id]
+    assert "POST /api/intake" in names and "job os.getcwd" in names
+    assert {"intake.store", "intake.db_write", "intake.enqueue", "db.query"} <= set(names)
+
+
+def test_profile_endpoint_requires_admin_token(monkeypatch):
+    import app.main as main
+
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    assert client.get("/debug/profile?seconds=0.05").status_code == 404
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/debug/profile?seconds=0.05", headers={"X-Admin-Token": "nope"}).status_code == 403
+    assert client.get("/debug/profile?seconds=600", headers={"X-Admin-Token": "s3cret"}).status_code == 400
+
+    resp = client.get("/debug/profile?seconds=0.1&interval_ms=2", headers={"X-Admin-Token": "s3cret"})
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    header, *stacks = resp.text.splitlines()
+    assert header.startswith("# samples=")
+    assert stacks and all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+    assert not any("sample (profiler.py" in line for line in stacks)
+
+
+def test_profiler_refuses_concurrent_runs():
+    assert profiler._busy.acquire(blocking=False)
+    try:
+        with pytest.raises(profiler.ProfilerBusy):
+            profiler.sample(0.01)
+    finally:
+        profiler._busy.release()
@@ -3,32 +3,18 @@ import sys
 # Ensure backend root is on sys.path for `from db...` imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from db.session import get_session, engine
+from db.session import get_session
 from db.models import Ticket
 from datetime import datetime, timedelta
 import uuid
 import shutil
-from sqlalchemy import text
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 MEDIA_DIR = os.path.abspath(os.path.join(BASE_DIR, 'media'))
 os.makedirs(MEDIA_DIR, exist_ok=True)
 
+# Needs a migrated database: python -m db.schema upgrade
 def main():
-    # Ensure media_url column exists (Postgres/SQLite tolerant)
-    try:
-        with engine.connect() as conn:
-            try:
-                conn.execute(text("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS media_url TEXT"))
-                conn.commit()
-            except Exception:
-                try:
-                    conn.execute(text("ALTER TABLE tickets ADD COLUMN media_url TEXT"))
-                    conn.commit()
-                except Exception:
-                    pass
-    except Exception:
-        pass
     # Copy sample image into media
     sample_src = os.path.abspath(os.path.join(BASE_DIR, '..', 'sample.jpg'))
     if not os.path.exists(sample_src):
@@ -0,0 +1,141 @@
+"""
+Micro-batching classification worker.
+
+Intake (CLASSIFY_MODE=batch) stores the photo, creates the ticket with a
+provisional filename-based label and pushes {id, source} onto a Redis list.
+This worker pops up to CLASSIFY_MAX_BATCH items (waiting at most
+CLASSIFY_MAX_WAIT_MS after the first one), runs one batched YOLO predict,
+writes iclass/severity/confidence back through TicketRepo.update together
+with a "file" outbox row, then relays it (workers/outbox.py). A batch whose
+predict fails is handed to the classify queue as one retried rq job per
+ticket (workers.jobs.classify_ticket).
+
+Items wait in this worker's processing list until the batch is done
+(workers/worklist.py), so a crash or a failed update puts them back on the
+list instead of leaving the tickets on their provisional label.
+
+Run:  python -m workers.classifier [--max-batch 16] [--max-wait-ms 50]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from db.repository import TicketRepo  # noqa: E402
+from workers.worklist import WorkList  # noqa: E402
+
+PENDING_KEY = os.getenv("CLASSIFY_PENDING_KEY", "classify:pending")
+MAX_BATCH = int(os.getenv("CLASSIFY_MAX_BATCH", "16"))
+MAX_WAIT_MS = int(os.getenv("CLASSIFY_MAX_WAIT_MS", "50"))
+
+
+def enqueue_classification(redis, ticket_id: str, source: str, name: Optional[str] = None) -> None:
+    """Queue a stored image for batched classification. `name` is the
+    upload's filename, which the provisional label came from."""
+    redis.rpush(PENDING_KEY, json.dumps({"id": ticket_id, "source": source, "name": name}))
+
+
+def _default_predict(sources: List[str], names: List[Optional[str]]):
+    from agents.vision import classify_batch
+
+    return classify_batch(sources, names)
+
+
+def _default_file(ticket: Dict[str, Any]) -> None:
+    from workers.outbox import OutboxRelay
+    from workers.queue import redis
+
+    OutboxRelay(redis).relay([ticket["id"]])
+
+
+class ClassifierService:
+    def __init__(
+        self,
+        redis,
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: int = MAX_WAIT_MS,
+        predict: Callable[[List[str], List[Optional[str]]], List[tuple]] = _default_predict,
+        on_classified: Optional[Callable[[Dict[str, Any]], None]] = _default_file,
+        worker: Optional[str] = None,
+    ):
+        self.redis = redis
+        self.work = WorkList(redis, PENDING_KEY, worker)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.predict = predict
+        self.on_classified = on_classified
+
+    def next_batch(self, block_timeout: float = 1.0) -> List[Dict[str, Any]]:
+        """Block for the first item, then top the batch up until it's full or
+        max_wait has elapsed since that first item arrived.
+        """
+        return [json.loads(r) for r in self.work.take(self.max_batch, self.max_wait, block_timeout)]
+
+    def process(self, batch: List[Dict[str, Any]]) -> int:
+        if not batch:
+            return 0
+        try:
+            results = self.predict([item["source"] for item in batch], [item.get("name") for item in batch])
+        except Exception as e:
+            print(f"[Classifier] predict failed for {len(batch)} items, queueing them singly:", e)
+            self._retry_singly(batch)
+            return 0
+        for item, (iclass, severity, conf) in zip(batch, results):
+            t = TicketRepo.update(
+                item["id"], {"iclass": iclass, "severity": severity, "confidence": conf}, outbox=[("file", {})]
+            )
+            if t and self.on_classified:
+                try:
+                    self.on_classified(t)
+                except Exception as e:
+                    print("[Classifier] follow-up enqueue failed:", e)
+        return len(batch)
+
+    def _retry_singly(self, batch: List[Dict[str, Any]]) -> None:
+        from workers.queue import enqueue_job, make_queues
+
+        queue = make_queues(self.redis)["classify"]
+        for item in batch:
+            enqueue_job(
+                queue, "workers.jobs.classify_ticket", item["id"], item["source"], item.get("name"),
+                job_id=f"classify-{item['id']}",
+            )
+
+    def run_forever(self) -> None:
+        print(f"[Classifier] waiting on {PENDING_KEY} (max_batch={self.max_batch}, max_wait={self.max_wait * 1000:.0f}ms)")
+        while True:
+            try:
+                self.process(self.next_batch())
+                self.work.ack()
+            except Exception as e:
+                print("[Classifier] batch failed, requeued:", e)
+                self.work.requeue()
+                time.sleep(1)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Batched YOLO classification worker")
+    ap.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    ap.add_argument("--max-wait-ms", type=int, default=MAX_WAIT_MS)
+    args = ap.parse_args()
+
+    from workers.queue import redis
+    from agents import vision
+    from agents.registry import registry
+
+    # Load the weights once up front rather than inside the first batch
+    vision.model()
+    print("[Classifier] models:", registry.stats())
+    ClassifierService(redis, args.max_batch, args.max_wait_ms).run_forever()
+
+
+if __name__ == "__main__":
+    main()
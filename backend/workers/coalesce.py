@@ -0,0 +1,139 @@
+"""
+Coalesced status transitions.
+
+Jobs that finish within `window_ms` of each other have their status updates
+buffered and written as one TicketRepo.transition per (expected, to_status)
+pair: a single CAS UPDATE and one round of counter upserts instead of a
+read + update + commit per ticket. A buffer is flushed when it holds
+`max_batch` tickets, when the window since its first entry has passed, and
+on close()/interpreter exit.
+
+With window_ms=0 every submit is applied immediately and a failed write
+raises to the caller (an rq job then fails and is retried). A buffered
+batch whose write fails goes back into the buffer and is retried with
+backoff (0.5s doubling up to RETRY_MAX_S), merged with anything submitted
+since, so the transition isn't lost while the caller has already returned.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from db.repository import TicketRepo
+
+Key = Tuple[str, str]
+
+RETRY_MAX_S = 30.0
+
+
+class StatusCoalescer:
+    def __init__(
+        self,
+        window_ms: float = 0,
+        max_batch: int = 500,
+        apply: Callable[[Dict[str, Dict[str, Any]], str, str], List[str]] = TicketRepo.transition,
+    ):
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.apply = apply
+        self._pending: Dict[Key, Dict[str, Dict[str, Any]]] = {}
+        self._first_at: Dict[Key, float] = {}
+        self._failures: Dict[Key, int] = {}
+        self._cond = threading.Condition()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, tid: str, expected: str, to_status: str, changes: Optional[Dict[str, Any]] = None) -> None:
+        if self.window <= 0:
+            self.apply({tid: dict(changes or {})}, expected, to_status)
+            return
+        key = (expected, to_status)
+        full = None
+        with self._cond:
+            bucket = self._pending.setdefault(key, {})
+            if not bucket:
+                self._first_at[key] = time.monotonic()
+            bucket[tid] = {**bucket.get(tid, {}), **(changes or {})}
+            if len(bucket) >= self.max_batch:
+                full = self._take(key)
+            else:
+                self._ensure_flusher()
+                self._cond.notify()
+        if full:
+            self._apply(key, full)
+
+    def flush(self) -> int:
+        """Write everything buffered now. Returns: tickets submitted"""
+        with self._cond:
+            batches = [(key, self._take(key)) for key in list(self._pending)]
+        n = 0
+        for key, batch in batches:
+            if batch:
+                self._apply(key, batch)
+                n += len(batch)
+        return n
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        for attempt in range(3):
+            self.flush()
+            with self._cond:
+                left = {tid for bucket in self._pending.values() for tid in bucket}
+            if not left:
+                return
+            time.sleep(0.5 * 2 ** attempt)
+        print(f"[Coalesce] giving up on {len(left)} status updates at exit:", sorted(left))
+
+    def _take(self, key: Key) -> Dict[str, Dict[str, Any]]:
+        self._first_at.pop(key, None)
+        return self._pending.pop(key, {})
+
+    def _apply(self, key: Key, batch: Dict[str, Dict[str, Any]]) -> None:
+        expected, to_status = key
+        try:
+            self.apply(batch, expected, to_status)
+        except Exception as e:
+            self._requeue(key, batch)
+            print(f"[Coalesce] {expected}->{to_status} for {len(batch)} tickets failed, retrying:", e)
+            return
+        with self._cond:
+            self._failures.pop(key, None)
+
+    def _requeue(self, key: Key, batch: Dict[str, Dict[str, Any]]) -> None:
+        """Put a failed batch back, due again after the backoff."""
+        with self._cond:
+            failures = self._failures[key] = self._failures.get(key, 0) + 1
+            backoff = min(RETRY_MAX_S, 0.5 * 2 ** (failures - 1))
+            bucket = self._pending.setdefault(key, {})
+            for tid, changes in batch.items():
+                bucket[tid] = {**changes, **bucket.get(tid, {})}  # later submits win
+            self._first_at[key] = time.monotonic() - self.window + backoff
+            if not self._closed:
+                self._ensure_flusher()
+                self._cond.notify()
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run, name="status-coalescer", daemon=True)
+            self._flusher.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                due = [k for k, t0 in self._first_at.items() if now - t0 >= self.window]
+                if not due:
+                    wait = min((t0 + self.window - now for t0 in self._first_at.values()), default=None)
+                    self._cond.wait(timeout=wait)
+                    continue
+                batches = [(k, self._take(k)) for k in due]
+            for key, batch in batches:
+                if batch:
+                    self._apply(key, batch)
@@ -0,0 +1,357 @@
+"""
+Batched authority filing.
+
+With FILING_MODE=dispatch, intake and the classifier push ticket ids onto a
+Redis list instead of enqueuing one RQ job per ticket. This worker pops them
+in batches (up to DISPATCH_MAX_BATCH, waiting at most DISPATCH_MAX_WAIT_MS
+after the first), moves them CREATED -> FILING in one statement, groups them
+by route endpoint and then:
+
+- email: sends one message per ticket over the shared SMTP session for the
+  relay (agents/mailer.py), so a busy department costs one handshake;
+- email, digest authorities (FILING_DIGEST=Sanitation Dept,... or *): parks
+  the ticket in a list per authority and address and sends a single digest
+  email to that address every FILING_DIGEST_INTERVAL_S seconds;
+- api: one POST of the whole group to `<endpoint>/batch` when the authority
+  supports it ({"filings": [...]}), falling back to a POST per ticket once
+  the batch route answers 404/405.
+
+Each ticket is sent under the same idempotency key as file_to_authority
+(idem:file:<id>: "sending" while in flight, "done" once delivered), so a
+batch that is requeued after its sends went out, or that races the rq job
+of a ticket, never files a ticket twice. Each endpoint group is marked FILED
+in one statement right after its send. A ticket whose send failed, or
+whose key another sender holds, stays FILING and is handed to the
+per-ticket rq job (workers.jobs.file_to_authority), which retries it with
+backoff and, after the last attempt, marks it FAILED and leaves it in the
+dead-letter queue for `python -m workers.dlq replay`. A digest's tickets
+stay on a list until they are marked FILED, so one that can't be sent (or
+whose sender dies) goes out with the next interval.
+
+Ids wait in this worker's processing list until their batch is done
+(workers/worklist.py), so a crash or a failed transition puts them back on
+the list instead of leaving the tickets CREATED or FILING.
+
+Run:  python -m workers.dispatch [--max-batch 200] [--max-wait-ms 500]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from agents import mailer  # noqa: E402
+from db.repository import TicketRepo  # noqa: E402
+from workers.jobs import (  # noqa: E402
+    FILING_DONE_TTL_S, FILING_LEASE_S, FILING_SECONDS, FILINGS, IDEMPOTENCY_KEY, _file_via_api, compose,
+)
+from workers.worklist import WorkList  # noqa: E402
+
+PENDING_KEY = os.getenv("DISPATCH_PENDING_KEY", "filing:pending")
+# Digests are keyed "<authority>|<to address>"
+DIGEST_KEY = "filing:digest:{}"
+DIGEST_SENDING_KEY = "filing:digest_sending:{}"
+DIGEST_SENT_KEY = "filing:digest_sent:{}"
+DIGEST_LOCK_KEY = "filing:digest_lock:{}"
+MAX_BATCH = int(os.getenv("DISPATCH_MAX_BATCH", "200"))
+MAX_WAIT_MS = int(os.getenv("DISPATCH_MAX_WAIT_MS", "500"))
+DIGEST_AUTHORITIES = {a.strip() for a in os.getenv("FILING_DIGEST", "").split(",") if a.strip()}
+DIGEST_INTERVAL_S = float(os.getenv("FILING_DIGEST_INTERVAL_S", "3600"))
+
+Endpoint = Tuple[str, str]
+
+
+def enqueue_filing(redis, ticket_id: str) -> None:
+    """Queue a ticket for the dispatcher (FILING_MODE=dispatch)."""
+    redis.rpush(PENDING_KEY, ticket_id)
+
+
+def _authority_ticket_id(tid: str) -> str:
+    return f"CG-{tid[:8]}"
+
+
+class FilingDispatcher:
+    def __init__(
+        self,
+        redis,
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: int = MAX_WAIT_MS,
+        smtp: Optional[mailer.SMTPSession] = None,
+        post: Callable[[str, Any], Any] = _file_via_api,
+        route: Optional[Callable[[Dict[str, Any]], Dict[str, str]]] = None,
+        digest_authorities: Set[str] = DIGEST_AUTHORITIES,
+        digest_interval_s: float = DIGEST_INTERVAL_S,
+        clock: Callable[[], float] = time.time,
+        worker: Optional[str] = None,
+    ):
+        self.redis = redis
+        self.work = WorkList(redis, PENDING_KEY, worker)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.smtp = smtp
+        self.post = post
+        self.route = route or self._default_route
+        self.digest_authorities = set(digest_authorities)
+        self.digest_interval_s = digest_interval_s
+        self.clock = clock
+        self._no_batch: Set[str] = set()  # API endpoints without a /batch route
+
+    @staticmethod
+    def _default_route(t: Dict[str, Any]) -> Dict[str, str]:
+        from agents.routing import resolve
+
+        return resolve(t.get("iclass"), t.get("lat"), t.get("lng"))
+
+    def _smtp(self) -> mailer.SMTPSession:
+        return self.smtp or mailer.session()
+
+    def _digest(self, authority: str) -> bool:
+        return "*" in self.digest_authorities or authority in self.digest_authorities
+
+    def next_batch(self, block_timeout: float = 1.0) -> List[str]:
+        ids = self.work.take(self.max_batch, self.max_wait, block_timeout)
+        return [i.decode() if isinstance(i, bytes) else i for i in ids]
+
+    def process(self, ids: List[str]) -> int:
+        """File a batch of tickets. Returns: tickets marked FILED"""
+        tickets = TicketRepo.get_many(ids)
+        routes = {tid: self.route(t) for tid, t in tickets.items()}
+        started = set(TicketRepo.transition(
+            {tid: {"authority": r.get("authority_name")} for tid, r in routes.items()
+             if tickets[tid].get("status") == "CREATED"},
+            "CREATED", "FILING",
+        ))
+        # Also pick up tickets left in FILING by an interrupted batch
+        todo = [tid for tid in tickets if tid in started or tickets[tid].get("status") == "FILING"]
+
+        groups: Dict[Endpoint, List[str]] = defaultdict(list)
+        for tid in todo:
+            r = routes[tid]
+            groups[(r.get("endpoint_type") or "email", r.get("endpoint_value"))].append(tid)
+
+        moved = 0
+        for (kind, target), tids in groups.items():
+            if kind == "email" and self._digest(routes[tids[0]].get("authority_name")):
+                self._park(routes[tids[0]], [tickets[t] for t in tids])
+                continue
+            claimed, delivered, busy = self._claim(tids)
+            failed: Set[str] = set()
+            if claimed:
+                # One observation per endpoint group: the batch is the unit of work here
+                authority = routes[tids[0]].get("authority_name") or "unknown"
+                with FILING_SECONDS.labels(authority, f"{kind}_batch").time():
+                    if kind == "email":
+                        failed = self._send_emails(target, [tickets[t] for t in claimed])
+                    else:
+                        failed = self._post_api(target, [tickets[t] for t in claimed])
+                FILINGS.labels(authority, "ok").inc(len(claimed) - len(failed))
+                if failed:
+                    FILINGS.labels(authority, "error").inc(len(failed))
+                self._release(claimed, failed)
+            moved += len(TicketRepo.transition(
+                {t: {"authority_ticket_id": _authority_ticket_id(t)}
+                 for t in tids if t in delivered or (t in claimed and t not in failed)},
+                "FILING", "FILED",
+            ))
+            retry = [tickets[t] for t in tids if t in failed or t in busy]
+            if retry:
+                self._retry(retry)
+        return moved
+
+    def _claim(self, tids: List[str]) -> Tuple[List[str], Set[str], Set[str]]:
+        """Take the idempotency key of each ticket.
+        Returns: (claimed, already delivered, held by another sender)
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for t in tids:
+            pipe.set(IDEMPOTENCY_KEY.format(t), "sending", nx=True, ex=FILING_LEASE_S)
+        taken = pipe.execute()
+        claimed = [t for t, ok in zip(tids, taken) if ok]
+        others = [t for t, ok in zip(tids, taken) if not ok]
+        states = self.redis.mget([IDEMPOTENCY_KEY.format(t) for t in others]) if others else []
+        delivered = {t for t, state in zip(others, states) if state in (b"done", "done")}
+        return claimed, delivered, set(others) - delivered
+
+    def _release(self, claimed: List[str], failed: Set[str]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        for t in claimed:
+            if t in failed:
+                pipe.delete(IDEMPOTENCY_KEY.format(t))
+            else:
+                pipe.set(IDEMPOTENCY_KEY.format(t), "done", ex=FILING_DONE_TTL_S)
+        pipe.execute()
+
+    def _retry(self, tickets: List[Dict[str, Any]]) -> None:
+        """Queue a filing job per ticket; it finds the ticket FILING and sends
+        it again, retrying with backoff and dead-lettering like FILING_MODE=job.
+        """
+        from workers.outbox import OutboxRelay
+
+        relay = OutboxRelay(self.redis, filing_mode="job")
+        for t in tickets:
+            relay.publish("file", {}, t)
+
+    def _send_emails(self, to_addr: str, tickets: List[Dict[str, Any]]) -> Set[str]:
+        """Returns: ids of the tickets whose message failed"""
+        msgs = []
+        for t in tickets:
+            subject, body = compose(t.get("iclass"), t.get("address"), t.get("contact"), t.get("media_url"))
+            msgs.append(mailer.message(to_addr, subject, body))
+        failed = set()
+        for t, err in zip(tickets, self._smtp().send_many(msgs)):
+            if err is not None:
+                print(f"[Dispatch] email for {t['id']} to {to_addr} failed:", err)
+                failed.add(t["id"])
+        return failed
+
+    def _payload(self, t: Dict[str, Any]) -> Dict[str, Any]:
+        subject, body = compose(t.get("iclass"), t.get("address"), t.get("contact"), t.get("media_url"))
+        return {"title": subject, "details": body, "photo": t.get("media_url")}
+
+    def _post_api(self, url: str, tickets: List[Dict[str, Any]]) -> Set[str]:
+        """Returns: ids of the tickets whose filing failed"""
+        if len(tickets) > 1 and url not in self._no_batch:
+            try:
+                resp = self.post(url.rstrip("/") + "/batch", {"filings": [self._payload(t) for t in tickets]})
+                if resp is not None and resp.status_code in (404, 405):
+                    self._no_batch.add(url)
+                else:
+                    if resp is not None and resp.status_code >= 400:
+                        print(f"[Dispatch] batch POST to {url} status={resp.status_code}")
+                        return {t["id"] for t in tickets}
+                    return set()
+            except Exception as e:
+                print(f"[Dispatch] batch POST to {url} failed:", e)
+                return {t["id"] for t in tickets}
+        failed = set()
+        for t in tickets:
+            try:
+                resp = self.post(url, self._payload(t))
+                if resp is not None and resp.status_code >= 400:
+                    raise RuntimeError(f"authority API answered {resp.status_code}")
+            except Exception as e:
+                print(f"[Dispatch] POST for {t['id']} to {url} failed:", e)
+                failed.add(t["id"])
+        return failed
+
+    # Digest mode: one digest per (authority, address), as routes can send an
+    # authority's tickets to different inboxes (per ward)
+    def _park(self, route: Dict[str, str], tickets: List[Dict[str, Any]]) -> None:
+        authority, to = route.get("authority_name"), route.get("endpoint_value")
+        digest = f"{authority}|{to}"
+        pipe = self.redis.pipeline()
+        for t in tickets:
+            pipe.rpush(DIGEST_KEY.format(digest), json.dumps({
+                "id": t["id"], "authority": authority, "to": to,
+                "iclass": t.get("iclass"), "address": t.get("address"), "photo": t.get("media_url"),
+            }))
+        pipe.setnx(DIGEST_SENT_KEY.format(digest), self.clock())  # interval starts with the first parked ticket
+        pipe.execute()
+
+    def send_due_digests(self, force: bool = False) -> int:
+        """Send digests whose interval has elapsed. Returns: tickets marked FILED"""
+        filed = 0
+        for digest in self._parked_digests():
+            last = float(self.redis.get(DIGEST_SENT_KEY.format(digest)) or 0)
+            if not force and self.clock() - last < self.digest_interval_s:
+                continue
+            lock = DIGEST_LOCK_KEY.format(digest)
+            if not self.redis.set(lock, 1, nx=True, ex=FILING_LEASE_S):
+                continue  # another dispatcher is sending it
+            try:
+                filed += self._flush_digest(digest)
+            finally:
+                self.redis.delete(lock)
+        return filed
+
+    def _flush_digest(self, digest: str) -> int:
+        """Move the parked list to the digest's sending list, send it and mark
+        its tickets FILED. The sending list is only deleted after that commit:
+        one left by a failed send or a crash goes out (again) next interval,
+        ahead of whatever was parked since, and tickets whose idempotency key
+        says they were delivered aren't mailed twice.
+        """
+        parked, sending = DIGEST_KEY.format(digest), DIGEST_SENDING_KEY.format(digest)
+        if not self.redis.exists(sending):
+            if not self.redis.exists(parked):
+                return 0
+            self.redis.rename(parked, sending)
+        self.redis.set(DIGEST_SENT_KEY.format(digest), self.clock())
+        items = list({i["id"]: i for i in map(json.loads, self.redis.lrange(sending, 0, -1))}.values())
+        if not self._send_digest(items):
+            return 0
+        filed = TicketRepo.transition(
+            {i["id"]: {"authority_ticket_id": _authority_ticket_id(i["id"])} for i in items}, "FILING", "FILED"
+        )
+        self.redis.delete(sending)
+        return len(filed)
+
+    def _parked_digests(self) -> Set[str]:
+        digests = set()
+        for key_format in (DIGEST_KEY, DIGEST_SENDING_KEY):
+            prefix = key_format.format("")
+            for k in self.redis.scan_iter(match=prefix + "*"):
+                digests.add((k.decode() if isinstance(k, bytes) else k)[len(prefix):])
+        return digests
+
+    def _send_digest(self, items: List[Dict[str, Any]]) -> bool:
+        """Mail the items not delivered yet. Returns: False if the send failed"""
+        states = self.redis.mget([IDEMPOTENCY_KEY.format(i["id"]) for i in items])
+        todo = [i for i, state in zip(items, states) if state not in (b"done", "done")]
+        if not todo:
+            return True
+        authority = todo[0].get("authority")
+        lines = [f"- {i['iclass']} at {i['address']} ({_authority_ticket_id(i['id'])}) {i.get('photo') or ''}" for i in todo]
+        msg = mailer.message(
+            todo[0]["to"],
+            f"[CivicGuard] {len(todo)} new reports for {authority}",
+            f"{len(todo)} issues reported since the last digest:\n\n" + "\n".join(lines),
+        )
+        try:
+            self._smtp().send(msg)
+        except Exception as e:
+            print(f"[Dispatch] digest for {authority} to {todo[0]['to']} failed, kept for the next one:", e)
+            return False
+        pipe = self.redis.pipeline(transaction=False)
+        for i in todo:
+            pipe.set(IDEMPOTENCY_KEY.format(i["id"]), "done", ex=FILING_DONE_TTL_S)
+        pipe.execute()
+        return True
+
+    def run_forever(self) -> None:
+        print(f"[Dispatch] waiting on {PENDING_KEY} (max_batch={self.max_batch}, max_wait={self.max_wait * 1000:.0f}ms)")
+        while True:
+            try:
+                self.process(self.next_batch())
+                self.work.ack()
+                self.send_due_digests()
+            except Exception as e:
+                print("[Dispatch] batch failed, requeued:", e)
+                self.work.requeue()
+                time.sleep(1)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Batched authority filing worker")
+    ap.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    ap.add_argument("--max-wait-ms", type=int, default=MAX_WAIT_MS)
+    args = ap.parse_args()
+
+    from workers.queue import redis
+
+    try:
+        FilingDispatcher(redis, args.max_batch, args.max_wait_ms).run_forever()
+    finally:
+        mailer.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Dead-letter queue: jobs that failed their last retry, kept in each stage
+queue's rq FailedJobRegistry.
+
+    python -m workers.dlq list [--stage file]
+    python -m workers.dlq replay [--stage file] [JOB_ID ...]
+    python -m workers.dlq purge [--stage file] [JOB_ID ...]
+
+Replay puts the job back on its queue with a fresh retry budget. Filing jobs
+are safe to replay: the ticket goes FAILED -> FILING again and the
+idempotency key (workers/jobs.py) stops a second delivery if the first one
+actually reached the authority.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional, Sequence
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from rq.exceptions import NoSuchJobError  # noqa: E402
+from rq.job import Job  # noqa: E402
+from rq.registry import FailedJobRegistry  # noqa: E402
+
+from workers import queue as q  # noqa: E402
+
+
+def _registries(connection, stages: Optional[Sequence[str]] = None) -> Dict[str, FailedJobRegistry]:
+    queues = q.make_queues(connection)
+    return {s: FailedJobRegistry(queue=queues[s]) for s in (stages or queues)}
+
+
+def failed_jobs(connection, stages: Optional[Sequence[str]] = None) -> List[Dict[str, object]]:
+    out = []
+    for stage, registry in _registries(connection, stages).items():
+        for jid in registry.get_job_ids():
+            try:
+                job = Job.fetch(jid, connection=connection)
+            except NoSuchJobError:
+                continue
+            exc = (job.exc_info or "").strip().splitlines()
+            out.append({
+                "stage": stage,
+                "id": jid,
+                "func": job.func_name,
+                "args": list(job.args or ()),
+                "ended_at": job.ended_at,
+                "error": exc[-1] if exc else None,
+            })
+    return out
+
+
+def replay(connection, stages: Optional[Sequence[str]] = None, job_ids: Optional[Sequence[str]] = None) -> int:
+    """Requeue dead-lettered jobs (all, or just `job_ids`). Returns: jobs requeued"""
+    n = 0
+    for registry in _registries(connection, stages).values():
+        for jid in registry.get_job_ids():
+            if job_ids and jid not in job_ids:
+                continue
+            job = Job.fetch(jid, connection=connection)
+            if q.JOB_MAX_RETRIES > 0:
+                job.retries_left = q.JOB_MAX_RETRIES
+                job.retry_intervals = q.JOB_RETRY_INTERVALS or None
+            registry.requeue(job)  # saves the job, then enqueues it
+            n += 1
+    return n
+
+
+def purge(connection, stages: Optional[Sequence[str]] = None, job_ids: Optional[Sequence[str]] = None) -> int:
+    n = 0
+    for registry in _registries(connection, stages).values():
+        for jid in registry.get_job_ids():
+            if job_ids and jid not in job_ids:
+                continue
+            registry.remove(jid, delete_job=True)
+            n += 1
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect and replay dead-lettered jobs")
+    ap.add_argument("command", choices=["list", "replay", "purge"])
+    ap.add_argument("job_ids", nargs="*")
+    ap.add_argument("--stage", action="append", choices=sorted(q.QUEUE_NAMES), help="repeatable; default all")
+    args = ap.parse_args()
+
+    if args.command == "list":
+        for j in failed_jobs(q.redis, args.stage):
+            print(f"{j['stage']:9} {j['id']:45} {j['ended_at']}  {j['error']}")
+    elif args.command == "replay":
+        print(f"requeued {replay(q.redis, args.stage, args.job_ids)} jobs")
+    else:
+        print(f"purged {purge(q.redis, args.stage, args.job_ids)} jobs")
+
+
+if __name__ == "__main__":
+    main()
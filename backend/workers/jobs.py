@@ -1,55 +1,151 @@
-import time, requests, smtplib, os
-from email.message import EmailMessage
+import atexit, os, time
+from urllib.parse import urlsplit
+from agents import mailer, metrics, outbound, tracing
 from db.repository import TicketRepo
+from workers.coalesce import StatusCoalescer
+from workers.queue import redis
 
+# Idempotency key per filing: "sending" while a delivery is in flight (lease
+# of FILING_LEASE_S, so a crashed worker doesn't block the retry forever),
+# "done" for FILING_DONE_TTL_S once the authority has it. A retried or
+# replayed job that finds "done" skips straight to marking the ticket FILED.
+IDEMPOTENCY_KEY = "idem:file:{}"
+FILING_LEASE_S = int(os.getenv("FILING_LEASE_S", "300"))
+FILING_DONE_TTL_S = int(os.getenv("FILING_DONE_TTL_S", str(30 * 24 * 3600)))
 
-SMTP_HOST = "smtp.sendgrid.net"
-SMTP_PORT = 587
-SMTP_USER = "apikey"
-SMTP_PASS = os.getenv("SENDGRID_KEY", "YOUR_SENDGRID_KEY")
-FROM = "noreply@civicguard.local"
+FILING_SECONDS = metrics.histogram(
+    "civicguard_filing_seconds", "Time to deliver a filing to the authority", ["authority", "channel"]
+)
+FILINGS = metrics.counter("civicguard_filings_total", "Filing deliveries per authority", ["authority", "outcome"])
+
+
+# Buffer the final FILED transition for this many ms so filings that finish
+# close together share one UPDATE. Only safe with an in-process worker
+# (python -m workers.run, or rq worker -w rq.worker.SimpleWorker); a forked
+# job horse exits without flushing. 0 writes each transition immediately.
+FILING_COALESCE_MS = float(os.getenv("FILING_COALESCE_MS", "0"))
+status_updates = StatusCoalescer(window_ms=FILING_COALESCE_MS)
+atexit.register(status_updates.close)
 
 
 def _file_via_email(to_addr: str, subject: str, body: str):
-    msg = EmailMessage()
-    msg["From"] = FROM
-    msg["To"] = to_addr
-    msg["Subject"] = subject
-    msg.set_content(body)
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=15) as s:
-        s.starttls()
-        s.login(SMTP_USER, SMTP_PASS)
-        s.send_message(msg)
+    # Shared SMTP session: connect/STARTTLS/login once per worker, not per ticket
+    mailer.session().send(mailer.message(to_addr, subject, body))
 
 
 def _file_via_api(url: str, payload: dict):
-    requests.post(url, json=payload, timeout=10)
+    # Pooled keep-alive session; breaker is per authority host so one dead
+    # endpoint doesn't slow filings to the others.
+    host = urlsplit(url).netloc
+    return outbound.request(f"authority:{host}", "POST", url, json=payload, timeout=10, retries=2)
 
 
-def file_to_authority(ticket_id: str, file_url: str, iclass: str, address: str, contact: str | None):
+def compose(iclass: str, address: str, contact: str | None, file_url: str) -> tuple[str, str]:
+    """Subject and body of a filing. Returns: (subject, body)"""
+    subject = f"[CivicGuard] {iclass} at {address}"
+    body = f"Issue: {iclass}\nAddress: {address}\nCitizen: {contact or ''}\nPhoto: {file_url}"
+    return subject, body
+
+
+def file_to_authority(
+    ticket_id: str,
+    file_url: str,
+    iclass: str,
+    address: str,
+    contact: str | None,
+    lat: float | None = None,
+    lng: float | None = None,
+):
     """File the ticket to an authority using routing table via email or API.
+    The ward comes from lat/lng (jobs queued without them use the default ward).
     Updates status/authority fields and writes authority_ticket_id using repo.
     """
-    from agents.routing import lookup
+    from agents.routing import resolve
 
-    t = TicketRepo.get(ticket_id)
-    if not t:
-        return
+    route = resolve(iclass, lat, lng)
+    # CAS CREATED -> FILING (FAILED -> FILING for a dead-letter replay); a
+    # retried job finds its ticket already FILING
+    authority = {ticket_id: {"authority": route.get("authority_name")}}
+    if not (TicketRepo.transition(authority, "CREATED", "FILING") or TicketRepo.transition(authority, "FAILED", "FILING")):
+        t = TicketRepo.get(ticket_id)
+        if not t or t.get("status") != "FILING":
+            return  # missing, merged or already filed
 
-    route = lookup(iclass, "Ward-1")
-    TicketRepo.update(ticket_id, {"status": "FILING", "authority": route.get("authority_name")})
-
-    subject = f"[CivicGuard] {iclass} at {address}"
-    body = f"Issue: {iclass}\nAddress: {address}\nCitizen: {contact or ''}\nPhoto: {file_url}"
-
-    try:
-        if route.get("endpoint_type") == "email":
-            _file_via_email(route.get("endpoint_value"), subject, body)
-        else:
-            _file_via_api(route.get("endpoint_value"), {"title": subject, "details": body, "photo": file_url})
-    except Exception as e:
-        print("[Filing] error:", e)
+    key = IDEMPOTENCY_KEY.format(ticket_id)
+    if redis.set(key, "sending", nx=True, ex=FILING_LEASE_S):
+        subject, body = compose(iclass, address, contact, file_url)
+        authority_name = route.get("authority_name") or "unknown"
+        channel = route.get("endpoint_type") or "email"
+        t0 = time.perf_counter()
+        try:
+            with tracing.span("filing.send", authority=authority_name, channel=channel):
+                if channel == "email":
+                    _file_via_email(route.get("endpoint_value"), subject, body)
+                else:
+                    resp = _file_via_api(route.get("endpoint_value"), {"title": subject, "details": body, "photo": file_url})
+                    if resp is not None and resp.status_code >= 400:
+                        raise RuntimeError(f"authority API answered {resp.status_code}")
+        except Exception:
+            FILINGS.labels(authority_name, "error").inc()
+            redis.delete(key)
+            raise  # rq retries with backoff, then dead-letters (on_job_failed)
+        finally:
+            FILING_SECONDS.labels(authority_name, channel).observe(time.perf_counter() - t0)
+        FILINGS.labels(authority_name, "ok").inc()
+        redis.set(key, "done", ex=FILING_DONE_TTL_S)
+    elif redis.get(key) != b"done":
+        raise RuntimeError(f"filing {ticket_id} already in progress")
 
     authority_ticket_id = f"CG-{ticket_id[:8]}"
-    TicketRepo.update(ticket_id, {"status": "FILED", "authority_ticket_id": authority_ticket_id})
+    status_updates.submit(ticket_id, "FILING", "FILED", {"authority_ticket_id": authority_ticket_id})
     return {"ok": True, "authority_ticket_id": authority_ticket_id}
+
+
+def geocode_ticket(ticket_id: str, lat: float, lng: float):
+    """Fill in the address of a ticket whose intake geocode came back empty."""
+    from agents.geo import reverse_geocode
+
+    # The intake lookup that queued this job left a negative cache entry
+    # (GEOCODE_CACHE_NEGATIVE_TTL) that would otherwise answer every retry
+    address = reverse_geocode(lat, lng, retry_negative=True)
+    if not address or address == "Unknown":
+        raise RuntimeError(f"no address for {lat},{lng}")  # retried with backoff
+    TicketRepo.update(ticket_id, {"address": address})
+    return {"ok": True, "address": address}
+
+
+def derive_media(ticket_id: str, key: str):
+    """Thumbnail and preview of the ticket's photo; sets thumb_url/preview_url."""
+    from agents.derivatives import generate
+
+    with tracing.span("media.derive", key=key):
+        urls = generate(key)
+    TicketRepo.update(ticket_id, urls)
+    return {"ok": True, **urls}
+
+
+def classify_ticket(ticket_id: str, source: str, name: str | None = None):
+    """Single-ticket classification, for batches the classifier worker
+    couldn't predict. Queues the filing with the final label.
+    """
+    from agents.vision import classify
+    from workers.outbox import OutboxRelay
+
+    iclass, severity, conf = classify(source, name)
+    t = TicketRepo.update(
+        ticket_id, {"iclass": iclass, "severity": severity, "confidence": conf}, outbox=[("file", {})]
+    )
+    if t:
+        OutboxRelay(redis).relay([ticket_id])
+    return {"ok": True, "class": iclass}
+
+
+def on_job_failed(job, connection, exc_type, exc_value, tb):
+    """rq failure callback. After the last retry the job sits in the
+    dead-letter queue; its ticket is marked FAILED so it shows up as such.
+    """
+    if job.should_retry:
+        return
+    print(f"[Jobs] {job.id} failed for good:", exc_value)
+    if job.func_name == "workers.jobs.file_to_authority" and job.args:
+        TicketRepo.transition({job.args[0]: {}}, "FILING", "FAILED")
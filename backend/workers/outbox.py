@@ -0,0 +1,136 @@
+"""
+Transactional outbox relay.
+
+Intake and the workers never enqueue follow-up work directly. They write an
+`outbox` row (topic + JSON payload) in the same commit as the ticket change
+(TicketRepo.create/update(..., outbox=[...])), and this relay publishes
+pending rows to Redis and marks them dispatched. A ticket created while
+Redis is down is therefore never lost: its row stays pending and goes out on
+the next relay pass.
+
+Topics:
+- file: RQ job workers.jobs.file_to_authority on the file queue, or the
+  batched dispatcher list with FILING_MODE=dispatch
+- classify: the micro-batching classifier list (CLASSIFY_MODE=batch)
+- geocode: RQ job workers.jobs.geocode_ticket on the geocode queue
+- media: RQ job workers.jobs.derive_media (thumbnails) on the media queue
+
+Intake relays its own rows right after the commit; `run_forever` sweeps
+whatever that missed, leaving rows younger than OUTBOX_GRACE_S to the fast
+path. RQ jobs use deterministic ids (<topic>-<ticket id>), so publishing a
+row twice doesn't queue the work twice.
+
+Run:  python -m workers.outbox [--interval 2]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional, Sequence
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from redis.exceptions import ConnectionError as RedisConnectionError  # noqa: E402
+
+from db.repository import OutboxRepo, TicketRepo  # noqa: E402
+from workers.queue import enqueue_job, make_queues  # noqa: E402
+
+# job: one RQ filing job per ticket; dispatch: ticket ids go to the batched
+# filing dispatcher (python -m workers.dispatch)
+FILING_MODE = os.getenv("FILING_MODE", "job").lower()
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "200"))
+OUTBOX_INTERVAL_S = float(os.getenv("OUTBOX_INTERVAL_S", "2"))
+OUTBOX_GRACE_S = float(os.getenv("OUTBOX_GRACE_S", "5"))
+
+
+class OutboxRelay:
+    def __init__(self, redis, queues=None, filing_mode: str = FILING_MODE):
+        self.redis = redis
+        self.queues = queues or make_queues(redis)
+        self.filing_mode = filing_mode
+
+    def publish(self, topic: str, payload: Dict[str, Any], ticket: Optional[Dict[str, Any]]) -> None:
+        if ticket is None:
+            return  # ticket gone; nothing to do
+        tid = ticket["id"]
+        if topic == "file":
+            if self.filing_mode == "dispatch":
+                from workers.dispatch import enqueue_filing
+
+                enqueue_filing(self.redis, tid)
+                return
+            enqueue_job(
+                self.queues["file"], "workers.jobs.file_to_authority",
+                tid, ticket.get("media_url"), ticket.get("iclass"), ticket.get("address"), ticket.get("contact"),
+                ticket.get("lat"), ticket.get("lng"),
+                job_id=f"file-{tid}", traceparent=payload.get("traceparent"),
+            )
+        elif topic == "classify":
+            from workers.classifier import enqueue_classification
+
+            enqueue_classification(
+                self.redis, tid, payload.get("source") or ticket.get("media_url"), payload.get("name")
+            )
+        elif topic == "geocode":
+            enqueue_job(
+                self.queues["geocode"], "workers.jobs.geocode_ticket",
+                tid, ticket.get("lat"), ticket.get("lng"),
+                job_id=f"geocode-{tid}", traceparent=payload.get("traceparent"),
+            )
+        elif topic == "media":
+            enqueue_job(
+                self.queues["media"], "workers.jobs.derive_media",
+                tid, payload.get("key"),
+                job_id=f"media-{tid}", traceparent=payload.get("traceparent"),
+            )
+        else:
+            raise ValueError(f"unknown outbox topic {topic!r}")
+
+    def relay(self, ticket_ids: Optional[Sequence[str]] = None, limit: int = OUTBOX_BATCH, grace_s: float = 0) -> int:
+        """Publish pending rows (for `ticket_ids`, or all). Returns: rows dispatched"""
+        older_than = TicketRepo._now() - timedelta(seconds=grace_s) if grace_s > 0 else None
+        rows = OutboxRepo.pending(limit, ticket_ids, older_than)
+        if not rows:
+            return 0
+        tickets = TicketRepo.get_many(list({r["ticket_id"] for r in rows}))
+        done = []
+        for r in rows:
+            try:
+                self.publish(r["topic"], json.loads(r["payload"] or "{}"), tickets.get(r["ticket_id"]))
+                done.append(r["id"])
+            except Exception as e:
+                OutboxRepo.mark_failed(r["id"], str(e))
+                print(f"[Outbox] {r['topic']} for {r['ticket_id']} failed:", e)
+                if isinstance(e, RedisConnectionError):
+                    break  # Redis is down; the rest can wait for the next pass
+        return OutboxRepo.mark_dispatched(done)
+
+    def run_forever(self, interval_s: float = OUTBOX_INTERVAL_S) -> None:
+        print(f"[Outbox] relaying every {interval_s}s (filing_mode={self.filing_mode})")
+        while True:
+            try:
+                while self.relay(grace_s=OUTBOX_GRACE_S) >= OUTBOX_BATCH:
+                    pass
+            except Exception as e:
+                print("[Outbox] relay failed:", e)
+            time.sleep(interval_s)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Outbox relay")
+    ap.add_argument("--interval", type=float, default=OUTBOX_INTERVAL_S)
+    args = ap.parse_args()
+
+    from workers.queue import redis
+
+    OutboxRelay(redis).run_forever(args.interval)
+
+
+if __name__ == "__main__":
+    main()
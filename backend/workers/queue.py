@@ -1,9 +1,132 @@
+"""
+RQ queues, one per pipeline stage, so each stage gets its own workers
+(python -m workers.run) and a slow stage can't back up the others.
+
+Jobs are enqueued with Retry(JOB_MAX_RETRIES, JOB_RETRY_INTERVALS) and the
+workers.jobs.on_job_failed callback. A job that is still failing after its
+last retry lands in the queue's FailedJobRegistry, which is the dead-letter
+queue (python -m workers.dlq list|replay|purge).
+
+With TRACING=1 the enqueuing trace's `traceparent` is stored in job.meta and
+workers.run picks it up, so the job's spans join the request that caused it.
+"""
 import os
+import time
+from typing import Dict, Optional
+
 from redis import Redis
-from rq import Queue
+from rq import Callback, Queue, Retry
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+from rq.registry import FailedJobRegistry, ScheduledJobRegistry
+from rq.utils import now
+
+from agents import metrics, tracing
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 
+JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", "5"))
+# Backoff in seconds before retry 1, 2, ... (rq: one value per retry)
+JOB_RETRY_INTERVALS = [int(s) for s in os.getenv("JOB_RETRY_INTERVALS", "10,30,120,600,1800").split(",") if s.strip()]
+
+QUEUE_NAMES = {
+    "classify": "classify_jobs",
+    "geocode": "geocode_jobs",
+    "file": "file_jobs",
+    "media": "media_jobs",
+}
+
+# A job with the same id in one of these states is not enqueued again
+_LIVE = {JobStatus.QUEUED, JobStatus.STARTED, JobStatus.SCHEDULED, JobStatus.DEFERRED}
+
+
+def make_queues(connection) -> Dict[str, Queue]:
+    return {stage: Queue(name, connection=connection) for stage, name in QUEUE_NAMES.items()}
+
+
+def retry_policy() -> Optional[Retry]:
+    if JOB_MAX_RETRIES < 1:
+        return None
+    return Retry(max=JOB_MAX_RETRIES, interval=JOB_RETRY_INTERVALS or 0)
+
+
+def enqueue_job(queue: Queue, func: str, *args, job_id: Optional[str] = None, traceparent: Optional[str] = None) -> Job:
+    """Enqueue with the retry policy and failure callback. A job id makes
+    the enqueue idempotent while that job is still waiting or running.
+    `traceparent` defaults to the current trace's.
+    """
+    if job_id:
+        try:
+            job = Job.fetch(job_id, connection=queue.connection)
+            if job.get_status() in _LIVE:
+                return job
+        except NoSuchJobError:
+            pass
+    traceparent = traceparent or tracing.traceparent()
+    return queue.enqueue(
+        func, *args,
+        job_id=job_id,
+        meta={"traceparent": traceparent} if traceparent else None,
+        retry=retry_policy(),
+        on_failure=Callback("workers.jobs.on_job_failed"),
+    )
+
+
+def queue_stats(connection) -> Dict[str, Dict[str, float]]:
+    """Per stage: jobs waiting, age of the oldest waiting job, jobs waiting
+    out a retry backoff, and dead-lettered jobs.
+    """
+    out = {}
+    for stage, queue in make_queues(connection).items():
+        oldest_age = 0.0
+        head = queue.get_job_ids(0, 1)
+        if head:
+            try:
+                enqueued_at = Job.fetch(head[0], connection=connection).enqueued_at
+                oldest_age = max(0.0, (now() - enqueued_at).total_seconds()) if enqueued_at else 0.0
+            except NoSuchJobError:
+                pass
+        out[stage] = {
+            "depth": queue.count,
+            "oldest_age_s": oldest_age,
+            "retrying": ScheduledJobRegistry(queue=queue).count,
+            "dead": FailedJobRegistry(queue=queue).count,
+        }
+    return out
+
+
+_GAUGES = (
+    ("depth", "civicguard_queue_depth", "Jobs waiting per queue"),
+    ("oldest_age_s", "civicguard_queue_oldest_job_age_seconds", "Age of the oldest waiting job per queue"),
+    ("retrying", "civicguard_queue_retrying_jobs", "Jobs waiting out a retry backoff per queue"),
+    ("dead", "civicguard_queue_dead_letter_jobs", "Jobs in the dead-letter queue per queue"),
+)
+
+
+def register_metrics(connection, max_age_s: float = 1.0, error_backoff_s: float = 30.0) -> None:
+    """Queue gauges for /metrics; one round of Redis reads per scrape. With
+    Redis down, a failed read is reused for error_backoff_s so scrapes don't
+    each sit through the client's connection retries.
+    """
+    memo = {"at": -error_backoff_s, "stats": {}, "error": None}
+
+    def stats():
+        ttl = max_age_s if memo["error"] is None else error_backoff_s
+        if time.monotonic() - memo["at"] > ttl:
+            try:
+                memo["stats"], memo["error"] = queue_stats(connection), None
+            except Exception as e:
+                memo["stats"], memo["error"] = {}, e
+            memo["at"] = time.monotonic()
+        if memo["error"] is not None:
+            raise memo["error"]
+        return memo["stats"]
+
+    for field, name, doc in _GAUGES:
+        metrics.gauge(name, doc, ["queue"], lambda f=field: {(s,): v[f] for s, v in stats().items()})
+
+
 redis = Redis(host=REDIS_HOST, port=REDIS_PORT)
-file_queue = Queue("file_jobs", connection=redis)
+queues = make_queues(redis)
+file_queue = queues["file"]
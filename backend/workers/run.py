@@ -0,0 +1,126 @@
+"""
+rq workers for the per-stage queues, each stage with its own concurrency.
+
+    python -m workers.run                 # every stage, one process group each
+    python -m workers.run file geocode    # just these stages
+
+WORKERS_CLASSIFY / WORKERS_GEOCODE / WORKERS_FILE / WORKERS_MEDIA set the
+worker count per stage (defaults 1 / 4 / 4 / 2). Workers run with the rq
+scheduler, which is what moves retries with a backoff interval back onto
+their queue.
+
+All stages use MeteredWorker, an in-process SimpleWorker (no fork per job):
+loaded models, the shared SMTP sessions, the FILING_COALESCE_MS buffer in
+workers/jobs.py and the metrics series all survive between jobs. Each worker
+writes its metrics to METRICS_DIR (a temp dir unless set) and this process
+serves the sum, plus queue depth/age, on METRICS_PORT (0 disables).
+
+With TRACING=1 each job is a trace root that continues the traceparent in
+job.meta (set by enqueue_job), so file_to_authority shows up under the
+intake request that queued it, with its SQL and outbound HTTP spans.
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
+
+from rq.utils import now  # noqa: E402
+from rq.worker import SimpleWorker  # noqa: E402
+from rq.worker_pool import WorkerPool  # noqa: E402
+
+from agents import metrics, tracing  # noqa: E402
+from workers import queue as q  # noqa: E402
+
+_DEFAULT_WORKERS = {"classify": 1, "geocode": 4, "file": 4, "media": 2}
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+JOB_WAIT = metrics.histogram("civicguard_job_wait_seconds", "Time a job waited in its queue before starting", ["queue"])
+JOB_SECONDS = metrics.histogram("civicguard_job_seconds", "Job run time", ["queue", "outcome"])
+
+
+class MeteredWorker(SimpleWorker):
+    def work(self, *args, **kwargs):
+        metrics.start_flusher()
+        _instrument_db()
+        return super().work(*args, **kwargs)
+
+    def perform_job(self, job, queue) -> bool:
+        try:
+            if job.enqueued_at:
+                JOB_WAIT.labels(queue.name).observe(max(0.0, (now() - job.enqueued_at).total_seconds()))
+        except Exception:
+            pass
+        t0 = time.perf_counter()
+        with tracing.start_trace(f"job {job.func_name}", parent=(job.meta or {}).get("traceparent"),
+                                 **{"job.id": job.id, "job.queue": queue.name}) as span:
+            ok = super().perform_job(job, queue)
+            if span is not None and not ok:
+                span.status = "error"
+        JOB_SECONDS.labels(queue.name, "ok" if ok else "error").observe(time.perf_counter() - t0)
+        return ok
+
+
+def _instrument_db() -> None:
+    if tracing.TRACING:
+        from db.session import engine
+
+        tracing.instrument_engine(engine)
+
+
+def concurrency(stage: str) -> int:
+    try:
+        return max(1, int(os.getenv(f"WORKERS_{stage.upper()}", _DEFAULT_WORKERS[stage])))
+    except ValueError:
+        return _DEFAULT_WORKERS[stage]
+
+
+def run_stage(stage: str) -> None:
+    pool = WorkerPool(
+        [q.QUEUE_NAMES[stage]],
+        connection=q.redis,
+        num_workers=concurrency(stage),
+        worker_class=MeteredWorker,
+    )
+    pool.start()
+
+
+def _metrics_dir() -> str:
+    directory = metrics.METRICS_DIR or tempfile.mkdtemp(prefix="civicguard-metrics-")
+    os.makedirs(directory, exist_ok=True)
+    for stale in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(stale)  # counters restart with the workers
+    # Inherited by the worker processes, forked or spawned
+    os.environ["METRICS_DIR"] = metrics.METRICS_DIR = directory
+    return directory
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-stage rq workers")
+    ap.add_argument("stages", nargs="*", choices=sorted(q.QUEUE_NAMES))
+    ap.add_argument("--metrics-port", type=int, default=METRICS_PORT)
+    args = ap.parse_args()
+    stages = args.stages or list(q.QUEUE_NAMES)
+
+    directory = _metrics_dir()
+    procs = [multiprocessing.Process(target=run_stage, args=(s,), name=f"workers-{s}") for s in stages]
+    for p in procs:
+        p.start()
+    if args.metrics_port:
+        q.register_metrics(q.redis)
+        threading.Thread(target=metrics.serve, args=(args.metrics_port, directory), daemon=True).start()
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Reliable Redis work lists for the batching workers (workers/classifier.py,
+workers/dispatch.py).
+
+Items are moved, not popped: BLMOVE/LMOVE from the pending list onto this
+worker's processing list (<pending>:processing:<host>:<pid>), which is only
+cleared once the batch is committed (`ack`). A batch that raises goes back
+to the front of the pending list (`requeue`). If the worker dies instead,
+its items stay in the processing list, and as soon as its heartbeat
+(<pending>:alive:<host>:<pid>) has lapsed for WORKLIST_LEASE_S, any worker on
+the same pending list moves them back (`recover`, run on the first take and
+then once per lease). The heartbeat is refreshed every third of a lease by a
+background thread, so a batch that runs longer than the lease (a slow SMTP
+relay, a DB stall) keeps its items.
+
+Delivery is therefore at-least-once; both consumers tolerate seeing a ticket
+twice (the classifier's update and the dispatcher's CAS transitions).
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from typing import List, Optional
+
+LEASE_S = int(os.getenv("WORKLIST_LEASE_S", "300"))
+
+
+class WorkList:
+    def __init__(self, redis, pending_key: str, worker: Optional[str] = None, lease_s: int = LEASE_S):
+        self.redis = redis
+        self.pending_key = pending_key
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_s = max(1, lease_s)
+        self.processing_key = self._processing(self.worker)
+        self.alive_key = f"{pending_key}:alive:{self.worker}"
+        self._next_recover = 0.0
+        self._stop = threading.Event()
+        self._beater: Optional[threading.Thread] = None
+
+    def _processing(self, worker: str) -> str:
+        return f"{self.pending_key}:processing:{worker}"
+
+    def take(self, max_batch: int, max_wait: float, block_timeout: float = 1.0) -> List[bytes]:
+        """Block for the first item, then top the batch up until it's full or
+        max_wait has elapsed since that first item arrived.
+        """
+        if time.monotonic() >= self._next_recover:
+            self.recover()
+            self._next_recover = time.monotonic() + self.lease_s
+        self.heartbeat()
+        if self._beater is None:
+            self._beater = threading.Thread(target=self._beat, name=f"worklist-{self.pending_key}", daemon=True)
+            self._beater.start()
+        first = self.redis.blmove(self.pending_key, self.processing_key, block_timeout, "LEFT", "RIGHT")
+        if first is None:
+            return []
+        items = [first]
+        deadline = time.monotonic() + max_wait
+        while len(items) < max_batch:
+            pipe = self.redis.pipeline(transaction=False)
+            for _ in range(max_batch - len(items)):
+                pipe.lmove(self.pending_key, self.processing_key, "LEFT", "RIGHT")
+            more = [i for i in pipe.execute() if i is not None]
+            if more:
+                items.extend(more)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # blmove timeouts are coarse; poll in short sleeps inside the window
+            time.sleep(min(remaining, 0.005))
+        return items
+
+    def heartbeat(self) -> None:
+        self.redis.set(self.alive_key, 1, ex=self.lease_s)
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.lease_s / 3):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                print(f"[WorkList] heartbeat on {self.pending_key} failed:", e)
+
+    def close(self) -> None:
+        """Stop the heartbeat; the processing list is left for `recover`."""
+        self._stop.set()
+
+    def ack(self) -> None:
+        """The batch taken is committed: forget it."""
+        self.redis.delete(self.processing_key)
+
+    def requeue(self) -> int:
+        """Put this worker's in-flight batch back at the front of the pending
+        list, in its original order. Returns: items moved
+        """
+        return self._drain(self.processing_key)
+
+    def recover(self) -> int:
+        """Requeue the in-flight batches of workers whose heartbeat lapsed.
+        Returns: items moved
+        """
+        prefix = self._processing("")
+        moved = 0
+        for key in self.redis.scan_iter(match=prefix + "*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            worker = key[len(prefix):]
+            if key == self.processing_key or not self.redis.exists(f"{self.pending_key}:alive:{worker}"):
+                n = self._drain(key)
+                if n:
+                    print(f"[WorkList] requeued {n} items left by {worker} on {self.pending_key}")
+                moved += n
+        return moved
+
+    def _drain(self, key: str) -> int:
+        n = 0
+        while self.redis.lmove(key, self.pending_key, "RIGHT", "LEFT") is not None:
+            n += 1
+        return n
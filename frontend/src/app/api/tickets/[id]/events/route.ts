@@ -0,0 +1,17 @@
+const BACKEND = process.env.BACKEND_API_BASE || process.env.NEXT_PUBLIC_API_BASE || 'http://127.0.0.1:8000'
+
+export const dynamic = 'force-dynamic'
+
+// Server-sent ticket updates: pass the stream through unbuffered
+export async function GET(req: Request, ctx: { params: { id: string } }) {
+  const upstream = `${BACKEND}/api/tickets/${encodeURIComponent(ctx.params.id)}/events`
+  const res = await fetch(upstream, { headers: { accept: 'text/event-stream' }, cache: 'no-store', signal: req.signal })
+  return new Response(res.body, {
+    status: res.status,
+    headers: {
+      'content-type': res.headers.get('content-type') || 'text/event-stream',
+      'cache-control': 'no-cache',
+      'x-accel-buffering': 'no'
+    }
+  })
+}
@@ -1,11 +1,20 @@
 const BACKEND = process.env.BACKEND_API_BASE || process.env.NEXT_PUBLIC_API_BASE || 'http://127.0.0.1:8000'
 
-export async function GET(_req: Request, ctx: { params: { id: string } }) {
+export async function GET(req: Request, ctx: { params: { id: string } }) {
   const upstream = `${BACKEND}/api/tickets/${encodeURIComponent(ctx.params.id)}`
-  const res = await fetch(upstream, { headers: { accept: 'application/json' }, cache: 'no-store' })
+  // Pass revalidation through: an unchanged ticket comes back as a 304
+  const headers: Record<string, string> = { accept: 'application/json' }
+  const inm = req.headers.get('if-none-match')
+  if (inm) headers['if-none-match'] = inm
+  const res = await fetch(upstream, { headers, cache: 'no-store' })
+  const out: Record<string, string> = {
+    'content-type': res.headers.get('content-type') || 'application/json'
+  }
+  for (const h of ['etag', 'cache-control']) {
+    const v = res.headers.get(h)
+    if (v) out[h] = v
+  }
+  if (res.status === 304) return new Response(null, { status: 304, headers: out })
   const text = await res.text()
-  return new Response(text, {
-    status: res.status,
-    headers: { 'content-type': res.headers.get('content-type') || 'application/json' }
-  })
+  return new Response(text, { status: res.status, headers: out })
 }
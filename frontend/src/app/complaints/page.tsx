@@ -12,6 +12,7 @@ type Ticket = {
   lat?: number
   lng?: number
   media_url?: string
+  thumb_url?: string
   created_at?: string
 }
 
@@ -85,8 +86,8 @@ export default function ComplaintsPage() {
       <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-4">
         {tickets.map((t) => (
           <div key={t.id} className="card overflow-hidden">
-            {t.media_url ? (
-              <img src={t.media_url} alt={t.iclass} className="w-full h-44 object-cover" />
+            {t.thumb_url || t.media_url ? (
+              <img src={t.thumb_url || t.media_url} alt={t.iclass} loading="lazy" className="w-full h-44 object-cover" />
             ) : (
               <div className="w-full h-44 bg-white/5 flex items-center justify-center text-gray-500">No image</div>
             )}
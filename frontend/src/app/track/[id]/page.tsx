@@ -16,6 +16,7 @@ type Ticket = {
   lat?: number
   lng?: number
   media_url?: string
+  preview_url?: string
   authority?: string
   authority_ticket_id?: string
 }
@@ -46,6 +47,18 @@ export default function TrackByIdPage() {
     return () => { cancelled = true }
   }, [id])
 
+  // Status changes are pushed (filing happens in the background); EventSource
+  // reconnects by itself and every (re)connect starts with the full ticket
+  useEffect(() => {
+    if (!id || typeof EventSource === 'undefined') return
+    const es = new EventSource(`/api/tickets/${encodeURIComponent(id)}/events`)
+    es.addEventListener('ticket', (e) => {
+      const update = JSON.parse((e as MessageEvent).data)
+      setData((prev) => (prev ? { ...prev, ...update } : update))
+    })
+    return () => es.close()
+  }, [id])
+
   return (
     <div className="space-y-6">
       <div className="flex items-center justify-between">
@@ -66,8 +79,10 @@ export default function TrackByIdPage() {
             <div className="text-gray-400 text-sm">{data.address}</div>
           </div>
           <div className="card p-4 space-y-3 hover-lift animate-in">
-            {data.media_url ? (
-              <img src={data.media_url} alt="attachment" className="w-full rounded-lg" />
+            {data.preview_url || data.media_url ? (
+              <a href={data.media_url || data.preview_url} target="_blank" rel="noreferrer">
+                <img src={data.preview_url || data.media_url} alt="attachment" className="w-full rounded-lg" />
+              </a>
             ) : (
               <div className="text-gray-500 text-sm">No image</div>
             )}